@@ -1,5 +1,9 @@
 """Legacy main entry point for backwards compatibility."""
 
 if __name__ == "__main__":
+    # 打包后的程序中，公式转换等进程池的工作进程从这里进入
+    import multiprocessing
+    multiprocessing.freeze_support()
+
     from pastemd.app.app import main
     main()
\ No newline at end of file
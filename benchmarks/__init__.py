@@ -0,0 +1 @@
+"""性能基准脚本（python -m benchmarks.<name> 运行，不参与 pytest）"""
@@ -0,0 +1,45 @@
+"""
+DocxProcessor.normalize_first_paragraph_style：zip 层面改写与原 python-docx 整包重存
+
+文档由 tests/test_docx_processor.py 的 build_docx 生成（pandoc 风格的段落样式与若干
+图片）。--reference 同时运行原 python-docx 实现（需要安装 python-docx）：
+
+    python -m benchmarks.bench_docx_postprocess --reference
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from pastemd.utils.docx_processor import DocxProcessor
+from tests.test_docx_processor import build_docx, reference_normalize
+
+from .common import measure, print_table, summarize
+
+_DOCUMENTS = [(200, 0), (2000, 50), (5000, 150)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--reference", action="store_true")
+    args = parser.parse_args()
+
+    rows = []
+    for paragraphs, images in _DOCUMENTS:
+        docx = build_docx(paragraphs, images)
+        row = [
+            f"{paragraphs:,}",
+            str(images),
+            f"{len(docx) / 1024 / 1024:.1f} MB",
+            summarize(measure(lambda: DocxProcessor.normalize_first_paragraph_style(docx), args.rounds)),
+        ]
+        if args.reference:
+            row.append(summarize(measure(lambda: reference_normalize(docx), max(1, args.rounds // 2))))
+        rows.append(row)
+    header = ["paragraphs", "images", "size", "zip rewrite"] + (["python-docx"] if args.reference else [])
+    print_table(header, rows)
+
+
+if __name__ == "__main__":
+    main()
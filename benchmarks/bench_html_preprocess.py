@@ -0,0 +1,85 @@
+"""
+HtmlPreprocessor：lxml 单次遍历规则引擎与原 BeautifulSoup 实现的耗时对比
+
+语料为 Excel 复制的大表格（class 样式、首行加粗）和网页正文（删除线、公式中的 <br>、SVG）。
+除总耗时外输出规则引擎各阶段与每条规则的耗时：
+
+    python -m benchmarks.bench_html_preprocess --rows 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import time
+
+from pastemd.service.preprocessor.html import HtmlPreprocessor
+from pastemd.utils.html_rules import (
+    HtmlRuleEngine,
+    build_formatting_rules,
+    format_rule_timings,
+    parse_html,
+    serialize_html,
+)
+
+from .common import measure, print_table, summarize
+
+_FORMATTING = {"strikethrough_to_del": True, "css_font_to_semantic": True, "bold_first_row_to_header": True}
+
+
+def excel_table(rows: int) -> str:
+    head = "<tr>" + "".join(f"<td class=xl65>col {c}</td>" for c in range(8)) + "</tr>"
+    body = "".join(
+        "<tr>" + "".join(f"<td class=xl{66 + (r + c) % 3}>{r * c}</td>" for c in range(8)) + "</tr>"
+        for r in range(rows)
+    )
+    return (
+        "<html><head><style>.xl65{font-weight:700}.xl66{font-style:italic}.xl67{}.xl68{font-weight:bold}</style>"
+        f"</head><body><table>{head}{body}</table></body></html>"
+    )
+
+
+def web_page(paragraphs: int) -> str:
+    block = (
+        "<p>Some ~~old~~ text with <b>bold</b> and <a href='#'>a link</a>.</p>"
+        "<p>$$a + b<br>= c$$</p><div><svg><path d='M0 0'/></svg><img src='x.png'></div>"
+        "<ul><li>~~done~~ item</li><li><span class='katex'>x<br>y</span></li></ul>"
+    )
+    return "<html><body>" + block * paragraphs + "</body></html>"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rows", type=int, default=20000)
+    parser.add_argument("--paragraphs", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    corpus = {"excel table": excel_table(args.rows), "web page": web_page(args.paragraphs)}
+    preprocessor = HtmlPreprocessor()
+    rows = []
+    for name, html in corpus.items():
+        for engine in ("bs4", "lxml"):
+            config = {"html_preprocess_engine": engine, "html_formatting": _FORMATTING}
+            timings = measure(lambda: preprocessor.process(html, config), args.rounds)
+            rows.append((name, f"{len(html) / 1024:.0f} KB", engine, summarize(timings)))
+    print_table(("corpus", "size", "engine", "time"), rows)
+
+    print()
+    for name, html in corpus.items():
+        start = time.perf_counter()
+        root = parse_html(html)
+        parsed = time.perf_counter()
+        engine = HtmlRuleEngine(build_formatting_rules(_FORMATTING))
+        engine.run(root)
+        traversed = time.perf_counter()
+        serialize_html(root)
+        done = time.perf_counter()
+        print(
+            f"{name}: parse {(parsed - start) * 1000:.1f} ms, traverse {(traversed - parsed) * 1000:.1f} ms, "
+            f"serialize {(done - traversed) * 1000:.1f} ms"
+        )
+        print(f"  {format_rule_timings(engine.timings)}")
+
+
+if __name__ == "__main__":
+    main()
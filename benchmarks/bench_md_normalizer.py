@@ -0,0 +1,64 @@
+"""
+normalize_markdown 的扩展性：1k 到 1M 行、大量代码块
+
+每种规模输出耗时与每千行耗时；每千行耗时基本不变即为线性。--reference 同时运行
+tests/test_md_normalizer.py 中的原实现（每个 ``` 行回扫之前所有行，规模较大时很慢，
+只运行到 --reference-max-lines）：
+
+    python -m benchmarks.bench_md_normalizer --reference
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from pastemd.utils.md_normalizer import normalize_markdown
+
+from .common import measure, print_table
+
+# 12 行一组，每组一个代码块，覆盖各种行类型
+_BLOCK = (
+    "# Heading\n"
+    "Paragraph text\n"
+    "- item\n"
+    "- item\n"
+    "1. first\n"
+    "> quote\n"
+    "| a | b |\n"
+    "```python\n"
+    "# comment inside code\n"
+    "print('x')\n"
+    "```\n"
+    "---\n"
+)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--reference", action="store_true")
+    parser.add_argument("--reference-max-lines", type=int, default=20_000)
+    args = parser.parse_args()
+
+    reference = None
+    if args.reference:
+        from tests.test_md_normalizer import _reference as reference
+
+    rows = []
+    for lines in (1_000, 10_000, 100_000, 1_000_000):
+        text = _BLOCK * (lines // 12)
+        best = min(measure(lambda: normalize_markdown(text), args.rounds, warmup=0))
+        row = [f"{lines:,}", f"{best:.1f} ms", f"{best / lines * 1000:.3f} ms"]
+        if reference is not None:
+            if lines <= args.reference_max_lines:
+                ref = min(measure(lambda: reference(text), 1, warmup=0))
+                row.append(f"{ref:.1f} ms")
+            else:
+                row.append("-")
+        rows.append(row)
+    header = ["lines", "time", "per 1k lines"] + (["reference"] if reference is not None else [])
+    print_table(header, rows)
+
+
+if __name__ == "__main__":
+    main()
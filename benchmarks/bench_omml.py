@@ -0,0 +1,59 @@
+"""
+convert_html_mathml_to_omml：1000 个公式的 HTML
+
+分别测量公式大多不同 / 只有约 300 个不同公式时的串行冷缓存、缓存命中与进程池并行
+（--workers，默认 CPU 数，至少 2 个）耗时。公式与 HTML 由 tests/test_omml.py 的语料生成；
+--reference 同时运行原逐个转换、逐个拼接的实现：
+
+    python -m benchmarks.bench_omml --reference
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import random
+
+from pastemd.utils import omml
+from pastemd.utils.omml import convert_html_mathml_to_omml
+from tests.test_omml import _reference, document
+
+from .common import measure, print_table, summarize
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--formulas", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=max(2, os.cpu_count() or 1))
+    parser.add_argument("--reference", action="store_true")
+    args = parser.parse_args()
+
+    parallel = {"enabled": True, "min_formulas": 0, "max_workers": args.workers}
+
+    def cold(html, **kwargs):
+        omml._replacement_cache.clear()
+        return convert_html_mathml_to_omml(html, **kwargs)
+
+    rows = []
+    try:
+        for distinct in (args.formulas, args.formulas * 3 // 10):
+            html = document(random.Random(distinct), args.formulas, distinct)
+            unique = len({m.group(0) for m in omml._MATH_RE.finditer(html)})
+            cases = [
+                ("serial", lambda: cold(html)),
+                ("warm cache", lambda: convert_html_mathml_to_omml(html)),
+                (f"{args.workers} workers", lambda: cold(html, parallel=parallel)),
+            ]
+            if args.reference:
+                cases.append(("reference", lambda: _reference(html)))
+            for name, func in cases:
+                rows.append([f"{args.formulas:,}", f"{unique:,}", f"{len(html) / 1024:.0f} KB", name,
+                             summarize(measure(func, args.rounds))])
+    finally:
+        omml.shutdown_omml_pool()
+    print_table(["formulas", "distinct", "html", "mode", "time"], rows)
+
+
+if __name__ == "__main__":
+    main()
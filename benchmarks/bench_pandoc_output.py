@@ -0,0 +1,83 @@
+"""
+rewrite_pandoc_output：约 1 MB 的 pandoc GFM / LaTeX 输出
+
+语料与 tests/test_pandoc_output.py 的回归语料相同（GFM 混合文档、以正文为主的 GFM
+（有 / 没有需要改写的公式）、带导言区的 LaTeX）。--reference 同时运行测试中的原逐条正则实现：
+
+    python -m benchmarks.bench_pandoc_output --reference
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+
+from pastemd.integrations.pandoc_output import rewrite_pandoc_output
+from tests.test_pandoc_output import _reference_gfm, _reference_latex, gfm_document, latex_document
+
+from .common import measure, print_table, summarize
+
+
+def _build(size: int, make) -> str:
+    parts = []
+    total = 0
+    while total < size:
+        parts.append(make())
+        total += len(parts[-1])
+    return "".join(parts)
+
+
+def _prose_document(rng: random.Random, math: float = 0.05) -> str:
+    """以正文为主：少量行内代码与公式（math 为每句带 $`...`$ 的概率），偶尔一个代码块"""
+    words = "alpha beta gamma delta 中文 文本 price $5".split()
+    blocks = []
+    for _ in range(12):
+        roll = rng.random()
+        if roll < 0.7:
+            sentences = (
+                " ".join(rng.choice(words) for _ in range(12)) + (" `code`" if rng.random() < 0.2 else "")
+                + (" $`x^2`$" if rng.random() < math else "")
+                for _ in range(rng.randint(2, 6))
+            )
+            blocks.append(" ".join(sentences))
+        elif roll < 0.8:
+            blocks.append("``` python\nimport os\nprint(os.name)\n```")
+        else:
+            blocks.append("## " + " ".join(rng.choice(words) for _ in range(4)))
+    return "\n\n".join(blocks) + "\n"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--size", type=int, default=1_000_000, help="每份语料的字符数")
+    parser.add_argument("--reference", action="store_true")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    latex_body = _build(args.size, lambda: latex_document(rng, 15))
+    corpora = [
+        ("gfm mixed", "gfm", _build(args.size, lambda: gfm_document(rng, 12)), _reference_gfm),
+        ("gfm prose", "gfm", _build(args.size, lambda: _prose_document(rng)), _reference_gfm),
+        # 较新的 pandoc 直接输出 $...$，多数文档没有需要改写的内容
+        ("gfm prose, no math", "gfm", _build(args.size, lambda: _prose_document(rng, 0)), _reference_gfm),
+        (
+            "latex",
+            "latex",
+            "\\documentclass{article}\n\\usepackage{x}\n\\begin{document}\n" + latex_body + "\\end{document}\n",
+            _reference_latex,
+        ),
+    ]
+
+    rows = []
+    for name, target, text, reference in corpora:
+        row = [name, f"{len(text) / 1024 / 1024:.1f} MB",
+               summarize(measure(lambda: rewrite_pandoc_output(text, target), args.rounds))]
+        if args.reference:
+            row.append(summarize(measure(lambda: reference(text), 1, warmup=0)))
+        rows.append(row)
+    print_table(["corpus", "size", "rewrite_pandoc_output"] + (["reference"] if args.reference else []), rows)
+
+
+if __name__ == "__main__":
+    main()
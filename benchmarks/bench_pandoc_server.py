@@ -0,0 +1,59 @@
+"""
+比较 pandoc CLI 与常驻 pandoc server 两种后端的转换延迟
+
+同一份语料分别用两种后端转换为 HTML 与 DOCX，输出每种组合的延迟分布，
+并检查两种后端得到的 HTML 是否一致。需要 pandoc ≥ 3.0：
+
+    python -m benchmarks.bench_pandoc_server --pandoc pandoc --rounds 20
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from pastemd.integrations.pandoc import PandocIntegration
+from pastemd.integrations.pandoc_server import PandocServer
+
+from .common import measure, print_table, sample_markdown, summarize
+
+CORPUS = {
+    "one line": "Hello **world**.",
+    "1 section": sample_markdown(1),
+    "20 sections": sample_markdown(20),
+    "500 sections": sample_markdown(500),
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pandoc", default="pandoc")
+    parser.add_argument("--rounds", type=int, default=10)
+    args = parser.parse_args()
+
+    server = PandocServer(args.pandoc)
+    server.start()
+    backends = {
+        "cli": PandocIntegration(args.pandoc),
+        "server": PandocIntegration(args.pandoc, server=server),
+    }
+    conversions = {
+        "md->html": lambda p, md: p.convert_markdown_to_html_text(md),
+        "md->docx": lambda p, md: p.convert_to_docx_bytes(md),
+    }
+
+    rows = []
+    try:
+        for name, md in CORPUS.items():
+            html = {b: p.convert_markdown_to_html_text(md) for b, p in backends.items()}
+            same = "yes" if html["cli"] == html["server"] else "NO"
+            for conversion, func in conversions.items():
+                for backend, pandoc in backends.items():
+                    timings = measure(lambda: func(pandoc, md), args.rounds)
+                    rows.append((name, conversion, backend, summarize(timings), same))
+    finally:
+        server.stop()
+    print_table(("corpus", "conversion", "backend", "latency", "same html"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""
+超大 Markdown 分块并行转换 DOCX 的吞吐量随工作进程数的变化
+
+同一份文档依次以 max_workers = 1, 2, 4, ... 转换（1 表示不拆分），输出耗时、KB/s
+与相对单进程的加速比。需要 pandoc：
+
+    python -m benchmarks.bench_parallel_conversion --sections 3000 --rounds 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import copy
+import os
+
+from pastemd.config.defaults import DEFAULT_CONFIG
+from pastemd.core.state import app_state
+from pastemd.service.document.generator import DocumentGenerator
+
+from .common import measure, print_table, sample_markdown
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pandoc", default="pandoc")
+    parser.add_argument("--sections", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1)
+    args = parser.parse_args()
+
+    config = copy.deepcopy(DEFAULT_CONFIG)
+    config["pandoc_path"] = args.pandoc
+    config["conversion_cache"]["enabled"] = False
+    app_state.config = config
+    generator = DocumentGenerator()
+
+    md = sample_markdown(args.sections)
+    size_kb = len(md.encode("utf-8")) / 1024
+    print(f"input: {size_kb:.0f} KB, {args.sections} top-level sections, {os.cpu_count()} CPUs")
+
+    workers = 1
+    baseline = None
+    rows = []
+    while workers <= args.max_workers:
+        config["parallel_conversion"] = {"enabled": workers > 1, "min_input_kb": 0, "max_workers": workers}
+        best = min(measure(lambda: generator.convert_markdown_to_docx_bytes(md, config), args.rounds, warmup=0))
+        baseline = baseline or best
+        rows.append((workers, f"{best:.0f} ms", f"{size_kb / (best / 1000):.0f} KB/s", f"{baseline / best:.2f}x"))
+        workers *= 2
+    print_table(("workers", "time", "throughput", "speedup"), rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+parse_markdown_table：1k 到 1M 行的数据库导出表格
+
+每种规模输出解析耗时与每千行耗时；--reference 同时运行 tests/test_spreadsheet_parser.py
+中的原逐字符实现（只运行到 --reference-max-rows）。表格之后附带一段普通文本，
+解析应在表格结束处停止：
+
+    python -m benchmarks.bench_table_parser --reference
+"""
+
+from __future__ import annotations
+
+import argparse
+
+from pastemd.service.spreadsheet.parser import parse_markdown_table
+
+from .common import measure, print_table
+
+
+def database_export(rows: int) -> str:
+    lines = ["| id | name | email | amount | note |", "|---:|:-----|:------|-------:|:-----|"]
+    lines.extend(
+        f"| {i} | user {i} | user{i}@example.com | {i * 1.5:.2f} | a\\|b `x|y` |" for i in range(rows)
+    )
+    lines.append("")
+    lines.append("Query finished.\n" * 1000)
+    return "\n".join(lines)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--reference", action="store_true")
+    parser.add_argument("--reference-max-rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    reference = None
+    if args.reference:
+        from tests.test_spreadsheet_parser import _reference as reference
+
+    rows = []
+    for count in (1_000, 10_000, 100_000, 1_000_000):
+        text = database_export(count)
+        best = min(measure(lambda: parse_markdown_table(text), args.rounds, warmup=0))
+        row = [f"{count:,}", f"{len(text) / 1024 / 1024:.1f} MB", f"{best:.0f} ms", f"{best / count * 1000:.2f} ms"]
+        if reference is not None:
+            if count <= args.reference_max_rows:
+                row.append(f"{min(measure(lambda: reference(text), 1, warmup=0)):.0f} ms")
+            else:
+                row.append("-")
+        rows.append(row)
+    header = ["rows", "size", "time", "per 1k rows"] + (["reference"] if reference is not None else [])
+    print_table(header, rows)
+
+
+if __name__ == "__main__":
+    main()
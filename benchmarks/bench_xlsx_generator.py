@@ -0,0 +1,75 @@
+"""
+SpreadsheetGenerator：10k / 100k 行表格的标准生成与流式（write-only）生成
+
+每种规模输出两种方式的耗时与 Python 堆内存峰值（tracemalloc，单独运行一轮，
+计时不受追踪开销影响），以及生成的 XLSX 大小。单元格混合纯文本、数字、粗体、
+行内代码、链接和富文本。100k 行的标准生成（含内存追踪那一轮）需要数分钟：
+
+    python -m benchmarks.bench_xlsx_generator
+"""
+
+from __future__ import annotations
+
+import argparse
+import tracemalloc
+
+from pastemd.service.spreadsheet.generator import SpreadsheetGenerator
+
+from .common import measure, print_table
+
+
+def sample_table(rows: int) -> list:
+    table = [["id", "name", "status", "amount", "link", "note"]]
+    table.extend(
+        [
+            str(i),
+            f"user {i}",
+            "**active**" if i % 3 else "`disabled`",
+            f"{i * 1.5:.2f}",
+            f"[page {i % 100}](http://example.com/{i % 100})",
+            f"plain *note* {i % 50} with `code`",
+        ]
+        for i in range(rows)
+    )
+    return table
+
+
+def _peak_mb(func) -> float:
+    tracemalloc.start()
+    try:
+        func()
+        return tracemalloc.get_traced_memory()[1] / 1024 / 1024
+    finally:
+        tracemalloc.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=1)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--plain", action="store_true", help="keep_format=False")
+    args = parser.parse_args()
+
+    rows = []
+    for count in args.rows:
+        table = sample_table(count)
+        for streaming in (False, True):
+            output = []
+
+            def generate(streaming=streaming, output=output):
+                output[:] = [SpreadsheetGenerator.generate_xlsx_bytes(table, not args.plain, streaming=streaming)]
+
+            best = min(measure(generate, args.rounds, warmup=0))
+            size = len(output[0])
+            rows.append([
+                f"{count:,}",
+                "streaming" if streaming else "standard",
+                f"{best:.0f} ms",
+                f"{_peak_mb(generate):.0f} MB",
+                f"{size / 1024 / 1024:.1f} MB",
+            ])
+    print_table(["rows", "mode", "time", "peak memory", "xlsx"], rows)
+
+
+if __name__ == "__main__":
+    main()
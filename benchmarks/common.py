@@ -0,0 +1,51 @@
+"""基准脚本共用的计时与输出工具"""
+
+from __future__ import annotations
+
+import statistics
+import time
+from typing import Callable, List, Sequence
+
+
+def measure(func: Callable[[], object], rounds: int, warmup: int = 1) -> List[float]:
+    """运行 func 并返回每轮耗时（毫秒）"""
+    for _ in range(warmup):
+        func()
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def summarize(timings: Sequence[float]) -> str:
+    """中位数 / p90 / 最小值"""
+    ordered = sorted(timings)
+    p90 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))]
+    return f"median {statistics.median(ordered):9.1f} ms  p90 {p90:9.1f} ms  min {ordered[0]:9.1f} ms"
+
+
+def print_table(header: Sequence[str], rows: Sequence[Sequence[object]]) -> None:
+    """按列宽对齐打印表格"""
+    cells = [[str(c) for c in header]] + [[str(c) for c in row] for row in rows]
+    widths = [max(len(row[i]) for row in cells) for i in range(len(header))]
+    for index, row in enumerate(cells):
+        print("  ".join(cell.rjust(width) for cell, width in zip(row, widths)))
+        if index == 0:
+            print("  ".join("-" * width for width in widths))
+
+
+def sample_markdown(sections: int) -> str:
+    """生成含标题、列表、表格、代码块和公式的 Markdown 文档"""
+    parts = []
+    for i in range(sections):
+        parts.append(
+            f"# Section {i}\n\n"
+            f"Paragraph with **bold**, *italic*, `code`, ~~strike~~ and $x_{i}^2$ inline math.\n\n"
+            f"- item one\n- [ ] task\n- [x] done\n\n"
+            f"| a | b | c |\n|---|---|---|\n| {i} | `x\\|y` | **z** |\n\n"
+            f"```python\nfor n in range({i}):\n    print(n)\n```\n\n"
+            f"$$\n\\int_0^{i} f(t)\\,dt\n$$\n\n"
+        )
+    return "".join(parts)
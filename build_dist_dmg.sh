@@ -282,7 +282,6 @@ move_dir_and_link_back "lua"
 move_dir_and_link_back "i18n"
 move_dir_and_link_back "tcl-files"
 move_dir_and_link_back "tk-files"
-move_dir_and_link_back "docx/templates"
 
 # Third-party notices: keep inside app bundle for compliance visibility
 NOTICES_SRC="THIRD_PARTY_NOTICES.md"
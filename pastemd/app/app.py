@@ -34,6 +34,9 @@ from ..config.loader import ConfigLoader
 from ..utils.logging import log
 from ..utils.version_checker import VersionChecker
 from ..service.notification.manager import NotificationManager
+from ..integrations.pandoc_server import start_pandoc_server_in_background, shutdown_pandoc_servers
+from ..utils.formula_cache import close_formula_cache
+from ..utils.omml import shutdown_omml_pool
 from ..i18n import FALLBACK_LANGUAGE, detect_system_language, set_language, t
 from .wiring import Container
 
@@ -69,7 +72,11 @@ def initialize_application() -> tuple[Container, dict]:
         language = str(language_value)
     set_language(language)
     
-    # 2. 创建依赖注入容器
+    # 2. 预热常驻 pandoc server（可选）
+    if config.get("pandoc_backend", "cli") == "server":
+        start_pandoc_server_in_background(config.get("pandoc_path", "pandoc"))
+
+    # 3. 创建依赖注入容器
     container = Container()
     
     log("Application initialized successfully")
@@ -169,6 +176,10 @@ def main() -> None:
         # 启动热键监听
         hotkey_runner = container.get_hotkey_runner()
         hotkey_runner.start()
+
+        # 启动剪贴板预转换监听（speculative_conversion.enabled 关闭时空转）
+        from .workflows.speculative import speculative_converter
+        speculative_converter.start()
         
         # 获取通知管理器和菜单管理器
         notification_manager = container.get_notification_manager()
@@ -286,6 +297,18 @@ def main() -> None:
         log(f"Fatal error: {e}")
         raise
     finally:
+        # 停止剪贴板预转换监听
+        try:
+            from .workflows.speculative import speculative_converter
+            speculative_converter.stop()
+        except Exception:
+            pass
+        # 停止常驻 pandoc server
+        shutdown_pandoc_servers()
+        # 关闭公式转换进程池
+        shutdown_omml_pool()
+        # 关闭公式磁盘缓存
+        close_formula_cache()
         # 释放锁
         if app_state.instance_checker:
             app_state.instance_checker.release_lock()
@@ -6,7 +6,11 @@ from ...service.notification.manager import NotificationManager
 from ...service.document import DocumentGenerator
 from ...service.spreadsheet import SpreadsheetGenerator
 from ...service.preprocessor import HtmlPreprocessor, MarkdownPreprocessor
+from ...integrations.pandoc_runner import current_cancel_token
+from ...utils.inline_images import InlineImageSet
+from .snapshot import ClipboardSnapshot
 from ...utils.logging import log
+from ...i18n import t
 
 
 class BaseWorkflow(ABC):
@@ -23,12 +27,32 @@ class BaseWorkflow(ABC):
         # 无状态预处理器（可复用）
         self._markdown_preprocessor = MarkdownPreprocessor()
         self._html_preprocessor = HtmlPreprocessor()
+
+        # 由 WorkflowRouter 在执行前注入的预转换结果（与当前剪贴板匹配时才非空）
+        self.speculative_result = None
+
+        # 本次执行中从 HTML 抽出的内联图片，由 WorkflowRouter 在执行结束后释放
+        self.inline_images = InlineImageSet()
+
+        # 本次执行的剪贴板快照，由 WorkflowRouter 在执行前注入
+        self._snapshot = None
     
     @property
     def config(self):
         """实时获取最新配置"""
         return app_state.config
     
+    @property
+    def snapshot(self) -> ClipboardSnapshot:
+        """本次执行的剪贴板快照（未注入时按需创建）"""
+        if self._snapshot is None:
+            self._snapshot = ClipboardSnapshot(self.config)
+        return self._snapshot
+
+    @snapshot.setter
+    def snapshot(self, value) -> None:
+        self._snapshot = value
+
     @property
     def doc_generator(self):
         """懒加载 DocumentGenerator"""
@@ -59,12 +83,20 @@ class BaseWorkflow(ABC):
         pass
     
     # 公共辅助方法
+    def _get_clipboard_html_for_docx(self) -> str:
+        """读取剪贴板 HTML，并把内联 data: 图片抽成临时文件（仅用于生成 DOCX 的流程）"""
+        return self.inline_images.extract(self.snapshot.html)
+
     def _notify_success(self, msg: str):
         """通知成功"""
         self.notification_manager.notify("PasteMD", msg, ok=True)
     
     def _notify_error(self, msg: str):
-        """通知错误"""
+        """通知错误（任务已被用户取消时改为取消提示）"""
+        token = current_cancel_token()
+        if token is not None and token.cancelled:
+            self.notification_manager.notify("PasteMD", t("workflow.generic.cancelled"), ok=True)
+            return
         self.notification_manager.notify("PasteMD", msg, ok=False)
     
     def _log(self, msg: str):
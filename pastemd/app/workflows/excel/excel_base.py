@@ -8,11 +8,7 @@ from pastemd.app.workflows.base import BaseWorkflow
 from pastemd.core.errors import ClipboardError
 from pastemd.i18n import t
 from pastemd.service.spreadsheet import SpreadsheetGenerator
-from pastemd.service.spreadsheet.parser import parse_markdown_table
-from pastemd.utils.clipboard import get_clipboard_text, is_clipboard_empty
 from pastemd.utils.fs import generate_output_path
-from pastemd.utils.clipboard import read_markdown_files_from_clipboard
-from pastemd.utils.markdown_utils import merge_markdown_contents
 
 
 class ExcelBaseWorkflow(BaseWorkflow, ABC):
@@ -65,16 +61,22 @@ class ExcelBaseWorkflow(BaseWorkflow, ABC):
             self._notify_error(t("workflow.generic.failure"))
 
     def _read_clipboard_table(self) -> list:
-        if is_clipboard_empty():
+        speculative = self.speculative_result
+        if speculative is not None and speculative.table_data:
+            return speculative.table_data
+
+        if self.snapshot.is_empty:
             raise ClipboardError("剪贴板为空")
-        markdown_text = get_clipboard_text()
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
+        table_data = self.snapshot.table
+
+        if not table_data:
+            # 网页 / AI 对话中以 HTML 渲染的表格：直接从剪贴板 HTML 提取
+            table_data = self.snapshot.html_table
+            if table_data:
+                self._log("Using table extracted from clipboard HTML")
 
         if not table_data:
-            raise ClipboardError("剪贴板中无有效 Markdown 表格")
+            raise ClipboardError("剪贴板中无有效 Markdown 或 HTML 表格")
 
         return table_data
 
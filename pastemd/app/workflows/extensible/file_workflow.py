@@ -3,15 +3,6 @@
 
 from .extensible_base import ExtensibleWorkflow
 from ....core.errors import ClipboardError, PandocError
-from ....utils.clipboard import (
-    get_clipboard_text,
-    get_clipboard_html,
-    is_clipboard_empty,
-    read_markdown_files_from_clipboard,
-)
-from ....utils.html_analyzer import is_plain_html_fragment
-from ....utils.markdown_utils import merge_markdown_contents
-from ....service.spreadsheet.parser import parse_markdown_table
 from ....service.spreadsheet.generator import SpreadsheetGenerator
 from ....utils.fs import generate_output_path
 from ....i18n import t
@@ -43,8 +34,7 @@ class FileWorkflow(ExtensibleWorkflow):
             self._log(f"File workflow: content_type={content_type}")
 
             if content_type == "table":
-                markdown_text = self._read_markdown_content()
-                table_data = parse_markdown_table(markdown_text)
+                table_data = self.snapshot.table
                 keep_format = self.config.get(
                     "excel_keep_format", self.config.get("keep_format", True)
                 )
@@ -66,14 +56,14 @@ class FileWorkflow(ExtensibleWorkflow):
                 html_text = ""
                 md_text = ""
                 if content_type == "html":
-                    html_text = get_clipboard_html(self.config)
-                    html_text = self.html_preprocessor.process(html_text, self.config)
+                    html_text = self._get_clipboard_html_for_docx()
+                    html_text = self.html_preprocessor.process(html_text, self.config, embed_images=True)
                     docx_bytes = self.doc_generator.convert_html_to_docx_bytes(
                         html_text, self.config
                     )
                 else:
                     md_text = self._read_markdown_content()
-                    md_text = self.markdown_preprocessor.process(md_text, self.config)
+                    md_text = self.markdown_preprocessor.process(md_text, self.config, embed_images=True)
                     docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
                         md_text, self.config
                     )
@@ -122,25 +112,16 @@ class FileWorkflow(ExtensibleWorkflow):
         Returns:
             "table" | "html" | "markdown"
         """
-        if is_clipboard_empty():
-            found, _, _ = read_markdown_files_from_clipboard()
-            if not found:
-                raise ClipboardError("剪贴板为空")
-
-        markdown_text = ""
-        if not is_clipboard_empty():
-            markdown_text = get_clipboard_text()
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            markdown_text = merge_markdown_contents(files_data)
-
-        table_data = parse_markdown_table(markdown_text) if markdown_text else None
-        if table_data:
+        snapshot = self.snapshot
+        if snapshot.is_empty and snapshot.merged_markdown_files is None:
+            raise ClipboardError("剪贴板为空")
+
+        if snapshot.table:
             return "table"
 
         try:
-            html = get_clipboard_html(self.config)
-            if not is_plain_html_fragment(html):
+            html = self._get_clipboard_html_for_docx()
+            if not snapshot.is_plain_html(html):
                 return "html"
         except ClipboardError:
             pass
@@ -149,15 +130,11 @@ class FileWorkflow(ExtensibleWorkflow):
 
     def _read_markdown_content(self) -> str:
         """读取 Markdown 内容（含剪贴板文件）"""
-        if not is_clipboard_empty():
-            content = get_clipboard_text()
-        else:
-            content = ""
-
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            return merge_markdown_contents(files_data)
+        merged = self.snapshot.merged_markdown_files
+        if merged is not None:
+            return merged
 
+        content = self.snapshot.text if not self.snapshot.is_empty else ""
         if content.strip():
             return content
 
@@ -7,12 +7,6 @@ import re
 
 from .extensible_base import ExtensibleWorkflow
 from ....core.errors import ClipboardError, PandocError
-from ....utils.clipboard import (
-    get_clipboard_html,
-    get_clipboard_text,
-    is_clipboard_empty,
-)
-from ....utils.html_analyzer import is_plain_html_fragment
 from ....config.paths import resource_path
 from ....i18n import t
 from ....service.paste import RichTextPastePlacer
@@ -89,16 +83,13 @@ class HtmlWorkflow(ExtensibleWorkflow):
     def _read_clipboard(self) -> tuple[str, str]:
         """读取剪贴板内容，返回 (类型, 内容)"""
         # 优先尝试 HTML
-        try:
-            html = get_clipboard_html(self.config)
-            if not is_plain_html_fragment(html):
-                return ("html", html)
-        except ClipboardError:
-            pass
+        html = self.snapshot.rich_html()
+        if html is not None:
+            return ("html", html)
         
         # 尝试纯文本
-        if not is_clipboard_empty():
-            return ("markdown", get_clipboard_text())
+        if not self.snapshot.is_empty:
+            return ("markdown", self.snapshot.text)
         
         raise ClipboardError("剪贴板为空或无有效内容")
     
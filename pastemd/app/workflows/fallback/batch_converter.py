@@ -0,0 +1,120 @@
+"""Batch converter - converts several Markdown files to DOCX concurrently."""
+
+import os
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+from pastemd.integrations.pandoc_runner import cancel_scope, current_cancel_token
+from pastemd.utils.logging import log
+
+# 在途内存按输入大小估算：预处理后的文本、Pandoc 输出和 DOCX 字节流大致与输入同量级
+_INFLIGHT_COST_FACTOR = 3
+
+
+class BatchDocxConverter:
+    """
+    多文件批量转换调度器（无应用多文件分支）
+
+    每个文件独立执行 预处理 → Pandoc → DocxProcessor，多个文件在线程池中并发转换，
+    按完成顺序逐个产出，交给 OutputExecutor.execute_docx_batch 边转换边写出。
+    已提交但尚未被消费的任务按输入大小计入在途内存，超过上限时暂停提交新任务。
+    """
+
+    def __init__(self, markdown_preprocessor, doc_generator):
+        """
+        Args:
+            markdown_preprocessor: MarkdownPreprocessor 实例
+            doc_generator: DocumentGenerator 实例
+        """
+        self.markdown_preprocessor = markdown_preprocessor
+        self.doc_generator = doc_generator
+
+    @staticmethod
+    def _settings(config: dict, file_count: int) -> Tuple[int, int]:
+        """(并发数, 在途内存上限字节数)；max_workers 为 0 时按 CPU 核数"""
+        settings = config.get("batch_conversion", {})
+        if not isinstance(settings, dict):
+            settings = {}
+        try:
+            workers = int(settings.get("max_workers", 0)) or os.cpu_count() or 1
+        except (TypeError, ValueError):
+            workers = os.cpu_count() or 1
+        try:
+            budget = int(float(settings.get("max_inflight_mb", 64)) * 1024 * 1024)
+        except (TypeError, ValueError):
+            budget = 64 * 1024 * 1024
+        return max(1, min(workers, file_count)), max(0, budget)
+
+    def iter_convert(
+        self,
+        files_data: Iterable[Tuple[str, str]],
+        config: dict,
+        failures: List[Tuple[str, str]],
+    ) -> Iterator[Tuple[str, str, bytes]]:
+        """
+        并发转换多个 Markdown 文件，按完成顺序产出结果
+
+        Args:
+            files_data: [(filename, content), ...]
+            config: 配置字典
+            failures: 转换失败的 (filename, error) 会追加到此列表
+
+        Yields:
+            (filename, 预处理后的 Markdown, docx_bytes)
+        """
+        pending = deque(files_data)
+        if not pending:
+            return
+        workers, budget = self._settings(config, len(pending))
+
+        # 工作线程继承当前任务的取消句柄
+        token = current_cancel_token()
+
+        def _convert(content: str) -> Tuple[str, bytes]:
+            if token is None:
+                return self._convert_one(content, config)
+            with cancel_scope(token):
+                return self._convert_one(content, config)
+
+        total = len(pending)
+        converted = 0
+        inflight = 0
+        running: Dict[Future, Tuple[str, int]] = {}
+        started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while pending or running:
+                # 至少保持一个任务在途，否则按内存上限控制提交
+                while pending and len(running) < workers:
+                    filename, content = pending[0]
+                    cost = len(content) * _INFLIGHT_COST_FACTOR
+                    if running and inflight + cost > budget:
+                        break
+                    pending.popleft()
+                    running[pool.submit(_convert, content)] = (filename, cost)
+                    inflight += cost
+
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    filename, cost = running.pop(future)
+                    try:
+                        md_text, docx_bytes = future.result()
+                    except Exception as e:
+                        log(f"Batch conversion failed ({filename}): {e}")
+                        failures.append((filename, str(e)))
+                    else:
+                        converted += 1
+                        yield filename, md_text, docx_bytes
+                    inflight -= cost
+
+        elapsed = time.perf_counter() - started
+        log(
+            f"Batch MD->DOCX: {converted}/{total} files in {elapsed:.2f} s "
+            f"({converted / max(elapsed, 1e-6):.1f} files/s, {workers} workers)"
+        )
+
+    def _convert_one(self, content: str, config: dict) -> Tuple[str, bytes]:
+        md_text = self.markdown_preprocessor.process(content, config, embed_images=True)
+        return md_text, self.doc_generator.convert_markdown_to_docx_bytes(md_text, config)
@@ -1,15 +1,11 @@
 """Fallback workflow - handles no-app scenarios."""
 
+import os
+
 from ..base import BaseWorkflow
+from .batch_converter import BatchDocxConverter
 from .output_executor import OutputExecutor
-from pastemd.utils.clipboard import (
-    get_clipboard_text, get_clipboard_html, is_clipboard_empty,
-    read_markdown_files_from_clipboard
-)
-from pastemd.utils.html_analyzer import is_plain_html_fragment
-from pastemd.utils.markdown_utils import merge_markdown_contents
-from pastemd.service.spreadsheet.parser import parse_markdown_table
-from pastemd.utils.fs import generate_output_path
+from pastemd.utils.fs import ensure_dir, generate_output_path, sanitize_filename
 from pastemd.core.errors import ClipboardError, PandocError
 from pastemd.i18n import t
 
@@ -27,6 +23,7 @@ class FallbackWorkflow(BaseWorkflow):
         
         根据剪贴板内容类型和配置决定行为：
         - 如果是表格 → 生成 XLSX
+        - 多个 MD 文件且启用 batch_conversion → 每个文件各生成一个 DOCX（并发转换）
         - 否则 → 生成 DOCX
         - 然后执行 no_app_action (open/save/clipboard)
         """
@@ -42,6 +39,8 @@ class FallbackWorkflow(BaseWorkflow):
             # 2. 根据内容类型处理
             if content_type == "table":
                 self._handle_table(no_app_action)
+            elif content_type == "markdown" and self._use_batch_conversion():
+                self._handle_markdown_files_batch(no_app_action)
             else:
                 self._handle_document(no_app_action, content_type)
         
@@ -71,22 +70,17 @@ class FallbackWorkflow(BaseWorkflow):
         Returns:
             "table" | "html" | "markdown"
         """
-        if is_clipboard_empty():
+        if self.snapshot.is_empty:
             raise ClipboardError("剪贴板为空")
         
         # 检查是否为表格
-        markdown_text = get_clipboard_text()
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
-        if table_data:
+        if self.snapshot.table:
             return "table"
         
         # 检查是否为 HTML
         try:
-            html = get_clipboard_html(self.config)
-            if not is_plain_html_fragment(html):
+            html = self._get_clipboard_html_for_docx()
+            if not self.snapshot.is_plain_html(html):
                 return "html"
         except ClipboardError:
             pass
@@ -96,11 +90,7 @@ class FallbackWorkflow(BaseWorkflow):
     
     def _handle_table(self, action: str):
         """处理表格内容"""
-        markdown_text = get_clipboard_text()
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            markdown_text = merge_markdown_contents(files_data)
-        table_data = parse_markdown_table(markdown_text)
+        table_data = self.snapshot.table
         
         # 生成输出路径
         output_path = generate_output_path(
@@ -125,8 +115,8 @@ class FallbackWorkflow(BaseWorkflow):
         """处理文档内容（HTML 或 Markdown）"""
         # 1. 读取内容
         if content_type == "html":
-            html = get_clipboard_html(self.config)
-            html = self.html_preprocessor.process(html, self.config)
+            html = self._get_clipboard_html_for_docx()
+            html = self.html_preprocessor.process(html, self.config, embed_images=True)
             docx_bytes = self.doc_generator.convert_html_to_docx_bytes(
                 html, self.config
             )
@@ -134,12 +124,9 @@ class FallbackWorkflow(BaseWorkflow):
             md_text = ""
         else:
             # Markdown
-            content = get_clipboard_text()
-            found, files_data, _ = read_markdown_files_from_clipboard()
-            if found:
-                content = merge_markdown_contents(files_data)
+            content = self.snapshot.markdown_text
             # 预处理
-            content = self.markdown_preprocessor.process(content, self.config)
+            content = self.markdown_preprocessor.process(content, self.config, embed_images=True)
             docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
                 content, self.config
             )
@@ -166,6 +153,39 @@ class FallbackWorkflow(BaseWorkflow):
         if not success:
             self._log(f"DOCX output failed with action: {action}")
     
+    def _use_batch_conversion(self) -> bool:
+        """复制了多个 MD 文件且启用了逐文件转换"""
+        settings = self.config.get("batch_conversion", {})
+        if not isinstance(settings, dict) or not settings.get("enabled", False):
+            return False
+        return self.snapshot.markdown_file_count > 1
+
+    def _handle_markdown_files_batch(self, action: str):
+        """多个 MD 文件：并发转换，每个文件各生成一个 DOCX，转换完成一个就写出一个"""
+        _, files_data, read_errors = self.snapshot.markdown_files
+        save_dir = self.config.get("save_dir", "")
+        ensure_dir(save_dir)
+
+        failures = list(read_errors)
+        converter = BatchDocxConverter(self.markdown_preprocessor, self.doc_generator)
+
+        def _items():
+            for filename, md_text, docx_bytes in converter.iter_convert(files_data, self.config, failures):
+                stem = os.path.splitext(filename)[0]
+                output_path = os.path.join(save_dir, f"{sanitize_filename(stem)}.docx")
+                yield docx_bytes, output_path, filename
+
+        result = self.output_executor.execute_docx_batch(
+            action,
+            _items(),
+            from_md_file=True,
+            pre_failures=failures,
+        )
+
+        if not result["success_paths"]:
+            self._log(f"DOCX batch produced no output: {result['failures']}")
+            self._notify_error(t("workflow.markdown.convert_failed"))
+
     def _read_markdown_content(self) -> str:
         """
         读取 Markdown 内容
@@ -174,12 +194,12 @@ class FallbackWorkflow(BaseWorkflow):
             Markdown 文本
         """
         # 优先读取文本
-        if not is_clipboard_empty():
-            return get_clipboard_text()
+        if not self.snapshot.is_empty:
+            return self.snapshot.text
         
         # 尝试 MD 文件
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            return merge_markdown_contents(files_data)
+        merged = self.snapshot.merged_markdown_files
+        if merged is not None:
+            return merged
         
         raise ClipboardError("剪贴板为空或无有效内容")
@@ -8,16 +8,19 @@ from abc import ABC, abstractmethod
 from pastemd.app.workflows.base import BaseWorkflow
 from pastemd.core.errors import ClipboardError, PandocError
 from pastemd.i18n import t
+from pastemd.integrations.pandoc import LUA_LATEX_REPLACEMENTS
+from pastemd.service.document.generator import get_pandoc_filters
 from pastemd.service.paste import RichTextPastePlacer
-from pastemd.utils.clipboard import (
-    get_clipboard_html,
-    get_clipboard_text,
-    is_clipboard_empty,
-    read_markdown_files_from_clipboard,
+from pastemd.utils.formula_cache import (
+    FormulaSubstitution,
+    formula_cache_version,
+    get_formula_cache,
+    restore_cached_formulas,
+    store_converted_formulas,
+    substitute_cached_formulas,
 )
-from pastemd.utils.html_analyzer import is_plain_html_fragment
-from pastemd.utils.markdown_utils import merge_markdown_contents
 from pastemd.utils.html_formatter import extract_html_body
+from pastemd.utils.latex import MathScan
 from pastemd.utils.omml import convert_html_mathml_to_omml, generate_office_html
 
 
@@ -26,11 +29,14 @@ class OfficeOmmlBaseWorkflow(BaseWorkflow, ABC):
     
     处理流程：
     1. 读取剪贴板 HTML/Markdown
-    2. 转换为带 MathML 的 HTML（Pandoc --mathml）
-    3. 将 MathML 替换为 OMML 条件注释
+    2. 转换为带 MathML 的 HTML（Pandoc --mathml；公式磁盘缓存中已有的公式以占位符代替）
+    3. 将 MathML 替换为 OMML 条件注释，占位符填回缓存的 OMML
     4. 使用 RichTextPastePlacer 粘贴
     """
 
+    # 表格中的公式保留为 MathML（不转换为 OMML）
+    skip_table_mathml = False
+
     def __init__(self):
         super().__init__()
         self._placer = RichTextPastePlacer()
@@ -49,35 +55,49 @@ class OfficeOmmlBaseWorkflow(BaseWorkflow, ABC):
         content_type: str | None = None
         from_md_file = False
         md_file_count = 0
+        formulas: FormulaSubstitution | None = None
 
         try:
             content_type, content, from_md_file, md_file_count = self._read_clipboard()
             self._log(f"Clipboard content type: {content_type}")
 
-            # Preprocess content
+            # Preprocess content (the Markdown formula inventory is reused below)
+            math = None
             if content_type == "markdown":
-                content = self.markdown_preprocessor.process(content, self.config)
+                content, math = self.markdown_preprocessor.process_with_math(content, self.config)
             elif content_type == "html":
                 content = self.html_preprocessor.process(content, self.config)
 
-            # Convert to HTML with MathML
+            # Convert to HTML with MathML (Pandoc --mathml is enabled)
             if content_type == "html":
-                md_text = self.doc_generator.convert_html_to_markdown_text(
+                # Parse HTML once; Markdown (plain-text fallback) and HTML are both rendered from the AST
+                md_text, html_with_mathml = self.doc_generator.convert_html_to_markdown_and_html_text(
                     content, self.config
                 )
             else:
                 md_text = content
-
-            # Generate HTML with MathML formulas (Pandoc --mathml is enabled)
-            html_with_mathml = self.doc_generator.convert_markdown_to_html_text(
-                md_text, self.config
-            )
+                formulas = self._substitute_cached_formulas(md_text, math)
+                html_with_mathml = self.doc_generator.convert_markdown_to_html_text(
+                    formulas.text if formulas is not None else md_text, self.config
+                )
 
             # Strip standalone HTML wrapper to avoid nested documents
             html_body = extract_html_body(html_with_mathml)
 
             # Convert MathML to OMML conditional comments
-            html_with_omml = self._convert_html_mathml_to_omml(html_body)
+            if math is not None and not math.has_math and "<math" not in md_text:
+                # No formulas in the Markdown (nor raw MathML), Pandoc emitted no MathML
+                html_with_omml = html_body
+            else:
+                if math is not None:
+                    self._log(f"Formulas: {math.inline_count} inline, {math.display_count} display")
+                if formulas is not None:
+                    self._store_converted_formulas(html_body, formulas)
+                html_with_omml = self._convert_html_mathml_to_omml(html_body)
+                if formulas is not None:
+                    html_with_omml = restore_cached_formulas(
+                        html_with_omml, formulas, skip_table_mathml=self.skip_table_mathml
+                    )
 
             # Wrap in Office HTML template
             office_html = generate_office_html(html_with_omml)
@@ -125,22 +145,51 @@ class OfficeOmmlBaseWorkflow(BaseWorkflow, ABC):
 
     def _read_clipboard(self) -> tuple[str, str, bool, int]:
         """读取剪贴板,返回 (类型, 内容, 是否来自 MD 文件, MD 文件数量)"""
-        try:
-            html = get_clipboard_html(self.config)
-            if not is_plain_html_fragment(html):
-                return ("html", html, False, 0)
-        except ClipboardError:
-            pass
+        html = self.snapshot.rich_html()
+        if html is not None:
+            return ("html", html, False, 0)
 
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            merged = merge_markdown_contents(files_data)
-            return ("markdown", merged, True, len(files_data))
+        merged = self.snapshot.merged_markdown_files
+        if merged is not None:
+            return ("markdown", merged, True, self.snapshot.markdown_file_count)
 
-        if not is_clipboard_empty():
-            return ("markdown", get_clipboard_text(), False, 0)
+        if not self.snapshot.is_empty:
+            return ("markdown", self.snapshot.text, False, 0)
 
         raise ClipboardError("剪贴板为空或无有效内容")
 
     def _convert_html_mathml_to_omml(self, html_body: str) -> str:
-        return convert_html_mathml_to_omml(html_body)
+        return convert_html_mathml_to_omml(
+            html_body,
+            skip_table_mathml=self.skip_table_mathml,
+            parallel=self.config.get("omml_parallel"),
+        )
+
+    def _substitute_cached_formulas(self, md_text: str, math: MathScan | None) -> FormulaSubstitution | None:
+        """查询公式磁盘缓存并以占位符代替已缓存的公式；未启用或不适用时返回 None"""
+        settings = self.config.get("formula_cache")
+        if not isinstance(settings, dict) or not settings.get("enabled", False):
+            return None
+        if math is None or not math.has_math or math.text != md_text:
+            return None
+        # 保留原始公式或配置了自定义 Filter 时，公式的输出不只取决于 LaTeX 源码
+        if self.config.get("Keep_original_formula", True) or get_pandoc_filters(self.config, "md_to_html"):
+            return None
+        try:
+            max_size_mb = float(settings.get("max_size_mb", 32))
+        except (TypeError, ValueError):
+            max_size_mb = 32
+        lua_path = LUA_LATEX_REPLACEMENTS if self.config.get("enable_latex_replacements", True) else None
+        formulas = substitute_cached_formulas(
+            get_formula_cache(max_size_mb), math, formula_cache_version(lua_path)
+        )
+        self._log(f"Formula cache: {len(formulas.hits)} hit(s), {len(formulas.misses)} miss(es)")
+        return formulas
+
+    def _store_converted_formulas(self, html_body: str, formulas: FormulaSubstitution) -> None:
+        """把本次新转换的公式写入磁盘缓存"""
+        stored = store_converted_formulas(
+            get_formula_cache(), html_body, formulas, parallel=self.config.get("omml_parallel")
+        )
+        if stored:
+            self._log(f"Formula cache: stored {stored} formula(s)")
@@ -1,8 +1,6 @@
 # -*- coding: utf-8 -*-
 """PowerPoint workflow with OMML formula support."""
 
-from pastemd.utils.omml import convert_html_mathml_to_omml
-
 from .office_omml_base import OfficeOmmlBaseWorkflow
 
 
@@ -13,9 +11,9 @@ class PowerPointWorkflow(OfficeOmmlBaseWorkflow):
     数学公式自动转换为可编辑的 Office 公式。
     """
 
+    # PowerPoint 表格中的公式保留为 MathML
+    skip_table_mathml = True
+
     @property
     def app_name(self) -> str:
         return "PowerPoint"
-
-    def _convert_html_mathml_to_omml(self, html_body: str) -> str:
-        return convert_html_mathml_to_omml(html_body, skip_table_mathml=True)
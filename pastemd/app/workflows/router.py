@@ -12,6 +12,8 @@ from .excel import ExcelWorkflow, WPSExcelWorkflow
 from .fallback import FallbackWorkflow
 from .office_omml import OneNoteWorkflow, PowerPointWorkflow
 from .extensible import HtmlWorkflow, MdWorkflow, LatexWorkflow, FileWorkflow
+from .snapshot import ClipboardSnapshot
+from .speculative import speculative_converter
 
 
 class WorkflowRouter:
@@ -125,7 +127,17 @@ class WorkflowRouter:
             # 动态构建路由表并路由
             routes = self._build_dynamic_routes(window_title)
             workflow = routes.get(target_app, routes[""])
-            workflow.execute()
+
+            # 剪贴板预转换结果（可选），匹配当前剪贴板时工作流可直接进入落地
+            workflow.speculative_result = speculative_converter.take()
+            # 每次热键触发使用新的剪贴板快照，各格式最多读取一次
+            workflow.snapshot = ClipboardSnapshot(app_state.config)
+            try:
+                workflow.execute()
+            finally:
+                workflow.speculative_result = None
+                workflow.snapshot = None
+                workflow.inline_images.release()
         
         except Exception as e:
             log(f"Router failed: {e}")
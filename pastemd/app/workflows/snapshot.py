@@ -0,0 +1,151 @@
+"""Per-invocation clipboard snapshot with memoized views."""
+
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from ...core.errors import ClipboardError
+from ...service.spreadsheet.html_table import parse_html_table
+from ...service.spreadsheet.parser import parse_markdown_table
+from ...utils.clipboard import (
+    get_clipboard_html,
+    get_clipboard_text,
+    is_clipboard_files,
+    read_markdown_files_from_clipboard,
+)
+from ...utils.html_analyzer import is_plain_html_fragment
+from ...utils.markdown_utils import is_markdown, merge_markdown_contents
+
+
+class ClipboardSnapshot:
+    """
+    一次热键触发内的剪贴板快照
+
+    各剪贴板格式在第一次用到时才读取，且最多读取一次；派生结果（合并后的 MD 文件、
+    表格解析、HTML 表格提取、纯文本 HTML 判定、Markdown 判定）同样只计算一次。读取失败的异常也会被
+    缓存，再次访问时原样抛出，行为与直接调用剪贴板函数一致。
+    """
+
+    def __init__(self, config: Optional[dict] = None) -> None:
+        self.config = config or {}
+        self._values: Dict[str, Any] = {}
+        self._errors: Dict[str, Exception] = {}
+        # is_plain_html_fragment 的结果：(html, verdict)，HTML 可能是抽取内联图片后的版本
+        self._plain_verdict: Optional[Tuple[str, bool]] = None
+
+    def _memo(self, key: str, read: Callable[[], Any]) -> Any:
+        if key in self._values:
+            return self._values[key]
+        if key in self._errors:
+            raise self._errors[key]
+        try:
+            value = read()
+        except ClipboardError as e:
+            self._errors[key] = e
+            raise
+        self._values[key] = value
+        return value
+
+    # ---- 原始格式 ----
+
+    @property
+    def text(self) -> str:
+        """剪贴板文本（ClipboardError 原样抛出）"""
+        return self._memo("text", get_clipboard_text)
+
+    @property
+    def html(self) -> str:
+        """剪贴板 HTML（没有 HTML 格式时抛出 ClipboardError）"""
+        return self._memo("html", lambda: get_clipboard_html(self.config))
+
+    @property
+    def has_files(self) -> bool:
+        return self._memo("has_files", is_clipboard_files)
+
+    @property
+    def markdown_files(self) -> Tuple[bool, List[Tuple[str, str]], List[Tuple[str, str]]]:
+        """(found, files_data, errors)，同 read_markdown_files_from_clipboard"""
+        return self._memo("markdown_files", read_markdown_files_from_clipboard)
+
+    # ---- 派生视图 ----
+
+    @property
+    def is_empty(self) -> bool:
+        """同 is_clipboard_empty：有文件时不为空，否则看文本是否为空白"""
+        if self.has_files:
+            return False
+        try:
+            text = self.text
+        except ClipboardError:
+            return True
+        return not text or not text.strip()
+
+    @property
+    def markdown_file_count(self) -> int:
+        found, files_data, _ = self.markdown_files
+        return len(files_data) if found else 0
+
+    @property
+    def merged_markdown_files(self) -> Optional[str]:
+        """合并后的 MD 文件内容；剪贴板中没有 MD 文件时为 None"""
+        def _merge() -> Optional[str]:
+            found, files_data, _ = self.markdown_files
+            return merge_markdown_contents(files_data) if found else None
+
+        return self._memo("merged_markdown_files", _merge)
+
+    @property
+    def markdown_text(self) -> str:
+        """Markdown 内容：优先使用剪贴板中的 MD 文件，否则为剪贴板文本"""
+        merged = self.merged_markdown_files
+        if merged is not None:
+            return merged
+        return self.text
+
+    @property
+    def table(self) -> Optional[list]:
+        """markdown_text 解析出的表格；不是表格时为 None"""
+        def _parse() -> Optional[list]:
+            markdown_text = self.markdown_text
+            return parse_markdown_table(markdown_text) if markdown_text else None
+
+        return self._memo("table", _parse)
+
+    @property
+    def html_table(self) -> Optional[list]:
+        """剪贴板 HTML 中第一个表格解析出的表格；没有 HTML 或其中没有表格时为 None"""
+        def _parse() -> Optional[list]:
+            try:
+                html = self.html
+            except ClipboardError:
+                return None
+            return parse_html_table(html)
+
+        return self._memo("html_table", _parse)
+
+    @property
+    def text_is_markdown(self) -> bool:
+        def _detect() -> bool:
+            try:
+                return is_markdown(self.text)
+            except ClipboardError:
+                return False
+
+        return self._memo("text_is_markdown", _detect)
+
+    def is_plain_html(self, html: str) -> bool:
+        """is_plain_html_fragment 的缓存版本（元宝检测复用快照中的文本）"""
+        cached = self._plain_verdict
+        if cached is not None and cached[0] is html:
+            return cached[1]
+        verdict = is_plain_html_fragment(html, get_text=lambda: self.text)
+        self._plain_verdict = (html, verdict)
+        return verdict
+
+    def rich_html(self) -> Optional[str]:
+        """剪贴板中有实际结构的 HTML；没有 HTML 或只是带壳的纯文本时返回 None"""
+        try:
+            html = self.html
+        except ClipboardError:
+            return None
+        return None if self.is_plain_html(html) else html
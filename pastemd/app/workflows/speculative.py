@@ -0,0 +1,322 @@
+"""Speculative background pre-conversion on clipboard change.
+
+可选功能：后台轮询剪贴板序列号，内容变化且看起来是 Markdown / HTML / 表格时，
+在低优先级线程上提前完成预处理和转换。热键触发时，WorkflowRouter 取出与当前剪贴板
+匹配的结果，Word/Excel 工作流直接进入落地阶段；其它工作流则命中转换缓存。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from typing import Optional
+
+from ...core.errors import ClipboardError, PandocError
+from ...core.state import app_state
+from ...integrations.pandoc_runner import CancelToken, PandocCancelledError, cancel_scope
+from ...service.document import DocumentGenerator
+from ...service.preprocessor import HtmlPreprocessor, MarkdownPreprocessor
+from ...service.spreadsheet.parser import parse_markdown_table
+from ...utils.clipboard import get_clipboard_sequence_number
+from ...utils.inline_images import InlineImageSet
+from ...utils.logging import log
+from .snapshot import ClipboardSnapshot
+
+# 剪贴板内容稳定多久后才开始转换（秒），避免复制过程中多次写入触发重复任务
+SPECULATIVE_SETTLE_S = 0.3
+# 配置关闭时的空闲轮询间隔（秒）
+SPECULATIVE_IDLE_POLL_S = 1.0
+
+
+class _Stale(Exception):
+    """剪贴板已变化，当前任务作废"""
+
+
+@dataclass
+class SpeculativeResult:
+    """一次预转换的结果（仅在剪贴板序列号和配置都未变化时有效）"""
+    sequence: int
+    config_fingerprint: str
+    content_type: str                      # "html" / "markdown"
+    content: str                           # 预处理后的内容
+    docx_bytes: Optional[bytes] = None
+    table_data: Optional[list] = None
+
+
+def _config_fingerprint(config: dict) -> str:
+    raw = json.dumps(config, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _lower_current_thread_priority() -> None:
+    """尽量降低当前线程优先级（仅 Windows 可按线程设置）"""
+    if sys.platform != "win32":
+        return
+    try:
+        import ctypes
+
+        THREAD_PRIORITY_BELOW_NORMAL = -1
+        kernel32 = ctypes.windll.kernel32
+        kernel32.SetThreadPriority(kernel32.GetCurrentThread(), THREAD_PRIORITY_BELOW_NORMAL)
+    except Exception:
+        pass
+
+
+class SpeculativeConverter:
+    """剪贴板预转换器（单例）"""
+
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, "_initialized"):
+            return
+
+        self._cond = threading.Condition()
+        self._stop_event = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        # 最新观察到的剪贴板序列号；任务在各阶段之间检查它来判断是否作废
+        self._latest_seq: Optional[int] = None
+        self._running_seq: Optional[int] = None
+        self._done_seq: Optional[int] = None
+        self._result: Optional[SpeculativeResult] = None
+        self._job_token: Optional[CancelToken] = None
+        self._last_job_end = 0.0
+
+        # 独立实例，避免与热键工作流共享状态；转换缓存是进程内共享的
+        self._doc_generator: Optional[DocumentGenerator] = None
+        self._markdown_preprocessor = MarkdownPreprocessor()
+        self._html_preprocessor = HtmlPreprocessor()
+        self._initialized = True
+
+    @property
+    def settings(self) -> dict:
+        cfg = app_state.config.get("speculative_conversion", {})
+        return cfg if isinstance(cfg, dict) else {}
+
+    def start(self) -> None:
+        """启动后台监听线程（配置关闭时线程空转，配置重载后无需重启）"""
+        if self._watcher is not None and self._watcher.is_alive():
+            return
+        self._stop_event.clear()
+        self._watcher = threading.Thread(target=self._watch_loop, daemon=True)
+        self._watcher.start()
+
+    def stop(self) -> None:
+        """停止后台监听线程"""
+        self._stop_event.set()
+        with self._cond:
+            self._latest_seq = None
+            self._result = None
+            token = self._job_token
+            self._cond.notify_all()
+        if token is not None:
+            token.cancel("speculative converter stopped")
+
+    def take(self) -> Optional[SpeculativeResult]:
+        """
+        取出与当前剪贴板匹配的预转换结果
+
+        如果当前内容的任务仍在进行，最多等待 wait_s 秒。
+
+        Returns:
+            匹配的结果；无结果、剪贴板或配置已变化时返回 None
+        """
+        if not self.settings.get("enabled", False):
+            return None
+
+        seq = get_clipboard_sequence_number()
+        try:
+            wait_s = float(self.settings.get("wait_s", 3.0))
+        except (TypeError, ValueError):
+            wait_s = 3.0
+        deadline = time.monotonic() + max(0.0, wait_s)
+
+        with self._cond:
+            while self._running_seq == seq:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    log("Speculative conversion still running, not waiting any longer")
+                    break
+                self._cond.wait(remaining)
+
+            result = self._result
+            if result is None or result.sequence != seq:
+                return None
+
+        if result.config_fingerprint != _config_fingerprint(app_state.config):
+            log("Speculative result discarded: config changed")
+            return None
+
+        log(f"Using speculative result (seq={seq}, type={result.content_type})")
+        return result
+
+    # ---- 后台线程 ----
+
+    def _watch_loop(self) -> None:
+        last_seen: Optional[int] = None
+        changed_at = 0.0
+
+        while not self._stop_event.is_set():
+            settings = self.settings
+            if not settings.get("enabled", False):
+                last_seen = None
+                self._stop_event.wait(SPECULATIVE_IDLE_POLL_S)
+                continue
+
+            try:
+                poll_s = max(0.1, float(settings.get("poll_interval_s", 0.5)))
+            except (TypeError, ValueError):
+                poll_s = 0.5
+
+            seq = get_clipboard_sequence_number()
+            now = time.monotonic()
+            if seq != last_seen:
+                last_seen = seq
+                changed_at = now
+                stale_token = None
+                with self._cond:
+                    if self._latest_seq is not None and self._latest_seq != seq:
+                        # 旧结果和旧任务全部作废，进行中的 pandoc 进程直接结束
+                        self._result = None
+                        stale_token = self._job_token
+                    self._latest_seq = seq
+                if stale_token is not None:
+                    stale_token.cancel("clipboard changed")
+
+            if self._should_start(seq, now, changed_at, settings):
+                token = CancelToken()
+                with self._cond:
+                    self._running_seq = seq
+                    self._job_token = token
+                threading.Thread(target=self._run_job, args=(seq, token), daemon=True).start()
+
+            self._stop_event.wait(poll_s)
+
+    def _should_start(self, seq: int, now: float, changed_at: float, settings: dict) -> bool:
+        if now - changed_at < SPECULATIVE_SETTLE_S:
+            return False
+        with self._cond:
+            if self._running_seq is not None or self._done_seq == seq:
+                return False
+        # 热键工作流运行中不抢占 CPU
+        if app_state.is_running():
+            return False
+        try:
+            cooldown_s = float(settings.get("min_interval_s", 1.0))
+        except (TypeError, ValueError):
+            cooldown_s = 1.0
+        return now - self._last_job_end >= cooldown_s
+
+    def _check_current(self, seq: int) -> None:
+        if self._stop_event.is_set() or self._latest_seq != seq:
+            raise _Stale()
+
+    def _run_job(self, seq: int, token: CancelToken) -> None:
+        _lower_current_thread_priority()
+        started = time.perf_counter()
+        result: Optional[SpeculativeResult] = None
+        try:
+            with cancel_scope(token):
+                result = self._convert(seq)
+        except (_Stale, PandocCancelledError):
+            log(f"Speculative conversion cancelled: clipboard changed (seq={seq})")
+        except (ClipboardError, PandocError) as e:
+            log(f"Speculative conversion skipped: {e}")
+        except Exception as e:
+            log(f"Speculative conversion failed: {e}")
+        finally:
+            with self._cond:
+                if result is not None and self._latest_seq == seq:
+                    self._result = result
+                    log(
+                        f"Speculative conversion ready (seq={seq}, type={result.content_type}) "
+                        f"in {(time.perf_counter() - started) * 1000:.0f} ms"
+                    )
+                self._done_seq = seq
+                self._running_seq = None
+                self._job_token = None
+                self._last_job_end = time.monotonic()
+                self._cond.notify_all()
+
+    def _convert(self, seq: int) -> Optional[SpeculativeResult]:
+        config = app_state.config
+        fingerprint = _config_fingerprint(config)
+        try:
+            max_chars = int(float(self.settings.get("max_input_kb", 256)) * 1024)
+        except (TypeError, ValueError):
+            max_chars = 256 * 1024
+
+        snapshot = ClipboardSnapshot(config)
+        # 预转换结果只给 Word/WPS 插入使用；不保留文件时用不压缩打包（见 WordBaseWorkflow）
+        transient = not config.get("keep_file", False)
+
+        # 文件列表交给热键工作流处理
+        if snapshot.has_files:
+            return None
+
+        html = None
+        try:
+            html = snapshot.html
+        except ClipboardError:
+            pass
+        self._check_current(seq)
+
+        if html:
+            # 内联图片抽成临时文件后再判断大小；DOCX 生成后即可释放
+            inline_images = InlineImageSet()
+            try:
+                html = inline_images.extract(html)
+                self._check_current(seq)
+                if not snapshot.is_plain_html(html):
+                    if len(html) > max_chars:
+                        log(f"Speculative conversion skipped: HTML larger than {max_chars} chars")
+                        return None
+                    content = self._html_preprocessor.process(html, config, embed_images=True)
+                    self._check_current(seq)
+                    docx_bytes = self._get_doc_generator().convert_html_to_docx_bytes(
+                        content, config, transient=transient
+                    )
+                    self._check_current(seq)
+                    return SpeculativeResult(seq, fingerprint, "html", content, docx_bytes=docx_bytes)
+            finally:
+                inline_images.release()
+
+        text = snapshot.text
+        if not text or not text.strip():
+            return None
+        if len(text) > max_chars:
+            log(f"Speculative conversion skipped: text larger than {max_chars} chars")
+            return None
+
+        table_data = parse_markdown_table(text) if config.get("enable_excel", True) else None
+        if not table_data and not snapshot.text_is_markdown:
+            return None
+        self._check_current(seq)
+
+        content = self._markdown_preprocessor.process(text, config, embed_images=True)
+        self._check_current(seq)
+        docx_bytes = self._get_doc_generator().convert_markdown_to_docx_bytes(
+            content, config, transient=transient
+        )
+        self._check_current(seq)
+        return SpeculativeResult(
+            seq, fingerprint, "markdown", content, docx_bytes=docx_bytes, table_data=table_data or None
+        )
+
+    def _get_doc_generator(self) -> DocumentGenerator:
+        if self._doc_generator is None:
+            self._doc_generator = DocumentGenerator()
+        return self._doc_generator
+
+
+# 全局单例
+speculative_converter = SpeculativeConverter()
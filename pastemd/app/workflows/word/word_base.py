@@ -7,15 +7,7 @@ from abc import ABC, abstractmethod
 from pastemd.app.workflows.base import BaseWorkflow
 from pastemd.core.errors import ClipboardError, PandocError
 from pastemd.i18n import t
-from pastemd.utils.clipboard import (
-    get_clipboard_html,
-    get_clipboard_text,
-    is_clipboard_empty,
-    read_markdown_files_from_clipboard,
-)
 from pastemd.utils.fs import generate_output_path
-from pastemd.utils.html_analyzer import is_plain_html_fragment
-from pastemd.utils.markdown_utils import merge_markdown_contents
 
 
 class WordBaseWorkflow(BaseWorkflow, ABC):
@@ -35,23 +27,32 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
         md_file_count = 0
 
         try:
-            content_type, content, from_md_file, md_file_count = self._read_clipboard()
-            self._log(f"Clipboard content type: {content_type}")
-
-            if content_type == "markdown":
-                content = self.markdown_preprocessor.process(content, self.config)
-            elif content_type == "html":
-                # 预处理 HTML，清理 LaTeX 公式块中的 br 标签等
-                content = self.html_preprocessor.process(content, self.config)
-
-            if content_type == "html":
-                docx_bytes = self.doc_generator.convert_html_to_docx_bytes(
-                    content, self.config
-                )
+            speculative = self.speculative_result
+            if speculative is not None and speculative.docx_bytes is not None:
+                # 后台已完成预处理和转换，直接落地
+                content_type = speculative.content_type
+                docx_bytes = speculative.docx_bytes
+                self._log(f"Clipboard content type: {content_type} (speculative)")
             else:
-                docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
-                    content, self.config
-                )
+                content_type, content, from_md_file, md_file_count = self._read_clipboard()
+                self._log(f"Clipboard content type: {content_type}")
+
+                if content_type == "markdown":
+                    content = self.markdown_preprocessor.process(content, self.config, embed_images=True)
+                elif content_type == "html":
+                    # 预处理 HTML，清理 LaTeX 公式块中的 br 标签等
+                    content = self.html_preprocessor.process(content, self.config, embed_images=True)
+
+                # 不保留文件时 DOCX 只用于插入，插入后即删除，用不压缩打包
+                transient = not self.config.get("keep_file", False)
+                if content_type == "html":
+                    docx_bytes = self.doc_generator.convert_html_to_docx_bytes(
+                        content, self.config, transient=transient
+                    )
+                else:
+                    docx_bytes = self.doc_generator.convert_markdown_to_docx_bytes(
+                        content, self.config, transient=transient
+                    )
 
             result = self.placer.place(docx_bytes, self.config)
 
@@ -101,19 +102,18 @@ class WordBaseWorkflow(BaseWorkflow, ABC):
         读取剪贴板,返回 (类型, 内容, 是否来自 MD 文件, MD 文件数量)
         """
         try:
-            html = get_clipboard_html(self.config)
-            if not is_plain_html_fragment(html):
+            html = self._get_clipboard_html_for_docx()
+            if not self.snapshot.is_plain_html(html):
                 return ("html", html, False, 0)
         except ClipboardError:
             pass
 
-        found, files_data, _ = read_markdown_files_from_clipboard()
-        if found:
-            merged = merge_markdown_contents(files_data)
-            return ("markdown", merged, True, len(files_data))
+        merged = self.snapshot.merged_markdown_files
+        if merged is not None:
+            return ("markdown", merged, True, self.snapshot.markdown_file_count)
         
-        if not is_clipboard_empty():
-            return ("markdown", get_clipboard_text(), False, 0)
+        if not self.snapshot.is_empty:
+            return ("markdown", self.snapshot.text, False, 0)
 
         raise ClipboardError("剪贴板为空或无有效内容")
 
@@ -43,16 +43,16 @@ class WPSWorkflow(WordBaseWorkflow):
             config["Keep_original_formula"] = True  # 保留公式为 LaTeX 文本
             if content_type == "html":
                 content = self.html_preprocessor.process(content, config)
-                md_text = self.doc_generator.convert_html_to_markdown_text(
+                # HTML 只解析一次，Markdown 与 HTML 都从同一份 AST 渲染
+                md_text, html_text = self.doc_generator.convert_html_to_markdown_and_html_text(
                     content, config
                 )
             else:
                 # markdown
                 md_text = self.markdown_preprocessor.process(content, config)
-
-            html_text = self.doc_generator.convert_markdown_to_html_text(
-                md_text, config
-            )
+                html_text = self.doc_generator.convert_markdown_to_html_text(
+                    md_text, config
+                )
             # 后处理 Pandoc 输出的 HTML，修复代码块格式等问题
             html_text = postprocess_pandoc_html_macwps(html_text)
             # 内容落地由 placer 负责（写剪贴板 + Cmd+V）
@@ -57,6 +57,10 @@ RESERVED_APPS = {"word", "wps", "excel", "wps_excel"}
 DEFAULT_CONFIG: Dict[str, Any] = {
     "hotkey": "<ctrl>+<shift>+b",
     "pandoc_path": find_pandoc(),
+    # Pandoc 调用方式：cli=每次转换启动新进程，server=常驻 pandoc server（需 pandoc ≥ 3.0，不支持的选项自动回退 CLI）
+    "pandoc_backend": "cli",
+    # 单次 Pandoc 转换的超时（秒），超时后结束整个进程树；0 表示不限
+    "pandoc_timeout_s": 60,
     "reference_docx": None,
     "save_dir": get_default_save_dir(),
     "keep_file": False,
@@ -71,6 +75,8 @@ DEFAULT_CONFIG: Dict[str, Any] = {
     "html_formatting": {
         "strikethrough_to_del": True,
     },
+    # HTML 预处理实现：lxml=在 lxml 树上单次遍历执行全部格式化规则，bs4=原 BeautifulSoup 实现
+    "html_preprocess_engine": "lxml",
     "move_cursor_to_end": True,
     "Keep_original_formula": False,
     "enable_latex_replacements": True,
@@ -80,6 +86,8 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
     ],
     "pandoc_filters": [],
+    # 把连续的 Lua Filter（含内置 Filter）合并为一个，尽量一次遍历 AST 完成全部处理
+    "pandoc_filter_fusion": True,
     "pandoc_filters_by_conversion": {
         "md_to_docx": [],
         "html_to_docx": [],
@@ -88,6 +96,64 @@ DEFAULT_CONFIG: Dict[str, Any] = {
         "md_to_rtf": [],
         "md_to_latex": [],
     },
+    # 转换结果缓存：相同内容和参数重复粘贴时直接复用结果
+    # disk_enabled=True 时会把结果写入用户数据目录下的 cache/conversions（按 disk_max_mb 淘汰）
+    "conversion_cache": {
+        "enabled": True,
+        "memory_max_entries": 32,
+        "disk_enabled": False,
+        "disk_max_mb": 200,
+    },
+    # 远程图片预取：生成 DOCX 前并发下载图片到用户数据目录下的 cache/images，引用改写为本地路径
+    # ttl_hours 缓存有效期；max_cache_mb 缓存总上限；max_image_mb 单张图片上限（超出则交给 Pandoc 自行下载）
+    # deadline_s 整体等待上限，超时未完成的图片交给 Pandoc 自行下载（<=0 表示不限制）
+    "image_prefetch": {
+        "enabled": True,
+        "max_workers": 8,
+        "timeout_s": 10,
+        "deadline_s": 30,
+        "ttl_hours": 24,
+        "max_cache_mb": 200,
+        "max_image_mb": 20,
+    },
+    # 超大 Markdown 并行转换（默认关闭）：超过 min_input_kb 时按一级标题/文件边界拆分，
+    # 多个 Pandoc 进程并行转换后合并为一个 DOCX；max_workers 为 0 时使用 CPU 核数
+    "parallel_conversion": {
+        "enabled": False,
+        "min_input_kb": 512,
+        "max_workers": 0,
+    },
+    # 无应用场景复制多个 MD 文件时逐个生成 DOCX（默认关闭，关闭时合并为一个 DOCX）
+    # 多个文件并发转换、完成一个写出一个；max_workers 为 0 时使用 CPU 核数；
+    # max_inflight_mb 按输入大小估算，限制同时在途的内容总量
+    "batch_conversion": {
+        "enabled": False,
+        "max_workers": 0,
+        "max_inflight_mb": 64,
+    },
+    # OneNote/PowerPoint 公式转换：不重复的公式达到 min_formulas 个时用多个进程并行转换为 Office 公式；
+    # max_workers 为 0 时使用 CPU 核数（单核或公式较少时在当前进程转换）
+    "omml_parallel": {
+        "enabled": True,
+        "min_formulas": 200,
+        "max_workers": 0,
+    },
+    # OneNote/PowerPoint 公式磁盘缓存：按 LaTeX 源码保存 MathML 与 Office 公式，跨会话复用；
+    # 已缓存的公式不再经过 Pandoc --mathml 和 mathml2omml。max_size_mb 为容量上限，超出时淘汰最久未用的公式
+    # 默认关闭：开启后剪贴板中的公式源码会持久保存在用户数据目录的 formula_cache.sqlite3 中
+    "formula_cache": {
+        "enabled": False,
+        "max_size_mb": 32,
+    },
+    # 剪贴板预转换：剪贴板变化后在后台提前转换，热键触发时直接落地（默认关闭）
+    # max_input_kb 限制参与预转换的内容大小；min_interval_s 为两次预转换之间的最小间隔
+    "speculative_conversion": {
+        "enabled": False,
+        "poll_interval_s": 0.5,
+        "min_interval_s": 1.0,
+        "max_input_kb": 256,
+        "wait_s": 3.0,
+    },
     # 可扩展工作流配置
     # apps 格式（win）: [{"name": "Notion", "id": "/path/to/app", "window_patterns": [".*Notion.*"]}, ...]
     # apps 格式（macOS）: [{"name": "Notion", "id": "com.notionlabs.Notion", "window_patterns": [".*Notion.*"]}, ...]
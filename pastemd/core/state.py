@@ -30,6 +30,9 @@ class AppState:
     # 退出事件，用于线程间同步退出
     quit_event: Optional[Any] = None
 
+    # 当前热键任务的取消句柄（pandoc_runner.CancelToken），无任务时为 None
+    cancel_token: Optional[Any] = None
+
     # 线程锁
     _lock: threading.Lock = field(default_factory=threading.Lock)
     
@@ -49,5 +52,15 @@ class AppState:
             return self.running
 
 
+    def cancel_running(self, reason: str) -> bool:
+        """取消正在运行的热键任务，返回是否确实发出了取消"""
+        with self._lock:
+            token = self.cancel_token if self.running else None
+        if token is None or token.cancelled:
+            return False
+        token.cancel(reason)
+        return True
+
+
 # 全局状态实例
 app_state = AppState()
@@ -0,0 +1,388 @@
+"""Fused Lua filter chain compiler.
+
+每次转换都会把 latex-replacements.lua、可选的 keep-latex-math.lua 以及用户配置的
+Filter 逐个作为 ``--lua-filter`` 传给 Pandoc，Pandoc 会为每个 Filter 单独遍历一次 AST。
+
+这里把命令行中连续的 Lua Filter 合并成一个生成的 Lua Filter（按源文件路径 + mtime
+缓存，源文件变化后自动重新生成）：
+
+- 只有「单一 pass、只处理叶子元素（Str/Math/Code/CodeBlock/RawBlock 等不含子元素的
+  类型）」的 Filter 才会合并：它们互相看不到对方处理的父元素，把各 Filter 对同一元素的
+  处理函数依次组合，一次 AST 遍历即可完成。某个函数返回了新元素或列表时，后续 Filter
+  继续作用在新元素（及其中的叶子元素）上，与 Pandoc 逐个遍历一致。
+- 其它 Filter（多个 pass、traverse 设置、Inline/Block/Para 等容器处理函数、
+  Pandoc/Meta/Blocks/Inlines 等整体处理函数）在生成的 Filter 中按原顺序保留各自的 pass，
+  语义与分别传参一致；只有前后相邻的可合并 Filter 会组合在一起。
+- 新生成的合并 Filter 首次使用前会用一份探测文档分别跑「逐个传参」和「合并」两种方式，
+  输出不一致时本进程内不再合并这组 Filter。
+
+外部 JSON Filter（``--filter``）保持原位置，把前后的 Lua Filter 分隔成不同的组。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from ..config.paths import get_user_data_dir
+from ..core.errors import PandocError
+from ..utils.logging import log
+from .pandoc_runner import PandocCancelledError, run_pandoc
+
+# 生成代码的版本号，模板变化时递增以避免复用旧文件
+_FUSED_FILTER_VERSION = 2
+# 同一路径的 stat 结果在这段时间内复用（秒），连续粘贴时不必反复访问文件系统
+_STAT_TTL_S = 1.0
+
+_FilterStamp = Tuple[int, int]
+
+# 等价性检查单次 pandoc 调用的截止时间（秒）
+_VERIFY_TIMEOUT_S = 10.0
+# 等价性检查用的探测文档：覆盖常见的行内/块级元素与公式
+_PROBE_MARKDOWN = r"""# Probe *heading* with $x^2$
+
+Text with **strong**, *emph*, `code`, [link](https://example.com "t"), ~~strike~~,
+H~2~O, x^2^ and a footnote[^1]. Inline math $\frac{a}{b} + \alpha$ and
+display math:
+
+$$
+\sum_{i=1}^{n} i = \frac{n(n+1)}{2}
+$$
+
+- item with $a_i$
+- [ ] task item
+
+  nested paragraph
+
+1. first
+2. second
+
+> quote with $y$ and <span class="c">html</span>
+
+```python
+print("code block $z$")
+```
+
+| a | b |
+|---|---|
+| $c$ | `d` |
+
+Term
+: definition with $e$
+
+---
+
+<div>raw html block</div>
+
+[^1]: Note with $f$.
+"""
+
+_stat_cache: Dict[str, Tuple[float, Optional[_FilterStamp]]] = {}
+_compiled: Dict[str, str] = {}
+_verified: Dict[str, bool] = {}
+_lock = threading.Lock()
+
+_LUA_TEMPLATE = r"""-- Generated by PasteMD: fused Lua filter chain. Do not edit.
+local SOURCES = {
+%(sources)s
+}
+
+local INLINE_TAGS = {
+  "Cite", "Code", "Emph", "Image", "LineBreak", "Link", "Math", "Note", "Quoted",
+  "RawInline", "SmallCaps", "SoftBreak", "Space", "Span", "Str", "Strikeout",
+  "Strong", "Subscript", "Superscript", "Underline",
+}
+local BLOCK_TAGS = {
+  "BlockQuote", "BulletList", "CodeBlock", "DefinitionList", "Div", "Figure",
+  "Header", "HorizontalRule", "LineBlock", "Null", "OrderedList", "Para", "Plain",
+  "RawBlock", "Table",
+}
+-- 不含子元素的元素类型：只处理这些类型的 Filter 之间互不可见，逐元素组合与逐个遍历等价
+local LEAF_TAGS = {
+  "Code", "LineBreak", "Math", "RawInline", "SoftBreak", "Space", "Str",
+  "CodeBlock", "HorizontalRule", "Null", "RawBlock",
+}
+-- 含这些键的 Filter 不能与其它 Filter 合并为一次遍历
+local NOT_FUSABLE = {
+  Pandoc = true, Doc = true, Meta = true, Blocks = true, Inlines = true,
+  Inline = true, Block = true, traverse = true,
+}
+
+local is_element, is_leaf = {}, {}
+for _, tag in ipairs(INLINE_TAGS) do is_element[tag] = true end
+for _, tag in ipairs(BLOCK_TAGS) do is_element[tag] = true end
+for _, tag in ipairs(LEAF_TAGS) do is_leaf[tag] = true end
+
+-- 在独立环境中加载 Filter，返回其 pass 列表
+local function load_filter(path)
+  local env = setmetatable({ PANDOC_SCRIPT_FILE = path }, { __index = _G })
+  local chunk = assert(loadfile(path, "t", env))
+  local result = chunk()
+  if result == nil then
+    -- 隐式 Filter：脚本中定义的全局函数
+    local implicit = {}
+    for key, value in pairs(env) do
+      if type(value) == "function" then implicit[key] = value end
+    end
+    return { implicit }
+  end
+  if result[1] == nil then
+    return { result }
+  end
+  return result
+end
+
+-- 单一 pass 且只处理叶子元素的 Filter 才能合并
+local function is_fusable(filter_passes)
+  if #filter_passes ~= 1 then return false end
+  for key, _ in pairs(filter_passes[1]) do
+    if NOT_FUSABLE[key] or (is_element[key] and not is_leaf[key]) then return false end
+  end
+  return true
+end
+
+local apply_from
+
+-- 新生成的非叶子元素：Pandoc 逐个遍历时，后续 Filter 会处理其中的叶子元素
+local function walk_rest(filters, first, el)
+  if first > #filters or el.walk == nil then return el end
+  local sub, any = {}, false
+  for i = first, #filters do
+    for key, _ in pairs(filters[i]) do
+      if is_leaf[key] then
+        sub[key] = function(item) return apply_from(filters, first, item) end
+        any = true
+      end
+    end
+  end
+  if not any then return el end
+  return el:walk(sub)
+end
+
+-- 从第 first 个 Filter 开始依次处理 el；返回 nil 表示未修改
+apply_from = function(filters, first, el)
+  if not is_leaf[el.t] then
+    return walk_rest(filters, first, el)
+  end
+  local current, changed = el, false
+  for i = first, #filters do
+    local fn = filters[i][current.t]
+    if fn then
+      local result = fn(current)
+      if result ~= nil then
+        changed = true
+        if result.t then
+          current = result
+          if not is_leaf[current.t] then
+            return walk_rest(filters, i + 1, current)
+          end
+        else
+          -- 返回了列表：剩余 Filter 分别作用在每个新元素上
+          local out = pandoc.List()
+          for _, item in ipairs(result) do
+            local replaced = apply_from(filters, i + 1, item)
+            if replaced == nil then
+              out:insert(item)
+            elseif replaced.t then
+              out:insert(replaced)
+            else
+              out:extend(replaced)
+            end
+          end
+          return out
+        end
+      end
+    end
+  end
+  if changed then return current end
+  return nil
+end
+
+local function fuse_group(filters)
+  local fused = {}
+  for _, filter in ipairs(filters) do
+    for key, _ in pairs(filter) do
+      if is_leaf[key] and fused[key] == nil then
+        fused[key] = function(el) return apply_from(filters, 1, el) end
+      end
+    end
+  end
+  return fused
+end
+
+-- 连续的可合并 Filter 组合为一个 pass，其余 Filter 按原顺序保留各自的 pass
+local passes, group = {}, {}
+local function flush()
+  if #group == 1 then
+    table.insert(passes, group[1])
+  elseif #group > 1 then
+    table.insert(passes, fuse_group(group))
+  end
+  group = {}
+end
+for _, path in ipairs(SOURCES) do
+  local filter_passes = load_filter(path)
+  if is_fusable(filter_passes) then
+    table.insert(group, filter_passes[1])
+  else
+    flush()
+    for _, pass in ipairs(filter_passes) do table.insert(passes, pass) end
+  end
+end
+flush()
+
+return passes
+"""
+
+def filter_stamp(path: str) -> Optional[_FilterStamp]:
+    """返回 Filter 文件的 (mtime_ns, size)，不存在时返回 None（短时间内复用结果）"""
+    now = time.monotonic()
+    with _lock:
+        cached = _stat_cache.get(path)
+        if cached is not None and now - cached[0] < _STAT_TTL_S:
+            return cached[1]
+    try:
+        st = os.stat(path)
+        stamp: Optional[_FilterStamp] = (st.st_mtime_ns, st.st_size)
+    except OSError:
+        stamp = None
+    with _lock:
+        _stat_cache[path] = (now, stamp)
+    return stamp
+
+
+def _lua_long_string(text: str) -> str:
+    level = 0
+    while f"]{'=' * level}]" in text:
+        level += 1
+    eq = "=" * level
+    return f"[{eq}[{text}]{eq}]"
+
+
+def _verify_equivalence(pandoc_path: str, paths: Sequence[str], fused_path: str) -> bool:
+    """用探测文档比较逐个传参与合并后的输出，一致时返回 True"""
+    sequential = [arg for path in paths for arg in ("--lua-filter", path)]
+    outputs = []
+    for filter_args in (sequential, ["--lua-filter", fused_path]):
+        cmd = [pandoc_path, "-f", "markdown", "-t", "json", *filter_args]
+        try:
+            result = run_pandoc(cmd, _PROBE_MARKDOWN.encode("utf-8"), timeout_s=_VERIFY_TIMEOUT_S)
+        except PandocCancelledError:
+            raise
+        except PandocError as e:
+            log(f"Fused Lua filter check failed to run: {e}")
+            return False
+        if result.returncode != 0:
+            stderr = result.stderr.decode("utf-8", errors="replace").strip()
+            log(f"Fused Lua filter check failed (exit {result.returncode}): {stderr}")
+            return False
+        outputs.append(result.stdout)
+    if outputs[0] != outputs[1]:
+        log(f"Fused Lua filter output differs from sequential run, fusion disabled for: {list(paths)}")
+        return False
+    return True
+
+
+def _compile(paths: Sequence[str], pandoc_path: Optional[str] = None) -> Optional[str]:
+    """
+    生成（或复用）合并后的 Lua Filter，返回其路径；失败时返回 None
+
+    给出 pandoc_path 时，首次使用前先做一次等价性检查，不通过时返回 None。
+    """
+    stamps = []
+    for path in paths:
+        stamp = filter_stamp(path)
+        if stamp is None:
+            return None
+        stamps.append([path, stamp[0], stamp[1]])
+    raw = json.dumps([_FUSED_FILTER_VERSION, stamps], ensure_ascii=False)
+    key = hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    with _lock:
+        cached = _compiled.get(key)
+        if _verified.get(key) is False:
+            return None
+    if cached is not None and os.path.exists(cached):
+        return cached
+
+    out_dir = os.path.join(get_user_data_dir(), "cache", "lua_filters")
+    out_path = os.path.join(out_dir, f"chain-{key}.lua")
+    if not os.path.exists(out_path):
+        sources = ",\n".join(f"  {_lua_long_string(p)}" for p in paths)
+        try:
+            os.makedirs(out_dir, exist_ok=True)
+            tmp_path = f"{out_path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                f.write(_LUA_TEMPLATE % {"sources": sources})
+            os.replace(tmp_path, out_path)
+        except OSError as e:
+            log(f"Failed to write fused Lua filter: {e}")
+            return None
+        log(f"Compiled fused Lua filter chain ({len(paths)} filters): {out_path}")
+
+    if pandoc_path:
+        with _lock:
+            verified = _verified.get(key)
+        if verified is None:
+            verified = _verify_equivalence(pandoc_path, paths, out_path)
+            with _lock:
+                _verified[key] = verified
+        if not verified:
+            return None
+
+    with _lock:
+        _compiled[key] = out_path
+    return out_path
+
+
+def build_filter_chain_args(
+    builtin_lua_filters: Sequence[str],
+    filter_args: Sequence[str],
+    *,
+    fuse: bool = True,
+    pandoc_path: Optional[str] = None,
+) -> List[str]:
+    """
+    生成 Pandoc Filter 命令行参数，合并连续的 Lua Filter
+
+    Args:
+        builtin_lua_filters: 内置 Lua Filter（排在用户 Filter 之前）
+        filter_args: _build_filter_args 生成的用户 Filter 参数
+        fuse: False 时按原样逐个传参
+        pandoc_path: 用于合并前的等价性检查；为 None 时跳过检查
+
+    Returns:
+        ["--lua-filter", path, "--filter", path, ...]
+    """
+    entries: List[Tuple[str, str]] = [("--lua-filter", p) for p in builtin_lua_filters]
+    entries += [(filter_args[i], filter_args[i + 1]) for i in range(0, len(filter_args) - 1, 2)]
+
+    if not fuse or sum(1 for flag, _ in entries if flag == "--lua-filter") < 2:
+        return [item for entry in entries for item in entry]
+
+    args: List[str] = []
+    run: List[str] = []
+
+    def _flush() -> None:
+        if len(run) >= 2:
+            compiled = _compile(run, pandoc_path)
+            if compiled is not None:
+                args.extend(["--lua-filter", compiled])
+                run.clear()
+                return
+        for path in run:
+            args.extend(["--lua-filter", path])
+        run.clear()
+
+    for flag, path in entries:
+        if flag == "--lua-filter":
+            run.append(path)
+            continue
+        _flush()
+        args.extend([flag, path])
+    _flush()
+    return args
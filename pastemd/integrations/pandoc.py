@@ -1,8 +1,11 @@
 """Pandoc CLI tool integration."""
 
+import base64
+import json
 import os
 import re
 import subprocess
+import time
 from typing import Optional, List
 
 from ..utils.html_formatter import protect_brackets
@@ -11,10 +14,192 @@ from ..config.paths import resource_path
 
 from ..core.errors import PandocError
 from ..utils.logging import log
+from .lua_filter_chain import build_filter_chain_args, filter_stamp
+from .pandoc_output import rewrite_pandoc_output
+from .pandoc_runner import PandocCancelledError, current_cancel_token, run_pandoc
+from .pandoc_server import PandocServer
 
 LUA_KEEP_ORIGINAL_FORMULA = resource_path("lua/keep-latex-math.lua")
 LUA_LATEX_REPLACEMENTS = resource_path("lua/latex-replacements.lua")
 
+# latex-replacements.lua 的规则表：{ pattern = "...", replacement = "..." }
+_LUA_PATTERN_RE = re.compile(r'\bpattern\s*=\s*"((?:[^"\\]|\\.)*)"')
+_LUA_HANDLER_RE = re.compile(r'\b(\w+)\s*=\s*function\b')
+_LUA_ESCAPES = {"n": "\n", "t": "\t", "\\": "\\", '"': '"', "'": "'"}
+# 输入为 HTML 时这些字符可能以实体形式出现，不能用于在原文中查找
+_ENTITY_CHARS = set('<>&"\'')
+
+_triggers_cache: dict = {}
+
+# 图片引用（本地或远程）需要 pandoc 读文件/下载，pandoc server 无法处理。
+# Markdown 中任何 ![ 都视为图片：行内 ![a](x)、引用式 ![a][ref] / ![ref]，以及 alt 中含方括号的情况
+_IMAGE_REF_RE = re.compile(r'!\[|<img\b|"t":\s*"Image"', re.IGNORECASE)
+
+# 输入/输出格式
+MARKDOWN_INPUT_FORMAT = "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash"
+HTML_INPUT_FORMAT = "html+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash"
+GFM_OUTPUT_FORMAT = "gfm-raw_html+tex_math_dollars"
+# pandoc JSON AST：输入只解析一次，之后可直接渲染为多种格式，中间不再经过 Markdown 文本
+AST_FORMAT = "json"
+
+
+def _lua_pattern_literal(pattern: str) -> str:
+    """返回 Lua 模式中任何匹配都必然包含的最长字面量（无法确定时返回空串）"""
+    best = ""
+    run: List[str] = []
+
+    def flush() -> None:
+        nonlocal best
+        if len(run) > len(best):
+            best = "".join(run)
+        run.clear()
+
+    i = 0
+    while i < len(pattern):
+        ch = pattern[i]
+        char: Optional[str] = None  # 单个字面字符；None 表示字符类/集合/任意字符
+        if ch == "%" and i + 1 < len(pattern):
+            nxt = pattern[i + 1]
+            if nxt in "bf":
+                # %b 平衡匹配、%f 边界：之后的结构不再分析
+                flush()
+                return best
+            char = None if nxt.isalnum() else nxt
+            i += 2
+        elif ch == "[":
+            end = pattern.find("]", i + 2)
+            if end < 0:
+                return ""
+            i = end + 1
+        elif ch in "()^$":
+            # 捕获与锚点不匹配字符
+            i += 1
+            continue
+        else:
+            char = None if ch == "." else ch
+            i += 1
+
+        quantifier = pattern[i] if i < len(pattern) else ""
+        if quantifier in ("*", "-", "?"):
+            # 可以不出现
+            flush()
+            i += 1
+        elif quantifier == "+":
+            # 至少出现一次，但之后的字符不再紧邻
+            if char is not None:
+                run.append(char)
+            flush()
+            i += 1
+        elif char is not None:
+            run.append(char)
+        else:
+            flush()
+    flush()
+    return best
+
+
+def _decode_lua_string(body: str) -> str:
+    return re.sub(r'\\(.)', lambda m: _LUA_ESCAPES.get(m.group(1), "\\" + m.group(1)), body)
+
+
+def latex_replacements_triggers() -> Optional[tuple]:
+    """
+    从 latex-replacements.lua 推导「该 Filter 可能生效」的字面量集合
+
+    Filter 只有 Math 处理函数且每条规则都有必然出现的字面量时返回这些字面量：输入中
+    一个都不出现时（含 JSON 转义形式）Filter 是空操作，可以交给 pandoc server；否则返回 None（总是走 CLI）。
+    结果按文件 mtime/大小缓存，文件修改后重新推导。
+    """
+    stamp = filter_stamp(LUA_LATEX_REPLACEMENTS)
+    if stamp is None:
+        return None
+    cached = _triggers_cache.get(LUA_LATEX_REPLACEMENTS)
+    if cached is not None and cached[0] == stamp:
+        return cached[1]
+
+    triggers: Optional[tuple] = None
+    try:
+        with open(LUA_LATEX_REPLACEMENTS, "r", encoding="utf-8") as f:
+            source = f.read()
+    except OSError:
+        source = None
+    if source is not None:
+        code = re.sub(r'--[^\n]*', "", source)
+        handlers = set(_LUA_HANDLER_RE.findall(code))
+        literals = [_lua_pattern_literal(_decode_lua_string(m)) for m in _LUA_PATTERN_RE.findall(code)]
+        if handlers == {"Math"} and literals and all(
+            literal and not (_ENTITY_CHARS & set(literal)) for literal in literals
+        ):
+            # JSON AST 输入中反斜杠、引号等以转义形式出现
+            escaped = [json.dumps(literal, ensure_ascii=ascii)[1:-1] for literal in literals for ascii in (False, True)]
+            triggers = tuple(dict.fromkeys(literals + escaped))
+    if triggers is None:
+        log("latex-replacements.lua not recognised, conversions using it stay on the CLI")
+    _triggers_cache[LUA_LATEX_REPLACEMENTS] = (stamp, triggers)
+    return triggers
+
+
+# protect_brackets 的任务列表占位符：(占位符, 原文, pandoc 任务列表复选框符号)
+_TASK_PLACEHOLDERS = (
+    ("{{TASK_CHECKED}}", "[x]", "\u2612"),
+    ("{{TASK_UNCHECKED}}", "[ ]", "\u2610"),
+)
+_TASK_SYMBOLS = {placeholder: symbol for placeholder, _, symbol in _TASK_PLACEHOLDERS}
+
+
+def _restore_brackets(text: str) -> str:
+    for placeholder, brackets, _ in _TASK_PLACEHOLDERS:
+        text = text.replace(placeholder, brackets)
+    return text
+
+
+def _restore_task_node(node, list_item: bool = False):
+    """
+    递归还原 AST 中的任务列表占位符
+
+    列表项首个块的首个行内元素恰好是占位符时改为复选框符号（与 Markdown 链路中
+    task_lists 扩展的结果一致），其余位置一律还原为原来的 [x] / [ ]。
+    """
+    if isinstance(node, str):
+        return _restore_brackets(node) if "{{TASK_" in node else node
+    if isinstance(node, list):
+        return [_restore_task_node(item) for item in node]
+    if not isinstance(node, dict):
+        return node
+
+    tag = node.get("t")
+    if tag in ("BulletList", "OrderedList"):
+        content = node.get("c")
+        if tag == "BulletList":
+            items, prefix = content, []
+        else:
+            items, prefix = content[1], [content[0]]
+        items = [_restore_task_item(item) for item in items]
+        return {"t": tag, "c": prefix + [items] if prefix else items}
+    return {key: _restore_task_node(value) for key, value in node.items()}
+
+
+def _restore_task_item(blocks: list) -> list:
+    if blocks and isinstance(blocks[0], dict) and blocks[0].get("t") in ("Plain", "Para"):
+        inlines = blocks[0].get("c") or []
+        first = inlines[0] if inlines else None
+        if isinstance(first, dict) and first.get("t") == "Str" and first.get("c") in _TASK_SYMBOLS:
+            head = {"t": blocks[0]["t"], "c": [{"t": "Str", "c": _TASK_SYMBOLS[first["c"]]}]
+                    + _restore_task_node(inlines[1:])}
+            return [head] + _restore_task_node(blocks[1:])
+    return _restore_task_node(blocks)
+
+
+def _restore_task_placeholders(ast: str) -> str:
+    """还原 protect_brackets 写入的任务列表占位符（只有列表项开头的占位符变为复选框）"""
+    if "{{TASK_" not in ast:
+        return ast
+    try:
+        doc = json.loads(ast)
+    except ValueError:
+        return _restore_brackets(ast)
+    return json.dumps(_restore_task_node(doc), ensure_ascii=False, separators=(",", ":"))
+
 
 def _log_pandoc_stderr_as_warning(stderr: Optional[bytes], *, context: str) -> None:
     if not stderr:
@@ -47,7 +232,7 @@ def _add_request_headers(cmd: List[str], request_headers: Optional[List[str]]) -
 class PandocIntegration:
     """Pandoc 工具集成"""
     
-    def __init__(self, pandoc_path: str = "pandoc"):
+    def __init__(self, pandoc_path: str = "pandoc", server: Optional[PandocServer] = None):
         # 测试 Pandoc 可执行文件路径
         cmd = [pandoc_path, "--version"]
         try:
@@ -67,6 +252,7 @@ class PandocIntegration:
                 shell=False,
                 startupinfo=startupinfo,
                 creationflags=creationflags,
+                timeout=30,
             )
             if result.returncode != 0:
                 raise PandocError(f"Pandoc not found or not working: {result.stderr.strip()}")
@@ -75,6 +261,97 @@ class PandocIntegration:
         except Exception as e:
             raise PandocError(f"Pandoc Error: {e}")
         self.pandoc_path = pandoc_path
+        # 可选的常驻 pandoc server；为 None 时所有转换走 CLI
+        self.server = server
+        # 单次 pandoc 调用的截止时间（秒），None 表示不限
+        self.timeout_s: Optional[float] = None
+        # 是否把连续的 Lua Filter 合并为一个（见 lua_filter_chain）
+        self.fuse_lua_filters = True
+
+    def _run_cli(
+        self,
+        cmd: List[str],
+        input_bytes: bytes,
+        *,
+        context: str,
+        cwd: Optional[str] = None,
+    ) -> subprocess.CompletedProcess:
+        """
+        以 stdin/stdout 字节流方式运行一次 pandoc CLI
+
+        Raises:
+            PandocCancelledError: 超时或被取消
+        """
+        started = time.perf_counter()
+        result = run_pandoc(cmd, input_bytes, timeout_s=self.timeout_s, cwd=cwd)
+        log(f"Pandoc {context} (cli) took {(time.perf_counter() - started) * 1000:.0f} ms")
+        return result
+
+    def _try_server(
+        self,
+        text: str,
+        options: dict,
+        *,
+        context: str,
+        lua_filters: List[str],
+        filter_args: List[str],
+        reads_resources: bool = False,
+    ) -> Optional[bytes]:
+        """
+        尝试通过 pandoc server 转换。
+
+        Returns:
+            输出字节；server 未启用、选项无法表达或 server 转换失败时返回 None（由调用方走 CLI）
+        """
+        if self.server is None or self.server.unavailable:
+            return None
+        # 外部/Lua Filter 无法在 server 中执行
+        if filter_args:
+            return None
+        for lua_filter in lua_filters:
+            if lua_filter == LUA_LATEX_REPLACEMENTS:
+                triggers = latex_replacements_triggers()
+                if triggers is not None and not any(trigger in text for trigger in triggers):
+                    continue
+            return None
+        # 需要读取本地文件或下载远程图片的转换只能走 CLI
+        if reads_resources and _IMAGE_REF_RE.search(text):
+            return None
+
+        token = current_cancel_token()
+        if token is not None:
+            token.raise_if_cancelled()
+
+        started = time.perf_counter()
+        try:
+            output = self.server.convert(text, options, timeout_s=self.timeout_s, token=token)
+        except PandocCancelledError:
+            # 超时/取消与 CLI 一样直接结束本次转换，不再回退
+            raise
+        except PandocError as e:
+            log(f"Pandoc {context} via server failed, falling back to CLI: {e}")
+            return None
+        if token is not None:
+            token.raise_if_cancelled()
+        log(f"Pandoc {context} (server) took {(time.perf_counter() - started) * 1000:.0f} ms")
+        return output
+
+    @staticmethod
+    def _reference_doc_options(reference_docx: Optional[str]) -> Optional[dict]:
+        """把参考模板以内嵌文件形式交给 server；读取失败返回 None"""
+        if not reference_docx:
+            return {}
+        try:
+            with open(reference_docx, "rb") as f:
+                data = f.read()
+        except OSError as e:
+            log(f"Failed to read reference_docx for pandoc server: {e}")
+            return None
+        name = os.path.basename(reference_docx)
+        return {
+            "reference-doc": name,
+            "files": {name: base64.b64encode(data).decode("ascii")},
+        }
 
     def _build_filter_args(self, custom_filters: Optional[List[str]] = None) -> List[str]:
         """
@@ -100,7 +377,7 @@ class PandocIntegration:
                 # 相对路径转换为绝对路径（相对于当前工作目录）
                 expanded_path = os.path.abspath(expanded_path)
             
-            if not os.path.exists(expanded_path):
+            if filter_stamp(expanded_path) is None:
                 log(f"Warning: Filter file not found, skipping: {expanded_path}")
                 continue
             
@@ -112,6 +389,60 @@ class PandocIntegration:
         
         return filter_args
 
+    def _chain_filter_args(self, lua_filters: List[str], filter_args: List[str]) -> List[str]:
+        """内置 Lua Filter + 用户 Filter 的最终命令行参数（连续的 Lua Filter 合并为一个）"""
+        return build_filter_chain_args(
+            lua_filters, filter_args, fuse=self.fuse_lua_filters, pandoc_path=self.pandoc_path
+        )
+
+    def _convert_to_gfm(
+        self,
+        text: str,
+        from_fmt: str,
+        custom_filters: Optional[List[str]],
+        *,
+        context: str,
+    ) -> str:
+        """
+        使用 Pandoc 将输入（HTML 或 JSON AST）转换为 GFM Markdown，并做统一后处理。
+        """
+        filter_args = self._build_filter_args(custom_filters)
+
+        output = self._try_server(
+            text,
+            {"from": from_fmt, "to": GFM_OUTPUT_FORMAT, "wrap": "none"},
+            context=context,
+            lua_filters=[],
+            filter_args=filter_args,
+        )
+        if output is None:
+            cmd = [
+                self.pandoc_path,
+                "-f", from_fmt,
+                "-t", GFM_OUTPUT_FORMAT,
+                "-o", "-",          # 输出到 stdout
+                "--wrap", "none",   # 不自动换行，方便你后处理
+            ]
+            cmd += self._chain_filter_args([], filter_args)
+
+            result = self._run_cli(
+                cmd,
+                text.encode("utf-8"),  # 显式用 UTF-8 编码
+                context=context,
+            )
+            if result.returncode != 0:
+                err = (result.stderr or b"").decode("utf-8", "ignore")
+                log(f"Pandoc {context} error: {err}")
+                raise PandocError(err or "Pandoc HTML to Markdown conversion failed")
+            output = result.stdout
+
+        # stdout 也是 bytes，自行按 UTF-8 解码
+        md = output.decode("utf-8", "ignore")
+        md = md.replace('\r\n', '\n').replace('\r', '\n')  # 统一换行符
+        # math 代码块、行内公式、删除线、任务列表占位符等按规则表单遍改写
+        md = rewrite_pandoc_output(md, "gfm")
+        return md
+
     def _convert_html_to_md(
         self,
         html_text: str,
@@ -121,47 +452,65 @@ class PandocIntegration:
         使用 Pandoc 将 HTML 转换为 Markdown。
         """
         html_text = protect_brackets(html_text)
-        cmd = [
-            self.pandoc_path,
-            "-f", "html+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
-            "-t", "gfm-raw_html+tex_math_dollars",
-            "-o", "-",          # 输出到 stdout
-            "--wrap", "none",   # 不自动换行，方便你后处理
-        ]
-        cmd += self._build_filter_args(custom_filters)
+        return self._convert_to_gfm(html_text, HTML_INPUT_FORMAT, custom_filters, context="HTML->MD")
+
+    def parse_html_to_ast(
+        self,
+        html_text: str,
+        *,
+        custom_filters: Optional[List[str]] = None,
+    ) -> str:
+        """
+        将 HTML 解析为 pandoc JSON AST（只解析一次，后续各格式直接从 AST 渲染）。
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
+        Args:
+            html_text: HTML 文本
+            custom_filters: 解析阶段执行的 Filter（对应 html_to_md）
 
-        result = subprocess.run(
-            cmd,
-            input=html_text.encode("utf-8"),  # 显式用 UTF-8 编码
-            capture_output=True,
-            text=False,                       # 二进制模式
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+        Returns:
+            JSON AST 文本，可作为 input_format=AST_FORMAT 传给各 convert_* 方法
+
+        Raises:
+            PandocError: 解析失败时
+        """
+        html_text = protect_brackets(html_text)
+        filter_args = self._build_filter_args(custom_filters)
+
+        output = self._try_server(
+            html_text,
+            {"from": HTML_INPUT_FORMAT, "to": AST_FORMAT},
+            context="HTML->AST",
+            lua_filters=[],
+            filter_args=filter_args,
         )
-        if result.returncode != 0:
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc HTML to MD error: {err}")
-            raise PandocError(err or "Pandoc HTML to Markdown conversion failed")
+        if output is None:
+            cmd = [
+                self.pandoc_path,
+                "-f", HTML_INPUT_FORMAT,
+                "-t", AST_FORMAT,
+                "-o", "-",
+            ]
+            cmd += self._chain_filter_args([], filter_args)
+
+            result = self._run_cli(cmd, html_text.encode("utf-8"), context="HTML->AST")
+            if result.returncode != 0:
+                err = (result.stderr or b"").decode("utf-8", "ignore")
+                log(f"Pandoc HTML to AST error: {err}")
+                raise PandocError(err or "Pandoc HTML parsing failed")
+            output = result.stdout
 
-        # stdout 也是 bytes，自行按 UTF-8 解码
-        md = result.stdout.decode("utf-8", "ignore")
-        md = md.replace('\r\n', '\n').replace('\r', '\n')  # 统一换行符
-        md = re.sub(r'```\s*math\s*\n(.*?)\n\s*```', r'$$\n\1\n$$', md, flags=re.DOTALL)
-        md = re.sub(r'\$\s*`([^`]+)`\s*\$', r'$\1$', md)
-        md = re.sub(r'(```\s*\w+)\s+[^\n]+', r'\1', md)
-        # 处理\~~删除线文本\~~
-        md = re.sub(r'\\~~(.*?)\\~~', r'~~\1~~', md)
+        return _restore_task_placeholders(output.decode("utf-8", "ignore"))
 
-        md = md.replace("{{TASK_CHECKED}}", "[x]").replace("{{TASK_UNCHECKED}}", "[ ]")
-        return md
+    def convert_ast_to_markdown_text(
+        self,
+        ast_json: str,
+        *,
+        custom_filters: Optional[List[str]] = None,
+    ) -> str:
+        """
+        将 JSON AST 渲染为 Markdown 文本（与 convert_html_to_markdown_text 输出一致的后处理）。
+        """
+        return self._convert_to_gfm(ast_json, AST_FORMAT, custom_filters, context="AST->MD")
 
     def convert_html_to_markdown_text(
         self,
@@ -182,49 +531,59 @@ class PandocIntegration:
         enable_latex_replacements: bool = True,
         custom_filters: Optional[List[str]] = None,
         cwd: Optional[str] = None,
+        input_format: str = MARKDOWN_INPUT_FORMAT,
     ) -> str:
         """
-        将 Markdown 转换为 HTML 文本（用于富文本粘贴）。
+        将 Markdown（或 JSON AST）转换为 HTML 文本（用于富文本粘贴）。
 
         Note:
             - Keep_original_formula=True 时，会用 keep-latex-math.lua 将数学节点改成普通文本 `$...$` / `$$...$$`。
             - 输出为 HTML fragment
         """
+        from_fmt = input_format
+        lua_filters = []
+        if enable_latex_replacements:
+            lua_filters.append(LUA_LATEX_REPLACEMENTS)
+        if Keep_original_formula:
+            lua_filters.append(LUA_KEEP_ORIGINAL_FORMULA)
+        filter_args = self._build_filter_args(custom_filters)
+
+        output = self._try_server(
+            md_text,
+            {
+                "from": from_fmt,
+                "to": "html",
+                "wrap": "none",
+                "standalone": True,
+                "html-math-method": "mathml",
+            },
+            context="MD->HTML",
+            lua_filters=lua_filters,
+            filter_args=filter_args,
+        )
+        if output is not None:
+            return output.decode("utf-8", "ignore")
+
         cmd = [
             self.pandoc_path,
-            "-f", "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
+            "-f", from_fmt,
             "-t", "html",
             "-o", "-",
             "--wrap", "none",
             "--standalone",
             "--mathml",
         ]
-        if enable_latex_replacements:
-            cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
-        if Keep_original_formula:
-            cmd += ["--lua-filter", LUA_KEEP_ORIGINAL_FORMULA]
-        cmd += self._build_filter_args(custom_filters)
+        cmd += self._chain_filter_args(lua_filters, filter_args)
 
         # 确保工作目录存在且可写
         if cwd:
             cwd = os.path.expandvars(cwd)
             os.makedirs(cwd, exist_ok=True)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        result = subprocess.run(
+        result = self._run_cli(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
+            context="MD->HTML",
             cwd=cwd,
         )
         if result.returncode != 0:
@@ -243,22 +602,38 @@ class PandocIntegration:
         custom_filters: Optional[List[str]] = None,
         request_headers: Optional[List[str]] = None,
         cwd: Optional[str] = None,
+        input_format: str = MARKDOWN_INPUT_FORMAT,
     ) -> bytes:
         """
-        将 Markdown 转换为 RTF 字节（用于富文本粘贴兜底）。
+        将 Markdown（或 JSON AST）转换为 RTF 字节（用于富文本粘贴兜底）。
         """
+        from_fmt = input_format
+        lua_filters = []
+        if enable_latex_replacements:
+            lua_filters.append(LUA_LATEX_REPLACEMENTS)
+        if Keep_original_formula:
+            lua_filters.append(LUA_KEEP_ORIGINAL_FORMULA)
+        filter_args = self._build_filter_args(custom_filters)
+
+        output = self._try_server(
+            md_text,
+            {"from": from_fmt, "to": "rtf", "standalone": True},
+            context="MD->RTF",
+            lua_filters=lua_filters,
+            filter_args=filter_args,
+            reads_resources=True,
+        )
+        if output is not None:
+            return output
+
         cmd = [
             self.pandoc_path,
-            "-f", "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
+            "-f", from_fmt,
             "-t", "rtf",
             "-o", "-",
             "--standalone",
         ]
-        if enable_latex_replacements:
-            cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
-        if Keep_original_formula:
-            cmd += ["--lua-filter", LUA_KEEP_ORIGINAL_FORMULA]
-        cmd += self._build_filter_args(custom_filters)
+        cmd += self._chain_filter_args(lua_filters, filter_args)
         cmd = _add_request_headers(cmd, request_headers)
 
         # 确保工作目录存在且可写
@@ -266,21 +641,10 @@ class PandocIntegration:
             cwd = os.path.expandvars(cwd)
             os.makedirs(cwd, exist_ok=True)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
-        result = subprocess.run(
+        result = self._run_cli(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
+            context="MD->RTF",
             cwd=cwd,
         )
         if result.returncode != 0:
@@ -290,7 +654,7 @@ class PandocIntegration:
 
         return result.stdout
 
-    def convert_to_docx_bytes(self, md_text: str, reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, request_headers: Optional[List[str]] = None, cwd: Optional[str] = None) -> bytes:
+    def convert_to_docx_bytes(self, md_text: str, reference_docx: Optional[str] = None, Keep_original_formula: bool = False, enable_latex_replacements: bool = True, custom_filters: Optional[List[str]] = None, request_headers: Optional[List[str]] = None, cwd: Optional[str] = None, input_format: str = MARKDOWN_INPUT_FORMAT) -> bytes:
         """
         用 stdin 喂入 Markdown，直接把 DOCX 从 stdout 读到内存（无任何输入文件写盘）
         
@@ -301,48 +665,57 @@ class PandocIntegration:
             enable_latex_replacements: 是否启用 LaTeX 替换
             custom_filters: 自定义 Filter 列表
             cwd: Pandoc 进程的工作目录，用于 Filter 创建临时文件（如 mermaid-filter.err）
+            input_format: 输入格式，传 AST_FORMAT 时 md_text 为 JSON AST
             
         Returns:
             DOCX 文件的字节流
         """
+        from_fmt = input_format
+        lua_filters = []
+        if enable_latex_replacements:
+            lua_filters.append(LUA_LATEX_REPLACEMENTS)
+        if Keep_original_formula:
+            lua_filters.append(LUA_KEEP_ORIGINAL_FORMULA)
+        # 添加自定义 Filter
+        filter_args = self._build_filter_args(custom_filters)
+
+        reference_options = (
+            self._reference_doc_options(reference_docx) if self.server is not None else None
+        )
+        if reference_options is not None:
+            output = self._try_server(
+                md_text,
+                {"from": from_fmt, "to": "docx", "highlight-style": "tango", **reference_options},
+                context="MD->DOCX",
+                lua_filters=lua_filters,
+                filter_args=filter_args,
+                reads_resources=True,
+            )
+            if output is not None:
+                return output
+
         cmd = [
             self.pandoc_path,
-            "-f", "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
+            "-f", from_fmt,
             "-t", "docx",
             "-o", "-",
             "--highlight-style", "tango",
         ]
-        if enable_latex_replacements:
-            cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
-        if Keep_original_formula:
-            cmd += ["--lua-filter", LUA_KEEP_ORIGINAL_FORMULA]
-        # 添加自定义 Filter
-        cmd += self._build_filter_args(custom_filters)
+        cmd += self._chain_filter_args(lua_filters, filter_args)
         if reference_docx:
             cmd += ["--reference-doc", reference_docx]
         cmd = _add_request_headers(cmd, request_headers)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
         # 确保工作目录存在且可写
         if cwd:
             cwd = os.path.expandvars(cwd)
             os.makedirs(cwd, exist_ok=True)
 
-        # 关键：input 直接传 UTF-8 字节；text=False 以得到二进制 stdout
-        result = subprocess.run(
+        # 关键：input 直接传 UTF-8 字节；stdout 为二进制 DOCX
+        result = self._run_cli(
             cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            md_text.encode("utf-8"),
+            context="MD->DOCX",
             cwd=cwd,
         )
         if result.returncode != 0:
@@ -384,53 +757,63 @@ class PandocIntegration:
             PandocError: 转换失败时
         """
         if Keep_original_formula:
-            md = self._convert_html_to_md(html_text, custom_filters_html_to_md)
+            # 解析一次为 AST 后直接渲染 DOCX，不再经过中间 Markdown 文本
+            ast = self.parse_html_to_ast(html_text, custom_filters=custom_filters_html_to_md)
             return self.convert_to_docx_bytes(
-                    md_text=md,
+                    md_text=ast,
                     reference_docx=reference_docx,
                     Keep_original_formula=Keep_original_formula,
                     enable_latex_replacements=enable_latex_replacements,
                     custom_filters=custom_filters_md_to_docx or custom_filters,
                     request_headers=request_headers,
                     cwd=cwd,
+                    input_format=AST_FORMAT,
                 )
-        
+
+        from_fmt = HTML_INPUT_FORMAT
+        lua_filters = []
+        if enable_latex_replacements:
+            lua_filters.append(LUA_LATEX_REPLACEMENTS)
+        # 添加自定义 Filter
+        filter_args = self._build_filter_args(custom_filters)
+
+        reference_options = (
+            self._reference_doc_options(reference_docx) if self.server is not None else None
+        )
+        if reference_options is not None:
+            output = self._try_server(
+                html_text,
+                {"from": from_fmt, "to": "docx", "highlight-style": "tango", **reference_options},
+                context="HTML->DOCX",
+                lua_filters=lua_filters,
+                filter_args=filter_args,
+                reads_resources=True,
+            )
+            if output is not None:
+                return output
+
         cmd = [
             self.pandoc_path,
-            "-f", "html+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
+            "-f", from_fmt,
             "-t", "docx",
             "-o", "-",
             "--highlight-style", "tango",
         ]
-        if enable_latex_replacements:
-            cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
-        # 添加自定义 Filter
-        cmd += self._build_filter_args(custom_filters)
+        cmd += self._chain_filter_args(lua_filters, filter_args)
         if reference_docx:
             cmd += ["--reference-doc", reference_docx]
         cmd = _add_request_headers(cmd, request_headers)
 
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
-
         # 确保工作目录存在且可写
         if cwd:
             cwd = os.path.expandvars(cwd)
             os.makedirs(cwd, exist_ok=True)
 
-        # 关键：input 直接传 UTF-8 字节；text=False 以得到二进制 stdout
-        result = subprocess.run(
+        # 关键：input 直接传 UTF-8 字节；stdout 为二进制 DOCX
+        result = self._run_cli(
             cmd,
-            input=html_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+            html_text.encode("utf-8"),
+            context="HTML->DOCX",
             cwd=cwd,
         )
         if result.returncode != 0:
@@ -450,47 +833,11 @@ class PandocIntegration:
         - \\documentclass, \\usepackage, \\begin{document}, \\end{document}
         - \\maketitle, \\tightlist, other preamble commands
         - Empty lines at start/end
+
+        Rules live in pandoc_output.OUTPUT_REWRITE_RULES["latex"]; lines inside
+        verbatim-like environments are kept as-is.
         """
-        lines = latex.split('\n')
-        result_lines = []
-        in_document = False
-        skip_patterns = [
-            r'^\s*\\documentclass',
-            r'^\s*\\usepackage',
-            r'^\s*\\begin\{document\}',
-            r'^\s*\\end\{document\}',
-            r'^\s*\\maketitle',
-            r'^\s*\\date\{',
-            r'^\s*\\author\{',
-            r'^\s*\\providecommand',
-            r'^\s*\\setlength',
-            r'^\s*\\def\\tightlist',
-            r'^\s*\\tightlist',
-            r'^\s*\\newcommand',
-        ]
-        
-        for line in lines:
-            # Skip preamble lines
-            should_skip = False
-            for pattern in skip_patterns:
-                if re.match(pattern, line):
-                    should_skip = True
-                    break
-            
-            if should_skip:
-                if '\\begin{document}' in line:
-                    in_document = True
-                continue
-            
-            # Only include content after \begin{document} or if no document structure
-            if in_document or not any(re.match(r'^\s*\\documentclass', l) for l in lines[:20]):
-                result_lines.append(line)
-        
-        # Clean up result
-        result = '\n'.join(result_lines)
-        # Remove leading/trailing empty lines
-        result = result.strip()
-        return result
+        return rewrite_pandoc_output(latex, "latex")
 
     def convert_html_to_latex_text(
         self,
@@ -510,13 +857,13 @@ class PandocIntegration:
         Returns:
             LaTeX content (body only if strip_preamble=True)
         """
-        # First convert HTML to Markdown
-        md_text = self._convert_html_to_md(html_text, custom_filters_html_to_md)
-        # Then convert Markdown to LaTeX
+        # Parse HTML once, then render LaTeX straight from the AST
+        ast = self.parse_html_to_ast(html_text, custom_filters=custom_filters_html_to_md)
         return self.convert_markdown_to_latex_text(
-            md_text,
+            ast,
             strip_preamble=strip_preamble,
             custom_filters=custom_filters_md_to_latex,
+            input_format=AST_FORMAT,
         )
 
     def convert_markdown_to_latex_text(
@@ -526,52 +873,56 @@ class PandocIntegration:
         strip_preamble: bool = True,
         enable_latex_replacements: bool = True,
         custom_filters: Optional[List[str]] = None,
+        input_format: str = MARKDOWN_INPUT_FORMAT,
     ) -> str:
         """
-        Convert Markdown to LaTeX text.
+        Convert Markdown (or a JSON AST) to LaTeX text.
         
         Args:
             md_text: Markdown content
             strip_preamble: If True, remove document preamble for Overleaf paste
             enable_latex_replacements: Enable LaTeX syntax fixes
             custom_filters: Optional list of custom Pandoc filters
+            input_format: Input format; pass AST_FORMAT when md_text is a JSON AST
             
         Returns:
             LaTeX content (body only if strip_preamble=True)
         """
-        cmd = [
-            self.pandoc_path,
-            "-f", "markdown+tex_math_dollars+raw_tex+tex_math_double_backslash+tex_math_single_backslash",
-            "-t", "latex",
-            "-o", "-",
-            "--wrap", "none",
-        ]
+        from_fmt = input_format
+        lua_filters = []
         if enable_latex_replacements:
-            cmd += ["--lua-filter", LUA_LATEX_REPLACEMENTS]
-        cmd += self._build_filter_args(custom_filters)
-
-        startupinfo = None
-        creationflags = 0
-        if os.name == "nt":
-            startupinfo = subprocess.STARTUPINFO()
-            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
-            creationflags = subprocess.CREATE_NO_WINDOW
+            lua_filters.append(LUA_LATEX_REPLACEMENTS)
+        filter_args = self._build_filter_args(custom_filters)
 
-        result = subprocess.run(
-            cmd,
-            input=md_text.encode("utf-8"),
-            capture_output=True,
-            text=False,
-            shell=False,
-            startupinfo=startupinfo,
-            creationflags=creationflags,
+        output = self._try_server(
+            md_text,
+            {"from": from_fmt, "to": "latex", "wrap": "none"},
+            context="MD->LaTeX",
+            lua_filters=lua_filters,
+            filter_args=filter_args,
         )
-        if result.returncode != 0:
-            err = (result.stderr or b"").decode("utf-8", "ignore")
-            log(f"Pandoc Markdown to LaTeX error: {err}")
-            raise PandocError(err or "Pandoc Markdown to LaTeX conversion failed")
+        if output is None:
+            cmd = [
+                self.pandoc_path,
+                "-f", from_fmt,
+                "-t", "latex",
+                "-o", "-",
+                "--wrap", "none",
+            ]
+            cmd += self._chain_filter_args(lua_filters, filter_args)
+
+            result = self._run_cli(
+                cmd,
+                md_text.encode("utf-8"),
+                context="MD->LaTeX",
+            )
+            if result.returncode != 0:
+                err = (result.stderr or b"").decode("utf-8", "ignore")
+                log(f"Pandoc Markdown to LaTeX error: {err}")
+                raise PandocError(err or "Pandoc Markdown to LaTeX conversion failed")
+            output = result.stdout
 
-        latex = result.stdout.decode("utf-8", "ignore")
+        latex = output.decode("utf-8", "ignore")
         
         if strip_preamble:
             latex = self._strip_latex_preamble(latex)
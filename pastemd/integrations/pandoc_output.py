@@ -0,0 +1,397 @@
+"""Rewrite rules for pandoc text output, compiled into one fence-aware scanner.
+
+Pandoc 返回 Markdown / LaTeX 文本后还需要做一些修正（旧版 pandoc 的 ```math 公式块与
+$`...`$ 行内公式、代码块信息串、被转义的删除线、任务列表占位符、LaTeX 导言区）。
+这里按目标格式登记改写规则，每个格式的规则编译成一个扫描器，单遍处理整份输出：
+
+- 先识别代码区域（Markdown 围栏代码块、LaTeX verbatim 类环境），正文规则不会作用于代码；
+- FenceRule 只改写代码块的开始/结束行；
+- TextRule 合并为一个正则，在正文中从左到右扫描一次，行内代码原样跳过；
+  in_code=True 的规则（本程序自己插入的占位符）同样作用于代码；
+- LineRule 合并为一个正则，命中的正文行整行删除。
+"""
+
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+# 行首的围栏：允许缩进、列表标记与引用标记作为前缀
+_MD_FENCE_OPEN_RE = re.compile(
+    r'^(?:[ \t]*+(?:(?:[-+*]|\d+[.)])[ \t]++|>[ \t]?+))*+[ \t]*+(`{3,}|~{3,})([^\n]*)$',
+    re.MULTILINE,
+)
+# 围栏候选行：三个反引号/波浪线之前只有列表、引用等前缀字符（再用 _MD_FENCE_OPEN_RE 确认）
+_MD_FENCE_PREFIX_RE = re.compile(r'[ \t>\-+*\d.)]*')
+_FENCE_SEARCH_WINDOW = 4096
+# 替换模板中的分组引用 \1
+_TEMPLATE_GROUP_RE = re.compile(r'\\(\d+)')
+_LATEX_CODE_BEGIN_RE = re.compile(r'[ \t]*\\begin\{(verbatim|Verbatim|lstlisting|minted)\}')
+_LATEX_DOCUMENTCLASS_RE = re.compile(r'\s*\\documentclass')
+# 只在前若干行中查找 \documentclass（与原实现一致）
+_LATEX_DOCUMENTCLASS_WINDOW = 20
+
+_fence_close_cache: Dict[Tuple[str, int], "re.Pattern[str]"] = {}
+
+
+class TextRule:
+    """
+    正文中的文本改写规则
+
+    所有 TextRule 会合并为一个正则，pattern 中只能使用编号分组（命名分组会互相冲突），
+    首字符必须是确定的字面字符（用于扫描时快速跳过）；replacement 中只支持 \\N 分组引用。
+    """
+
+    def __init__(self, name: str, pattern: str, replacement: str, *, in_code: bool = False):
+        self.name = name
+        self.pattern = pattern
+        self.replacement = replacement
+        # 是否同样作用于代码块与行内代码
+        self.in_code = in_code
+        # 拆分后的模板：偶数位为字面文本，奇数位为分组编号
+        self._template = _TEMPLATE_GROUP_RE.split(replacement)
+
+    def replacer(self, offset: int) -> Callable[["re.Match[str]"], str]:
+        """
+        生成改写合并正则命中的函数；offset 为本规则的分组在合并正则中的编号
+
+        分组编号在编译时换算好，常见的无分组 / 单分组模板生成专用函数，每次命中只做一次拼接。
+        """
+        template = self._template
+        if len(template) == 1:
+            replacement = self.replacement
+            return lambda m: replacement
+        literals = template[0::2]
+        groups = [offset + int(group) for group in template[1::2]]
+        if len(groups) == 1:
+            (before, after), group = literals, groups[0]
+            return lambda m: before + (m.group(group) or "") + after
+
+        def replace(m: "re.Match[str]") -> str:
+            parts = [literals[0]]
+            for group, literal in zip(groups, literals[1:]):
+                parts.append(m.group(group) or "")
+                parts.append(literal)
+            return "".join(parts)
+
+        return replace
+
+
+class FenceRule:
+    """
+    代码块开始行的改写规则
+
+    pattern 在开始行中搜索，命中部分按 replacement 模板替换；close 不为 None 时
+    结束行的围栏替换为 close（如 ```math 代码块改写为 $$ 公式块）。
+    """
+
+    def __init__(self, name: str, pattern: str, replacement: str, *, close: Optional[str] = None):
+        self.name = name
+        self.regex = re.compile(pattern)
+        self.replacement = replacement
+        self.close = close
+
+
+class LineRule:
+    """正文中从行首匹配 pattern 的行整行删除"""
+
+    def __init__(self, name: str, pattern: str):
+        self.name = name
+        self.pattern = pattern
+
+
+class RewriteRules:
+    """
+    一个目标格式的改写规则
+
+    Args:
+        code: 代码区域的识别方式，"markdown"（围栏代码块 + 行内代码）或 "latex"（verbatim 类环境）
+        document_body: 只保留 \\begin{document} 之后的内容（前 20 行中有 \\documentclass 时）
+    """
+
+    def __init__(
+        self,
+        code: str,
+        *,
+        text: Sequence[TextRule] = (),
+        fences: Sequence[FenceRule] = (),
+        drop_lines: Sequence[LineRule] = (),
+        document_body: bool = False,
+    ):
+        self.code = code
+        self.text = list(text)
+        self.fences = list(fences)
+        self.drop_lines = list(drop_lines)
+        self.document_body = document_body
+
+
+OUTPUT_REWRITE_RULES: Dict[str, RewriteRules] = {
+    # HTML/AST -> GFM Markdown
+    "gfm": RewriteRules(
+        "markdown",
+        fences=[
+            # 旧版 pandoc 把显示公式输出为 ```math 代码块
+            FenceRule("math_block", r'```[ \t]*math[ \t]*$', "$$", close="$$"),
+            # 代码块语言之后的其余信息串
+            FenceRule("fence_info", r'(```[ \t]*\w+)[ \t]+[^\n]+', r"\1"),
+        ],
+        text=[
+            # 旧版 pandoc 的行内公式 $`...`$
+            TextRule("math_inline", r'\$\s*`([^`]+)`\s*\$', r"$\1$"),
+            # 被转义的删除线 \~~...\~~
+            TextRule("strikethrough", r'\\~~(.*?)\\~~', r"~~\1~~"),
+            # 任务列表占位符（见 html_formatter 中的任务列表处理）
+            TextRule("task_checked", r'\{\{TASK_CHECKED\}\}', "[x]", in_code=True),
+            TextRule("task_unchecked", r'\{\{TASK_UNCHECKED\}\}', "[ ]", in_code=True),
+        ],
+    ),
+    # Markdown/AST -> LaTeX（粘贴到 Overleaf 等只需要正文）
+    "latex": RewriteRules(
+        "latex",
+        drop_lines=[
+            LineRule("documentclass", r'\\documentclass'),
+            LineRule("usepackage", r'\\usepackage'),
+            LineRule("begin_document", r'\\begin\{document\}'),
+            LineRule("end_document", r'\\end\{document\}'),
+            LineRule("maketitle", r'\\maketitle'),
+            LineRule("date", r'\\date\{'),
+            LineRule("author", r'\\author\{'),
+            LineRule("providecommand", r'\\providecommand'),
+            LineRule("setlength", r'\\setlength'),
+            LineRule("def_tightlist", r'\\def\\tightlist'),
+            LineRule("tightlist", r'\\tightlist'),
+            LineRule("newcommand", r'\\newcommand'),
+        ],
+        document_body=True,
+    ),
+}
+
+
+def _fence_close_re(fence: str) -> "re.Pattern[str]":
+    """与开始围栏同字符、不短于它的结束围栏行"""
+    key = (fence[0], len(fence))
+    regex = _fence_close_cache.get(key)
+    if regex is None:
+        regex = re.compile(
+            r'^([ \t>]*)%s{%d,}[ \t]*$' % (re.escape(fence[0]), len(fence)),
+            re.MULTILINE,
+        )
+        _fence_close_cache[key] = regex
+    return regex
+
+
+class OutputRewriter:
+    """把一个目标格式的 RewriteRules 编译为单遍扫描器"""
+
+    def __init__(self, rules: RewriteRules):
+        self.rules = rules
+        self._text_re = self._compile_text(rules.text, skip_code=rules.code == "markdown")
+        code_rules = [rule for rule in rules.text if rule.in_code]
+        self._code_re = self._compile_text(code_rules, skip_code=False)
+        # 各规则单独编译的正则：首字符是字面字符，单独搜索比合并正则的字符集扫描快得多；
+        # 没有任何规则命中的正文 / 代码（不论是否位于行内代码中）直接原样保留
+        self._text_probes = [re.compile(rule.pattern).search for rule in rules.text]
+        self._code_probes = [re.compile(rule.pattern).search for rule in code_rules]
+        # 合并正则的分支名 -> 改写函数（每次命中只做一次字典查找和一次调用）
+        self._text_handlers = self._rule_handlers(self._text_re, rules.text)
+        self._text_handlers.update(
+            code=self._rewrite_code_span, span=self._rewrite_code_span, esc=re.Match.group, tick=re.Match.group,
+        )
+        self._code_handlers = self._rule_handlers(self._code_re, code_rules)
+        self._drop_re = (
+            re.compile(r'\s*(?:%s)' % "|".join(rule.pattern for rule in rules.drop_lines))
+            if rules.drop_lines else None
+        )
+
+    @staticmethod
+    def _compile_text(text_rules: Sequence[TextRule], *, skip_code: bool) -> Optional["re.Pattern[str]"]:
+        # 每个分支的首个字面字符放在命名分组之外，正则引擎据此生成首字符集合，
+        # 扫描时可以快速跳过不可能命中的位置
+        branches = []
+        for i, rule in enumerate(text_rules):
+            first, rest = _split_first_literal(rule.pattern)
+            branches.append(f"{first}(?P<r{i}>{rest})")
+        if not branches:
+            return None
+        if skip_code:
+            # 转义字符（如 \`）、行内代码（常见的单反引号形式单独匹配，较快；
+            # 不跨越空行）、没有结束反引号串的反引号串（按普通文本保留）
+            branches.append(r"\\(?P<esc>[\s\S])")
+            branches.append(r"`(?P<code>(?:[^`\n]|\n(?!\n))+`(?!`))")
+            branches.append(r"`(?P<span>(?P<run>`*)(?!`)(?:(?!\n\n)[\s\S])*?(?<!`)`(?P=run)(?!`))")
+            branches.append(r"`(?P<tick>`*)")
+        return re.compile("|".join(branches))
+
+    @staticmethod
+    def _rule_handlers(
+        regex: Optional["re.Pattern[str]"], text_rules: Sequence[TextRule]
+    ) -> Dict[str, Callable[["re.Match[str]"], str]]:
+        if regex is None:
+            return {}
+        return {f"r{i}": rule.replacer(regex.groupindex[f"r{i}"]) for i, rule in enumerate(text_rules)}
+
+    def rewrite(self, text: str) -> str:
+        if self.rules.code == "latex":
+            return self._rewrite_latex(text)
+        return self._rewrite_markdown(text)
+
+    # ---- Markdown ----
+
+    def _rewrite_markdown(self, text: str) -> str:
+        out: List[str] = []
+        pos = 0
+        end = len(text)
+        while pos < end:
+            m = _find_fence_open(text, pos)
+            if m is None:
+                out.append(self._rewrite_text(text[pos:]))
+                break
+
+            out.append(self._rewrite_text(text[pos:m.start()]))
+            open_line, close_line = self._rewrite_fence(m.group(0))
+            out.append(open_line)
+
+            # 没有结束围栏时代码块延续到文末
+            close = _fence_close_re(m.group(1)).search(text, m.end())
+            block_end = close.start() if close is not None else end
+            out.append(self._rewrite_code(text[m.end():block_end]))
+            if close is None:
+                break
+            # 改写结束行时保留缩进与引用标记，代码块仍在原来的列表/引用中
+            out.append(close.group(0) if close_line is None else close.group(1) + close_line)
+            pos = close.end()
+
+        return "".join(out)
+
+    def _rewrite_fence(self, line: str) -> Tuple[str, Optional[str]]:
+        for rule in self.rules.fences:
+            rewritten, count = rule.regex.subn(rule.replacement, line, count=1)
+            if count:
+                return rewritten, rule.close
+        return line, None
+
+    def _rewrite_code(self, code: str) -> str:
+        if not any(probe(code) for probe in self._code_probes):
+            return code
+        return self._code_re.sub(self._expand_code_rule, code)
+
+    def _rewrite_code_span(self, m: "re.Match[str]") -> str:
+        return self._rewrite_code(m.group())
+
+    def _expand_code_rule(self, m: "re.Match[str]") -> str:
+        return self._code_handlers[m.lastgroup](m)
+
+    def _rewrite_text(self, text: str) -> str:
+        if not any(probe(text) for probe in self._text_probes):
+            return text
+        return self._text_re.sub(self._replace_text, text)
+
+    def _replace_text(self, m: "re.Match[str]") -> str:
+        return self._text_handlers[m.lastgroup](m)
+
+    # ---- LaTeX ----
+
+    def _rewrite_latex(self, text: str) -> str:
+        lines = text.split("\n")
+        drop = self._drop_re.match if self._drop_re is not None else None
+        body_only = self.rules.document_body and _has_documentclass(lines)
+        in_document = False
+        code_end: Optional[str] = None
+        result_lines = []
+
+        for line in lines:
+            if code_end is not None:
+                # verbatim 类环境中的内容原样保留
+                if code_end in line:
+                    code_end = None
+            else:
+                begin = _LATEX_CODE_BEGIN_RE.match(line)
+                if begin is not None:
+                    code_end = "\\end{%s}" % begin.group(1)
+                elif drop is not None and drop(line):
+                    if "\\begin{document}" in line:
+                        in_document = True
+                    continue
+
+            # 有文档结构时只保留 \begin{document} 之后的内容
+            if in_document or not body_only:
+                result_lines.append(line)
+
+        return "\n".join(result_lines).strip()
+
+
+def _find_fence_open(text: str, pos: int) -> Optional["re.Match[str]"]:
+    """
+    从 pos（行首）开始查找下一个围栏代码块的开始行
+
+    用 str.find 定位 ``` / ~~~（比逐行首尝试的 MULTILINE 正则快得多），再检查其所在行。
+    查找限定在逐步加倍的窗口内，文中只有一种围栏时不会每次都扫描到文末。
+    """
+    search = pos
+    window = _FENCE_SEARCH_WINDOW
+    while search < len(text):
+        limit = search + window
+        ticks = text.find("```", search, limit + 2)
+        tildes = text.find("~~~", search, ticks + 2 if ticks >= 0 else limit + 2)
+        if ticks < 0 and tildes < 0:
+            search = limit
+            window *= 2
+            continue
+        marker = tildes if tildes >= 0 else ticks
+        line_start = text.rfind("\n", 0, marker) + 1
+        if line_start >= pos and _MD_FENCE_PREFIX_RE.fullmatch(text, line_start, marker):
+            m = _MD_FENCE_OPEN_RE.match(text, line_start)
+            # 反引号围栏的信息串中不能有反引号（否则是一行行内代码）
+            if m is not None and not (m.group(1)[0] == "`" and "`" in m.group(2)):
+                return m
+        # 同一行中更靠后的标记不可能是围栏，从下一行继续
+        search = text.find("\n", marker) + 1
+        if search == 0:
+            break
+    return None
+
+
+def _split_first_literal(pattern: str) -> Tuple[str, str]:
+    """把 TextRule pattern 拆成首个字面字符与其余部分（如 r'\\$x' -> (r'\\$', 'x')）"""
+    size = 2 if pattern[:1] == "\\" else 1
+    first, rest = pattern[:size], pattern[size:]
+    if (
+        not first
+        or (size == 1 and first in ".^$*+?{}[]|()")
+        or (size == 2 and first[1:].isalnum())
+        or rest[:1] in ("*", "+", "?", "{")
+    ):
+        raise ValueError(f"TextRule pattern must start with a literal character: {pattern!r}")
+    return first, rest
+
+
+def _has_documentclass(lines: List[str]) -> bool:
+    """前 20 行的正文（不含 verbatim 类环境）中是否有 \\documentclass"""
+    code_end: Optional[str] = None
+    for line in lines[:_LATEX_DOCUMENTCLASS_WINDOW]:
+        if code_end is not None:
+            if code_end in line:
+                code_end = None
+            continue
+        begin = _LATEX_CODE_BEGIN_RE.match(line)
+        if begin is not None:
+            code_end = "\\end{%s}" % begin.group(1)
+        elif _LATEX_DOCUMENTCLASS_RE.match(line):
+            return True
+    return False
+
+
+_rewriters: Dict[str, OutputRewriter] = {}
+
+
+def rewrite_pandoc_output(text: str, target: str) -> str:
+    """
+    按目标格式（OUTPUT_REWRITE_RULES 的键）改写 pandoc 输出
+
+    Raises:
+        KeyError: 没有登记该目标格式的规则
+    """
+    rewriter = _rewriters.get(target)
+    if rewriter is None:
+        rewriter = _rewriters[target] = OutputRewriter(OUTPUT_REWRITE_RULES[target])
+    return rewriter.rewrite(text)
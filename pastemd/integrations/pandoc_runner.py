@@ -0,0 +1,268 @@
+"""Cancellable, time-bounded pandoc process runner.
+
+``subprocess.run`` 没有超时也无法从外部中止：卡住的 Filter 或缓慢的远程图片下载
+会让工作线程一直占着 ``app_state.running``，后续热键全部被忽略。这里用 Popen
+流式读写 stdin/stdout，并支持：
+
+- 每次转换的截止时间（超时杀掉整个进程树）
+- 可跨线程触发的取消句柄（新的热键 / 托盘菜单 / 剪贴板变化）
+- 失败时附带已读到的部分 stderr，便于诊断
+"""
+
+from __future__ import annotations
+
+import contextlib
+import os
+import signal
+import subprocess
+import threading
+import time
+from typing import Callable, Iterator, List, Optional
+
+from ..core.errors import PandocError
+from ..utils.logging import log
+
+# 写入 stdin 的分块大小
+_STDIN_CHUNK_SIZE = 64 * 1024
+# stderr 只保留末尾这么多字节
+_STDERR_TAIL_BYTES = 64 * 1024
+# 等待进程期间检查取消/超时的间隔（秒）
+_POLL_INTERVAL_S = 0.05
+# 进程正常退出后等待读线程读完管道剩余数据的上限（秒）：只有进程退出后仍有子进程
+# （如 Filter 启动的后台进程）持有 stdout/stderr 时才会等满
+_READER_JOIN_TIMEOUT_S = 30
+# 超时/取消时输出不再需要，只短暂等待读线程
+_ABORT_JOIN_TIMEOUT_S = 2
+
+
+class PandocCancelledError(PandocError):
+    """Pandoc 转换被取消（超时或用户取消）"""
+    pass
+
+
+class CancelToken:
+    """可跨线程触发的取消句柄"""
+
+    def __init__(self) -> None:
+        self._event = threading.Event()
+        self._lock = threading.Lock()
+        self._callbacks: List[Callable[[], None]] = []
+        self.reason = ""
+
+    @property
+    def cancelled(self) -> bool:
+        return self._event.is_set()
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        """触发取消（幂等），并立即执行已注册的回调（如杀进程）"""
+        with self._lock:
+            if self._event.is_set():
+                return
+            self.reason = reason
+            self._event.set()
+            callbacks = list(self._callbacks)
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                log(f"Cancel callback failed: {e}")
+
+    def add_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            if not self._event.is_set():
+                self._callbacks.append(callback)
+                return
+        callback()
+
+    def remove_callback(self, callback: Callable[[], None]) -> None:
+        with self._lock:
+            with contextlib.suppress(ValueError):
+                self._callbacks.remove(callback)
+
+    def raise_if_cancelled(self) -> None:
+        if self.cancelled:
+            raise PandocCancelledError(f"Pandoc conversion cancelled: {self.reason}")
+
+
+_local = threading.local()
+
+
+def current_cancel_token() -> Optional[CancelToken]:
+    """当前线程绑定的取消句柄（未绑定时为 None）"""
+    return getattr(_local, "token", None)
+
+
+@contextlib.contextmanager
+def cancel_scope(token: CancelToken) -> Iterator[CancelToken]:
+    """在当前线程内绑定取消句柄，作用域内的 pandoc 调用都会响应它"""
+    previous = current_cancel_token()
+    _local.token = token
+    try:
+        yield token
+    finally:
+        _local.token = previous
+
+
+def _popen_kwargs() -> dict:
+    if os.name == "nt":
+        startupinfo = subprocess.STARTUPINFO()
+        startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+        return {
+            "startupinfo": startupinfo,
+            "creationflags": subprocess.CREATE_NO_WINDOW | subprocess.CREATE_NEW_PROCESS_GROUP,
+        }
+    # 独立进程组，方便连同 Filter 子进程一起结束
+    return {"start_new_session": True}
+
+
+def kill_process_tree(proc: subprocess.Popen) -> None:
+    """结束进程及其所有子进程（Filter 可能再启动 node/浏览器等）"""
+    if proc.poll() is not None:
+        return
+    try:
+        if os.name == "nt":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            subprocess.run(
+                ["taskkill", "/F", "/T", "/PID", str(proc.pid)],
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.DEVNULL,
+                timeout=5,
+                startupinfo=startupinfo,
+                creationflags=subprocess.CREATE_NO_WINDOW,
+            )
+        else:
+            os.killpg(proc.pid, signal.SIGKILL)
+    except Exception as e:
+        log(f"Failed to kill pandoc process tree (pid={proc.pid}): {e}")
+    with contextlib.suppress(Exception):
+        proc.kill()
+
+
+def run_pandoc(
+    cmd: List[str],
+    input_bytes: bytes,
+    *,
+    timeout_s: Optional[float] = None,
+    cwd: Optional[str] = None,
+    token: Optional[CancelToken] = None,
+) -> subprocess.CompletedProcess:
+    """
+    运行一次 pandoc：流式写入 stdin、读取 stdout/stderr，支持超时与取消
+
+    Args:
+        cmd: 命令行
+        input_bytes: 写入 stdin 的内容
+        timeout_s: 截止时间（秒），None 或 <=0 表示不限
+        cwd: 工作目录
+        token: 取消句柄，默认使用当前线程绑定的句柄
+
+    Returns:
+        CompletedProcess（stdout/stderr 为 bytes）
+
+    Raises:
+        PandocCancelledError: 超时或被取消（附带部分 stderr）
+        PandocError: 无法启动进程；进程退出后输出管道迟迟读不完（输出可能不完整）
+    """
+    token = token or current_cancel_token()
+    if token is not None:
+        token.raise_if_cancelled()
+
+    try:
+        proc = subprocess.Popen(
+            cmd,
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
+            shell=False,
+            cwd=cwd,
+            **_popen_kwargs(),
+        )
+    except OSError as e:
+        raise PandocError(f"Failed to launch pandoc: {e}")
+
+    stdout_chunks: List[bytes] = []
+    stderr_tail = bytearray()
+
+    def _write_stdin() -> None:
+        try:
+            view = memoryview(input_bytes)
+            for offset in range(0, len(view), _STDIN_CHUNK_SIZE):
+                proc.stdin.write(view[offset:offset + _STDIN_CHUNK_SIZE])
+        except (BrokenPipeError, OSError, ValueError):
+            # 进程提前退出或被杀，错误信息以 returncode/stderr 为准
+            pass
+        finally:
+            with contextlib.suppress(Exception):
+                proc.stdin.close()
+
+    def _read_stdout() -> None:
+        for chunk in iter(lambda: proc.stdout.read(_STDIN_CHUNK_SIZE), b""):
+            stdout_chunks.append(chunk)
+
+    def _read_stderr() -> None:
+        for chunk in iter(lambda: proc.stderr.read(4096), b""):
+            stderr_tail.extend(chunk)
+            if len(stderr_tail) > _STDERR_TAIL_BYTES:
+                del stderr_tail[:-_STDERR_TAIL_BYTES]
+
+    threads = [
+        threading.Thread(target=_write_stdin, daemon=True),
+        threading.Thread(target=_read_stdout, daemon=True),
+        threading.Thread(target=_read_stderr, daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    kill = lambda: kill_process_tree(proc)  # noqa: E731
+    if token is not None:
+        token.add_callback(kill)
+
+    deadline = time.monotonic() + timeout_s if timeout_s and timeout_s > 0 else None
+    timed_out = False
+    try:
+        while proc.poll() is None:
+            if token is not None and token.cancelled:
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                timed_out = True
+                break
+            with contextlib.suppress(subprocess.TimeoutExpired):
+                proc.wait(timeout=_POLL_INTERVAL_S)
+    finally:
+        if token is not None:
+            token.remove_callback(kill)
+        if proc.poll() is None:
+            kill_process_tree(proc)
+        proc.wait()
+        aborted = timed_out or (token is not None and token.cancelled)
+        join_timeout = _ABORT_JOIN_TIMEOUT_S if aborted else _READER_JOIN_TIMEOUT_S
+        for thread in threads:
+            thread.join(timeout=join_timeout)
+        readers_done = not any(thread.is_alive() for thread in threads[1:])
+        for stream in (proc.stdout, proc.stderr):
+            with contextlib.suppress(Exception):
+                stream.close()
+
+    stderr = bytes(stderr_tail)
+    if aborted:
+        partial = stderr.decode("utf-8", "ignore").strip()
+        if timed_out:
+            reason = f"timed out after {timeout_s:g}s"
+        else:
+            reason = token.reason or "cancelled"  # type: ignore[union-attr]
+        if partial:
+            log(f"Pandoc {reason}, partial stderr: {partial[-4000:]}")
+        message = f"Pandoc conversion {reason}"
+        if partial:
+            message += f": {partial[-1000:]}"
+        raise PandocCancelledError(message)
+
+    if not readers_done:
+        # 读线程还没读到 EOF，stdout 可能不完整，不能当作成功的输出返回
+        raise PandocError(
+            f"Pandoc exited (code {proc.returncode}) but its output pipes were still open "
+            f"after {_READER_JOIN_TIMEOUT_S}s; output may be incomplete"
+        )
+
+    return subprocess.CompletedProcess(cmd, proc.returncode, b"".join(stdout_chunks), stderr)
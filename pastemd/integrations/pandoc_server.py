@@ -0,0 +1,326 @@
+"""Long-lived `pandoc server` backend.
+
+冷启动 pandoc 进程是热键到粘贴延迟的主要来源。这里维护一个常驻的
+``pandoc server``（pandoc ≥ 3.0），通过本机 HTTP + JSON 发送转换请求，
+进程意外退出时自动重启。
+
+Note:
+    - pandoc server 运行在纯模式下：不能执行 Lua/外部 Filter，
+      也不能读取本地文件或下载远程资源，这类转换必须走 CLI。
+    - pandoc server 没有绑定地址参数，监听端口由系统随机分配，
+      请求只发往 127.0.0.1。
+"""
+
+from __future__ import annotations
+
+import atexit
+import base64
+import http.client
+import json
+import os
+import socket
+import subprocess
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from ..core.errors import PandocError
+from ..utils.logging import log
+from .pandoc_runner import CancelToken, PandocCancelledError, current_cancel_token
+
+# 等待 server 就绪的最长时间（秒）
+SERVER_START_TIMEOUT_S = 10.0
+# 就绪探测间隔（秒）
+SERVER_POLL_INTERVAL_S = 0.05
+# 单次转换请求超时（秒），同时作为 pandoc server --timeout
+SERVER_REQUEST_TIMEOUT_S = 60
+
+
+def _find_free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class PandocServer:
+    """常驻 pandoc server 进程管理（线程安全）"""
+
+    def __init__(self, pandoc_path: str = "pandoc"):
+        self.pandoc_path = pandoc_path
+        self._proc: Optional[subprocess.Popen] = None
+        self._port: Optional[int] = None
+        self._lock = threading.Lock()
+        # 启动失败（如 pandoc < 3.0）后不再重试，统一回退 CLI
+        self.unavailable = False
+
+    def is_alive(self) -> bool:
+        return self._proc is not None and self._proc.poll() is None
+
+    def start(self) -> None:
+        """启动 server（已运行时直接返回）"""
+        with self._lock:
+            self._start_locked()
+
+    def stop(self) -> None:
+        """停止 server 进程"""
+        with self._lock:
+            self._stop_locked()
+
+    def _start_locked(self) -> None:
+        if self.is_alive():
+            return
+        if self.unavailable:
+            raise PandocError("pandoc server is unavailable")
+
+        port = _find_free_port()
+        cmd = [
+            self.pandoc_path,
+            "server",
+            "--port", str(port),
+            "--timeout", str(SERVER_REQUEST_TIMEOUT_S),
+        ]
+
+        startupinfo = None
+        creationflags = 0
+        if os.name == "nt":
+            startupinfo = subprocess.STARTUPINFO()
+            startupinfo.dwFlags |= subprocess.STARTF_USESHOWWINDOW
+            creationflags = subprocess.CREATE_NO_WINDOW
+
+        try:
+            proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.DEVNULL,
+                stderr=subprocess.PIPE,
+                shell=False,
+                startupinfo=startupinfo,
+                creationflags=creationflags,
+            )
+        except Exception as e:
+            self.unavailable = True
+            raise PandocError(f"Failed to launch pandoc server: {e}")
+
+        deadline = time.monotonic() + SERVER_START_TIMEOUT_S
+        while time.monotonic() < deadline:
+            if proc.poll() is not None:
+                err = (proc.stderr.read() if proc.stderr else b"").decode("utf-8", "ignore")
+                self.unavailable = True
+                raise PandocError(f"pandoc server exited on startup: {err.strip()}")
+            if self._probe(port):
+                self._proc = proc
+                self._port = port
+                threading.Thread(target=self._drain_stderr, args=(proc,), daemon=True).start()
+                log(f"pandoc server started on 127.0.0.1:{port} (pid={proc.pid})")
+                return
+            time.sleep(SERVER_POLL_INTERVAL_S)
+
+        proc.kill()
+        self.unavailable = True
+        raise PandocError("pandoc server did not become ready in time")
+
+    def _stop_locked(self) -> None:
+        proc = self._proc
+        self._proc = None
+        self._port = None
+        if proc is None or proc.poll() is not None:
+            return
+        try:
+            proc.terminate()
+            proc.wait(timeout=2)
+        except Exception:
+            try:
+                proc.kill()
+            except Exception:
+                pass
+        log("pandoc server stopped")
+
+    @staticmethod
+    def _drain_stderr(proc: subprocess.Popen) -> None:
+        """持续读取 server 的 stderr，避免管道写满阻塞进程"""
+        if proc.stderr is None:
+            return
+        try:
+            for line in proc.stderr:
+                msg = line.decode("utf-8", "ignore").strip()
+                if msg:
+                    log(f"pandoc server (stderr): {msg[:4000]}")
+        except Exception:
+            pass
+
+    @staticmethod
+    def _probe(port: int) -> bool:
+        conn = http.client.HTTPConnection("127.0.0.1", port, timeout=1)
+        try:
+            conn.request("GET", "/version")
+            return conn.getresponse().status == 200
+        except OSError:
+            return False
+        finally:
+            conn.close()
+
+    def convert(
+        self,
+        text: str,
+        options: Dict[str, Any],
+        *,
+        timeout_s: Optional[float] = None,
+        token: Optional[CancelToken] = None,
+    ) -> bytes:
+        """
+        发送一次转换请求
+
+        Args:
+            text: 输入文本
+            options: pandoc server 选项（from/to/standalone/wrap/files 等）
+            timeout_s: 截止时间（秒），None 或 <=0 表示只受 server 自身的超时限制
+            token: 取消句柄，默认使用当前线程绑定的句柄
+
+        Returns:
+            输出字节（二进制格式如 docx 已完成 base64 解码）
+
+        Raises:
+            PandocCancelledError: 超时或被取消（与 CLI 的 run_pandoc 一致）
+            PandocError: 转换失败、响应无法解析，或 server 重启后仍不可用
+        """
+        token = token or current_cancel_token()
+        if token is not None:
+            token.raise_if_cancelled()
+        payload = dict(options)
+        payload["text"] = text
+        body = json.dumps(payload).encode("utf-8")
+        deadline = time.monotonic() + timeout_s if timeout_s and timeout_s > 0 else None
+
+        for attempt in range(2):
+            with self._lock:
+                if not self.is_alive():
+                    if self._proc is not None:
+                        log("pandoc server died, restarting")
+                    self._stop_locked()
+                    self._start_locked()
+                port = self._port
+            try:
+                return self._post(port, body, deadline, token)
+            except PandocCancelledError:
+                # 结束 server 进程，中止仍在进行的转换；下次请求时重新启动
+                with self._lock:
+                    self._stop_locked()
+                raise
+            except (ConnectionError, http.client.HTTPException, socket.timeout) as e:
+                log(f"pandoc server request failed (attempt {attempt + 1}): {e}")
+                with self._lock:
+                    self._stop_locked()
+            except (OSError, ValueError) as e:
+                # 其它网络错误、被截断或格式错误的响应
+                raise PandocError(f"pandoc server request failed: {type(e).__name__}: {e}")
+        raise PandocError("pandoc server is not responding")
+
+    @staticmethod
+    def _post(port: int, body: bytes, deadline: Optional[float], token: Optional[CancelToken]) -> bytes:
+        conn = http.client.HTTPConnection(
+            "127.0.0.1", port, timeout=SERVER_REQUEST_TIMEOUT_S + 5
+        )
+        aborted = []
+
+        def _abort(reason: str) -> None:
+            # 关闭套接字，让阻塞中的读写立即返回
+            aborted.append(reason)
+            sock = conn.sock
+            if sock is not None:
+                try:
+                    sock.shutdown(socket.SHUT_RDWR)
+                except OSError:
+                    pass
+
+        timer = None
+        if deadline is not None:
+            remaining = deadline - time.monotonic()
+            timer = threading.Timer(max(0.0, remaining), _abort, args=(f"timed out after {remaining:.3g}s",))
+            timer.daemon = True
+        cancel = lambda: _abort((token.reason if token else "") or "cancelled")  # noqa: E731
+        try:
+            conn.connect()
+            if timer is not None:
+                timer.start()
+            if token is not None:
+                token.add_callback(cancel)
+                token.raise_if_cancelled()
+            conn.request(
+                "POST",
+                "/",
+                body=body,
+                headers={
+                    "Content-Type": "application/json",
+                    "Accept": "application/json",
+                },
+            )
+            resp = conn.getresponse()
+            data = resp.read()
+            if aborted:
+                raise PandocCancelledError(f"Pandoc conversion {aborted[0]}")
+        except (OSError, http.client.HTTPException):
+            if aborted:
+                raise PandocCancelledError(f"Pandoc conversion {aborted[0]}")
+            raise
+        finally:
+            if timer is not None:
+                timer.cancel()
+            if token is not None:
+                token.remove_callback(cancel)
+            conn.close()
+
+        if resp.status != 200:
+            raise PandocError(data.decode("utf-8", "ignore") or f"pandoc server HTTP {resp.status}")
+
+        result = json.loads(data.decode("utf-8"))
+        if not isinstance(result, dict):
+            raise ValueError(f"unexpected pandoc server response: {type(result).__name__}")
+        if result.get("error"):
+            raise PandocError(str(result["error"]))
+
+        for message in result.get("messages") or []:
+            verbosity = message.get("verbosity", "") if isinstance(message, dict) else ""
+            if verbosity in ("WARNING", "ERROR"):
+                log(f"pandoc server {verbosity.lower()}: {message}")
+
+        output = result.get("output", "")
+        if not isinstance(output, str):
+            raise ValueError("pandoc server response has no text output")
+        if result.get("base64"):
+            return base64.b64decode(output)
+        return output.encode("utf-8")
+
+_servers: Dict[str, PandocServer] = {}
+_servers_lock = threading.Lock()
+
+
+def get_pandoc_server(pandoc_path: str) -> PandocServer:
+    """获取（必要时创建）指定 pandoc 路径对应的共享 server 实例"""
+    with _servers_lock:
+        server = _servers.get(pandoc_path)
+        if server is None:
+            server = PandocServer(pandoc_path)
+            _servers[pandoc_path] = server
+        return server
+
+
+def start_pandoc_server_in_background(pandoc_path: str) -> None:
+    """后台预热 pandoc server，失败只记录日志（转换时自动回退 CLI）"""
+    def _start():
+        try:
+            get_pandoc_server(pandoc_path).start()
+        except PandocError as e:
+            log(f"pandoc server warm-up failed, using CLI backend: {e}")
+
+    threading.Thread(target=_start, daemon=True).start()
+
+
+def shutdown_pandoc_servers() -> None:
+    """停止所有 pandoc server 进程"""
+    with _servers_lock:
+        servers = list(_servers.values())
+    for server in servers:
+        server.stop()
+
+
+atexit.register(shutdown_pandoc_servers)
@@ -12,6 +12,7 @@ from ...core.state import app_state
 from ...config.loader import ConfigLoader
 from ...config.paths import get_log_path, get_config_path
 from ...service.notification.manager import NotificationManager
+from ...utils.formula_cache import clear_formula_cache
 from ...utils.fs import ensure_dir, open_dir, open_file
 from ...utils.logging import log
 from ...utils.version_checker import VersionChecker
@@ -120,6 +121,11 @@ class TrayMenuManager:
             self._build_html_formatting_menu(),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(t("tray.menu.set_hotkey"), self._on_set_hotkey),
+            pystray.MenuItem(
+                t("tray.menu.cancel_conversion"),
+                self._on_cancel_conversion,
+                enabled=lambda item: app_state.is_running()
+            ),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(
                 t("tray.menu.keep_file"),
@@ -129,6 +135,7 @@ class TrayMenuManager:
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(t("tray.menu.open_save_dir"), self._on_open_save_dir),
             pystray.MenuItem(t("tray.menu.open_log"), self._on_open_log),
+            pystray.MenuItem(t("tray.menu.clear_formula_cache"), self._on_clear_formula_cache),
             pystray.Menu.SEPARATOR,
             pystray.MenuItem(t("settings.dialog.title"), self._on_open_settings),
             pystray.Menu.SEPARATOR,
@@ -302,6 +309,12 @@ class TrayMenuManager:
         status = t("tray.status.keep_file_on") if app_state.config["keep_file"] else t("tray.status.keep_file_off")
         self.notification_manager.notify("PasteMD", status, ok=True)
     
+    def _on_cancel_conversion(self, icon, item):
+        """取消正在进行的转换（结束 pandoc 进程树）"""
+        if app_state.cancel_running("cancelled from tray"):
+            log("Conversion cancelled via tray menu")
+            self.notification_manager.notify("PasteMD", t("workflow.generic.cancelled"), ok=True)
+    
     def _on_open_save_dir(self, icon, item):
         """打开保存目录"""
         save_dir = app_state.config.get("save_dir", "")
@@ -316,6 +329,12 @@ class TrayMenuManager:
             # 创建空日志文件
             open(log_path, "w", encoding="utf-8").close()
         open_file(log_path)
+
+    def _on_clear_formula_cache(self, icon, item):
+        """清空公式磁盘缓存（OneNote/PowerPoint）"""
+        count, size = clear_formula_cache()
+        status = t("tray.status.formula_cache_cleared", count=count, size=f"{size / (1024 * 1024):.1f} MB")
+        self.notification_manager.notify("PasteMD", status, ok=True)
     
     def _on_open_settings(self, icon, item):
         """打开设置界面"""
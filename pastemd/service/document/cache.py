@@ -0,0 +1,321 @@
+"""Content-addressed conversion cache.
+
+同一份剪贴板内容经常被连续粘贴多次（例如把同一段回答贴进多个 Word 文档），
+这里按「输入内容 + 影响输出的全部参数」计算哈希，缓存最终转换结果：
+
+- 内存层：有界 LRU（按条目数和总字节数双重限制）
+- 磁盘层：可选，位于用户数据目录下，按总大小淘汰最久未使用的条目
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Iterable, List, Optional, Tuple
+from urllib.parse import unquote
+
+from ...config.paths import get_user_data_dir
+from ...utils.logging import log
+
+# 内存层单条最大字节数，超过的结果只进磁盘层
+MEMORY_MAX_ITEM_BYTES = 16 * 1024 * 1024
+# 内存层总字节上限
+MEMORY_MAX_TOTAL_BYTES = 64 * 1024 * 1024
+
+_DISK_SUFFIX = ".bin"
+
+# 输入中可能引用本地文件的位置：Markdown 图片与引用定义、HTML <img>、JSON AST 中的 [目标, 标题]
+_RESOURCE_REF_RES = (
+    re.compile(r'!\[[^\]]*\]\(\s*<?([^)\s>]+)'),
+    re.compile(r'^[ \t]{0,3}\[[^\]]+\]:[ \t]*<?([^\s>]+)', re.MULTILINE),
+    re.compile(r'<img\b[^>]*?\bsrc\s*=\s*["\']([^"\']+)', re.IGNORECASE),
+)
+_AST_TARGET_RE = re.compile(r'\[("(?:[^"\\]|\\.)*"),\s*"(?:[^"\\]|\\.)*"\]')
+_REMOTE_REF_RE = re.compile(r'^(?:[a-z][a-z0-9+.-]*:)?//|^(?:data|mailto|https?):|^#', re.IGNORECASE)
+
+
+def _file_mtime(path: Optional[str]) -> Optional[float]:
+    if not path:
+        return None
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def resolve_file_stamps(paths: Iterable[str]) -> List[Tuple[str, Optional[float]]]:
+    """
+    解析文件路径（展开环境变量、转绝对路径）并附带 mtime
+
+    与 PandocIntegration._build_filter_args 的解析规则保持一致，
+    这样 Filter 文件被修改后缓存键随之变化。
+    """
+    stamps = []
+    for path in paths:
+        if not path:
+            continue
+        expanded = os.path.abspath(os.path.expandvars(path))
+        stamps.append((expanded, _file_mtime(expanded)))
+    return stamps
+
+
+def _file_stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except (OSError, ValueError):
+        return None
+    return st.st_mtime_ns, st.st_size
+
+
+def _resource_refs(content: str) -> List[str]:
+    refs = [m.group(1) for regex in _RESOURCE_REF_RES for m in regex.finditer(content)]
+    if '"t":' in content:
+        # JSON AST：图片/链接目标是 [目标, 标题] 二元字符串数组
+        for m in _AST_TARGET_RE.finditer(content):
+            try:
+                refs.append(json.loads(m.group(1)))
+            except ValueError:
+                continue
+    return refs
+
+
+def resolve_resource_stamps(content: str, base_dir: str) -> List[Tuple[str, Optional[Tuple[int, int]]]]:
+    """
+    找出输入中引用的本地文件（相对路径按 base_dir 解析），附带 mtime/大小
+
+    Pandoc 在工作目录下读取这些文件并嵌入输出；把它们放进缓存键后，换了目录粘贴
+    同样的相对路径、或图片被修改后不会返回旧结果。远程地址和 data: URI 不在此列。
+    """
+    stamps = []
+    for ref in dict.fromkeys(_resource_refs(content)):
+        if ref.lower().startswith("file://"):
+            ref = ref[len("file://"):]
+        elif _REMOTE_REF_RE.match(ref):
+            continue
+        path = ref if os.path.isabs(ref) else os.path.join(base_dir, ref)
+        stamp = _file_stamp(path)
+        if stamp is None:
+            # Pandoc 会对百分号编码的路径解码后再读取
+            decoded = unquote(path)
+            if decoded != path:
+                stamp = _file_stamp(decoded)
+        stamps.append((os.path.normpath(path), stamp))
+    return stamps
+
+
+def make_cache_key(direction: str, content: str, **params: Any) -> str:
+    """
+    计算缓存键
+
+    Args:
+        direction: 转换方向，如 md_to_docx
+        content: 预处理后的输入内容
+        **params: 其它影响输出的参数（需可 JSON 序列化）
+
+    Returns:
+        sha256 十六进制摘要
+    """
+    hasher = hashlib.sha256()
+    hasher.update(direction.encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(json.dumps(params, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+    hasher.update(b"\0")
+    hasher.update(content.encode("utf-8", "surrogatepass"))
+    return hasher.hexdigest()
+
+
+class ConversionCache:
+    """两级转换结果缓存（线程安全）"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_bytes = 0
+        self.enabled = True
+        self.memory_max_entries = 32
+        self.disk_enabled = False
+        self.disk_max_bytes = 200 * 1024 * 1024
+        self.disk_dir = os.path.join(get_user_data_dir(), "cache", "conversions")
+        self.hits = 0
+        self.misses = 0
+
+    def configure(self, config: dict) -> None:
+        """按 conversion_cache 配置更新开关和容量"""
+        cache_config = config.get("conversion_cache")
+        if not isinstance(cache_config, dict):
+            cache_config = {}
+        self.enabled = bool(cache_config.get("enabled", True))
+        self.disk_enabled = bool(cache_config.get("disk_enabled", False))
+        try:
+            self.memory_max_entries = max(0, int(cache_config.get("memory_max_entries", 32)))
+        except (TypeError, ValueError):
+            self.memory_max_entries = 32
+        try:
+            self.disk_max_bytes = max(0, int(float(cache_config.get("disk_max_mb", 200)) * 1024 * 1024))
+        except (TypeError, ValueError):
+            self.disk_max_bytes = 200 * 1024 * 1024
+
+        with self._lock:
+            self._evict_memory_locked()
+
+    def get(self, key: str, *, label: str = "") -> Optional[bytes]:
+        """查找缓存，并记录命中/未命中日志"""
+        if not self.enabled:
+            return None
+
+        tier = "memory"
+        with self._lock:
+            data = self._memory.get(key)
+            if data is not None:
+                self._memory.move_to_end(key)
+
+        if data is None and self.disk_enabled:
+            data = self._disk_read(key)
+            if data is not None:
+                tier = "disk"
+                self._memory_put(key, data)
+
+        with self._lock:
+            if data is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            total = self.hits + self.misses
+            stats = f"{self.hits}/{total} hits"
+
+        if data is None:
+            log(f"Conversion cache miss [{label}] key={key[:12]} ({stats})")
+        else:
+            log(f"Conversion cache hit ({tier}) [{label}] key={key[:12]} ({stats})")
+        return data
+
+    def put(self, key: str, data: bytes) -> None:
+        """写入缓存（内存层，按配置同时写磁盘层）"""
+        if not self.enabled:
+            return
+        self._memory_put(key, data)
+        if self.disk_enabled:
+            self._disk_write(key, data)
+
+    def clear(self) -> None:
+        """清空内存层和磁盘层"""
+        with self._lock:
+            self._memory.clear()
+            self._memory_bytes = 0
+        for path, _, _ in self._disk_entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    # ---- 内存层 ----
+
+    def _memory_put(self, key: str, data: bytes) -> None:
+        if self.memory_max_entries <= 0 or len(data) > MEMORY_MAX_ITEM_BYTES:
+            return
+        with self._lock:
+            old = self._memory.pop(key, None)
+            if old is not None:
+                self._memory_bytes -= len(old)
+            self._memory[key] = data
+            self._memory_bytes += len(data)
+            self._evict_memory_locked()
+
+    def _evict_memory_locked(self) -> None:
+        while self._memory and (
+            len(self._memory) > self.memory_max_entries
+            or self._memory_bytes > MEMORY_MAX_TOTAL_BYTES
+        ):
+            _, evicted = self._memory.popitem(last=False)
+            self._memory_bytes -= len(evicted)
+
+    # ---- 磁盘层 ----
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key + _DISK_SUFFIX)
+
+    def _disk_read(self, key: str) -> Optional[bytes]:
+        path = self._disk_path(key)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except OSError:
+            return None
+        try:
+            # 以 mtime 作为最近使用时间，供淘汰排序
+            os.utime(path, None)
+        except OSError:
+            pass
+        return data
+
+    def _disk_write(self, key: str, data: bytes) -> None:
+        if len(data) > self.disk_max_bytes:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            log(f"Conversion cache disk write failed: {e}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+        self._evict_disk()
+
+    def _disk_entries(self) -> List[Tuple[str, float, int]]:
+        entries = []
+        try:
+            with os.scandir(self.disk_dir) as it:
+                for entry in it:
+                    if not entry.name.endswith(_DISK_SUFFIX):
+                        continue
+                    try:
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    entries.append((entry.path, st.st_mtime, st.st_size))
+        except OSError:
+            pass
+        return entries
+
+    def _evict_disk(self) -> None:
+        entries = self._disk_entries()
+        total = sum(size for _, _, size in entries)
+        if total <= self.disk_max_bytes:
+            return
+        # 最久未使用的先删
+        entries.sort(key=lambda item: item[1])
+        removed = 0
+        for path, _, size in entries:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        if removed:
+            log(f"Conversion cache evicted {removed} disk entries")
+
+
+_cache: Optional[ConversionCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_conversion_cache() -> ConversionCache:
+    """获取进程内共享的转换缓存（各工作流的 DocumentGenerator 共用）"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ConversionCache()
+        return _cache
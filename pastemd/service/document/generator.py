@@ -1,33 +1,27 @@
 """Document generator - centralized DOCX generation and conversion."""
 
-from typing import Optional, List
+import json
+import os
+import shutil
+import time
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, List, Tuple
 
-from ...integrations.pandoc import PandocIntegration
+from ... import __version__
+from ...integrations.pandoc import AST_FORMAT, PandocIntegration
+from ...integrations.pandoc_runner import PandocCancelledError, cancel_scope, current_cancel_token
+from ...integrations.pandoc_server import get_pandoc_server
+from ...utils.docx_merge import merge_docx_packages
 from ...utils.docx_processor import DocxProcessor
+from ...utils.markdown_utils import split_markdown_chunks
+from ...utils.request_headers import DEFAULT_REQUEST_HEADERS, get_request_headers
 from ...utils.logging import log
 from ...core.state import app_state
 from ...core.errors import PandocError
 from ...config.defaults import DEFAULT_CONFIG
 from ...config.loader import ConfigLoader
-
-
-_DEFAULT_PANDOC_REQUEST_HEADERS: List[str] = [
-    "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
-]
-
-
-def _get_pandoc_request_headers(config: dict) -> List[str]:
-    if "pandoc_request_headers" not in config:
-        return _DEFAULT_PANDOC_REQUEST_HEADERS
-
-    headers = config.get("pandoc_request_headers")
-    if headers is None:
-        return []
-    if isinstance(headers, str):
-        return [headers]
-    if isinstance(headers, list):
-        return [h.strip() for h in headers if isinstance(h, str) and h.strip()]
-    return []
+from .cache import get_conversion_cache, make_cache_key, resolve_file_stamps, resolve_resource_stamps
 
 
 def _mask_pandoc_request_headers(headers: List[str]) -> List[str]:
@@ -76,7 +70,14 @@ def _normalize_filters(value) -> List[str]:
     return []
 
 
-def _get_pandoc_filters(config: dict, key: str) -> List[str]:
+def get_pandoc_filters(config: dict, key: str) -> List[str]:
+    """
+    某类转换生效的自定义 Filter：pandoc_filters 加上按转换类型配置的 Filter（去重、保持顺序）
+
+    Args:
+        config: 配置字典
+        key: 转换类型，如 "md_to_docx"、"md_to_html"
+    """
     global_filters = _normalize_filters(config.get("pandoc_filters"))
 
     per_filters: List[str] = []
@@ -95,6 +96,18 @@ def _get_pandoc_filters(config: dict, key: str) -> List[str]:
     return combined
 
 
+def _get_pandoc_timeout(config: dict) -> Optional[float]:
+    try:
+        timeout_s = float(config.get("pandoc_timeout_s", 60))
+    except (TypeError, ValueError):
+        return DEFAULT_CONFIG.get("pandoc_timeout_s")
+    return timeout_s if timeout_s > 0 else None
+
+
+# 并行分块转换时每块的最小字符数，块太小时进程启动开销会抵消并行收益
+_PARALLEL_MIN_CHUNK_CHARS = 32 * 1024
+
+
 class DocumentGenerator:
     """
     文档生成服务
@@ -123,6 +136,7 @@ class DocumentGenerator:
             PandocError: 如果 Pandoc 初始化失败
         """
         if self._pandoc_integration is not None:
+            self._sync_pandoc_backend()
             return
         
         pandoc_path = app_state.config.get("pandoc_path", "pandoc")
@@ -143,14 +157,102 @@ class DocumentGenerator:
                 log(f"Retry to initialize PandocIntegration failed: {e2}")
                 self._pandoc_integration = None
                 raise PandocError(f"Pandoc initialization failed: {e2}")
+        self._sync_pandoc_backend()
+
+    def _sync_pandoc_backend(self) -> None:
+        """按配置同步 pandoc 调用方式：挂载/卸载共享的 pandoc server，更新单次转换超时和 Filter 合并开关"""
+        integration = self._pandoc_integration
+        if integration is None:
+            return
+        integration.timeout_s = _get_pandoc_timeout(app_state.config)
+        integration.fuse_lua_filters = bool(app_state.config.get("pandoc_filter_fusion", True))
+        if app_state.config.get("pandoc_backend", "cli") == "server":
+            if integration.server is None:
+                integration.server = get_pandoc_server(integration.pandoc_path)
+        else:
+            integration.server = None
+
+    def _cached_bytes(
+        self,
+        direction: str,
+        content: str,
+        config: dict,
+        convert: Callable[[], bytes],
+        *,
+        filters: List[str],
+        **params,
+    ) -> bytes:
+        """
+        带缓存执行一次转换
+
+        缓存键包含：输入内容、转换方向、Filter 列表及其 mtime、pandoc 可执行文件、
+        应用版本（内置 Lua Filter 和后处理随版本变化）、pandoc 的工作目录（相对路径的
+        解析目录）及输入引用的本地文件的 mtime/大小，以及调用方传入的其它参数。
+        """
+        cache = get_conversion_cache()
+        cache.configure(config)
+        if not cache.enabled:
+            return convert()
+
+        pandoc_path = self._pandoc_integration.pandoc_path  # type: ignore[union-attr]
+        save_dir = config.get("save_dir")
+        resource_dir = os.path.abspath(os.path.expandvars(save_dir)) if save_dir else os.getcwd()
+        key = make_cache_key(
+            direction,
+            content,
+            version=__version__,
+            pandoc=resolve_file_stamps([shutil.which(pandoc_path) or pandoc_path]),
+            filters=resolve_file_stamps(filters),
+            resource_dir=resource_dir,
+            resources=resolve_resource_stamps(content, resource_dir),
+            **params,
+        )
+        data = cache.get(key, label=direction)
+        if data is not None:
+            return data
+
+        data = convert()
+        cache.put(key, data)
+        return data
+
+    def _cached_text(
+        self,
+        direction: str,
+        content: str,
+        config: dict,
+        convert: Callable[[], str],
+        *,
+        filters: List[str],
+        **params,
+    ) -> str:
+        """文本结果版本的 _cached_bytes"""
+        data = self._cached_bytes(
+            direction,
+            content,
+            config,
+            lambda: convert().encode("utf-8", "surrogatepass"),
+            filters=filters,
+            **params,
+        )
+        return data.decode("utf-8", "surrogatepass")
+
+    def _log_request_headers(self, config: dict) -> List[str]:
+        request_headers = get_request_headers(config)
+        if "pandoc_request_headers" in config and request_headers != DEFAULT_REQUEST_HEADERS:
+            log(
+                f"pandoc_request_headers (effective): {_mask_pandoc_request_headers(request_headers)}"
+            )
+        return request_headers
     
-    def convert_markdown_to_docx_bytes(self, md_text: str, config: dict) -> bytes:
+    def convert_markdown_to_docx_bytes(self, md_text: str, config: dict, *, transient: bool = False) -> bytes:
         """
         将 Markdown 文本转换为 DOCX 字节流
         
         Args:
             md_text: 预处理后的 Markdown 文本
             config: 配置字典
+            transient: 结果只用于立即插入 Word/WPS、不保留文件时为 True，
+                此时 DOCX 以不压缩的方式打包（省去压缩和插入时的解压）
             
         Returns:
             DOCX 文件的字节流
@@ -161,40 +263,126 @@ class DocumentGenerator:
         Note:
             调用方应该先使用 MarkdownPreprocessor 处理 md_text
         """
-        # 1. 转换为 DOCX 字节流
         self._ensure_pandoc_integration()
-        request_headers = _get_pandoc_request_headers(config)
-        if "pandoc_request_headers" in config and request_headers != _DEFAULT_PANDOC_REQUEST_HEADERS:
-            log(
-                f"pandoc_request_headers (effective): {_mask_pandoc_request_headers(request_headers)}"
+        request_headers = self._log_request_headers(config)
+        reference_docx = config.get("reference_docx")
+        keep_formula = config.get("Keep_original_formula", False)
+        latex_replacements = config.get("enable_latex_replacements", True)
+        disable_first_para_indent = config.get("md_disable_first_para_indent", True)
+        filters = get_pandoc_filters(config, "md_to_docx")
+
+        def _convert_text(text: str) -> bytes:
+            return self._pandoc_integration.convert_to_docx_bytes(  # type: ignore[union-attr]
+                md_text=text,
+                reference_docx=reference_docx,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters,
+                request_headers=request_headers,
+                cwd=config.get("save_dir"),
             )
-        docx_bytes = self._pandoc_integration.convert_to_docx_bytes(
-            md_text=md_text,
-            reference_docx=config.get("reference_docx"),
-            Keep_original_formula=config.get("Keep_original_formula", False),
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=_get_pandoc_filters(config, "md_to_docx"),
-            request_headers=request_headers,
-            cwd=config.get("save_dir"),
-        )
-        
-        # 2. 处理 DOCX 样式
-        if config.get("md_disable_first_para_indent", True):
-            docx_bytes = DocxProcessor.apply_custom_processing(
+
+        def _convert() -> bytes:
+            # 1. 转换为 DOCX 字节流（超大文档可分块并行转换）
+            docx_bytes = self._convert_markdown_in_parallel(md_text, config, _convert_text, transient=transient)
+            if docx_bytes is None:
+                docx_bytes = _convert_text(md_text)
+
+            # 2. 处理 DOCX 样式（临时输出同时改为不压缩打包）
+            return DocxProcessor.apply_custom_processing(
                 docx_bytes,
-                disable_first_para_indent=True,
-                target_style="Body Text"
+                disable_first_para_indent=disable_first_para_indent,
+                target_style="Body Text",
+                transient=transient,
             )
-        
-        return docx_bytes
+
+        return self._cached_bytes(
+            "md_to_docx",
+            md_text,
+            config,
+            _convert,
+            filters=filters,
+            reference_docx=resolve_file_stamps([reference_docx]) if reference_docx else None,
+            request_headers=request_headers,
+            Keep_original_formula=keep_formula,
+            enable_latex_replacements=latex_replacements,
+            disable_first_para_indent=disable_first_para_indent,
+            parallel_conversion=config.get("parallel_conversion"),
+            transient=transient,
+        )
+
+    def _convert_markdown_in_parallel(
+        self,
+        md_text: str,
+        config: dict,
+        convert_chunk: Callable[[str], bytes],
+        *,
+        transient: bool = False,
+    ) -> Optional[bytes]:
+        """
+        超大 Markdown 分块并行转换为 DOCX 后合并（transient 时合并结果不压缩）
+
+        Returns:
+            合并后的 DOCX；未启用、输入不够大、无法拆分、某个分块转换失败或合并失败时
+            返回 None（调用方整体转换）
+
+        Raises:
+            PandocCancelledError: 任务被取消
+        """
+        settings = config.get("parallel_conversion", {})
+        if not isinstance(settings, dict) or not settings.get("enabled", False):
+            return None
+        try:
+            min_chars = int(float(settings.get("min_input_kb", 512)) * 1024)
+            workers = int(settings.get("max_workers", 0)) or os.cpu_count() or 1
+        except (TypeError, ValueError):
+            return None
+        if len(md_text) < min_chars or workers < 2:
+            return None
+
+        chunks = split_markdown_chunks(md_text, workers, min_chunk_chars=_PARALLEL_MIN_CHUNK_CHARS)
+        if len(chunks) < 2:
+            return None
+
+        # 工作线程继承当前任务的取消句柄，取消时所有 pandoc 进程一起结束
+        token = current_cancel_token()
+
+        def _run(chunk: str) -> bytes:
+            if token is None:
+                return convert_chunk(chunk)
+            with cancel_scope(token):
+                return convert_chunk(chunk)
+
+        started = time.perf_counter()
+        try:
+            with ThreadPoolExecutor(max_workers=len(chunks)) as pool:
+                parts = list(pool.map(_run, chunks))
+        except PandocCancelledError:
+            raise
+        except PandocError as e:
+            # 单个分块失败（例如拆分处截断了某个结构）时改为整体转换
+            log(f"Parallel MD->DOCX chunk failed, falling back to whole-document conversion: {e}")
+            return None
+        merged = merge_docx_packages(parts, zipfile.ZIP_STORED if transient else zipfile.ZIP_DEFLATED)
+        if merged is None:
+            return None
+
+        elapsed = time.perf_counter() - started
+        size_kb = len(md_text.encode("utf-8")) / 1024
+        log(
+            f"Parallel MD->DOCX: {len(chunks)} chunks, {size_kb:.0f} KB in {elapsed * 1000:.0f} ms "
+            f"({size_kb / max(elapsed, 1e-6):.0f} KB/s)"
+        )
+        return merged
     
-    def convert_html_to_docx_bytes(self, html_text: str, config: dict) -> bytes:
+    def convert_html_to_docx_bytes(self, html_text: str, config: dict, *, transient: bool = False) -> bytes:
         """
         将 HTML 文本转换为 DOCX 字节流
         
         Args:
             html_text: HTML 文本
             config: 配置字典
+            transient: 结果只用于立即插入 Word/WPS、不保留文件时为 True（不压缩打包）
             
         Returns:
             DOCX 文件的字节流
@@ -202,34 +390,51 @@ class DocumentGenerator:
         Raises:
             PandocError: 转换失败时
         """
-        # 1. 转换为 DOCX 字节流
         self._ensure_pandoc_integration()
-        request_headers = _get_pandoc_request_headers(config)
-        if "pandoc_request_headers" in config and request_headers != _DEFAULT_PANDOC_REQUEST_HEADERS:
-            log(
-                f"pandoc_request_headers (effective): {_mask_pandoc_request_headers(request_headers)}"
+        request_headers = self._log_request_headers(config)
+        reference_docx = config.get("reference_docx")
+        keep_formula = config.get("Keep_original_formula", False)
+        latex_replacements = config.get("enable_latex_replacements", True)
+        disable_first_para_indent = config.get("html_disable_first_para_indent", True)
+        filters = get_pandoc_filters(config, "html_to_docx")
+        filters_html_to_md = get_pandoc_filters(config, "html_to_md")
+        filters_md_to_docx = get_pandoc_filters(config, "md_to_docx")
+
+        def _convert() -> bytes:
+            # 1. 转换为 DOCX 字节流
+            docx_bytes = self._pandoc_integration.convert_html_to_docx_bytes(  # type: ignore[union-attr]
+                html_text=html_text,
+                reference_docx=reference_docx,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters,
+                custom_filters_html_to_md=filters_html_to_md,
+                custom_filters_md_to_docx=filters_md_to_docx,
+                request_headers=request_headers,
+                cwd=config.get("save_dir"),
             )
-        docx_bytes = self._pandoc_integration.convert_html_to_docx_bytes(
-            html_text=html_text,
-            reference_docx=config.get("reference_docx"),
-            Keep_original_formula=config.get("Keep_original_formula", False),
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=_get_pandoc_filters(config, "html_to_docx"),
-            custom_filters_html_to_md=_get_pandoc_filters(config, "html_to_md"),
-            custom_filters_md_to_docx=_get_pandoc_filters(config, "md_to_docx"),
-            request_headers=request_headers,
-            cwd=config.get("save_dir"),
-        )
-        
-        # 2. 处理 DOCX 样式
-        if config.get("html_disable_first_para_indent", True):
-            docx_bytes = DocxProcessor.apply_custom_processing(
+
+            # 2. 处理 DOCX 样式（临时输出同时改为不压缩打包）
+            return DocxProcessor.apply_custom_processing(
                 docx_bytes,
-                disable_first_para_indent=True,
-                target_style="Body Text"
+                disable_first_para_indent=disable_first_para_indent,
+                target_style="Body Text",
+                transient=transient,
             )
-        
-        return docx_bytes
+
+        return self._cached_bytes(
+            "html_to_docx",
+            html_text,
+            config,
+            _convert,
+            filters=filters + filters_html_to_md + filters_md_to_docx,
+            reference_docx=resolve_file_stamps([reference_docx]) if reference_docx else None,
+            request_headers=request_headers,
+            Keep_original_formula=keep_formula,
+            enable_latex_replacements=latex_replacements,
+            disable_first_para_indent=disable_first_para_indent,
+            transient=transient,
+        )
 
     def convert_html_to_markdown_text(self, html_text: str, config: dict) -> str:
         """
@@ -239,9 +444,16 @@ class DocumentGenerator:
             PandocError: 转换失败时
         """
         self._ensure_pandoc_integration()
-        return self._pandoc_integration.convert_html_to_markdown_text(  # type: ignore[union-attr]
+        filters = get_pandoc_filters(config, "html_to_md")
+        return self._cached_text(
+            "html_to_md",
             html_text,
-            custom_filters=_get_pandoc_filters(config, "html_to_md"),
+            config,
+            lambda: self._pandoc_integration.convert_html_to_markdown_text(  # type: ignore[union-attr]
+                html_text,
+                custom_filters=filters,
+            ),
+            filters=filters,
         )
 
     def convert_markdown_to_html_text(self, md_text: str, config: dict) -> str:
@@ -252,31 +464,98 @@ class DocumentGenerator:
             - 通过 Keep_original_formula=True 可把数学节点改成普通文本 `$...$` / `$$...$$`
         """
         self._ensure_pandoc_integration()
-        return self._pandoc_integration.convert_markdown_to_html_text(  # type: ignore[union-attr]
+        keep_formula = config.get("Keep_original_formula", True)
+        latex_replacements = config.get("enable_latex_replacements", True)
+        filters = get_pandoc_filters(config, "md_to_html")
+        return self._cached_text(
+            "md_to_html",
             md_text,
-            Keep_original_formula=config.get("Keep_original_formula", True),
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=_get_pandoc_filters(config, "md_to_html"),
-            cwd=config.get("save_dir"),
+            config,
+            lambda: self._pandoc_integration.convert_markdown_to_html_text(  # type: ignore[union-attr]
+                md_text,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters,
+                cwd=config.get("save_dir"),
+            ),
+            filters=filters,
+            Keep_original_formula=keep_formula,
+            enable_latex_replacements=latex_replacements,
+        )
+
+    def convert_html_to_markdown_and_html_text(self, html_text: str, config: dict) -> Tuple[str, str]:
+        """
+        将 HTML 一次解析为 pandoc AST，再分别渲染出 Markdown 文本和 HTML 文本。
+
+        用于 HTML→MD→HTML 链路（OneNote/PowerPoint、macOS WPS），
+        避免把中间 Markdown 文本再解析一遍。
+
+        Returns:
+            (md_text, html_text)
+
+        Raises:
+            PandocError: 转换失败时
+        """
+        self._ensure_pandoc_integration()
+        keep_formula = config.get("Keep_original_formula", True)
+        latex_replacements = config.get("enable_latex_replacements", True)
+        filters_html_to_md = get_pandoc_filters(config, "html_to_md")
+        filters_md_to_html = get_pandoc_filters(config, "md_to_html")
+
+        def _convert() -> str:
+            integration = self._pandoc_integration
+            ast = integration.parse_html_to_ast(  # type: ignore[union-attr]
+                html_text, custom_filters=filters_html_to_md
+            )
+            md_text = integration.convert_ast_to_markdown_text(ast)  # type: ignore[union-attr]
+            html = integration.convert_markdown_to_html_text(  # type: ignore[union-attr]
+                ast,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters_md_to_html,
+                cwd=config.get("save_dir"),
+                input_format=AST_FORMAT,
+            )
+            return json.dumps([md_text, html], ensure_ascii=False)
+
+        md_text, html = json.loads(
+            self._cached_text(
+                "html_to_md_html",
+                html_text,
+                config,
+                _convert,
+                filters=filters_html_to_md + filters_md_to_html,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+            )
         )
+        return md_text, html
 
     def convert_markdown_to_rtf_bytes(self, md_text: str, config: dict) -> bytes:
         """
         将 Markdown 文本转换为 RTF 字节流（用于富文本粘贴兜底）。
         """
         self._ensure_pandoc_integration()
-        request_headers = _get_pandoc_request_headers(config)
-        if "pandoc_request_headers" in config and request_headers != _DEFAULT_PANDOC_REQUEST_HEADERS:
-            log(
-                f"pandoc_request_headers (effective): {_mask_pandoc_request_headers(request_headers)}"
-            )
-        return self._pandoc_integration.convert_markdown_to_rtf_bytes(  # type: ignore[union-attr]
+        request_headers = self._log_request_headers(config)
+        keep_formula = config.get("Keep_original_formula", True)
+        latex_replacements = config.get("enable_latex_replacements", True)
+        filters = get_pandoc_filters(config, "md_to_rtf")
+        return self._cached_bytes(
+            "md_to_rtf",
             md_text,
-            Keep_original_formula=config.get("Keep_original_formula", True),
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=_get_pandoc_filters(config, "md_to_rtf"),
+            config,
+            lambda: self._pandoc_integration.convert_markdown_to_rtf_bytes(  # type: ignore[union-attr]
+                md_text,
+                Keep_original_formula=keep_formula,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters,
+                request_headers=request_headers,
+                cwd=config.get("save_dir"),
+            ),
+            filters=filters,
             request_headers=request_headers,
-            cwd=config.get("save_dir"),
+            Keep_original_formula=keep_formula,
+            enable_latex_replacements=latex_replacements,
         )
 
     def convert_html_to_latex_text(self, html_text: str, config: dict) -> str:
@@ -287,11 +566,19 @@ class DocumentGenerator:
             去除文档头部的 LaTeX 内容，可直接粘贴到 Overleaf
         """
         self._ensure_pandoc_integration()
-        return self._pandoc_integration.convert_html_to_latex_text(  # type: ignore[union-attr]
+        filters_html_to_md = get_pandoc_filters(config, "html_to_md")
+        filters_md_to_latex = get_pandoc_filters(config, "md_to_latex")
+        return self._cached_text(
+            "html_to_latex",
             html_text,
-            strip_preamble=True,
-            custom_filters_html_to_md=_get_pandoc_filters(config, "html_to_md"),
-            custom_filters_md_to_latex=_get_pandoc_filters(config, "md_to_latex"),
+            config,
+            lambda: self._pandoc_integration.convert_html_to_latex_text(  # type: ignore[union-attr]
+                html_text,
+                strip_preamble=True,
+                custom_filters_html_to_md=filters_html_to_md,
+                custom_filters_md_to_latex=filters_md_to_latex,
+            ),
+            filters=filters_html_to_md + filters_md_to_latex,
         )
 
     def convert_markdown_to_latex_text(self, md_text: str, config: dict) -> str:
@@ -302,9 +589,18 @@ class DocumentGenerator:
             去除文档头部的 LaTeX 内容，可直接粘贴到 Overleaf
         """
         self._ensure_pandoc_integration()
-        return self._pandoc_integration.convert_markdown_to_latex_text(  # type: ignore[union-attr]
+        latex_replacements = config.get("enable_latex_replacements", True)
+        filters = get_pandoc_filters(config, "md_to_latex")
+        return self._cached_text(
+            "md_to_latex",
             md_text,
-            strip_preamble=True,
-            enable_latex_replacements=config.get("enable_latex_replacements", True),
-            custom_filters=_get_pandoc_filters(config, "md_to_latex"),
+            config,
+            lambda: self._pandoc_integration.convert_markdown_to_latex_text(  # type: ignore[union-attr]
+                md_text,
+                strip_preamble=True,
+                enable_latex_replacements=latex_replacements,
+                custom_filters=filters,
+            ),
+            filters=filters,
+            enable_latex_replacements=latex_replacements,
         )
@@ -6,6 +6,7 @@ from typing import Callable
 
 from ...core.constants import FIRE_DEBOUNCE_SEC
 from ...core.state import app_state
+from ...integrations.pandoc_runner import CancelToken, cancel_scope
 from ...utils.logging import log
 
 
@@ -30,19 +31,25 @@ class DebounceManager:
         
         app_state.last_fire = now
         
-        # 互斥：如果已有任务在运行，直接返回
+        # 互斥：如果已有任务在运行，本次按键视为取消当前任务
         if app_state.is_running():
+            if app_state.cancel_running("cancelled by hotkey"):
+                log("Hotkey pressed while running, cancelling current conversion")
             return
         
         # 启动后台线程执行实际工作
         def worker():
+            token = CancelToken()
+            app_state.cancel_token = token
             app_state.set_running(True)
             try:
-                callback()
+                with cancel_scope(token):
+                    callback()
             except Exception as e:
                 log(f"Callback execution failed: {e}")
             finally:
                 app_state.set_running(False)
+                app_state.cancel_token = None
         
         thread = threading.Thread(target=worker, daemon=True)
         thread.start()
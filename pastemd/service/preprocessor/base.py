@@ -1,6 +1,9 @@
 """Base preprocessor class."""
 
 from abc import ABC, abstractmethod
+from typing import List, Optional
+
+from ...utils.request_headers import get_request_headers
 
 
 class BasePreprocessor(ABC):
@@ -19,3 +22,16 @@ class BasePreprocessor(ABC):
             处理后的内容
         """
         pass
+
+    @staticmethod
+    def _image_prefetch_settings(config: dict) -> Optional[dict]:
+        """返回启用的 image_prefetch 配置，关闭时返回 None"""
+        settings = config.get("image_prefetch", {})
+        if not isinstance(settings, dict) or not settings.get("enabled", True):
+            return None
+        return settings
+
+    @staticmethod
+    def _request_headers(config: dict) -> List[str]:
+        """与 Pandoc 下载远程资源时一致的请求头"""
+        return get_request_headers(config)
@@ -1,6 +1,11 @@
 """HTML content preprocessor."""
 
+import time
+from typing import Optional
+
 from bs4 import BeautifulSoup
+from lxml import etree
+
 from .base import BasePreprocessor
 from ...utils.html_formatter import (
     clean_html_content,
@@ -8,38 +13,104 @@ from ...utils.html_formatter import (
     convert_strikethrough_to_del,
     promote_bold_first_row_to_header,
 )
+from ...utils.html_rules import (
+    HtmlRuleEngine,
+    RemoteImageRule,
+    build_formatting_rules,
+    format_rule_timings,
+    parse_html,
+    serialize_html,
+)
+from ...utils.image_prefetch import prefetch_element_images, prefetch_soup_images
 from ...utils.logging import log
 
 
 class HtmlPreprocessor(BasePreprocessor):
     """HTML 内容预处理器（无状态）"""
 
-    def process(self, html: str, config: dict) -> str:
+    def process(self, html: str, config: dict, *, embed_images: bool = False) -> str:
         """
         预处理 HTML 内容
 
+        默认在 lxml 树上单次遍历执行全部规则（html_preprocess_engine="lxml"），
+        设为 "bs4" 时使用原 BeautifulSoup 实现。
+
         处理步骤:
         1. 清理无效元素（SVG等）
         2. 转换删除线标记
         3. 清理 LaTeX 公式块中的 br 标签
-        4. 其他自定义处理...
+        4. 预取远程图片并改写为本地路径（仅 embed_images=True）
+        5. 其他自定义处理...
 
         Args:
             html: 原始 HTML 内容
             config: 配置字典
+            embed_images: 输出为 DOCX 等内嵌图片的格式时传 True
 
         Returns:
             预处理后的 HTML 内容
         """
         log("Preprocessing HTML content")
 
+        html_formatting = config.get("html_formatting") or config.get("Html_formatting") or {}
+        if not isinstance(html_formatting, dict):
+            html_formatting = {}
+
+        html_output = None
+        if config.get("html_preprocess_engine", "lxml") == "lxml":
+            html_output = self._process_with_rules(html, config, html_formatting, embed_images)
+        if html_output is None:
+            html_output = self._process_with_soup(html, config, html_formatting, embed_images)
+
+        # 仅在 HTML 不包含 DOCTYPE 时才添加
+        if "<!DOCTYPE" not in html_output.upper():
+            html_output = f"<!DOCTYPE html>\n<meta charset='utf-8'>\n{html_output}"
+
+        return html_output
+
+    def _process_with_rules(
+        self, html: str, config: dict, html_formatting: dict, embed_images: bool
+    ) -> Optional[str]:
+        """lxml 树上单次遍历执行全部规则；解析失败时返回 None（回退 BeautifulSoup）"""
+        start = time.perf_counter()
+        try:
+            root = parse_html(html)
+        except (etree.ParserError, etree.XMLSyntaxError, ValueError) as e:
+            log(f"lxml HTML parse failed, falling back to BeautifulSoup: {e}")
+            return None
+        parsed = time.perf_counter()
+
+        rules = build_formatting_rules(html_formatting)
+        image_rule = None
+        settings = self._image_prefetch_settings(config) if embed_images else None
+        if settings is not None:
+            image_rule = RemoteImageRule()
+            rules.append(image_rule)
+
+        engine = HtmlRuleEngine(rules)
+        engine.run(root)
+        traversed = time.perf_counter()
+
+        if image_rule is not None:
+            prefetch_element_images(image_rule.images, self._request_headers(config), settings)
+        prefetched = time.perf_counter()
+
+        html_output = serialize_html(root)
+        log(
+            f"HTML rules: parse {(parsed - start) * 1000:.1f} ms, "
+            f"traverse {(traversed - parsed) * 1000:.1f} ms ({format_rule_timings(engine.timings)}), "
+            f"serialize {(time.perf_counter() - prefetched) * 1000:.1f} ms"
+        )
+        return html_output
+
+    def _process_with_soup(
+        self, html: str, config: dict, html_formatting: dict, embed_images: bool
+    ) -> str:
+        """BeautifulSoup 实现（各规则分别遍历）"""
         # 使用 html_formatter 进行清理
         soup = BeautifulSoup(html, "html.parser")
         clean_html_content(soup, config)
 
-        html_formatting = config.get("html_formatting") or config.get("Html_formatting") or {}
-        if not isinstance(html_formatting, dict):
-            html_formatting = {}
         if html_formatting.get("strikethrough_to_del", True):
             convert_strikethrough_to_del(soup)
         if html_formatting.get("css_font_to_semantic", True):
@@ -47,13 +118,12 @@ class HtmlPreprocessor(BasePreprocessor):
         if html_formatting.get("bold_first_row_to_header", False):
             promote_bold_first_row_to_header(soup)
 
+        if embed_images:
+            settings = self._image_prefetch_settings(config)
+            if settings is not None:
+                prefetch_soup_images(soup, self._request_headers(config), settings)
+
         # unwrap_li_paragraphs(soup)
         # remove_empty_paragraphs(soup)
 
-        html_output = str(soup)
-        
-        # 仅在 HTML 不包含 DOCTYPE 时才添加
-        if "<!DOCTYPE" not in html_output.upper():
-            html_output = f"<!DOCTYPE html>\n<meta charset='utf-8'>\n{html_output}"
-        
-        return html_output
+        return str(soup)
@@ -1,31 +1,49 @@
 """Markdown content preprocessor."""
 
+from typing import Optional, Tuple
+
 from .base import BasePreprocessor
 from ...utils.md_normalizer import normalize_markdown
-from ...utils.latex import convert_latex_delimiters
+from ...utils.latex import MathScan, scan_latex_math
+from ...utils.image_prefetch import prefetch_markdown_images
 from ...utils.logging import log
 
 
 class MarkdownPreprocessor(BasePreprocessor):
     """Markdown 内容预处理器（无状态）"""
 
-    def process(self, markdown: str, config: dict) -> str:
+    def process(self, markdown: str, config: dict, *, embed_images: bool = False) -> str:
         """
         预处理 Markdown 内容
 
         处理步骤:
         1. 标准化 Markdown 语法
         2. 处理 LaTeX 数学公式
-        3. 其他自定义处理...
+        3. 预取远程图片并改写为本地路径（仅 embed_images=True）
+        4. 其他自定义处理...
 
         Args:
             markdown: 原始 Markdown 文本
             config: 配置字典
+            embed_images: 输出为 DOCX 等内嵌图片的格式时传 True
 
         Returns:
             预处理后的 Markdown 文本
         """
+        return self.process_with_math(markdown, config, embed_images=embed_images)[0]
+
+    def process_with_math(
+        self, markdown: str, config: dict, *, embed_images: bool = False
+    ) -> Tuple[str, Optional[MathScan]]:
+        """
+        同 process，并返回 LaTeX 步骤得到的公式清单（供后续步骤复用，不必再检测公式）
+
+        Returns:
+            (预处理后的 Markdown 文本, 公式清单)；未启用 latex_support 时清单为 None。
+            清单中的位置对应 LaTeX 步骤后的文本，embed_images=True 改写图片链接后可能偏移。
+        """
         log("Preprocessing Markdown content")
+        math: Optional[MathScan] = None
 
         # 1. 标准化 Markdown
         if config.get("normalize_markdown", True):
@@ -34,8 +52,15 @@ class MarkdownPreprocessor(BasePreprocessor):
         # 2. 处理 LaTeX
         if config.get("latex_support", True):
             fix_single_dollar_block = config.get("fix_single_dollar_block", True)
-            markdown = convert_latex_delimiters(markdown, fix_single_dollar_block)
+            math = scan_latex_math(markdown, fix_single_dollar_block)
+            markdown = math.text
+
+        # 3. 预取远程图片
+        if embed_images:
+            settings = self._image_prefetch_settings(config)
+            if settings is not None:
+                markdown = prefetch_markdown_images(markdown, self._request_headers(config), settings)
 
         # 未来可扩展其他处理...
 
-        return markdown
+        return markdown, math
@@ -1,11 +1,23 @@
 """Cell formatting utilities for spreadsheet insertion."""
 
 import re
-from typing import List, Optional
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+# 触发 Markdown / HTML 解析的字符；不含这些字符的单元格（数字、日期、"Yes" 等）走快速路径
+_MARKUP_TRIGGER_RE = re.compile(r'[*_~`<\[\\]')
+_BR_RE = re.compile(r'<br\s*/?>', re.IGNORECASE)
+
+# 解析结果缓存：条目数上限；超过长度上限的单元格很少重复，不进入缓存
+_PARSE_CACHE_SIZE = 4096
+_PARSE_CACHE_MAX_TEXT = 256
 
 
 class TextSegment:
     """文本片段,带有格式信息"""
+    __slots__ = ('text', 'bold', 'italic', 'strikethrough', 'is_code', 'hyperlink_url')
+
     def __init__(self, text: str, bold: bool = False, italic: bool = False,
                  strikethrough: bool = False, is_code: bool = False,
                  hyperlink_url: Optional[str] = None):
@@ -17,8 +29,31 @@ class TextSegment:
         self.hyperlink_url = hyperlink_url  # 如果非空,表示这是一个超链接
 
 
+@dataclass(frozen=True)
+class ParsedSegment:
+    """TextSegment 的只读快照"""
+    text: str
+    bold: bool = False
+    italic: bool = False
+    strikethrough: bool = False
+    is_code: bool = False
+    hyperlink_url: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class ParsedCell:
+    """CellFormat 解析结果的只读快照（CellFormat.cached 返回，在多处共享）"""
+    text: str
+    clean_text: str
+    is_code_block: bool
+    has_newline: bool
+    segments: Tuple[ParsedSegment, ...]
+
+
 class CellFormat:
     """单元格格式信息"""
+    __slots__ = ('text', 'is_code_block', 'has_newline', 'segments', 'clean_text')
+
     def __init__(self, text: str):
         self.text = text
         self.is_code_block = False
@@ -30,8 +65,15 @@ class CellFormat:
         """解析 Markdown 格式并生成文本片段(字符级解析)"""
         text = self.text
         
+        # 快速路径：没有任何格式标记，整格就是一个普通片段
+        if not _MARKUP_TRIGGER_RE.search(text):
+            self.has_newline = '\n' in text
+            self.segments = [TextSegment(text)] if text else []
+            self.clean_text = text
+            return text
+        
         # 处理 HTML 标签和换行
-        text = re.sub(r'<br\s*/?>', '\n', text, flags=re.IGNORECASE)
+        text = _BR_RE.sub('\n', text)
         if '\n' in text:
             self.has_newline = True
         
@@ -40,10 +82,10 @@ class CellFormat:
             self.is_code_block = True
             # 提取代码块内容
             text = re.sub(r'<pre>(.*?)</pre>',
-                          lambda m: re.sub(r'<br\s*/?>', '\n', m.group(1), flags=re.IGNORECASE),
+                          lambda m: _BR_RE.sub('\n', m.group(1)),
                           text, flags=re.DOTALL | re.IGNORECASE)
             text = re.sub(r'<code>(.*?)</code>',
-                          lambda m: re.sub(r'<br\s*/?>', '\n', m.group(1), flags=re.IGNORECASE),
+                          lambda m: _BR_RE.sub('\n', m.group(1)),
                           text, flags=re.DOTALL | re.IGNORECASE)
             self.clean_text = text.strip()
             self.segments = [TextSegment(self.clean_text, is_code=True)]
@@ -54,6 +96,30 @@ class CellFormat:
         self.clean_text = ''.join(seg.text for seg in self.segments)
         return self.clean_text
     
+    def freeze(self) -> ParsedCell:
+        """返回当前解析结果的只读快照"""
+        return ParsedCell(
+            self.text,
+            self.clean_text,
+            self.is_code_block,
+            self.has_newline,
+            tuple(
+                ParsedSegment(seg.text, seg.bold, seg.italic, seg.strikethrough, seg.is_code, seg.hyperlink_url)
+                for seg in self.segments
+            ),
+        )
+
+    @classmethod
+    def cached(cls, text: str) -> ParsedCell:
+        """
+        返回单元格的解析结果（共享的 LRU 缓存）
+
+        表格中重复的单元格只解析一次。结果在多处共享，因此是不可修改的快照。
+        """
+        if len(text) > _PARSE_CACHE_MAX_TEXT:
+            return _parse_cell(text)
+        return _parse_cell_cached(text)
+
     def _parse_segments(self, text: str, bold: bool = False, italic: bool = False,
                         strikethrough: bool = False) -> List[TextSegment]:
         """
@@ -224,3 +290,12 @@ class CellFormat:
         
         flush_current()
         return segments
+
+
+def _parse_cell(text: str) -> ParsedCell:
+    cell_format = CellFormat(text)
+    cell_format.parse()
+    return cell_format.freeze()
+
+
+_parse_cell_cached = lru_cache(maxsize=_PARSE_CACHE_SIZE)(_parse_cell)
@@ -1,9 +1,12 @@
 """Spreadsheet file generator - creates XLSX files from table data."""
 
-from typing import List
+from copy import copy
+from typing import Dict, List, Optional, Tuple
 from io import BytesIO
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, PatternFill, Alignment
+from openpyxl.styles.cell_style import StyleArray
 from openpyxl.utils import get_column_letter
 from openpyxl.cell.text import InlineFont
 from openpyxl.cell.rich_text import TextBlock, CellRichText
@@ -12,6 +15,17 @@ from ...utils.logging import log
 from ...core.errors import InsertError
 from .formatting import CellFormat
 
+# 单元格数（各行单元格数之和）达到该值时自动使用流式生成
+STREAMING_MIN_CELLS = 5000
+
+_HEADER_FILL_COLOR = "D3D3D3"
+_CODE_FILL_COLOR = "F0F0F0"
+
+# 字体规格：Font 构造参数的 (name, value) 元组，作为共享样式缓存的键
+_HEADER_FONT = (("bold", True),)
+_CODE_BLOCK_FONT = (("name", "Consolas"),)
+_HYPERLINK_FONT = (("color", "0563C1"), ("underline", "single"))  # Excel 默认超链接颜色
+
 
 class SpreadsheetGenerator:
     """表格生成器 - 生成 XLSX 字节流（支持复杂格式）
@@ -22,13 +36,19 @@ class SpreadsheetGenerator:
     """
     
     @staticmethod
-    def generate_xlsx_bytes(table_data: List[List[str]], keep_format: bool = True) -> bytes:
+    def generate_xlsx_bytes(
+        table_data: List[List[str]],
+        keep_format: bool = True,
+        streaming: Optional[bool] = None,
+    ) -> bytes:
         """
         从表格数据生成 XLSX 字节流（支持 Markdown 格式）
         
         Args:
             table_data: 二维数组表格数据
             keep_format: 是否保留 Markdown 格式（粗体、斜体等）
+            streaming: 是否使用流式（write-only）生成；None 时单元格数达到
+                STREAMING_MIN_CELLS 自动启用。两种方式生成的表格内容和格式一致
             
         Returns:
             XLSX 文件的字节流
@@ -37,6 +57,13 @@ class SpreadsheetGenerator:
             InsertError: 生成失败时
         """
         try:
+            if streaming is None:
+                streaming = sum(map(len, table_data)) >= STREAMING_MIN_CELLS
+            if streaming:
+                xlsx_bytes = SpreadsheetGenerator._generate_xlsx_streaming(table_data, keep_format)
+                log(f"Successfully generated XLSX bytes (streaming): {len(xlsx_bytes)} bytes")
+                return xlsx_bytes
+            
             # 创建新的工作簿
             wb = Workbook()
             ws = wb.active
@@ -61,8 +88,8 @@ class SpreadsheetGenerator:
                     
                     if keep_format:
                         # 解析 Markdown 格式
-                        cell_format = CellFormat(cell_value)
-                        clean_text = cell_format.parse()
+                        cell_format = CellFormat.cached(cell_value)
+                        clean_text = cell_format.clean_text
                         
                         # 检查是否有超链接
                         hyperlink_url = None
@@ -143,8 +170,7 @@ class SpreadsheetGenerator:
                             cell.value = clean_text
                     else:
                         # 不保留格式，清除 Markdown 符号
-                        cell_format = CellFormat(cell_value)
-                        cell.value = cell_format.parse()
+                        cell.value = CellFormat.cached(cell_value).clean_text
                     
                     # 第一行应用表头样式
                     if row_idx == 1:
@@ -187,4 +213,165 @@ class SpreadsheetGenerator:
         except Exception as e:
             log(f"Failed to generate XLSX: {e}")
             raise InsertError(f"生成 XLSX 文件失败: {e}")
+    
+    @staticmethod
+    def _generate_xlsx_streaming(table_data: List[List[str]], keep_format: bool) -> bytes:
+        """
+        流式生成：write-only 工作表 + 共享样式对象
+        
+        每个单元格只解析一次，解析时同步统计列宽；write-only 工作表要求列宽在写入
+        第一行之前设置（<cols> 位于 <sheetData> 之前），因此先把解析结果按行保存为
+        轻量元组，设置列宽后逐行写出，不创建常驻的 Cell 对象。
+        """
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet("Sheet1")
+        
+        if not table_data:
+            log("Table data is empty, creating empty spreadsheet")
+        
+        styles = _SharedStyles()
+        widths = [0] * (len(table_data[0]) if table_data else 0)
+        width_cols = len(widths)
+        rows = []
+        
+        for row_idx, row_data in enumerate(table_data):
+            is_header = row_idx == 0
+            row = []
+            for col_idx, cell_value in enumerate(row_data):
+                value, hyperlink, style = styles.resolve(cell_value, keep_format, is_header)
+                row.append((value, hyperlink, style))
+                
+                # 列宽只统计第一行覆盖的列（考虑换行符）
+                if value and col_idx < width_cols:
+                    text = str(value)
+                    length = max(map(len, text.split('\n'))) if '\n' in text else len(text)
+                    if length > widths[col_idx]:
+                        widths[col_idx] = length
+            rows.append(row)
+        
+        # 设置列宽（最小10，最大50）
+        for col_idx, max_length in enumerate(widths, start=1):
+            ws.column_dimensions[get_column_letter(col_idx)].width = min(max(max_length + 2, 10), 50)
+        
+        for row_idx in range(len(rows)):
+            row, rows[row_idx] = rows[row_idx], None
+            ws.append([styles.make_cell(ws, *cell) for cell in row])
+        
+        buffer = BytesIO()
+        wb.save(buffer)
+        return buffer.getvalue()
 
+
+class _SharedStyles:
+    """
+    流式生成的单元格格式解析与共享样式缓存
+    
+    格式规则与 generate_xlsx_bytes 的标准模式一致；相同格式组合
+    （字体、填充、是否换行）的单元格复用同一组 Font / PatternFill / Alignment
+    及其在工作簿中的样式索引，富文本片段复用同一个 InlineFont。
+    """
+    
+    def __init__(self):
+        self._styles: Dict[tuple, int] = {}
+        self._style_objects: List[Tuple[Optional[Font], Optional[PatternFill], Alignment]] = []
+        self._style_arrays: List[Optional[StyleArray]] = []
+        self._inline_fonts: Dict[tuple, InlineFont] = {}
+    
+    def resolve(self, cell_value: str, keep_format: bool, is_header: bool) -> Tuple[object, Optional[str], int]:
+        """
+        解析单元格
+        
+        Returns:
+            (单元格值, 超链接 URL, 样式编号)
+        """
+        cell_format = CellFormat.cached(cell_value)
+        value = cell_format.clean_text
+        hyperlink_url = None
+        font = fill = None
+        wrap = False
+        
+        if keep_format:
+            segments = cell_format.segments
+            for seg in segments:
+                if seg.hyperlink_url:
+                    hyperlink_url = seg.hyperlink_url
+                    break
+            wrap = cell_format.has_newline
+            
+            if cell_format.is_code_block:
+                font = _CODE_BLOCK_FONT
+                fill = _CODE_FILL_COLOR
+                wrap = True
+            elif hyperlink_url:
+                font = _HYPERLINK_FONT
+                wrap = False
+            elif len(segments) > 1:
+                # 多个片段，使用富文本
+                parts = [
+                    TextBlock(self._inline_font(seg.bold, seg.italic, seg.strikethrough, seg.is_code), seg.text)
+                    for seg in segments if seg.text
+                ]
+                if parts:
+                    value = CellRichText(*parts)
+                    if any(seg.is_code for seg in segments if seg.text):
+                        fill = _CODE_FILL_COLOR
+                else:
+                    value = None
+            elif len(segments) == 1:
+                seg = segments[0]
+                if seg.is_code:
+                    fill = _CODE_FILL_COLOR
+                if seg.bold or seg.italic or seg.strikethrough or seg.is_code:
+                    font = (
+                        ("bold", seg.bold),
+                        ("italic", seg.italic),
+                        ("strike", seg.strikethrough),
+                        ("name", "Consolas" if seg.is_code else None),
+                    )
+        
+        # 第一行应用表头样式
+        if is_header:
+            fill = _HEADER_FILL_COLOR
+            font = _HEADER_FONT
+        
+        key = (font, fill, wrap)
+        style = self._styles.get(key)
+        if style is None:
+            style = self._styles[key] = len(self._style_objects)
+            self._style_arrays.append(None)
+            self._style_objects.append((
+                Font(**dict(font)) if font is not None else None,
+                PatternFill(start_color=fill, end_color=fill, fill_type="solid") if fill is not None else None,
+                Alignment(wrap_text=True, vertical="top") if wrap
+                else Alignment(horizontal="center", vertical="center"),
+            ))
+        return value, hyperlink_url, style
+    
+    def make_cell(self, ws, value, hyperlink_url: Optional[str], style: int) -> WriteOnlyCell:
+        """按解析结果创建 write-only 单元格"""
+        cell = WriteOnlyCell(ws, value)
+        if hyperlink_url:
+            cell.hyperlink = hyperlink_url
+        style_array = self._style_arrays[style]
+        if style_array is not None:
+            # 同一样式的后续单元格直接复用首个单元格登记到工作簿后的样式索引，
+            # 避免每次赋值 Font / PatternFill / Alignment 都在工作簿样式表中哈希查找
+            cell._style = copy(style_array)
+            return cell
+        font, fill, alignment = self._style_objects[style]
+        if font is not None:
+            cell.font = font
+        if fill is not None:
+            cell.fill = fill
+        cell.alignment = alignment
+        self._style_arrays[style] = copy(cell._style)
+        return cell
+    
+    def _inline_font(self, bold: bool, italic: bool, strike: bool, is_code: bool) -> InlineFont:
+        key = (bold, italic, strike, is_code)
+        font = self._inline_fonts.get(key)
+        if font is None:
+            font = self._inline_fonts[key] = InlineFont(
+                b=bold, i=italic, strike=strike, rFont="Consolas" if is_code else None
+            )
+        return font
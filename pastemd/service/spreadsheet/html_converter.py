@@ -26,8 +26,8 @@ def cell_to_html(cell_value: str, *, keep_format: bool) -> Tuple[str, bool]:
         - html_content: The HTML representation of the cell.
         - needs_code_bg: Whether the cell needs code background styling.
     """
-    cf = CellFormat(cell_value)
-    clean_text = cf.parse()
+    cf = CellFormat.cached(cell_value)
+    clean_text = cf.clean_text
 
     # If not keeping format, just escape and convert newlines
     if not keep_format:
@@ -144,8 +144,7 @@ def table_to_tsv(table_data: List[List[str]]) -> str:
     for row in table_data:
         out_cells: List[str] = []
         for cell_value in row:
-            cf = CellFormat(cell_value)
-            text = cf.parse()
+            text = CellFormat.cached(cell_value).clean_text
             # Replace newlines with spaces for TSV format
             text = text.replace("\r\n", "\n").replace("\r", "\n").replace("\n", " ")
             out_cells.append(text)
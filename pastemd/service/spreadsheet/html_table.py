@@ -0,0 +1,403 @@
+"""HTML table extractor - converts clipboard HTML tables to table data."""
+
+from __future__ import annotations
+
+import re
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from lxml import etree
+
+from ...utils.html_formatter import parse_css_font_classes
+
+# 每次喂给增量解析器的字符数；找到第一个表格后不再解析剩余的 HTML
+_FEED_CHUNK = 64 * 1024
+# colspan / rowspan 的上限（异常值会生成巨大的空白区域）
+_MAX_COLSPAN = 1000
+_MAX_ROWSPAN = 65534
+
+_WS_RE = re.compile(r'\s+')
+# CellFormat 会解析的标记字符，普通文本中需要用反斜杠转义
+_ESCAPE_RE = re.compile(r'([\\*_~`\[])')
+# CellFormat 在处理转义之前就按 <br> / <pre> / <code> 识别换行和代码块，文本中的这些字面量
+# 在 < 之后插入转义字符（<\br），CellFormat 去掉反斜杠后仍显示原文
+_TAG_LIKE_RE = re.compile(r'<(br|pre|code)', re.IGNORECASE)
+_FONT_WEIGHT_RE = re.compile(r'font-weight\s*:\s*([^;]+)', re.IGNORECASE)
+_FONT_STYLE_RE = re.compile(r'font-style\s*:\s*([^;]+)', re.IGNORECASE)
+_LINE_THROUGH_RE = re.compile(r'text-decoration[^;:]*:[^;]*line-through', re.IGNORECASE)
+
+_BOLD_TAGS = frozenset(("b", "strong"))
+_ITALIC_TAGS = frozenset(("i", "em"))
+_STRIKE_TAGS = frozenset(("s", "del", "strike"))
+_SKIP_TAGS = frozenset(("script", "style", "template"))
+# 单元格内的块级元素：前后各换一行
+_BLOCK_TAGS = frozenset((
+    "p", "div", "li", "ul", "ol", "dl", "dt", "dd", "blockquote", "table", "tr",
+    "h1", "h2", "h3", "h4", "h5", "h6", "hr",
+))
+
+_LINE_BREAK = "<br>"
+
+
+class _Run:
+    """单元格中格式相同的一段文本"""
+    __slots__ = ("text", "bold", "italic", "strike", "code", "href")
+
+    def __init__(self, text: str, bold: bool, italic: bool, strike: bool, code: bool, href: Optional[str]):
+        self.text = text
+        self.bold = bold
+        self.italic = italic
+        self.strike = strike
+        self.code = code
+        self.href = href
+
+    def same_format(self, other: "_Run") -> bool:
+        return (
+            self.bold == other.bold
+            and self.italic == other.italic
+            and self.strike == other.strike
+            and self.code == other.code
+            and self.href == other.href
+        )
+
+
+def parse_html_table(html: str) -> Optional[List[List[str]]]:
+    """
+    从 HTML 中提取第一个表格为二维数组
+
+    使用 lxml 增量解析，遇到第一个（最外层且非空的）<table> 结束即停止，不解析其后的
+    内容。单元格内的粗体、斜体、删除线、行内代码和链接转换为 CellFormat 能识别的
+    Markdown 标记；colspan / rowspan 展开为空单元格，保持各列对齐。
+
+    Args:
+        html: 剪贴板 HTML
+
+    Returns:
+        二维数组；没有表格时返回 None
+    """
+    if not html or "<table" not in html.lower():
+        return None
+
+    parser = etree.HTMLPullParser(events=("end",), tag=("table", "style"), huge_tree=True)
+    css_parts: List[str] = []
+    try:
+        for start in range(0, len(html), _FEED_CHUNK):
+            parser.feed(html[start:start + _FEED_CHUNK])
+            table_data = _take_table(parser.read_events(), css_parts)
+            if table_data is not None:
+                return table_data
+        parser.close()
+        return _take_table(parser.read_events(), css_parts)
+    except etree.LxmlError:
+        return None
+
+
+def _take_table(events, css_parts: List[str]) -> Optional[List[List[str]]]:
+    """处理一批 end 事件，返回第一个有内容的最外层表格"""
+    for _, el in events:
+        if el.tag == "style":
+            css_parts.append(el.text or "")
+            continue
+        # 嵌套表格的内容并入外层单元格的文本
+        if any(ancestor.tag == "table" for ancestor in el.iterancestors()):
+            continue
+        table_data = _HtmlTableReader(parse_css_font_classes("\n".join(css_parts))).read(el)
+        if table_data is not None:
+            return table_data
+    return None
+
+
+def _span(cell, name: str, limit: int) -> int:
+    value = cell.get(name)
+    if value is None:
+        return 1
+    try:
+        value = int(value.strip())
+    except ValueError:
+        return 1
+    return min(max(value, 1), limit)
+
+
+def _iter_rows(table) -> Iterator:
+    """表格的行（按文档顺序，不含嵌套表格的行）"""
+    for child in table:
+        tag = child.tag
+        if tag == "tr":
+            yield child
+        elif tag in ("thead", "tbody", "tfoot"):
+            for row in child:
+                if row.tag == "tr":
+                    yield row
+
+
+class _HtmlTableReader:
+    """把一个 <table> 元素转换为二维数组"""
+
+    def __init__(self, class_styles: Dict[str, Tuple[bool, bool]]):
+        # <style> 中设置了粗体/斜体的 class（Excel / WPS 复制的 HTML）
+        self.class_styles = class_styles
+
+    def read(self, table) -> Optional[List[List[str]]]:
+        rows: List[List[str]] = []
+        # 每列还要被上方单元格的 rowspan 占用的行数
+        carry: List[int] = []
+        has_content = False
+
+        for tr in _iter_rows(table):
+            row: List[str] = []
+            col = 0
+            for cell in tr:
+                if cell.tag not in ("td", "th"):
+                    continue
+                while col < len(carry) and carry[col] > 0:
+                    carry[col] -= 1
+                    row.append("")
+                    col += 1
+
+                text = self._cell_text(cell)
+                has_content = has_content or bool(text)
+                colspan = _span(cell, "colspan", _MAX_COLSPAN)
+                rowspan = _span(cell, "rowspan", _MAX_ROWSPAN)
+                row.append(text)
+                row.extend([""] * (colspan - 1))
+
+                if len(carry) < col + colspan:
+                    carry.extend([0] * (col + colspan - len(carry)))
+                for span_col in range(col, col + colspan):
+                    carry[span_col] = rowspan - 1
+                col += colspan
+
+            # 行尾仍被上方单元格占用的列
+            while col < len(carry):
+                if carry[col] > 0:
+                    carry[col] -= 1
+                row.append("")
+                col += 1
+            rows.append(row)
+
+        if not has_content:
+            return None
+
+        # 补齐为矩形
+        width = max(len(row) for row in rows)
+        for row in rows:
+            if len(row) < width:
+                row.extend([""] * (width - len(row)))
+        return rows
+
+    # ---- 单元格内容 ----
+
+    def _cell_text(self, cell) -> str:
+        bold, italic, strike = self._class_flags(cell)
+
+        # 快速路径：只有文本、没有格式的单元格
+        if not len(cell) and not (bold or italic or strike):
+            text = cell.text
+            return _escape_text(_WS_RE.sub(" ", text).strip()) if text else ""
+
+        # 含 <pre> 的单元格整体作为代码块（与 CellFormat 对 <pre> 的处理一致）
+        if any(True for _ in cell.iter("pre")):
+            code = _plain_text(cell).strip("\n")
+            return f"<pre>{code}</pre>" if code else ""
+
+        runs: List[Optional[_Run]] = []
+        self._collect(cell, runs, bold, italic, strike, False, None)
+        return _render_runs(runs)
+
+    def _class_flags(self, el) -> Tuple[bool, bool, bool]:
+        bold = italic = strike = False
+        class_attr = el.get("class")
+        if class_attr and self.class_styles:
+            for class_name in class_attr.split():
+                styles = self.class_styles.get(class_name)
+                if styles is not None:
+                    bold = bold or styles[0]
+                    italic = italic or styles[1]
+        style = el.get("style")
+        if style:
+            weight = _FONT_WEIGHT_RE.search(style)
+            if weight:
+                value = weight.group(1).strip().lower()
+                bold = value in ("bold", "bolder") or (value.isdigit() and int(value) >= 600)
+            font_style = _FONT_STYLE_RE.search(style)
+            if font_style:
+                value = font_style.group(1).lower()
+                italic = "italic" in value or "oblique" in value
+            strike = bool(_LINE_THROUGH_RE.search(style))
+        return bold, italic, strike
+
+    def _collect(
+        self,
+        el,
+        runs: List[Optional[_Run]],
+        bold: bool,
+        italic: bool,
+        strike: bool,
+        code: bool,
+        href: Optional[str],
+    ) -> None:
+        """深度优先收集文本片段；None 表示换行"""
+        if el.text:
+            runs.append(_Run(el.text, bold, italic, strike, code, href))
+
+        for child in el:
+            tag = child.tag
+            if not isinstance(tag, str) or tag in _SKIP_TAGS:
+                # 注释、处理指令、脚本：只保留其后的文本
+                pass
+            elif tag == "br":
+                runs.append(None)
+            else:
+                child_bold, child_italic, child_strike = self._class_flags(child)
+                child_href = href
+                if tag == "a":
+                    link = (child.get("href") or "").strip()
+                    if link and not link.startswith(("#", "javascript:")):
+                        child_href = link
+                block = tag in _BLOCK_TAGS
+                if block:
+                    runs.append(None)
+                elif tag in ("td", "th"):
+                    # 嵌套表格的单元格之间用空格分隔
+                    runs.append(_Run(" ", bold, italic, strike, code, href))
+                self._collect(
+                    child,
+                    runs,
+                    bold or child_bold or tag in _BOLD_TAGS,
+                    italic or child_italic or tag in _ITALIC_TAGS,
+                    strike or child_strike or tag in _STRIKE_TAGS,
+                    code or tag in ("code", "kbd", "samp"),
+                    child_href,
+                )
+                if block:
+                    runs.append(None)
+
+            if child.tail:
+                runs.append(_Run(child.tail, bold, italic, strike, code, href))
+
+
+def _plain_text(el) -> str:
+    """元素的纯文本（<br> 与块级元素换行，其余空白原样保留）"""
+    parts: List[str] = []
+
+    def walk(node) -> None:
+        if node.text:
+            parts.append(node.text)
+        for child in node:
+            tag = child.tag
+            if tag == "br":
+                parts.append("\n")
+            elif isinstance(tag, str) and tag not in _SKIP_TAGS:
+                block = tag in _BLOCK_TAGS
+                if block and parts and not parts[-1].endswith("\n"):
+                    parts.append("\n")
+                walk(child)
+                if block:
+                    parts.append("\n")
+            if child.tail:
+                parts.append(child.tail)
+
+    walk(el)
+    return "".join(parts)
+
+
+def _render_runs(runs: List[Optional[_Run]]) -> str:
+    """折叠空白、合并同格式片段后输出为 CellFormat 标记"""
+    # 按换行切分为行，每行内折叠空白
+    lines: List[List[_Run]] = [[]]
+    for run in runs:
+        if run is None:
+            lines.append([])
+            continue
+        text = _WS_RE.sub(" ", run.text)
+        if not text:
+            continue
+        line = lines[-1]
+        if line and line[-1].text.endswith(" ") and text.startswith(" "):
+            text = text[1:]
+            if not text:
+                continue
+        if line and line[-1].same_format(run):
+            line[-1].text += text
+        else:
+            run.text = text
+            line.append(run)
+
+    rendered: List[str] = []
+    for line in lines:
+        # 去掉行首尾空白
+        while line and not line[0].text.strip():
+            line.pop(0)
+        while line and not line[-1].text.strip():
+            line.pop()
+        if not line:
+            continue
+        line[0].text = line[0].text.lstrip()
+        line[-1].text = line[-1].text.rstrip()
+        rendered.append(_render_line(line))
+
+    return _LINE_BREAK.join(rendered)
+
+
+def _render_line(line: List[_Run]) -> str:
+    parts: List[str] = []
+    i = 0
+    while i < len(line):
+        href = line[i].href
+        if href is None:
+            parts.append(_render_run(line[i]))
+            i += 1
+            continue
+        # 连续的同一链接合并为一个 [text](url)
+        j = i
+        while j < len(line) and line[j].href == href:
+            j += 1
+        inner = "".join(_render_run(run) for run in line[i:j])
+        if "]" in inner:
+            parts.append(inner)
+        else:
+            parts.append(f"[{inner}]({href.replace(')', '%29')})")
+        i = j
+    return "".join(parts)
+
+
+def _escape_text(text: str) -> str:
+    """转义普通文本，使 CellFormat 按原文显示"""
+    text = _ESCAPE_RE.sub(r"\\\1", text)
+    if "<" in text:
+        text = _TAG_LIKE_RE.sub(r"<\\\1", text)
+    return text
+
+
+def _render_run(run: _Run) -> str:
+    """
+    输出单个片段
+
+    CellFormat 查找结束标记时不识别转义，所以定界符选用片段中没有出现的字符：
+    粗体 ** / __，斜体 _ / *；片段中两种字符都有（或删除线中含 ~）时退化为普通文本。
+    """
+    text = run.text
+    # 行内代码不处理转义，含 <br> 等字面量时按普通文本输出
+    if run.code and "`" not in text and text.strip() and not _TAG_LIKE_RE.search(text):
+        return f"`{text}`"
+
+    # 首尾空白放在标记之外
+    stripped = text.strip()
+    if not stripped or not (run.bold or run.italic or run.strike):
+        return _escape_text(text)
+    lead = text[:len(text) - len(text.lstrip())]
+    trail = text[len(text.rstrip()):]
+
+    marker = ""
+    if run.bold or run.italic:
+        for char in ("*", "_") if not run.italic or run.bold else ("_", "*"):
+            if char not in stripped:
+                marker = char * ((2 if run.bold else 0) + (1 if run.italic else 0))
+                break
+    strike = run.strike and "~" not in stripped
+
+    body = _escape_text(stripped)
+    if marker:
+        body = f"{marker}{body}{marker}"
+    if strike:
+        body = f"~~{body}~~"
+    return f"{lead}{body}{trail}"
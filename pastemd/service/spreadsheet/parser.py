@@ -1,95 +1,115 @@
 """Markdown table parser."""
 
 import re
-from typing import List, Optional
+from typing import Iterator, List, Optional
+
+# 非空的一行（不含换行符）；行首尾空白由调用方 strip
+_LINE_RE = re.compile(r'[^\n]+')
+# 分隔符行（如 |---|:---:|）
+_SEPARATOR_RE = re.compile(r'\s*\|?\s*[-:]+\s*(\|\s*[-:]+\s*)+\|?\s*')
+# 一个单元格的内容：到行内代码以外、未转义的 | 为止（\| 为转义的竖线；
+# 没有等长结束反引号串的反引号按普通字符处理）
+_CELL_RE = re.compile(r'(?:[^|`\\]+|\\\|?|(`+)(?:.*?(?<!`)\1(?!`))?)*')
 
 
 def _split_table_cells(line: str) -> List[str]:
     """
-    按 | 分割表格单元格,正确处理转义的竖线
-    
+    按 | 分割表格单元格,正确处理转义的竖线和行内代码中的竖线
+
     Args:
         line: 表格行文本
-        
+
     Returns:
         单元格列表
     """
+    # 快速路径：没有转义和行内代码时直接 split
+    if '\\' not in line and '`' not in line:
+        return [cell.strip() for cell in line.split('|')]
+    if not line:
+        return []
+
     cells = []
-    current_cell = []
-    i = 0
-    
-    while i < len(line):
-        if i > 0 and line[i] == '|' and line[i - 1] == '\\':
-            # 转义的竖线,替换前一个反斜杠并添加竖线
-            current_cell[-1] = '|'
-            i += 1
-        elif line[i] == '|':
-            # 未转义的竖线,分割单元格
-            cells.append(''.join(current_cell).strip())
-            current_cell = []
-            i += 1
-        else:
-            current_cell.append(line[i])
-            i += 1
-    
-    # 添加最后一个单元格
-    if current_cell or cells:  # 如果有内容或已经有单元格
-        cells.append(''.join(current_cell).strip())
-    
+    match = _CELL_RE.match
+    pos = 0
+    end_of_line = len(line)
+    while True:
+        end = match(line, pos).end()
+        # 转义的竖线还原为 |
+        cells.append(line[pos:end].replace('\\|', '|').strip())
+        if end >= end_of_line:
+            return cells
+        pos = end + 1
+
+
+def _trim_outer_cells(cells: List[str]) -> List[str]:
+    """移除首尾的空元素（如果行是 |a|b| 格式）"""
+    if cells and cells[0] == '':
+        cells = cells[1:]
+    if cells and cells[-1] == '':
+        cells = cells[:-1]
     return cells
 
 
+def _iter_body_rows(lines) -> Iterator[List[str]]:
+    """分隔符之后的数据行：空行跳过，第一行非表格文本结束"""
+    separator_match = _SEPARATOR_RE.fullmatch
+    for m in lines:
+        line = m.group().strip()
+
+        # 跳过空行
+        if not line:
+            continue
+
+        # 表格行必须包含 |，否则表格结束
+        if '|' not in line:
+            return
+
+        # 多余的分隔符行忽略
+        if separator_match(line):
+            continue
+
+        cells = _trim_outer_cells(_split_table_cells(line))
+        if cells:
+            yield cells
+
+
 def parse_markdown_table(md_text: str) -> Optional[List[List[str]]]:
     """
     解析 Markdown 表格为二维数组
-    
+
+    逐行读取（不预先切分整个文本），遇到表格之后的第一行非表格文本即停止，
+    不会扫描剪贴板的其余部分。
+
     Args:
         md_text: Markdown 文本内容
-        
+
     Returns:
         二维数组，每个元素代表一行的单元格内容；如果不是表格则返回 None
     """
-    lines = md_text.strip().split('\n')
-    if len(lines) < 2:
-        return None
-    
-    table_data = []
-    separator_found = False
-    
-    for i, line in enumerate(lines):
-        line = line.strip()
-        
+    lines = _LINE_RE.finditer(md_text)
+    rows: List[List[str]] = []
+
+    for m in lines:
+        line = m.group().strip()
+
         # 跳过空行
         if not line:
             continue
-            
-        # 检查是否为表格行（以 | 开头或结尾）
-        if not (line.startswith('|') or line.endswith('|') or '|' in line):
-            # 如果已经找到分隔符，说明表格结束
-            if separator_found:
-                break
-            # 否则不是表格
+
+        # 分隔符之前出现非表格行：不是表格
+        if '|' not in line:
             return None
-        
-        # 检查是否为分隔符行（如 |---|---|）
-        if re.match(r'^\s*\|?\s*[-:]+\s*(\|\s*[-:]+\s*)+\|?\s*$', line):
-            separator_found = True
-            continue
-        
-        # 使用新的分割方法解析单元格
-        cells = _split_table_cells(line)
-        
-        # 移除首尾的空元素（如果行是 |a|b| 格式）
-        if cells and cells[0] == '':
-            cells = cells[1:]
-        if cells and cells[-1] == '':
-            cells = cells[:-1]
-        
+
+        # 分隔符行（如 |---|---|）
+        if _SEPARATOR_RE.fullmatch(line):
+            break
+
+        cells = _trim_outer_cells(_split_table_cells(line))
         if cells:
-            table_data.append(cells)
-    
-    # 必须找到分隔符才认为是有效表格
-    if not separator_found or not table_data:
+            rows.append(cells)
+    else:
+        # 必须找到分隔符才认为是有效表格
         return None
-    
-    return table_data
+
+    rows.extend(_iter_body_rows(lines))
+    return rows if rows else None
@@ -11,6 +11,7 @@ from ..core.errors import ClipboardError
 # 根据操作系统导入对应的实现
 if sys.platform == "darwin":
     from .macos.clipboard import (
+        get_clipboard_sequence_number,
         get_clipboard_text,
         set_clipboard_text,
         is_clipboard_empty,
@@ -29,6 +30,7 @@ if sys.platform == "darwin":
     from .clipboard_file_utils import read_file_with_encoding
 elif sys.platform == "win32":
     from .win32.clipboard import (
+        get_clipboard_sequence_number,
         get_clipboard_text,
         set_clipboard_text,
         is_clipboard_empty,
@@ -67,6 +69,30 @@ else:
         except Exception as e:
             raise ClipboardError(f"Failed to read clipboard: {e}")
 
+    def get_clipboard_sequence_number() -> int:
+        """
+        获取剪贴板变化标识
+
+        Note:
+            在不支持的平台上没有系统计数器，退化为剪贴板文本的哈希值
+
+        Returns:
+            剪贴板内容变化时随之变化的整数
+        """
+        try:
+            return hash(get_clipboard_text()) & 0x7FFFFFFF
+        except ClipboardError:
+            return 0
+
+    def is_clipboard_files() -> bool:
+        """
+        检测剪贴板是否包含文件
+
+        Note:
+            在不支持的平台上始终返回 False
+        """
+        return False
+
     def is_clipboard_empty() -> bool:
         """
         检查剪贴板是否为空
@@ -121,11 +147,13 @@ else:
 
 # 导出公共接口
 __all__ = [
+    "get_clipboard_sequence_number",
     "get_clipboard_text",
     "set_clipboard_text",
     "is_clipboard_empty",
     "is_clipboard_html",
     "get_clipboard_html",
+    "is_clipboard_files",
     "ClipboardError",
 ]
 
@@ -135,7 +163,6 @@ if sys.platform in ("win32", "darwin"):
         "set_clipboard_rich_text",
         "simulate_paste",
         "copy_files_to_clipboard",
-        "is_clipboard_files",
         "get_clipboard_files",
         "get_markdown_files_from_clipboard",
         "read_markdown_files_from_clipboard",
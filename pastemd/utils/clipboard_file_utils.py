@@ -6,16 +6,36 @@ These utilities don't depend on platform-specific APIs and can be reused by
 both Windows and macOS implementations.
 """
 
+import codecs
+import mmap
 import os
+from concurrent.futures import ThreadPoolExecutor
 from ..utils.logging import log
 from ..core.errors import ClipboardError
 
+# 无 BOM 时依次尝试的编码
+_ENCODINGS = ["utf-8", "gbk", "gb2312"]
+# 带 BOM 的编码（长 BOM 在前，UTF-32 LE 的 BOM 以 UTF-16 LE 的 BOM 开头）
+_BOMS = [
+    (codecs.BOM_UTF32_LE, "utf-32-le"),
+    (codecs.BOM_UTF32_BE, "utf-32-be"),
+    (codecs.BOM_UTF8, "utf-8"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+# 超过该大小的文件用 mmap 读取，避免再复制一份完整的 bytes
+_MMAP_THRESHOLD = 1024 * 1024
+# 并行读取多个文件时的线程数上限
+_MAX_READ_WORKERS = 8
+
 
 def read_file_with_encoding(file_path: str) -> str:
     """
     读取文件内容，自动检测编码
     
-    尝试顺序：utf-8 -> gbk -> gb2312 -> utf-8-sig
+    文件只读取一次（较大的文件使用 mmap），再在内存中判断编码：
+    先看 BOM（utf-8 / utf-16 / utf-32），没有 BOM 时依次尝试 utf-8 -> gbk -> gb2312。
+    换行符统一为 \\n（与文本模式 open 一致）。
     
     Args:
         file_path: 文件路径
@@ -26,24 +46,46 @@ def read_file_with_encoding(file_path: str) -> str:
     Raises:
         ClipboardError: 读取失败时
     """
-    encodings = ["utf-8", "gbk", "gb2312", "utf-8-sig"]
-    
-    for encoding in encodings:
+    try:
+        with open(file_path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size >= _MMAP_THRESHOLD:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mm, "madvise"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    content, encoding = _decode_bytes(mm, file_path)
+            else:
+                content, encoding = _decode_bytes(f.read(), file_path)
+    except (OSError, ValueError) as e:
+        log(f"Error reading file '{file_path}': {e}")
+        raise ClipboardError(f"Failed to read file '{file_path}': {e}")
+
+    log(f"Successfully read file '{file_path}' with encoding: {encoding}")
+    if "\r" in content:
+        content = content.replace("\r\n", "\n").replace("\r", "\n")
+    return content
+
+
+def _decode_bytes(data, file_path: str) -> tuple[str, str]:
+    """按 BOM / 候选编码解码（data 为 bytes 或 mmap），返回 (内容, 编码)"""
+    head = data[:4]
+    for bom, encoding in _BOMS:
+        if head.startswith(bom):
+            try:
+                return str(memoryview(data)[len(bom):], encoding), encoding
+            except UnicodeDecodeError:
+                log(f"Failed to decode '{file_path}' with BOM encoding: {encoding}")
+                break
+
+    for encoding in _ENCODINGS:
         try:
-            with open(file_path, "r", encoding=encoding) as f:
-                content = f.read()
-                log(f"Successfully read file '{file_path}' with encoding: {encoding}")
-                return content
+            return str(data, encoding), encoding
         except UnicodeDecodeError:
             log(f"Failed to decode '{file_path}' with encoding: {encoding}")
-            continue
-        except Exception as e:
-            log(f"Error reading file '{file_path}' with encoding {encoding}: {e}")
-            continue
-    
+
     # 所有编码都失败
     raise ClipboardError(
-        f"Failed to read file '{file_path}' with any supported encoding: {encodings}"
+        f"Failed to read file '{file_path}' with any supported encoding: {_ENCODINGS}"
     )
 
 
@@ -93,17 +135,39 @@ def read_markdown_files(file_paths: list[str]) -> tuple[bool, list[tuple[str, st
     files_data: list[tuple[str, str]] = []
     errors: list[tuple[str, str]] = []
     
-    for file_path in file_paths:
-        filename = os.path.basename(file_path)
-        try:
-            content = read_file_with_encoding(file_path)
+    # 多个文件按连续分段交给线程池并行读取（每段一个任务），结果按原顺序汇总
+    workers = min(_MAX_READ_WORKERS, len(file_paths))
+    if workers > 1:
+        step = -(-len(file_paths) // workers)
+        batches = [file_paths[i:i + step] for i in range(0, len(file_paths), step)]
+        with ThreadPoolExecutor(max_workers=len(batches)) as pool:
+            results = [item for batch in pool.map(_read_markdown_batch, batches) for item in batch]
+    else:
+        results = _read_markdown_batch(file_paths)
+    
+    for filename, content, error_msg in results:
+        if error_msg is None:
             files_data.append((filename, content))
-            log(f"Successfully read MD file: {filename}")
-        except Exception as e:
-            # 记录失败信息，但继续处理其他文件
-            error_msg = str(e)
-            log(f"Failed to read MD file '{filename}': {error_msg}")
+        else:
             errors.append((filename, error_msg))
     
     # found 为 True 当且仅当至少成功读取了一个文件
     return len(files_data) > 0, files_data, errors
+
+
+def _read_markdown_batch(file_paths: list[str]) -> list[tuple[str, str, str | None]]:
+    return [_read_markdown_file(file_path) for file_path in file_paths]
+
+
+def _read_markdown_file(file_path: str) -> tuple[str, str, str | None]:
+    """读取单个 MD 文件，返回 (filename, content, error_msg)；失败时 content 为空"""
+    filename = os.path.basename(file_path)
+    try:
+        content = read_file_with_encoding(file_path)
+        log(f"Successfully read MD file: {filename}")
+        return filename, content, None
+    except Exception as e:
+        # 记录失败信息，但继续处理其他文件
+        error_msg = str(e)
+        log(f"Failed to read MD file '{filename}': {error_msg}")
+        return filename, "", error_msg
@@ -0,0 +1,313 @@
+"""Merge DOCX packages produced from Markdown chunks into one document."""
+
+from __future__ import annotations
+
+import io
+import posixpath
+import zipfile
+from typing import Dict, List, Optional, Set
+
+from lxml import etree
+
+from .logging import log
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R_NS = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+WP_NS = "http://schemas.openxmlformats.org/drawingml/2006/wordprocessingDrawing"
+PKG_REL_NS = "http://schemas.openxmlformats.org/package/2006/relationships"
+CT_NS = "http://schemas.openxmlformats.org/package/2006/content-types"
+
+_DOCUMENT = "word/document.xml"
+_DOCUMENT_RELS = "word/_rels/document.xml.rels"
+_NUMBERING = "word/numbering.xml"
+_STYLES = "word/styles.xml"
+_CONTENT_TYPES = "[Content_Types].xml"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+def _unique_name(name: str, used: Set[str]) -> str:
+    """与 Pandoc 生成重复标识符的方式一致：name-1、name-2 ..."""
+    seq = 1
+    while f"{name}-{seq}" in used:
+        seq += 1
+    return f"{name}-{seq}"
+
+
+def _max_int_attr(root, tag: str, attr: str) -> int:
+    result = 0
+    for el in root.iter(_w(tag)):
+        try:
+            result = max(result, int(el.get(_w(attr), "0")))
+        except ValueError:
+            continue
+    return result
+
+
+class _Package:
+    """可修改的 DOCX zip 包（按需解析 XML 部件）"""
+
+    def __init__(self, data: bytes) -> None:
+        with zipfile.ZipFile(io.BytesIO(data)) as zf:
+            self.names: List[str] = zf.namelist()
+            self.blobs: Dict[str, bytes] = {name: zf.read(name) for name in self.names}
+        self._xml: Dict[str, etree._Element] = {}
+
+    def has(self, name: str) -> bool:
+        return name in self.blobs
+
+    def xml(self, name: str):
+        root = self._xml.get(name)
+        if root is None:
+            root = etree.fromstring(self.blobs[name])
+            self._xml[name] = root
+        return root
+
+    def add_blob(self, name: str, data: bytes) -> None:
+        if name not in self.blobs:
+            self.names.append(name)
+        self.blobs[name] = data
+
+    def to_bytes(self, compression: int = zipfile.ZIP_DEFLATED) -> bytes:
+        for name, root in self._xml.items():
+            self.blobs[name] = etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+        out = io.BytesIO()
+        with zipfile.ZipFile(out, "w", compression) as zf:
+            for name in self.names:
+                zf.writestr(name, self.blobs[name])
+        return out.getvalue()
+
+
+class _ChunkMerger:
+    """把一个分块的正文及其依赖（图片、超链接、列表编号、样式）并入基础包"""
+
+    def __init__(self, base: _Package) -> None:
+        self.base = base
+        self.rel_seq = 0
+        self.media_seq = 0
+        self.base_body = base.xml(_DOCUMENT).find(_w("body"))
+        self.base_rels = base.xml(_DOCUMENT_RELS)
+        self.base_ct = base.xml(_CONTENT_TYPES)
+        self.bookmark_next = _max_int_attr(base.xml(_DOCUMENT), "bookmarkStart", "id") + 1
+        self.bookmark_names: Set[str] = {
+            el.get(_w("name")) for el in base.xml(_DOCUMENT).iter(_w("bookmarkStart")) if el.get(_w("name"))
+        }
+
+    def merge(self, index: int, chunk: _Package) -> None:
+        body = chunk.xml(_DOCUMENT).find(_w("body"))
+        if body is None:
+            return
+        elements = [el for el in body if el.tag != _w("sectPr")]
+
+        rel_map = self._merge_relationships(index, chunk, elements)
+        num_map = self._merge_numbering(chunk)
+        self._merge_styles(chunk)
+
+        name_map = self._rename_bookmarks(elements)
+        bookmark_map: Dict[str, str] = {}
+        for el in elements:
+            for node in el.iter():
+                if not isinstance(node.tag, str):
+                    continue
+                for key, value in node.attrib.items():
+                    if key.startswith(f"{{{R_NS}}}") and value in rel_map:
+                        node.set(key, rel_map[value])
+                if node.tag == _w("numId"):
+                    val = node.get(_w("val"))
+                    if val in num_map:
+                        node.set(_w("val"), num_map[val])
+                elif node.tag == _w("hyperlink"):
+                    # 指向本分块内被改名书签的内部链接同步改名；指向其它分块的保持原名
+                    anchor = node.get(_w("anchor"))
+                    if anchor in name_map:
+                        node.set(_w("anchor"), name_map[anchor])
+                elif node.tag in (_w("bookmarkStart"), _w("bookmarkEnd")):
+                    old = node.get(_w("id"))
+                    if old is not None:
+                        if old not in bookmark_map:
+                            bookmark_map[old] = str(self.bookmark_next)
+                            self.bookmark_next += 1
+                        node.set(_w("id"), bookmark_map[old])
+
+        insert_at = len(self.base_body)
+        if insert_at and self.base_body[-1].tag == _w("sectPr"):
+            insert_at -= 1
+        for offset, el in enumerate(elements):
+            self.base_body.insert(insert_at + offset, el)
+
+    def _rename_bookmarks(self, elements) -> Dict[str, str]:
+        """书签名（标题 id）在整个文档内必须唯一：与已合并部分重名的改名，返回 {旧名: 新名}"""
+        starts = [node for el in elements for node in el.iter(_w("bookmarkStart")) if node.get(_w("name"))]
+        # 新名字同时避开本分块自己的书签名
+        used = self.bookmark_names | {node.get(_w("name")) for node in starts}
+        name_map: Dict[str, str] = {}
+        for node in starts:
+            name = node.get(_w("name"))
+            if name in self.bookmark_names:
+                new_name = _unique_name(name, used)
+                used.add(new_name)
+                name_map[name] = new_name
+                node.set(_w("name"), new_name)
+        self.bookmark_names.update(node.get(_w("name")) for node in starts)
+        return name_map
+
+    def _merge_relationships(self, index: int, chunk: _Package, elements) -> Dict[str, str]:
+        if not chunk.has(_DOCUMENT_RELS):
+            return {}
+        used = set()
+        for el in elements:
+            for node in el.iter():
+                if not isinstance(node.tag, str):
+                    continue
+                for key, value in node.attrib.items():
+                    if key.startswith(f"{{{R_NS}}}"):
+                        used.add(value)
+        if not used:
+            return {}
+
+        rel_map: Dict[str, str] = {}
+        for rel in chunk.xml(_DOCUMENT_RELS):
+            rel_id = rel.get("Id")
+            if rel_id not in used:
+                continue
+            target = rel.get("Target", "")
+            new_target = target
+            if rel.get("TargetMode") != "External":
+                source_part = posixpath.normpath(posixpath.join("word", target))
+                if not chunk.has(source_part):
+                    continue
+                self.media_seq += 1
+                new_target = posixpath.join(
+                    posixpath.dirname(target), f"c{index}_{self.media_seq}_{posixpath.basename(target)}"
+                )
+                new_part = posixpath.normpath(posixpath.join("word", new_target))
+                self.base.add_blob(new_part, chunk.blobs[source_part])
+                self._copy_content_type(chunk, source_part, new_part)
+
+            self.rel_seq += 1
+            new_id = f"rIdMerge{self.rel_seq}"
+            new_rel = etree.SubElement(self.base_rels, f"{{{PKG_REL_NS}}}Relationship")
+            new_rel.set("Id", new_id)
+            new_rel.set("Type", rel.get("Type", ""))
+            new_rel.set("Target", new_target)
+            if rel.get("TargetMode"):
+                new_rel.set("TargetMode", rel.get("TargetMode"))
+            rel_map[rel_id] = new_id
+        return rel_map
+
+    def _copy_content_type(self, chunk: _Package, source_part: str, new_part: str) -> None:
+        chunk_ct = chunk.xml(_CONTENT_TYPES)
+        for override in chunk_ct.iter(f"{{{CT_NS}}}Override"):
+            if override.get("PartName") == "/" + source_part:
+                el = etree.SubElement(self.base_ct, f"{{{CT_NS}}}Override")
+                el.set("PartName", "/" + new_part)
+                el.set("ContentType", override.get("ContentType", ""))
+                return
+        ext = posixpath.splitext(new_part)[1].lstrip(".").lower()
+        if not ext:
+            return
+        for default in self.base_ct.iter(f"{{{CT_NS}}}Default"):
+            if default.get("Extension", "").lower() == ext:
+                return
+        for default in chunk_ct.iter(f"{{{CT_NS}}}Default"):
+            if default.get("Extension", "").lower() == ext:
+                el = etree.Element(f"{{{CT_NS}}}Default")
+                el.set("Extension", default.get("Extension"))
+                el.set("ContentType", default.get("ContentType", ""))
+                # Default 需要排在 Override 之前
+                self.base_ct.insert(0, el)
+                return
+
+    def _merge_numbering(self, chunk: _Package) -> Dict[str, str]:
+        if not chunk.has(_NUMBERING) or not self.base.has(_NUMBERING):
+            return {}
+        base_root = self.base.xml(_NUMBERING)
+        chunk_root = chunk.xml(_NUMBERING)
+        abstract_offset = _max_int_attr(base_root, "abstractNum", "abstractNumId") + 1
+        num_offset = _max_int_attr(base_root, "num", "numId") + 1
+
+        abstract_map: Dict[str, str] = {}
+        last_abstract = None
+        for el in base_root.findall(_w("abstractNum")):
+            last_abstract = el
+        for el in chunk_root.findall(_w("abstractNum")):
+            old = el.get(_w("abstractNumId"))
+            new = str(int(old) + abstract_offset)
+            abstract_map[old] = new
+            el.set(_w("abstractNumId"), new)
+            # nsid 相同时 Word 会把不同列表视为同一个
+            nsid = el.find(_w("nsid"))
+            if nsid is not None:
+                nsid.getparent().remove(nsid)
+            if last_abstract is not None:
+                last_abstract.addnext(el)
+            else:
+                base_root.insert(0, el)
+            last_abstract = el
+
+        num_map: Dict[str, str] = {}
+        last_num = None
+        for el in base_root.findall(_w("num")):
+            last_num = el
+        for el in chunk_root.findall(_w("num")):
+            old = el.get(_w("numId"))
+            new = str(int(old) + num_offset)
+            num_map[old] = new
+            el.set(_w("numId"), new)
+            ref = el.find(_w("abstractNumId"))
+            if ref is not None and ref.get(_w("val")) in abstract_map:
+                ref.set(_w("val"), abstract_map[ref.get(_w("val"))])
+            if last_num is not None:
+                last_num.addnext(el)
+            elif last_abstract is not None:
+                last_abstract.addnext(el)
+            else:
+                base_root.append(el)
+            last_num = el
+        return num_map
+
+    def _merge_styles(self, chunk: _Package) -> None:
+        if not chunk.has(_STYLES) or not self.base.has(_STYLES):
+            return
+        base_root = self.base.xml(_STYLES)
+        existing = {el.get(_w("styleId")) for el in base_root.iter(_w("style"))}
+        for el in chunk.xml(_STYLES).findall(_w("style")):
+            style_id = el.get(_w("styleId"))
+            if style_id not in existing:
+                base_root.append(el)
+                existing.add(style_id)
+
+
+def _renumber_drawings(root) -> None:
+    """图片的 wp:docPr id 必须在整个文档内唯一"""
+    for seq, el in enumerate(root.iter(f"{{{WP_NS}}}docPr"), start=1):
+        el.set("id", str(seq))
+
+
+def merge_docx_packages(parts: List[bytes], compression: int = zipfile.ZIP_DEFLATED) -> Optional[bytes]:
+    """
+    把多个由同一参考模板生成的 DOCX 按顺序合并为一个
+
+    以第一个包为基础（保留其样式、页面设置和元数据），后续包的正文依次追加，
+    图片/超链接关系、列表编号、书签与图片 id 会重新编号，重名书签及指向它的内部链接会改名，缺失的样式会补齐。
+    compression 为合并后整包的压缩方式（临时输出可用 ZIP_STORED 省去压缩）。
+
+    Returns:
+        合并后的 DOCX 字节流；合并失败时返回 None（调用方应回退为整体转换）
+    """
+    if not parts:
+        return None
+    if len(parts) == 1:
+        return parts[0]
+    try:
+        base = _Package(parts[0])
+        merger = _ChunkMerger(base)
+        for index, data in enumerate(parts[1:], start=1):
+            merger.merge(index, _Package(data))
+        _renumber_drawings(base.xml(_DOCUMENT))
+        return base.to_bytes(compression)
+    except (zipfile.BadZipFile, KeyError, ValueError, etree.XMLSyntaxError) as e:
+        log(f"Failed to merge DOCX chunks: {type(e).__name__}: {e}")
+        return None
@@ -1,13 +1,90 @@
 """DOCX document post-processing utilities."""
 
-import io
-from docx import Document
+from typing import Callable, List, Optional
+
+from lxml import etree
+
 from ..utils.logging import log
+from .docx_zip import DocxPartTransform, rewrite_docx_parts
+
+W_NS = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+
+_STYLES = "word/styles.xml"
+
+
+def _w(tag: str) -> str:
+    return f"{{{W_NS}}}{tag}"
+
+
+class ParagraphStyleTransform(DocxPartTransform):
+    """
+    把正文顶层段落的某个段落样式替换为另一个样式（按样式名称匹配，与 python-docx 的
+    doc.paragraphs / paragraph.style 语义一致：表格、文本框中的段落不处理）
+    """
+
+    part = "word/document.xml"
+
+    def __init__(self, source_style: str, target_style: str) -> None:
+        self.source_style = source_style
+        self.target_style = target_style
+
+    def apply(self, data: bytes, read_part: Callable[[str], Optional[bytes]]) -> Optional[bytes]:
+        styles = read_part(_STYLES)
+        if styles is None:
+            log(f"No styles part, skip replacing '{self.source_style}'")
+            return None
+        source_ids, target_id, default_id = self._resolve_style_ids(styles)
+        # 快速路径：文档中根本没有引用源样式
+        if not source_ids or not any(style_id.encode("utf-8") in data for style_id in source_ids):
+            log(f"No '{self.source_style}' style found in document")
+            return None
+        if target_id is None:
+            log(f"Style '{self.target_style}' not defined, keep '{self.source_style}'")
+            return None
+
+        root = etree.fromstring(data)
+        body = root.find(_w("body"))
+        modified_count = 0
+        if body is not None:
+            for p_style in body.iterfind(f"{_w('p')}/{_w('pPr')}/{_w('pStyle')}"):
+                if p_style.get(_w("val")) not in source_ids:
+                    continue
+                if target_id == default_id:
+                    # 目标为默认段落样式时不写 pStyle（与 python-docx 一致）
+                    p_style.getparent().remove(p_style)
+                else:
+                    p_style.set(_w("val"), target_id)
+                modified_count += 1
+
+        if modified_count == 0:
+            log(f"No '{self.source_style}' style found in document")
+            return None
+        log(f"Total {modified_count} paragraph(s) changed from '{self.source_style}' to '{self.target_style}'")
+        return etree.tostring(root, xml_declaration=True, encoding="UTF-8", standalone=True)
+
+    def _resolve_style_ids(self, styles: bytes):
+        """返回 (源样式 ID 集合, 目标样式 ID, 默认段落样式 ID)"""
+        source_ids = set()
+        target_id = None
+        default_id = None
+        for style in etree.fromstring(styles).iterfind(_w("style")):
+            if style.get(_w("type")) != "paragraph":
+                continue
+            style_id = style.get(_w("styleId"))
+            name_el = style.find(_w("name"))
+            name = name_el.get(_w("val")) if name_el is not None else None
+            if style.get(_w("default")) in ("1", "true", "on"):
+                default_id = style_id
+            if name == self.source_style:
+                source_ids.add(style_id)
+            elif name == self.target_style and target_id is None:
+                target_id = style_id
+        return source_ids, target_id, default_id
 
 
 class DocxProcessor:
     """DOCX 文档后处理器 - 用于修改已生成的 DOCX 文档样式"""
-    
+
     @staticmethod
     def normalize_first_paragraph_style(
         docx_bytes: bytes,
@@ -15,72 +92,72 @@ class DocxProcessor:
     ) -> bytes:
         """
         将 DOCX 文档中的 "First Paragraph" 样式替换为指定样式
-        
+
         Args:
             docx_bytes: DOCX 文件的字节流
             target_style: 目标样式名称，默认为 "Body Text"
-            
+
         Returns:
             修改后的 DOCX 文件字节流
         """
+        return DocxProcessor.apply_transforms(
+            docx_bytes,
+            [ParagraphStyleTransform("First Paragraph", target_style)],
+        )
+
+    @staticmethod
+    def apply_transforms(
+        docx_bytes: bytes,
+        transforms: List[DocxPartTransform],
+        transient: bool = False,
+    ) -> bytes:
+        """
+        在一次 zip 重写中串联执行多个部件改写步骤
+
+        只有被改写的部件会重新压缩，图片等其余成员按原压缩数据拷贝。
+
+        Args:
+            docx_bytes: DOCX 文件的字节流
+            transforms: 改写步骤，按顺序执行
+            transient: 输出只用于立即插入（不保留文件），XML 部件改为不压缩存储
+
+        Returns:
+            处理后的 DOCX 文件字节流；处理失败时返回原始字节流
+        """
         try:
-            # 从字节流加载文档
-            doc = Document(io.BytesIO(docx_bytes))
-            
-            # 统计修改的段落数量
-            modified_count = 0
-            
-            # 遍历所有段落
-            for paragraph in doc.paragraphs:
-                # 检查段落样式是否为 "First Paragraph"
-                if paragraph.style and paragraph.style.name == "First Paragraph":
-                    # 修改为目标样式
-                    paragraph.style = target_style
-                    modified_count += 1
-                    log(f"Changed paragraph style from 'First Paragraph' to '{target_style}'")
-            
-            # 如果有修改，记录日志
-            if modified_count > 0:
-                log(f"Total {modified_count} paragraph(s) changed from 'First Paragraph' to '{target_style}'")
-            else:
-                log("No 'First Paragraph' style found in document")
-            
-            # 将修改后的文档保存到字节流
-            output_stream = io.BytesIO()
-            doc.save(output_stream)
-            output_stream.seek(0)
-            
-            return output_stream.read()
-            
+            return rewrite_docx_parts(docx_bytes, transforms, store=transient)
         except Exception as e:
             log(f"Failed to process DOCX styles: {type(e).__name__}: {e}")
             # 如果处理失败，返回原始字节流
             return docx_bytes
-    
+
     @staticmethod
     def apply_custom_processing(
         docx_bytes: bytes,
         disable_first_para_indent: bool = False,
-        target_style: str = "Body Text"
+        target_style: str = "Body Text",
+        transient: bool = False,
     ) -> bytes:
         """
         对 DOCX 文档应用自定义后处理
-        
+
         Args:
             docx_bytes: DOCX 文件的字节流
             disable_first_para_indent: 是否禁用第一段特殊格式（替换 First Paragraph 样式）
             target_style: 目标样式名称
-            
+            transient: 输出只用于立即插入 Word/WPS（不保留文件），改为不压缩打包
+
         Returns:
             处理后的 DOCX 文件字节流
         """
+        transforms: List[DocxPartTransform] = []
+
         # 如果需要禁用第一段特殊格式
         if disable_first_para_indent:
-            docx_bytes = DocxProcessor.normalize_first_paragraph_style(
-                docx_bytes,
-                target_style
-            )
-        
-        # 可以在这里添加其他后处理逻辑
-        
-        return docx_bytes
+            transforms.append(ParagraphStyleTransform("First Paragraph", target_style))
+
+        # 可以在这里添加其他后处理步骤（同一部件上的步骤只解析、压缩一次）
+
+        if not transforms and not transient:
+            return docx_bytes
+        return DocxProcessor.apply_transforms(docx_bytes, transforms, transient)
@@ -0,0 +1,289 @@
+"""Rewrite selected parts of a DOCX package at the zip level."""
+
+from __future__ import annotations
+
+import io
+import struct
+import zipfile
+import zlib
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from .logging import log
+
+_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+_CENTRAL_HEADER = struct.Struct("<4s4B4HL2L5H2L")
+_END_RECORD = struct.Struct("<4s4H2LH")
+_LOCAL_SIG = b"PK\x03\x04"
+_CENTRAL_SIG = b"PK\x01\x02"
+_END_SIG = b"PK\x05\x06"
+_DESCRIPTOR_SIG = b"PK\x07\x08"
+
+# 通用标志位
+_FLAG_ENCRYPTED = 0x1
+_FLAG_DATA_DESCRIPTOR = 0x8
+_FLAG_UTF8 = 0x800
+
+# 临时输出（store=True）时改为不压缩存储的部件：Word/WPS 插入时要解压并解析的 XML；
+# 图片等媒体本身已压缩，仍按原压缩数据拷贝
+_STORE_SUFFIXES = (".xml", ".rels")
+
+# ZIP64 占位值
+_ZIP64_U16 = 0xFFFF
+_ZIP64_U32 = 0xFFFFFFFF
+
+
+class DocxPartTransform(ABC):
+    """
+    DOCX 部件改写步骤
+
+    子类设置 part（zip 成员名）并实现 apply；apply 返回 None 表示不修改。
+    同一部件上的多个步骤按顺序串联，部件只解压、压缩各一次。
+    """
+
+    part: str = "word/document.xml"
+
+    @abstractmethod
+    def apply(self, data: bytes, read_part: Callable[[str], Optional[bytes]]) -> Optional[bytes]:
+        """
+        Args:
+            data: 部件当前内容（已经过前面步骤的改写）
+            read_part: 读取包内其他部件的原始内容（不存在时返回 None）
+        """
+        pass
+
+
+class _UnsupportedZip(Exception):
+    """ZIP64、加密、分卷等本模块不直接处理的情况（回退到 zipfile 整包重写）"""
+
+
+class _Entry:
+    """中央目录中的一个成员"""
+
+    __slots__ = ("name", "central", "flags", "method", "csize", "offset", "raw")
+
+    def __init__(self, name: str, central: bytes, flags: int, method: int, csize: int, offset: int) -> None:
+        self.name = name
+        # 完整的中央目录记录（含文件名、扩展字段与注释）
+        self.central = central
+        self.flags = flags
+        self.method = method
+        self.csize = csize
+        self.offset = offset
+        # 本地文件头 + 压缩数据（+ 数据描述符）
+        self.raw = b""
+
+
+def _read_entries(data: bytes) -> Tuple[List[_Entry], bytes]:
+    """解析中央目录，返回 (成员列表, zip 注释)"""
+    end = data.rfind(_END_SIG, max(0, len(data) - _END_RECORD.size - 0xFFFF))
+    if end < 0:
+        raise zipfile.BadZipFile("End of central directory not found")
+    _, disk, cd_disk, count_disk, count, cd_size, cd_offset, comment_len = _END_RECORD.unpack_from(data, end)
+    if disk or cd_disk or count != count_disk or _ZIP64_U16 in (count,) or _ZIP64_U32 in (cd_size, cd_offset):
+        raise _UnsupportedZip("multi-disk or ZIP64 archive")
+    comment = data[end + _END_RECORD.size:end + _END_RECORD.size + comment_len]
+
+    entries: List[_Entry] = []
+    pos = cd_offset
+    for _ in range(count):
+        fields = _CENTRAL_HEADER.unpack_from(data, pos)
+        if fields[0] != _CENTRAL_SIG:
+            raise zipfile.BadZipFile("Bad central directory record")
+        flags, method = fields[5], fields[6]
+        csize, usize = fields[10], fields[11]
+        name_len, extra_len, comment_len = fields[12], fields[13], fields[14]
+        offset = fields[18]
+        if flags & _FLAG_ENCRYPTED or _ZIP64_U32 in (csize, usize, offset):
+            raise _UnsupportedZip("encrypted or ZIP64 member")
+        record_end = pos + _CENTRAL_HEADER.size + name_len + extra_len + comment_len
+        raw_name = data[pos + _CENTRAL_HEADER.size:pos + _CENTRAL_HEADER.size + name_len]
+        name = raw_name.decode("utf-8" if flags & _FLAG_UTF8 else "cp437")
+        entry = _Entry(name, data[pos:record_end], flags, method, csize, offset)
+
+        # 本地文件头的文件名/扩展字段长度可能与中央目录不同，按本地头计算数据位置
+        local = _LOCAL_HEADER.unpack_from(data, offset)
+        if local[0] != _LOCAL_SIG:
+            raise zipfile.BadZipFile(f"Bad local file header: {name}")
+        data_end = offset + _LOCAL_HEADER.size + local[10] + local[11] + csize
+        if flags & _FLAG_DATA_DESCRIPTOR:
+            data_end += 16 if data[data_end:data_end + 4] == _DESCRIPTOR_SIG else 12
+        entry.raw = data[offset:data_end]
+        entries.append(entry)
+        pos = record_end
+    return entries, comment
+
+
+def _entry_payload(entry: _Entry) -> bytes:
+    """解压成员内容"""
+    local = _LOCAL_HEADER.unpack_from(entry.raw, 0)
+    start = _LOCAL_HEADER.size + local[10] + local[11]
+    payload = entry.raw[start:start + entry.csize]
+    if entry.method == zipfile.ZIP_STORED:
+        return payload
+    if entry.method == zipfile.ZIP_DEFLATED:
+        return zlib.decompress(payload, -15)
+    raise _UnsupportedZip(f"compression method {entry.method}")
+
+
+def _rebuild_entry(entry: _Entry, content: bytes, method: int) -> None:
+    """用新内容替换成员：重写本地文件头与中央目录记录（不使用数据描述符）"""
+    if method == zipfile.ZIP_DEFLATED:
+        compressor = zlib.compressobj(zlib.Z_DEFAULT_COMPRESSION, zlib.DEFLATED, -15)
+        payload = compressor.compress(content) + compressor.flush()
+    else:
+        payload = content
+    crc = zlib.crc32(content)
+    fields = list(_CENTRAL_HEADER.unpack_from(entry.central, 0))
+    flags = fields[5] & _FLAG_UTF8
+    raw_name = entry.central[_CENTRAL_HEADER.size:_CENTRAL_HEADER.size + fields[12]]
+    extract_version = 20 if method == zipfile.ZIP_DEFLATED else 10
+
+    entry.raw = _LOCAL_HEADER.pack(
+        _LOCAL_SIG, extract_version, 0, flags, method, fields[7], fields[8],
+        crc, len(payload), len(content), len(raw_name), 0,
+    ) + raw_name + payload
+    fields[3] = extract_version
+    fields[5] = flags
+    fields[6] = method
+    fields[9], fields[10], fields[11] = crc, len(payload), len(content)
+    entry.central = _CENTRAL_HEADER.pack(*fields) + entry.central[_CENTRAL_HEADER.size:]
+    entry.flags, entry.method, entry.csize = flags, method, len(payload)
+
+
+def _write_package(entries: Sequence[_Entry], comment: bytes) -> bytes:
+    out = io.BytesIO()
+    central = []
+    for entry in entries:
+        offset = out.tell()
+        out.write(entry.raw)
+        # 中央目录记录中只需更新本地文件头的偏移
+        record = bytearray(entry.central)
+        struct.pack_into("<L", record, 42, offset)
+        central.append(bytes(record))
+    cd_offset = out.tell()
+    cd = b"".join(central)
+    out.write(cd)
+    out.write(_END_RECORD.pack(_END_SIG, 0, 0, len(entries), len(entries), len(cd), cd_offset, len(comment)))
+    out.write(comment)
+    return out.getvalue()
+
+
+def _apply_chain(
+    name: str,
+    content: bytes,
+    transforms: Sequence[DocxPartTransform],
+    read_part: Callable[[str], Optional[bytes]],
+) -> Optional[bytes]:
+    """按顺序执行同一部件上的改写步骤，全部未修改时返回 None"""
+    changed = False
+    for transform in transforms:
+        result = transform.apply(content, read_part)
+        if result is not None:
+            content = result
+            changed = True
+    return content if changed else None
+
+
+def _rewrite_with_zipfile(
+    docx_bytes: bytes,
+    transforms: Sequence[DocxPartTransform],
+    store: bool,
+) -> bytes:
+    """回退实现：用 zipfile 读出全部成员后整包重写"""
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zin:
+        infos = zin.infolist()
+        blobs = {info.filename: zin.read(info) for info in infos}
+
+    changed = False
+    for name in dict.fromkeys(t.part for t in transforms):
+        if name in blobs:
+            result = _apply_chain(name, blobs[name], [t for t in transforms if t.part == name], blobs.get)
+            if result is not None:
+                blobs[name] = result
+                changed = True
+    if not changed and not store:
+        return docx_bytes
+
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in infos:
+            compress_type = info.compress_type
+            if store and info.filename.endswith(_STORE_SUFFIXES):
+                compress_type = zipfile.ZIP_STORED
+            zout.writestr(info, blobs[info.filename], compress_type=compress_type)
+    return out.getvalue()
+
+
+def rewrite_docx_parts(
+    docx_bytes: bytes,
+    transforms: Sequence[DocxPartTransform],
+    *,
+    store: bool = False,
+) -> bytes:
+    """
+    在 zip 层面改写 DOCX 的部分部件
+
+    只解压、改写并重新压缩 transforms 涉及的部件；其余成员（图片、样式等）的
+    本地文件头与压缩数据原样拷贝，不解压也不重新压缩。没有任何部件被修改时
+    直接返回原字节流。
+
+    Args:
+        docx_bytes: DOCX 文件的字节流
+        transforms: 改写步骤，按顺序执行
+        store: 临时输出（插入后即删除）：改写的部件不再压缩，其余 XML 部件解压后
+            改为不压缩存储，省去本次压缩和插入时的解压；需要保留的文件应使用默认值
+
+    Returns:
+        改写后的 DOCX 字节流
+
+    Raises:
+        zipfile.BadZipFile: 不是有效的 zip 包
+    """
+    if not transforms and not store:
+        return docx_bytes
+    try:
+        entries, comment = _read_entries(docx_bytes)
+    except (_UnsupportedZip, struct.error) as e:
+        log(f"DOCX zip rewrite falls back to zipfile: {e}")
+        return _rewrite_with_zipfile(docx_bytes, transforms, store)
+
+    by_name: Dict[str, _Entry] = {entry.name: entry for entry in entries}
+    payloads: Dict[str, bytes] = {}
+
+    def read_part(name: str) -> Optional[bytes]:
+        entry = by_name.get(name)
+        if entry is None:
+            return None
+        content = payloads.get(name)
+        if content is None:
+            content = payloads[name] = _entry_payload(entry)
+        return content
+
+    changed = False
+    try:
+        for name in dict.fromkeys(t.part for t in transforms):
+            content = read_part(name)
+            if content is None:
+                continue
+            result = _apply_chain(name, content, [t for t in transforms if t.part == name], read_part)
+            if result is not None:
+                entry = by_name[name]
+                if store or entry.method == zipfile.ZIP_STORED:
+                    method = zipfile.ZIP_STORED
+                else:
+                    method = zipfile.ZIP_DEFLATED
+                _rebuild_entry(entry, result, method)
+                changed = True
+        if store:
+            for entry in entries:
+                if entry.method == zipfile.ZIP_DEFLATED and entry.name.endswith(_STORE_SUFFIXES):
+                    _rebuild_entry(entry, read_part(entry.name), zipfile.ZIP_STORED)
+                    changed = True
+    except (_UnsupportedZip, zlib.error) as e:
+        log(f"DOCX zip rewrite falls back to zipfile: {e}")
+        return _rewrite_with_zipfile(docx_bytes, transforms, store)
+
+    if not changed:
+        return docx_bytes
+    return _write_package(entries, comment)
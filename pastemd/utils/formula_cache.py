@@ -0,0 +1,470 @@
+# -*- coding: utf-8 -*-
+"""Persistent formula cache for the Office OMML paste path.
+
+OneNote/PowerPoint 工作流把 Markdown 中的 LaTeX 公式经 Pandoc --mathml 转为 MathML，
+再经 mathml2omml 转为 OMML。这里把「LaTeX 源码 -> MathML + OMML」保存在用户数据目录下
+的 sqlite 数据库中，跨会话复用：
+
+- 键为规范化后的 LaTeX 源码、行内/块级，以及当前 latex-replacements.lua 的内容摘要；
+- 一次粘贴中已缓存的公式在交给 Pandoc 前替换为占位符，转换后直接填回 OMML，
+  不再经过 MathML 往返；未缓存的公式照常转换，并按出现顺序与 Pandoc 输出的 MathML
+  对应后写入缓存；
+- 按总大小限制容量，超出时淘汰最久未使用的条目。
+
+缓存会把剪贴板中的公式源码持久保存到磁盘，因此默认关闭（formula_cache.enabled）。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import html as html_lib
+import os
+import re
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, field
+
+from ..config.paths import ensure_user_data_dir
+from .latex import MathScan, MathSpan
+from .logging import log
+from .omml import RangeIndex, convert_mathml_replacements, extract_mathml_elements
+
+# 缓存格式版本：MathML/OMML 的生成方式变化时递增，使旧条目全部失效
+_CACHE_FORMAT_VERSION = 1
+# 数据库表结构版本（PRAGMA user_version），不一致时重建
+_SCHEMA_VERSION = 1
+_DB_FILENAME = "formula_cache.sqlite3"
+_DEFAULT_MAX_SIZE_MB = 32
+# 超出容量时淘汰到容量的这个比例，避免之后每次写入都触发淘汰
+_EVICT_TARGET_RATIO = 0.9
+# 单条语句 IN (...) 的参数个数上限（旧版 sqlite 限制为 999）
+_SQL_BATCH = 500
+# 每个条目除 MathML/OMML 外的大致开销（键、索引）
+_ENTRY_OVERHEAD = 128
+
+_PLACEHOLDER_PREFIX = "PASTEMDF"
+# Pandoc 输出中不能填入 Office 公式的位置：注释、代码、标签内部（属性值）
+_LITERAL_RE = re.compile(
+    r'<!--.*?-->|<(pre|code|script|style)\b.*?</\1\s*>|<[^>]*>',
+    re.DOTALL | re.IGNORECASE,
+)
+_ANNOTATION_RE = re.compile(r'<annotation\b[^>]*application/x-tex[^>]*>(.*?)</annotation>', re.DOTALL)
+_DISPLAY_BLOCK_RE = re.compile(r'<math\b[^>]*\bdisplay="block"')
+# 公式中间的空行：Pandoc 不会跨空行识别公式
+_BLANK_LINE_RE = re.compile(r'\n[ \t]*\r?\n')
+
+_lua_digests: dict[str, tuple[tuple[int, int], str]] = {}
+
+
+def _normalize_latex(latex: str) -> str:
+    """规范化 LaTeX 源码：连续空白合并为一个空格（公式中空白不影响排版）"""
+    return " ".join(latex.split())
+
+
+def formula_cache_version(lua_path: str | None) -> str:
+    """
+    缓存版本：缓存格式版本 + latex-replacements.lua 内容摘要（未启用该 Filter 时传 None）
+
+    Filter 文件被修改后版本随之变化，旧条目不再命中，之后按 LRU 淘汰。
+    """
+    if not lua_path:
+        return f"{_CACHE_FORMAT_VERSION}:-"
+    try:
+        st = os.stat(lua_path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _lua_digests.get(lua_path)
+        if cached is None or cached[0] != stamp:
+            with open(lua_path, "rb") as f:
+                cached = (stamp, hashlib.sha256(f.read()).hexdigest()[:16])
+            _lua_digests[lua_path] = cached
+        return f"{_CACHE_FORMAT_VERSION}:{cached[1]}"
+    except OSError:
+        return f"{_CACHE_FORMAT_VERSION}:?"
+
+
+def formula_key(latex: str, display: bool, version: str) -> str:
+    """缓存键：版本 + 行内/块级 + 规范化后的 LaTeX 源码的摘要"""
+    raw = f"{version}\0{'D' if display else 'I'}\0{_normalize_latex(latex)}"
+    return hashlib.sha256(raw.encode("utf-8", "surrogatepass")).hexdigest()
+
+
+class FormulaCache:
+    """
+    sqlite 公式缓存（线程安全）
+
+    数据库不可用（无法创建、被占用等）时记录日志，本次运行内不再使用；
+    文件损坏时删除后重建。
+    """
+
+    def __init__(self, path: str, max_bytes: int) -> None:
+        self.path = path
+        self.max_bytes = max_bytes
+        self._conn: sqlite3.Connection | None = None
+        self._disabled = False
+        self._lock = threading.Lock()
+
+    # ---- 连接 ----
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5, check_same_thread=False)
+        try:
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                conn.executescript(
+                    f"""
+                    DROP TABLE IF EXISTS formulas;
+                    CREATE TABLE formulas (
+                        key TEXT PRIMARY KEY,
+                        mathml TEXT NOT NULL,
+                        omml TEXT NOT NULL,
+                        size INTEGER NOT NULL,
+                        last_used REAL NOT NULL
+                    );
+                    CREATE INDEX formulas_last_used ON formulas(last_used);
+                    PRAGMA user_version = {_SCHEMA_VERSION};
+                    """
+                )
+        except sqlite3.Error:
+            conn.close()
+            raise
+        return conn
+
+    def _connect(self) -> sqlite3.Connection | None:
+        """返回数据库连接（调用方持有锁）；不可用时返回 None"""
+        if self._conn is not None or self._disabled:
+            return self._conn
+        try:
+            self._conn = self._open()
+        except sqlite3.OperationalError as e:
+            self._fail(e)
+        except sqlite3.DatabaseError as e:
+            log(f"Formula cache is corrupted, recreating: {e}")
+            try:
+                os.remove(self.path)
+                self._conn = self._open()
+            except (OSError, sqlite3.Error) as e2:
+                self._fail(e2)
+        return self._conn
+
+    def _fail(self, error: Exception) -> None:
+        """出错后本次运行内停用缓存（调用方持有锁）"""
+        log(f"Formula cache disabled: {type(error).__name__}: {error}")
+        self._disabled = True
+        if self._conn is not None:
+            try:
+                self._conn.close()
+            except sqlite3.Error:
+                pass
+            self._conn = None
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    # ---- 读写 ----
+
+    def get_many(self, keys: list[str]) -> dict[str, tuple[str, str]]:
+        """批量查询，返回 键 -> (MathML, OMML 替换片段)，并刷新命中条目的使用时间"""
+        found: dict[str, tuple[str, str]] = {}
+        unique = list(dict.fromkeys(keys))
+        with self._lock:
+            conn = self._connect()
+            if conn is None or not unique:
+                return found
+            try:
+                with conn:
+                    for i in range(0, len(unique), _SQL_BATCH):
+                        batch = unique[i:i + _SQL_BATCH]
+                        marks = ",".join("?" * len(batch))
+                        rows = conn.execute(
+                            f"SELECT key, mathml, omml FROM formulas WHERE key IN ({marks})", batch
+                        )
+                        for key, mathml, omml in rows:
+                            found[key] = (mathml, omml)
+                    if found:
+                        now = time.time()
+                        conn.executemany(
+                            "UPDATE formulas SET last_used = ? WHERE key = ?",
+                            [(now, key) for key in found],
+                        )
+            except sqlite3.Error as e:
+                self._fail(e)
+                return {}
+        return found
+
+    def put_many(self, items: list[tuple[str, str, str]]) -> None:
+        """批量写入 (键, MathML, OMML 替换片段)，超出容量时淘汰最久未使用的条目"""
+        if not items:
+            return
+        now = time.time()
+        rows = [
+            (key, mathml, omml, len(mathml.encode("utf-8")) + len(omml.encode("utf-8")) + _ENTRY_OVERHEAD, now)
+            for key, mathml, omml in items
+        ]
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return
+            try:
+                with conn:
+                    conn.executemany("INSERT OR REPLACE INTO formulas VALUES (?, ?, ?, ?, ?)", rows)
+                    self._evict(conn)
+            except sqlite3.Error as e:
+                self._fail(e)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM formulas").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        excess = total - int(self.max_bytes * _EVICT_TARGET_RATIO)
+        victims = []
+        for key, size in conn.execute("SELECT key, size FROM formulas ORDER BY last_used"):
+            victims.append((key,))
+            excess -= size
+            if excess <= 0:
+                break
+        conn.executemany("DELETE FROM formulas WHERE key = ?", victims)
+        log(f"Formula cache evicted {len(victims)} entries")
+
+    # ---- 维护 ----
+
+    def stats(self) -> tuple[int, int]:
+        """返回 (条目数, 估算大小字节数)"""
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0, 0
+            try:
+                count, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM formulas").fetchone()
+            except sqlite3.Error as e:
+                self._fail(e)
+                return 0, 0
+        return count, size
+
+    def clear(self) -> tuple[int, int]:
+        """清空缓存并压缩数据库文件，返回清除前的 (条目数, 估算大小字节数)"""
+        count, size = self.stats()
+        with self._lock:
+            conn = self._connect()
+            if conn is None:
+                return 0, 0
+            try:
+                with conn:
+                    conn.execute("DELETE FROM formulas")
+                conn.execute("VACUUM")
+            except sqlite3.Error as e:
+                self._fail(e)
+                return 0, 0
+        log(f"Formula cache cleared: {count} entries, {size} bytes")
+        return count, size
+
+
+_cache: FormulaCache | None = None
+_cache_lock = threading.Lock()
+
+
+def get_formula_cache(max_size_mb: float | None = None) -> FormulaCache:
+    """全局公式缓存（首次使用时创建，数据库位于用户数据目录）；传入 max_size_mb 时更新容量"""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            path = os.path.join(ensure_user_data_dir(), _DB_FILENAME)
+            _cache = FormulaCache(path, _DEFAULT_MAX_SIZE_MB * 1024 * 1024)
+        if max_size_mb is not None:
+            _cache.max_bytes = max(0, int(max_size_mb * 1024 * 1024))
+        return _cache
+
+
+def clear_formula_cache() -> tuple[int, int]:
+    """清空公式缓存（托盘菜单调用），返回清除前的 (条目数, 估算大小字节数)"""
+    return get_formula_cache().clear()
+
+
+def close_formula_cache() -> None:
+    """关闭数据库连接（程序退出时调用）"""
+    with _cache_lock:
+        if _cache is not None:
+            _cache.close()
+
+
+@dataclass
+class _CachedFormula:
+    source: str  # 原文（含分隔符）
+    mathml: str
+    omml: str
+
+
+@dataclass
+class FormulaSubstitution:
+    """一次粘贴中公式的缓存查询结果"""
+
+    # 交给 Pandoc 的 Markdown：命中缓存的公式已替换为占位符
+    text: str
+    # 占位符前缀（保证不出现在原文中），占位符为 前缀 + 序号 + "Z"
+    prefix: str
+    hits: list[_CachedFormula] = field(default_factory=list)
+    # 未命中的公式 (键, 是否块级, LaTeX 源码)，按出现顺序
+    misses: list[tuple[str, bool, str]] = field(default_factory=list)
+
+
+def _pandoc_parses_math(text: str, span: MathSpan) -> bool:
+    """
+    span 是否会被 Pandoc 识别为公式（tex_math_dollars / tex_math_single_backslash 的规则）
+
+    MathScan 比 Pandoc 宽松：$ x$、$x $（$ 内侧有空白）、$x$3 / \\(x\\)3（结束分隔符后紧跟数字）
+    以及跨空行的公式，Pandoc 都按普通文本处理，这些位置不能替换为缓存的公式。
+    """
+    width = len(span.delimiter)
+    content = text[span.start + width:span.end - width]
+    if not content or _BLANK_LINE_RE.search(content):
+        return False
+    if span.display:
+        return True
+    if span.delimiter == "$" and (content[0].isspace() or content[-1].isspace()):
+        return False
+    following = text[span.end:span.end + 1]
+    return not (following and following in "0123456789")
+
+
+def substitute_cached_formulas(cache: FormulaCache, math: MathScan, version: str) -> FormulaSubstitution:
+    """
+    查询 Markdown 中全部公式，命中缓存的公式替换为占位符
+
+    Args:
+        cache: 公式缓存
+        math: 预处理得到的公式清单（位置对应 math.text）
+        version: formula_cache_version 的结果
+
+    Returns:
+        FormulaSubstitution；没有命中时 text 即原文
+    """
+    text = math.text
+    formulas = []
+    for span in math.spans:
+        if not _pandoc_parses_math(text, span):
+            continue
+        width = len(span.delimiter)
+        latex = text[span.start + width:span.end - width]
+        formulas.append((span, formula_key(latex, span.display, version), latex))
+    found = cache.get_many([key for _, key, _ in formulas])
+
+    prefix = _PLACEHOLDER_PREFIX
+    attempt = 0
+    while prefix in text:
+        attempt += 1
+        prefix = f"{_PLACEHOLDER_PREFIX}{attempt}Q"
+    result = FormulaSubstitution(text, prefix)
+
+    parts: list[str] = []
+    pos = 0
+    for span, key, latex in formulas:
+        entry = found.get(key)
+        if entry is None:
+            result.misses.append((key, span.display, latex))
+            continue
+        parts.append(text[pos:span.start])
+        parts.append(f"{prefix}{len(result.hits)}Z")
+        result.hits.append(_CachedFormula(text[span.start:span.end], entry[0], entry[1]))
+        pos = span.end
+    if parts:
+        parts.append(text[pos:])
+        result.text = "".join(parts)
+    return result
+
+
+def store_converted_formulas(
+    cache: FormulaCache,
+    html: str,
+    substitution: FormulaSubstitution,
+    *,
+    parallel: dict | None = None,
+) -> int:
+    """
+    把 Pandoc 为未命中公式生成的 MathML 转为 OMML 并写入缓存
+
+    MathML 元素按出现顺序与未命中的公式对应；数量或行内/块级不一致（原文含原始 MathML、
+    某些 $ 未被 Pandoc 识别为公式等）时不写入。MathML 带有 TeX 注释时还要求注释与源码一致。
+    转换结果同时进入内存缓存，随后的 convert_html_mathml_to_omml 直接复用。
+
+    Returns:
+        写入的条目数
+    """
+    if not substitution.misses:
+        return 0
+    elements = [mathml for mathml, _, _ in extract_mathml_elements(html)]
+    if len(elements) != len(substitution.misses):
+        log(f"Formula cache: {len(elements)} MathML elements for {len(substitution.misses)} formulas, skip storing")
+        return 0
+
+    pairs: list[tuple[str, str]] = []
+    for (key, display, latex), mathml in zip(substitution.misses, elements):
+        if bool(_DISPLAY_BLOCK_RE.match(mathml)) != display:
+            log("Formula cache: MathML elements do not line up with formulas, skip storing")
+            return 0
+        annotation = _ANNOTATION_RE.search(mathml)
+        if annotation is not None and _normalize_latex(html_lib.unescape(annotation.group(1))) != _normalize_latex(latex):
+            # 源码被 Filter 改写过（如 \kern），无法确定对应关系
+            continue
+        pairs.append((key, mathml))
+
+    replacements = convert_mathml_replacements([mathml for _, mathml in pairs], parallel=parallel)
+    items = [(key, mathml, replacements[mathml]) for key, mathml in pairs if mathml in replacements]
+    cache.put_many(items)
+    return len(items)
+
+
+def restore_cached_formulas(
+    html: str,
+    substitution: FormulaSubstitution,
+    *,
+    skip_table_mathml: bool = False,
+) -> str:
+    """
+    把 Pandoc 输出中的占位符替换为缓存的 OMML 条件注释
+
+    占位符落在代码、注释或标签属性中时还原为公式原文（与 Pandoc 对这些位置的处理一致）；
+    skip_table_mathml=True 时表格中的占位符填入缓存的 MathML。
+    """
+    if not substitution.hits:
+        return html
+    placeholder_re = re.compile(re.escape(substitution.prefix) + r'(\d+)Z')
+    literal = RangeIndex(html, _LITERAL_RE)
+    tables = RangeIndex(html) if skip_table_mathml else None
+
+    parts: list[str] = []
+    pos = 0
+    for match in placeholder_re.finditer(html):
+        index = int(match.group(1))
+        if index >= len(substitution.hits):
+            continue
+        formula = substitution.hits[index]
+        if literal.contains(match.start(), match.end()):
+            value = html_lib.escape(formula.source)
+        elif tables and tables.contains(match.start(), match.end()):
+            value = formula.mathml
+        else:
+            value = formula.omml
+        parts.append(html[pos:match.start()])
+        parts.append(value)
+        pos = match.end()
+    if not parts:
+        return html
+    parts.append(html[pos:])
+    return "".join(parts)
+
+
+__all__ = [
+    "FormulaCache",
+    "FormulaSubstitution",
+    "formula_cache_version",
+    "formula_key",
+    "get_formula_cache",
+    "clear_formula_cache",
+    "close_formula_cache",
+    "substitute_cached_formulas",
+    "store_converted_formulas",
+    "restore_cached_formulas",
+]
@@ -2,13 +2,11 @@
 
 from __future__ import annotations
 
-from typing import Iterable, Set
+import re
+from html import unescape
+from typing import Callable, Iterable, List, Optional, Set
 
-try:
-    from bs4 import BeautifulSoup, FeatureNotFound  # type: ignore
-except Exception:  # pragma: no cover - BeautifulSoup is in requirements
-    BeautifulSoup = None  # type: ignore
-    FeatureNotFound = None  # type: ignore
+from bs4 import BeautifulSoup
 
 from .logging import log
 from .clipboard import get_clipboard_text
@@ -92,29 +90,6 @@ MARKDOWN_HINTS: Iterable[str] = (
 )
 
 
-def _count_semantic_tags(html_soup) -> int:
-    """统计 HTML 中带有语义结构的标签数量。"""
-    body = html_soup.body or html_soup
-    count = 0
-    for tag in body.find_all(True):
-        name = tag.name.lower()
-        if name in SEMANTIC_TAGS:
-            count += 1
-    return count
-
-
-def _only_contains_inline_wrappers(html_soup) -> bool:
-    """判断 HTML 是否只包含 wrapper / inline 标签。"""
-    body = html_soup.body or html_soup
-    for tag in body.find_all(True):
-        name = tag.name.lower()
-        if name in ("html", "head", "body", "meta", "style"):
-            continue
-        if name not in INLINE_WRAPPER_TAGS:
-            return False
-    return True
-
-
 def _markdown_hint_score(text: str) -> int:
     """根据 Markdown 语法特征粗略打分。"""
     score = 0
@@ -124,70 +99,294 @@ def _markdown_hint_score(text: str) -> int:
     return score
 
 
-def _has_yuanbao_formula_tags(soup) -> bool:
-    """检测HTML中是否包含元宝的公式标签"""
-    
-    # 检查是否存在元宝的特征class
-    yuanbao_classes = ["ybc-markdown-katex", "ybc-pre-component", "ybc-p", "ybc-ul-component", "ybc-ol-component"]
-    
-    for class_name in yuanbao_classes:
-        # 查找包含该class的标签
-        elements = soup.find_all(class_=class_name)
-        if elements:
-            return True
-    
-    return False
+# 元宝的特征 class
+YUANBAO_CLASSES: Set[str] = {
+    "ybc-markdown-katex",
+    "ybc-pre-component",
+    "ybc-p",
+    "ybc-ul-component",
+    "ybc-ol-component",
+}
+
+# lxml 把文档开头的这些标签放进 <head>
+_HEAD_TAGS: Set[str] = {"title", "meta", "link", "base", "style", "script"}
+# <head> 中这些标签的内容不是标记，整段跳到对应的结束标签
+_HEAD_RAW_TAGS: Set[str] = {"title", "style", "script"}
+# 单遍扫描只处理出现在正文中的这些普通标签；libxml2 对其它标签（html/head/body/title、
+# script/style/textarea/xmp/plaintext 等原始文本元素、svg/template/select/frameset 等）有专门的
+# 容错规则，遇到时改为交给 BeautifulSoup 判断
+_FAST_BODY_TAGS: Set[str] = (SEMANTIC_TAGS | INLINE_WRAPPER_TAGS | {"div", "br", "img"}) - {"math"}
 
+# 不参与内联标签判断的标签
+_IGNORED_TAGS: Set[str] = {"html", "head", "body", "meta", "style"}
 
+# <head> 打开时遇到这些标签会关闭 head、开始 body；其它标签（如 input、section）会留在 head 中，
+# 之后的树结构取决于 libxml2 的容错规则，此时改为用 BeautifulSoup 判断
+_HEAD_CLOSING_TAGS: Set[str] = {
+    "a", "abbr", "address", "b", "bdo", "blockquote", "br", "center", "cite", "code", "dd",
+    "dfn", "dir", "div", "dl", "dt", "em", "fieldset", "font", "form", "h1", "h2", "h3", "h4",
+    "h5", "h6", "hr", "i", "iframe", "img", "kbd", "li", "map", "menu", "ol", "p", "pre", "q",
+    "s", "samp", "small", "span", "strike", "strong", "sub", "sup", "table", "tt", "u", "ul", "var",
+}
+
+# 下一个标记：<tag / </tag / <!-- / <! / <?
+_MARKUP_RE = re.compile(r"<(?:(/?)([A-Za-z][^\s/>]*)|(!--)|[!?])")
+# 标签剩余部分（属性值中可以包含 >）
+_TAG_REST_RE = re.compile(r"""(?:[^>"']|"[^"]*"|'[^']*')*>?""")
+_TRAILER_RE = re.compile(r"(?:\s|</(?:body|html)\s*>|<!--(?:[^-]|-(?!->))*-->)*", re.IGNORECASE)
+# html.unescape 与 libxml2 处理结果一致的字符引用
+_ENTITY_RE = re.compile(r"&(?:(amp|lt|gt|quot|nbsp);|#([0-9]{1,5});|#[xX]([0-9A-Fa-f]{1,4});)?")
+_DOCTYPE_RE = re.compile(r"<!doctype\b", re.IGNORECASE)
+_CLASS_ATTR_RE = re.compile(r"""(?:^|\s)class\s*=\s*(?:"([^"]*)"|'([^']*)'|([^\s>]+))""", re.IGNORECASE)
+_YUANBAO_CLASS_RE = re.compile(r"(?<![\w-])(?:%s)(?![\w-])" % "|".join(re.escape(c) for c in sorted(YUANBAO_CLASSES)))
+
+# 仅在没有结构标签时才需要文本，累计超过该长度后不再收集（Markdown 特征在开头足以判断）
+_MAX_TEXT_CHARS = 1024 * 1024
+# 单遍扫描最多检查的字符数；超出部分视为含有非内联标签，只按已收集的文本判断
+_MAX_SCAN_CHARS = 4 * 1024 * 1024
+
+
+def _is_simple_text(piece: str) -> bool:
+    """文本中的 & 都是常见的命名字符引用或 BMP 内可打印字符的数字引用"""
+    for match in _ENTITY_RE.finditer(piece):
+        if match.group(1):
+            continue
+        if match.group(2) or match.group(3):
+            code = int(match.group(2), 10) if match.group(2) else int(match.group(3), 16)
+            if 0x20 <= code < 0x7F or 0xA0 <= code < 0xD800:
+                continue
+        return False
+    return True
+
+
+class _NeedsTree(Exception):
+    """标记扫描无法确定 lxml 的树结构"""
+
+
+class _FragmentScan:
+    """
+    is_plain_html_fragment 需要的信息，与 BeautifulSoup(html, "lxml") 的结果对应：
 
-def is_plain_html_fragment(html: str) -> bool:
+    - has_yuanbao：整个文档中有元宝 class
+    - has_semantic / only_inline：body（没有 body 时为整个文档）中的标签
+    - text_pieces：body 中的文本（注释、script/style 内容除外）
+    """
+
+    def __init__(self, find_yuanbao: bool) -> None:
+        self.find_yuanbao = find_yuanbao
+        self.has_yuanbao = False
+        self.has_semantic = False
+        self.only_inline = True
+        self.text_pieces: List[str] = []
+        self.escaped = True
+        self._text_chars = 0
+
+    @property
+    def done(self) -> bool:
+        return self.has_semantic and (self.has_yuanbao or not self.find_yuanbao)
+
+    def check_class(self, value: Optional[str]) -> None:
+        if value and YUANBAO_CLASSES.intersection(value.split()):
+            self.has_yuanbao = True
+
+    def add_tag(self, name: str) -> None:
+        if name in SEMANTIC_TAGS:
+            self.has_semantic = True
+        elif name not in INLINE_WRAPPER_TAGS and name not in _IGNORED_TAGS:
+            self.only_inline = False
+
+    def add_text(self, piece: str) -> None:
+        if self._text_chars < _MAX_TEXT_CHARS:
+            self.text_pieces.append(piece)
+            self._text_chars += len(piece)
+
+    def text(self) -> str:
+        """与 body.get_text(separator="\n").strip() 对应的文本"""
+        pieces = []
+        for piece in self.text_pieces:
+            if self.escaped and "&" in piece:
+                piece = unescape(piece)
+            # 空白片段只会在分隔符之间多出空白，不影响 Markdown 特征
+            if piece.strip():
+                pieces.append(piece)
+        return "\n".join(pieces).strip()
+
+    def scan_markup(self, html: str) -> None:
+        """
+        单遍扫描标记（不构建树）；遇到第一个语义标签即停止（除非还需要查找元宝 class）
+
+        只处理常见的剪贴板片段：开头可选的 DOCTYPE / <html> / <head>（其中只有 meta、title、
+        style 等）/ <body>，正文中只有 _FAST_BODY_TAGS 中的标签、文本与注释。其余情况
+        （正文中的 </head>、结尾以外的 </body>、<?...>、CDATA、没有对应开始标签的结束标签、
+        未闭合的标签或注释、head 中的其它标签或文本、不常见的字符引用等）libxml2 的容错结果无法单遍复现，抛出 _NeedsTree。
+        只检查前 _MAX_SCAN_CHARS 个字符。
+        """
+        length = min(len(html), _MAX_SCAN_CHARS)
+        pos = 0
+        in_body = False
+        head_open = False
+        head_closed = False
+        seen_html = False
+        opened: Set[str] = set()
+        while pos < length:
+            match = _MARKUP_RE.search(html, pos, length)
+            text_end = length if match is None else match.start()
+            if text_end > pos:
+                piece = html[pos:text_end]
+                if "\0" in piece or ("&" in piece and not _is_simple_text(piece)):
+                    raise _NeedsTree()
+                if in_body:
+                    self.add_text(piece)
+                elif piece.strip():
+                    if head_open:
+                        raise _NeedsTree()
+                    in_body = True
+                    self.add_text(piece)
+            if match is None:
+                break
+
+            if match.group(3):
+                # 注释
+                end = html.find("-->", match.end(), length)
+                if end < 0:
+                    raise _NeedsTree()
+                pos = end + 3
+                continue
+            rest = _TAG_REST_RE.match(html, match.end(), length)
+            if not rest.group().endswith(">"):
+                raise _NeedsTree()
+            pos = rest.end()
+            name = match.group(2)
+            if name is None:
+                # 只接受文档开头的 <!DOCTYPE>；<?...?>、<![CDATA[...]]> 等交给树解析
+                if in_body or head_open or seen_html or not _DOCTYPE_RE.match(html, match.start()):
+                    raise _NeedsTree()
+                continue
+            name = name.lower()
+            if match.group(1):
+                if name == "head" and head_open and not in_body:
+                    head_open = False
+                    head_closed = True
+                    continue
+                # 剪贴板片段常以 </body></html> 结尾：其后只有空白和注释时正文已经结束
+                if in_body and name in ("body", "html") and _TRAILER_RE.fullmatch(html, match.start(), length):
+                    break
+                # 只接受正文中已打开过的普通标签的结束标签
+                if not in_body or name not in opened:
+                    raise _NeedsTree()
+                continue
+
+            attrs = html[match.end():pos]
+            if self.find_yuanbao and "ybc" in attrs:
+                class_match = _CLASS_ATTR_RE.search(attrs)
+                if class_match is not None:
+                    self.check_class(next(g for g in class_match.groups() if g is not None))
+
+            if not in_body:
+                if name == "html" and not seen_html and not head_open:
+                    seen_html = True
+                    continue
+                if head_closed and (name == "head" or name in _HEAD_TAGS):
+                    raise _NeedsTree()
+                if name == "head" and not head_open:
+                    seen_html = head_open = True
+                    continue
+                if name in _HEAD_TAGS:
+                    # 没有 <head> 时 lxml 同样把开头的这些标签放进隐式的 head
+                    seen_html = head_open = True
+                    if name in _HEAD_RAW_TAGS:
+                        pos = self._skip_raw(html, name, pos, length)
+                    continue
+                if name == "body":
+                    in_body = True
+                    continue
+                if head_open and name not in _HEAD_CLOSING_TAGS:
+                    # head 中出现的其它标签
+                    raise _NeedsTree()
+                in_body = True
+            if name not in _FAST_BODY_TAGS:
+                raise _NeedsTree()
+            opened.add(name)
+            self.add_tag(name)
+            if self.done:
+                break
+
+        if not in_body:
+            # 只有 head 内容：BeautifulSoup 按整个文档判断
+            raise _NeedsTree()
+        if length < len(html) and not self.has_semantic:
+            log(f"HTML fragment scan stopped after {length} of {len(html)} chars")
+            self.only_inline = False
+
+    @staticmethod
+    def _skip_raw(html: str, name: str, pos: int, length: int) -> int:
+        """跳过 head 中 title/style/script 的内容及其结束标签"""
+        close = re.compile(r"</%s[\s/>]" % re.escape(name), re.IGNORECASE).search(html, pos, length)
+        if close is None:
+            raise _NeedsTree()
+        rest = _TAG_REST_RE.match(html, close.end() - 1, length)
+        if not rest.group().endswith(">"):
+            raise _NeedsTree()
+        return rest.end()
+
+    def scan_tree(self, html: str) -> None:
+        """按原 BeautifulSoup(html, "lxml") 实现判断（用于单遍扫描无法复现 libxml2 容错规则的文档）"""
+        self.__init__(self.find_yuanbao)
+        self.escaped = False
+        soup = BeautifulSoup(html, "lxml")
+        if self.find_yuanbao:
+            for tag in soup.find_all(True):
+                classes = tag.get("class")
+                if classes:
+                    self.check_class(" ".join(classes) if isinstance(classes, list) else classes)
+        body = soup.body or soup
+        for tag in body.find_all(True):
+            self.add_tag(tag.name.lower())
+        self.text_pieces = [body.get_text(separator="\n")]
+
+
+def is_plain_html_fragment(html: str, get_text: Optional[Callable[[], str]] = None) -> bool:
     """
     判断 HTML 片段是否只是带壳的 Markdown / 纯文本。
 
     复制按钮经常返回“只有 span + 内联样式 + 纯文本”的 HTML，
     如果直接走 Pandoc HTML 流程会把 Markdown 符号原样贴进 Word。
     这里通过结构标签数量、内联标签检测、以及 Markdown 语法特征
-    来辅助判断是否应该退回 Markdown 流程。
+    来辅助判断是否应该退回 Markdown 流程。判断只需单遍扫描标记，不构建解析树，
+    遇到第一个语义标签即返回。
     
     特别地，对于元宝等应用，如果HTML中有公式标签但携带不可解析的HTML，
     而剪切板文本中有标准的LaTeX公式标记，则优先使用文本流程。
+
+    get_text 用于获取剪贴板文本（默认直接读取剪贴板），调用方可传入快照中已缓存的文本。
     """
     if not html or not html.strip():
         return True
 
-    if BeautifulSoup is None:  # pragma: no cover - fallback
-        # 简单兜底：没有解析器时，只要看不到典型结构标签就视为纯文本
-        lowered = html.lower()
-        return not any(tag in lowered for tag in ("<p", "<h1", "<ul", "<table", "<pre", "<code", "<blockquote"))
-
+    find_yuanbao = "ybc" in html and _YUANBAO_CLASS_RE.search(html) is not None
+    scan = _FragmentScan(find_yuanbao)
     try:
-        soup = BeautifulSoup(html, "lxml")
-    except Exception as exc:  # pragma: no cover - depends on env parser
-        if FeatureNotFound is not None and isinstance(exc, FeatureNotFound):
-            soup = BeautifulSoup(html, "html.parser")
-        else:
-            soup = BeautifulSoup(html, "html.parser")
+        scan.scan_markup(html)
+    except _NeedsTree:
+        scan.scan_tree(html)
+
     # 检测元宝公式：如果HTML中有元宝公式标签，且文本中有LaTeX公式，则使用文本
-    if "ybc" in html:
-        if _has_yuanbao_formula_tags(soup):
-            try:
-                clipboard_text = get_clipboard_text()
-                if clipboard_text and is_markdown(clipboard_text):
-                    log("检测到元宝公式标签且剪切板文本包含LaTeX公式，使用文本流程")
-                    return True
-            except Exception as e:
-                log(f"检测元宝公式时获取剪切板文本失败: {e}")
-
-    semantic_count = _count_semantic_tags(soup)
-
-    if semantic_count > 0:
+    if scan.has_yuanbao:
+        try:
+            clipboard_text = get_text() if get_text is not None else get_clipboard_text()
+            if clipboard_text and is_markdown(clipboard_text):
+                log("检测到元宝公式标签且剪切板文本包含LaTeX公式，使用文本流程")
+                return True
+        except Exception as e:
+            log(f"检测元宝公式时获取剪切板文本失败: {e}")
+
+    if scan.has_semantic:
         return False
 
-    if _only_contains_inline_wrappers(soup):
+    if scan.only_inline:
         return True
 
-    body = soup.body or soup
-    text = body.get_text(separator="\n").strip()
+    text = scan.text()
     if not text:
         return True
 
@@ -3,11 +3,12 @@
 from __future__ import annotations
 
 import re
-from typing import Dict, Optional
+from typing import Dict, Optional, Tuple
 
 from bs4 import BeautifulSoup, NavigableString, Tag
 
 _CSS_CLASS_RE = re.compile(r"\.(?P<class>[A-Za-z0-9_-]+)\s*\{(?P<body>[^}]*)\}", re.DOTALL)
+STRIKETHROUGH_RE = re.compile(r"~~([^~]+?)~~")
 
 
 def extract_html_body(html: str) -> str:
@@ -50,21 +51,17 @@ def clean_html_content(soup: BeautifulSoup, options: Optional[Dict[str, object]]
     _clean_latex_br_tags(soup)
 
 
-def convert_css_font_to_semantic(soup: BeautifulSoup) -> None:
+def parse_css_font_classes(css_text: str) -> Dict[str, Tuple[bool, bool]]:
     """
-    将 CSS 中的粗体/斜体类映射为 <strong>/<em>，以便 Pandoc 保留样式。
+    从 <style> 文本中解析出设置了粗体/斜体的 class。
 
-    主要用于 Excel/WPS 复制的 HTML：样式往往只写在 <style> 的 class 中，
-    直接转 Markdown 会丢失加粗/斜体信息。
+    Returns:
+        {class 名: (bold, italic)}，只包含至少有一种样式的 class。
     """
-    css_text_parts = []
-    for style in soup.find_all("style"):
-        css_text_parts.append(style.get_text() or "")
-    css_text = "\n".join(css_text_parts)
+    class_styles: Dict[str, Tuple[bool, bool]] = {}
     if not css_text.strip():
-        return
+        return class_styles
 
-    class_styles: dict[str, tuple[bool, bool]] = {}
     for match in _CSS_CLASS_RE.finditer(css_text):
         class_name = match.group("class")
         body = match.group("body").lower()
@@ -87,7 +84,20 @@ def convert_css_font_to_semantic(soup: BeautifulSoup) -> None:
 
         if bold or italic:
             class_styles[class_name] = (bold, italic)
+    return class_styles
+
 
+def convert_css_font_to_semantic(soup: BeautifulSoup) -> None:
+    """
+    将 CSS 中的粗体/斜体类映射为 <strong>/<em>，以便 Pandoc 保留样式。
+
+    主要用于 Excel/WPS 复制的 HTML：样式往往只写在 <style> 的 class 中，
+    直接转 Markdown 会丢失加粗/斜体信息。
+    """
+    css_text_parts = []
+    for style in soup.find_all("style"):
+        css_text_parts.append(style.get_text() or "")
+    class_styles = parse_css_font_classes("\n".join(css_text_parts))
     if not class_styles:
         return
 
@@ -218,13 +228,12 @@ def convert_strikethrough_to_del(soup) -> None:
         if isinstance(element, NavigableString):
             if "~~" not in element:
                 continue
-            pattern = r'~~([^~]+?)~~'
-            if not re.search(pattern, element):
+            if not STRIKETHROUGH_RE.search(element):
                 continue
 
             new_content = []
             last_end = 0
-            for match in re.finditer(pattern, element):
+            for match in STRIKETHROUGH_RE.finditer(element):
                 if match.start() > last_end:
                     new_content.append(element[last_end:match.start()])
 
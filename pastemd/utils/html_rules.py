@@ -0,0 +1,478 @@
+"""Single-traversal HTML formatting rules on an lxml tree.
+
+html_formatter 中的各个函数分别在 BeautifulSoup 树上 find_all 扫描一遍，
+Excel / 网页复制的大段 HTML 会被反复遍历多次，且 html.parser 本身就很慢。
+
+这里把每条格式化规则拆成「按标签注册的节点处理函数」，所有启用的规则在同一次
+深度优先遍历中执行，最后只序列化一次。规则的语义与 html_formatter 中对应函数一致：
+
+- RemoveSvgRule：clean_html_content 中删除 <svg> 与指向 .svg 的 <img>
+- LatexBrRule：_clean_latex_br_tags
+- StrikethroughRule：convert_strikethrough_to_del
+- CssFontRule：convert_css_font_to_semantic
+- BoldHeaderRule：promote_bold_first_row_to_header
+- RemoteImageRule：收集远程图片，供 prefetch_element_images 使用
+"""
+
+from __future__ import annotations
+
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from lxml import etree
+
+from .html_formatter import STRIKETHROUGH_RE, parse_css_font_classes
+from .image_prefetch import is_remote_image_src
+
+# 使用普通 etree 元素：lxml.html 的 HtmlElement 每创建一个代理对象都要调用一次 Python 层的类查找
+_PARSER = etree.HTMLParser(huge_tree=True, default_doctype=False)
+
+_LATEX_BR_CONTAINERS = ("p", "div", "span", "li", "td", "th")
+# 不处理其中文本的元素（原实现会把其中的 ~~ 也替换成标签，破坏脚本/样式）
+_RAW_TEXT_TAGS = frozenset(("script", "style"))
+
+
+def _drop_tree(el) -> None:
+    """删除元素及其子树，保留其后的文本（同 lxml.html 的 drop_tree）"""
+    parent = el.getparent()
+    if el.tail:
+        previous = el.getprevious()
+        if previous is None:
+            parent.text = (parent.text or "") + el.tail
+        else:
+            previous.tail = (previous.tail or "") + el.tail
+    parent.remove(el)
+
+
+def _text_content(el) -> str:
+    """子树中的全部文本（不含注释，同 BeautifulSoup 的 get_text）"""
+    return etree.tostring(el, method="text", encoding="unicode", with_tail=False)
+
+
+class HtmlRule:
+    """
+    单次遍历中的一条格式化规则
+
+    tags 为 None 时 enter 对所有元素调用，否则只对列出的标签调用；
+    handles_text 为 True 时对每段文本（元素的 text 与 tail）调用 text/tail。
+    """
+
+    name = ""
+    tags: Optional[Tuple[str, ...]] = None
+    handles_text = False
+
+    def prepare(self, root) -> bool:
+        """遍历前调用；返回 False 时本文档跳过该规则"""
+        return True
+
+    def enter(self, el):
+        """
+        处理元素（先序）
+
+        Returns:
+            继续遍历的元素（可以是替换后的新元素）；元素已被删除时返回 None
+        """
+        return el
+
+    def text(self, el) -> None:
+        """处理 el.text（el 的子元素已确定，新插入的元素不会再被遍历）"""
+
+    def tail(self, el) -> None:
+        """处理 el.tail（在 el 的 enter 之前调用）"""
+
+    def finish(self) -> None:
+        """遍历结束后调用"""
+
+
+def _is_svg(el) -> bool:
+    """<svg> 或指向 .svg 的 <img>（RemoveSvgRule 删除的元素）"""
+    return el.tag == "svg" or (el.tag == "img" and (el.get("src") or "").lower().endswith(".svg"))
+
+
+def _text_outside_svg(el) -> str:
+    """子树中 SVG 以外的文本（LatexBrRule 在 SVG 删除之前运行，统计 $$ 时跳过其中的文本）"""
+    if not any(_is_svg(node) for node in el.iter("svg", "img")):
+        return _text_content(el)
+    parts: List[str] = []
+    stack: list = [el]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, str):
+            parts.append(node)
+            continue
+        if node is not el and node.tail:
+            stack.append(node.tail)
+        if not isinstance(node.tag, str) or (node is not el and _is_svg(node)):
+            continue
+        if node.text:
+            parts.append(node.text)
+        stack.extend(reversed(node))
+    return "".join(parts)
+
+
+class RemoveSvgRule(HtmlRule):
+    name = "remove_svg"
+    tags = ("svg", "img")
+
+    def enter(self, el):
+        if not _is_svg(el):
+            return el
+        _drop_tree(el)
+        return None
+
+
+class LatexBrRule(HtmlRule):
+    """
+    删除 KaTeX 元素内以及 $$ ... $$ 之间的 <br>
+
+    <br> 在遍历结束后才删除：原实现先删除 <br> 再处理删除线，<br> 两侧仍是两段独立文本，
+    立即删除会把两段文本合并，使 ~~ 跨过 <br> 配对。
+    """
+
+    name = "latex_br"
+
+    def __init__(self) -> None:
+        self._to_drop: List = []
+
+    def enter(self, el):
+        class_attr = el.get("class")
+        if class_attr and "katex" in class_attr:
+            self._to_drop.extend(el.iter("br"))
+            return el
+        if el.tag in _LATEX_BR_CONTAINERS and el.find("br") is not None and "$$" in _text_outside_svg(el):
+            self._collect_br_inside_math(el)
+        return el
+
+    def _collect_br_inside_math(self, el) -> None:
+        in_latex = (el.text or "").count("$$") % 2 == 1
+        for child in el:
+            if child.tag == "br":
+                if in_latex:
+                    self._to_drop.append(child)
+            elif isinstance(child.tag, str):
+                if not _is_svg(child) and _text_outside_svg(child).count("$$") % 2 == 1:
+                    in_latex = not in_latex
+            elif (child.text or "").count("$$") % 2 == 1:
+                # 注释在 BeautifulSoup 中也是文本节点
+                in_latex = not in_latex
+            if (child.tail or "").count("$$") % 2 == 1:
+                in_latex = not in_latex
+
+    def finish(self) -> None:
+        for br in self._to_drop:
+            # 同一个 <br> 可能被外层和内层容器重复收集
+            if br.getparent() is not None:
+                _drop_tree(br)
+        self._to_drop = []
+
+
+class StrikethroughRule(HtmlRule):
+    """~~text~~ → <del>text</del>"""
+
+    name = "strikethrough"
+    tags = ()
+    handles_text = True
+
+    @staticmethod
+    def _split(text: str) -> Optional[Tuple[str, List[Tuple[str, str]]]]:
+        """返回 (首段文本, [(删除线文本, 其后的文本), ...])；没有匹配时返回 None"""
+        if "~~" not in text:
+            return None
+        matches = list(STRIKETHROUGH_RE.finditer(text))
+        if not matches:
+            return None
+        pieces = []
+        for i, match in enumerate(matches):
+            end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+            pieces.append((match.group(1), text[match.end():end]))
+        return text[:matches[0].start()], pieces
+
+    @staticmethod
+    def _new_del(content: str, tail: str):
+        del_el = etree.Element("del")
+        del_el.text = content
+        del_el.tail = tail or None
+        return del_el
+
+    def text(self, el) -> None:
+        if not el.text or el.tag in _RAW_TEXT_TAGS:
+            return
+        split = self._split(el.text)
+        if split is None:
+            return
+        head, pieces = split
+        el.text = head or None
+        for index, (content, tail) in enumerate(pieces):
+            el.insert(index, self._new_del(content, tail))
+
+    def tail(self, el) -> None:
+        if not el.tail:
+            return
+        split = self._split(el.tail)
+        if split is None:
+            return
+        head, pieces = split
+        el.tail = head or None
+        anchor = el
+        for content, tail in pieces:
+            del_el = self._new_del(content, tail)
+            anchor.addnext(del_el)
+            anchor = del_el
+
+
+class CssFontRule(HtmlRule):
+    """<style> 中设置了粗体/斜体的 class → <strong>/<em>"""
+
+    name = "css_font"
+
+    def __init__(self) -> None:
+        self.class_styles: Dict[str, Tuple[bool, bool]] = {}
+
+    def prepare(self, root) -> bool:
+        css_text_parts = []
+        for style in root.iter("style"):
+            # <svg> 会先被删除，其中的样式不参与
+            if any(ancestor.tag == "svg" for ancestor in style.iterancestors()):
+                continue
+            css_text_parts.append(style.text or "")
+        self.class_styles = parse_css_font_classes("\n".join(css_text_parts))
+        return bool(self.class_styles)
+
+    @staticmethod
+    def _build_wrapper(bold: bool, italic: bool):
+        if bold and italic:
+            strong = etree.Element("strong")
+            em = etree.SubElement(strong, "em")
+            return strong, em
+        wrapper = etree.Element("strong" if bold else "em")
+        return wrapper, wrapper
+
+    @staticmethod
+    def _move_contents(source, target) -> None:
+        target.text = source.text
+        source.text = None
+        for child in list(source):
+            target.append(child)
+
+    def enter(self, el):
+        class_attr = el.get("class")
+        if not class_attr:
+            return el
+        bold = False
+        italic = False
+        for class_name in class_attr.split():
+            styles = self.class_styles.get(class_name)
+            if styles is not None:
+                bold = bold or styles[0]
+                italic = italic or styles[1]
+        if not (bold or italic):
+            return el
+
+        tag = el.tag
+        if tag in ("table", "tbody", "thead", "tfoot", "tr"):
+            return el
+
+        if tag in ("td", "th"):
+            # 原实现在删除 SVG 之后才处理样式：只含 SVG 的单元格视为空
+            if not el.text and all(_is_svg(child) and not child.tail for child in el):
+                return el
+            wrapper, inner = self._build_wrapper(bold, italic)
+            self._move_contents(el, inner)
+            el.append(wrapper)
+            return el
+
+        if tag in ("strong", "em"):
+            if tag == "strong" and bold and not italic:
+                return el
+            if tag == "em" and italic and not bold:
+                return el
+            # 需要补充另一种样式，直接包裹内容
+            if tag == "strong" and italic:
+                wrapper = etree.Element("em")
+            elif tag == "em" and bold:
+                wrapper = etree.Element("strong")
+            else:
+                return el
+            self._move_contents(el, wrapper)
+            el.append(wrapper)
+            return el
+
+        parent = el.getparent()
+        if parent is None:
+            return el
+        wrapper, inner = self._build_wrapper(bold, italic)
+        self._move_contents(el, inner)
+        wrapper.tail = el.tail
+        el.tail = None
+        parent.replace(el, wrapper)
+        return wrapper
+
+
+class BoldHeaderRule(HtmlRule):
+    """首行单元格全部加粗、其余行有非粗体单元格时，把首行提升为 <th>"""
+
+    name = "bold_header"
+    tags = ("table",)
+
+    def __init__(self) -> None:
+        self.tables: List = []
+
+    def enter(self, el):
+        # 需要在 CssFontRule 包裹完单元格内容之后判断，这里只收集
+        self.tables.append(el)
+        return el
+
+    @staticmethod
+    def _cell_is_bold(cell) -> bool:
+        if cell.text and cell.text.strip():
+            return False
+        children = 0
+        only = None
+        for child in cell:
+            if isinstance(child.tag, str) or (child.text or "").strip():
+                children += 1
+                only = child
+            if child.tail and child.tail.strip():
+                return False
+        return children == 1 and only.tag in ("strong", "b")
+
+    @staticmethod
+    def _cells(row) -> list:
+        return [child for child in row if child.tag in ("td", "th")]
+
+    def finish(self) -> None:
+        for table in self.tables:
+            if next(table.iter("th"), None) is not None:
+                continue
+            rows = list(table.iter("tr"))
+            if len(rows) < 2:
+                continue
+            header_cells = self._cells(rows[0])
+            if not header_cells or not all(self._cell_is_bold(cell) for cell in header_cells):
+                continue
+            if all(self._cell_is_bold(cell) for row in rows[1:] for cell in self._cells(row)):
+                continue
+            for cell in header_cells:
+                cell.tag = "th"
+        self.tables = []
+
+
+class RemoteImageRule(HtmlRule):
+    """收集 src 为 http(s) 的 <img>"""
+
+    name = "remote_images"
+    tags = ("img",)
+
+    def __init__(self) -> None:
+        self.images: List = []
+
+    def enter(self, el):
+        if is_remote_image_src(el.get("src")):
+            self.images.append(el)
+        return el
+
+
+def build_formatting_rules(html_formatting: dict) -> List[HtmlRule]:
+    """按 html_formatting 配置生成规则列表（顺序与 HtmlPreprocessor 原有处理顺序一致）"""
+    rules: List[HtmlRule] = [RemoveSvgRule(), LatexBrRule()]
+    if html_formatting.get("strikethrough_to_del", True):
+        rules.append(StrikethroughRule())
+    if html_formatting.get("css_font_to_semantic", True):
+        rules.append(CssFontRule())
+    if html_formatting.get("bold_first_row_to_header", False):
+        rules.append(BoldHeaderRule())
+    return rules
+
+
+class HtmlRuleEngine:
+    """在一次深度优先遍历中执行全部规则，并记录每条规则的耗时（秒）"""
+
+    def __init__(self, rules: List[HtmlRule]) -> None:
+        self.rules = rules
+        self.timings: Dict[str, float] = {}
+
+    def _timed(self, rule: HtmlRule, fn: Callable) -> Callable:
+        timings = self.timings
+        name = rule.name
+        perf_counter = time.perf_counter
+
+        def _call(arg):
+            start = perf_counter()
+            try:
+                return fn(arg)
+            finally:
+                timings[name] += perf_counter() - start
+
+        return _call
+
+    def run(self, root) -> None:
+        active = []
+        for rule in self.rules:
+            start = time.perf_counter()
+            enabled = rule.prepare(root)
+            self.timings[rule.name] = self.timings.get(rule.name, 0.0) + time.perf_counter() - start
+            if enabled:
+                active.append(rule)
+
+        entries: List[Tuple[Optional[Tuple[str, ...]], Callable]] = []
+        text_handlers: List[Callable] = []
+        tail_handlers: List[Callable] = []
+        for rule in active:
+            if rule.tags is None or rule.tags:
+                entries.append((rule.tags, self._timed(rule, rule.enter)))
+            if rule.handles_text:
+                text_handlers.append(self._timed(rule, rule.text))
+                tail_handlers.append(self._timed(rule, rule.tail))
+
+        # 按标签预先展开处理函数列表（保持规则顺序）
+        default_chain = [enter for tags, enter in entries if tags is None]
+        chains: Dict[str, List[Callable]] = {
+            tag: [enter for tags, enter in entries if tags is None or tag in tags]
+            for rule in active if rule.tags
+            for tag in rule.tags
+        }
+
+        stack = [root]
+        pop = stack.pop
+        extend = stack.extend
+        while stack:
+            el = pop()
+            if tail_handlers and el.tail:
+                for handler in tail_handlers:
+                    handler(el)
+            tag = el.tag
+            if not isinstance(tag, str):
+                # 注释 / 处理指令
+                continue
+            for handler in chains.get(tag, default_chain):
+                el = handler(el)
+                if el is None:
+                    break
+            if el is None:
+                continue
+            # 先压栈子元素，text 处理新插入的 <del> 不会再被遍历
+            extend(reversed(el))
+            if text_handlers and el.text:
+                for handler in text_handlers:
+                    handler(el)
+
+        for rule in active:
+            start = time.perf_counter()
+            rule.finish()
+            self.timings[rule.name] += time.perf_counter() - start
+
+
+def parse_html(html: str):
+    """解析为 lxml 文档树（保留原有 DOCTYPE，不自动补充）"""
+    root = etree.fromstring(html, parser=_PARSER)
+    if root is None:
+        raise etree.ParserError("Document is empty")
+    return root
+
+
+def serialize_html(root) -> str:
+    return etree.tostring(root.getroottree(), encoding="unicode", method="html")
+
+
+def format_rule_timings(timings: Dict[str, float]) -> str:
+    return ", ".join(f"{name} {seconds * 1000:.1f} ms" for name, seconds in timings.items())
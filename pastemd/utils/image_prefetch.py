@@ -0,0 +1,406 @@
+"""Concurrent remote-image prefetcher with a local content cache.
+
+Pandoc 生成 DOCX 时会逐张串行下载远程图片，一个慢主机就能拖住整个粘贴。
+这里在预处理阶段收集图片 URL，用有界线程池并发下载（请求头与
+pandoc_request_headers 一致），写入按内容哈希命名的磁盘缓存（TTL + 总大小淘汰），
+再把引用改写为本地路径，Pandoc 直接读本地文件。
+
+下载失败或超出整体截止时间（deadline_s）的图片保持原 URL，由 Pandoc 按原逻辑处理；
+当前线程绑定的取消句柄被触发时立即放弃等待。
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, List, Optional
+
+from ..config.paths import get_user_data_dir
+from .logging import log
+
+# Markdown 图片：![alt](url "title") / ![alt](<url>)
+_MD_IMAGE_RE = re.compile(
+    r'(!\[[^\]]*\]\(\s*<?)(https?://[^\s)>]+)(>?(?:\s+(?:"[^"]*"|\'[^\']*\'))?\s*\))'
+)
+# Markdown 中内嵌的 <img src="...">
+_HTML_IMG_SRC_RE = re.compile(
+    r'(<img\b[^>]*?\bsrc\s*=\s*["\'])(https?://[^"\']+)(["\'])',
+    re.IGNORECASE,
+)
+# 围栏代码块内的内容不改写
+_FENCE_RE = re.compile(r'^(```|~~~)[^\n]*\n.*?^\1[ \t]*$', re.MULTILINE | re.DOTALL)
+
+_READ_CHUNK = 64 * 1024
+# 等待下载期间检查取消句柄的间隔（秒）
+_POLL_INTERVAL_S = 0.1
+
+
+def _sniff_extension(data: bytes, content_type: str) -> Optional[str]:
+    """根据文件头判断图片扩展名（Pandoc 按扩展名识别图片类型）"""
+    head = data[:16]
+    if head.startswith(b"\x89PNG"):
+        return ".png"
+    if head.startswith(b"\xff\xd8"):
+        return ".jpg"
+    if head.startswith(b"GIF8"):
+        return ".gif"
+    if head.startswith(b"RIFF") and data[8:12] == b"WEBP":
+        return ".webp"
+    if head.startswith(b"BM"):
+        return ".bmp"
+    content_type = content_type.lower()
+    if "svg" in content_type or b"<svg" in data[:512].lower():
+        return ".svg"
+    return None
+
+
+def _parse_headers(request_headers: Iterable[str]) -> Dict[str, str]:
+    headers: Dict[str, str] = {}
+    for raw in request_headers or []:
+        if not isinstance(raw, str):
+            continue
+        name, sep, value = raw.partition(":")
+        if sep and name.strip():
+            headers[name.strip()] = value.strip()
+    return headers
+
+
+def _number_setting(settings: dict, key: str, default: float) -> float:
+    """读取数值配置，无法解析时回退默认值"""
+    try:
+        return float(settings.get(key, default))
+    except (TypeError, ValueError):
+        log(f"Invalid image_prefetch.{key}: {settings.get(key)!r}, using {default}")
+        return float(default)
+
+
+class ImageCache:
+    """按内容哈希存储的图片磁盘缓存（线程安全）"""
+
+    def __init__(self, cache_dir: str) -> None:
+        self.cache_dir = cache_dir
+        self._index_path = os.path.join(cache_dir, "index.json")
+        self._lock = threading.Lock()
+        self._index: Optional[Dict[str, list]] = None
+
+    def _load_index_locked(self) -> Dict[str, list]:
+        if self._index is None:
+            try:
+                with open(self._index_path, "r", encoding="utf-8") as f:
+                    data = json.load(f)
+                self._index = data if isinstance(data, dict) else {}
+            except (OSError, ValueError):
+                self._index = {}
+        return self._index
+
+    def _save_index_locked(self) -> None:
+        tmp_path = self._index_path + ".tmp"
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(self._index or {}, f)
+            os.replace(tmp_path, self._index_path)
+        except OSError as e:
+            log(f"Image cache index save failed: {e}")
+
+    def lookup(self, url: str, ttl_s: float) -> Optional[str]:
+        """查找未过期的缓存文件路径"""
+        with self._lock:
+            entry = self._load_index_locked().get(url)
+        if not entry:
+            return None
+        name, fetched_at = entry
+        if ttl_s > 0 and time.time() - fetched_at > ttl_s:
+            return None
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.isfile(path):
+            return None
+        try:
+            os.utime(path, None)
+        except OSError:
+            pass
+        return path
+
+    def store(self, url: str, data: bytes, ext: str) -> str:
+        """写入内容并登记 URL，返回本地路径（相同内容只存一份）"""
+        name = hashlib.sha256(data).hexdigest() + ext
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.isfile(path):
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{path}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        with self._lock:
+            self._load_index_locked()[url] = [name, time.time()]
+        return path
+
+    def flush_and_evict(self, ttl_s: float, max_bytes: int) -> None:
+        """清理过期索引、按总大小淘汰最久未使用的文件，并保存索引"""
+        with self._lock:
+            index = self._load_index_locked()
+            now = time.time()
+            if ttl_s > 0:
+                for url in [u for u, (_, ts) in index.items() if now - ts > ttl_s]:
+                    del index[url]
+
+            entries = []
+            try:
+                with os.scandir(self.cache_dir) as it:
+                    for entry in it:
+                        if entry.name == "index.json" or entry.name.endswith(".tmp"):
+                            continue
+                        try:
+                            st = entry.stat()
+                        except OSError:
+                            continue
+                        entries.append((entry.name, st.st_mtime, st.st_size))
+            except OSError:
+                entries = []
+
+            referenced = {name for name, _ in index.values()}
+            total = sum(size for _, _, size in entries)
+            entries.sort(key=lambda item: item[1])
+            removed = set()
+            for name, _, size in entries:
+                # 不再被引用的文件，或超出总大小上限时从最旧的开始删
+                if name in referenced and total <= max_bytes:
+                    continue
+                try:
+                    os.remove(os.path.join(self.cache_dir, name))
+                except OSError:
+                    continue
+                total -= size
+                removed.add(name)
+
+            if removed:
+                for url in [u for u, (name, _) in index.items() if name in removed]:
+                    del index[url]
+                log(f"Image cache evicted {len(removed)} files")
+            self._save_index_locked()
+
+
+_cache: Optional[ImageCache] = None
+_cache_lock = threading.Lock()
+
+
+def get_image_cache() -> ImageCache:
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = ImageCache(os.path.join(get_user_data_dir(), "cache", "images"))
+        return _cache
+
+
+def _fetch(url: str, headers: Dict[str, str], timeout_s: float, max_bytes: int) -> Optional[tuple]:
+    request = urllib.request.Request(url, headers=headers)
+    with urllib.request.urlopen(request, timeout=timeout_s) as resp:
+        content_type = resp.headers.get("Content-Type", "") or ""
+        chunks: List[bytes] = []
+        size = 0
+        while True:
+            chunk = resp.read(_READ_CHUNK)
+            if not chunk:
+                break
+            size += len(chunk)
+            if size > max_bytes:
+                log(f"Image prefetch skipped (larger than {max_bytes} bytes): {url}")
+                return None
+            chunks.append(chunk)
+    data = b"".join(chunks)
+    ext = _sniff_extension(data, content_type)
+    if ext is None:
+        log(f"Image prefetch skipped (not an image, Content-Type={content_type!r}): {url}")
+        return None
+    return data, ext
+
+
+def prefetch_images(urls: Iterable[str], request_headers: Iterable[str], settings: dict) -> Dict[str, str]:
+    """
+    并发下载图片到本地缓存
+
+    Args:
+        urls: 图片 URL（重复项会合并）
+        request_headers: ["Name: Value", ...]，与 pandoc --request-header 一致
+        settings: image_prefetch 配置
+
+    Returns:
+        {url: 本地路径}，只包含成功的条目
+    """
+    unique_urls = list(dict.fromkeys(urls))
+    if not unique_urls:
+        return {}
+
+    ttl_s = _number_setting(settings, "ttl_hours", 24) * 3600
+    max_cache_bytes = int(_number_setting(settings, "max_cache_mb", 200) * 1024 * 1024)
+    max_image_bytes = int(_number_setting(settings, "max_image_mb", 20) * 1024 * 1024)
+    timeout_s = _number_setting(settings, "timeout_s", 10)
+    deadline_s = _number_setting(settings, "deadline_s", 30)
+    max_workers = max(1, int(_number_setting(settings, "max_workers", 8)))
+
+    cache = get_image_cache()
+    resolved: Dict[str, str] = {}
+    to_fetch: List[str] = []
+    for url in unique_urls:
+        path = cache.lookup(url, ttl_s)
+        if path:
+            resolved[url] = path
+        else:
+            to_fetch.append(url)
+
+    started = time.perf_counter()
+    if to_fetch:
+        headers = _parse_headers(request_headers)
+
+        def _task(url: str) -> Optional[str]:
+            try:
+                fetched = _fetch(url, headers, timeout_s, max_image_bytes)
+            except Exception as e:
+                log(f"Image prefetch failed: {url}: {e}")
+                return None
+            if fetched is None:
+                return None
+            data, ext = fetched
+            try:
+                return cache.store(url, data, ext)
+            except OSError as e:
+                log(f"Image cache write failed: {e}")
+                return None
+
+        from ..integrations.pandoc_runner import current_cancel_token
+
+        token = current_cancel_token()
+        deadline = time.monotonic() + deadline_s if deadline_s > 0 else None
+        pool = ThreadPoolExecutor(max_workers=min(max_workers, len(to_fetch)))
+        pending = {pool.submit(_task, url): url for url in to_fetch}
+        try:
+            while pending:
+                if token is not None:
+                    token.raise_if_cancelled()
+                timeout = _POLL_INTERVAL_S
+                if deadline is not None:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        log(f"Image prefetch deadline ({deadline_s:g} s) reached, {len(pending)} urls left to Pandoc")
+                        break
+                    timeout = min(timeout, remaining)
+                done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+                for future in done:
+                    url = pending.pop(future)
+                    path = future.result()
+                    if path:
+                        resolved[url] = path
+        finally:
+            # 未完成的下载留在后台线程里自然结束（受 timeout_s 约束），不再阻塞粘贴
+            pool.shutdown(wait=False, cancel_futures=True)
+
+        cache.flush_and_evict(ttl_s, max_cache_bytes)
+
+    log(
+        f"Image prefetch: {len(unique_urls)} urls, {len(unique_urls) - len(to_fetch)} cached, "
+        f"{len(resolved)} resolved in {(time.perf_counter() - started) * 1000:.0f} ms"
+    )
+    return resolved
+
+
+def _local_ref(path: str) -> str:
+    # Pandoc 在各平台都接受正斜杠路径
+    return path.replace("\\", "/")
+
+
+def _split_outside_fences(markdown: str) -> List[tuple]:
+    """把 Markdown 切成 [(is_code, text), ...]"""
+    parts = []
+    pos = 0
+    for match in _FENCE_RE.finditer(markdown):
+        if match.start() > pos:
+            parts.append((False, markdown[pos:match.start()]))
+        parts.append((True, match.group(0)))
+        pos = match.end()
+    if pos < len(markdown):
+        parts.append((False, markdown[pos:]))
+    return parts
+
+
+def collect_markdown_image_urls(markdown: str) -> List[str]:
+    """收集 Markdown（含内嵌 <img>）中的远程图片 URL，忽略围栏代码块"""
+    urls: List[str] = []
+    for is_code, text in _split_outside_fences(markdown):
+        if is_code:
+            continue
+        urls.extend(m.group(2) for m in _MD_IMAGE_RE.finditer(text))
+        urls.extend(m.group(2) for m in _HTML_IMG_SRC_RE.finditer(text))
+    return urls
+
+
+def rewrite_markdown_image_urls(markdown: str, mapping: Dict[str, str]) -> str:
+    """把 Markdown 中已下载的图片 URL 改写为本地路径"""
+    if not mapping:
+        return markdown
+
+    def _md_sub(match: re.Match) -> str:
+        path = mapping.get(match.group(2))
+        if not path:
+            return match.group(0)
+        prefix = match.group(1)
+        suffix = match.group(3)
+        # 路径可能含空格，统一用 <...> 包裹
+        if not prefix.endswith("<"):
+            prefix += "<"
+            suffix = ">" + suffix
+        return f"{prefix}{_local_ref(path)}{suffix}"
+
+    def _img_sub(match: re.Match) -> str:
+        path = mapping.get(match.group(2))
+        if not path:
+            return match.group(0)
+        return f"{match.group(1)}{_local_ref(path)}{match.group(3)}"
+
+    out = []
+    for is_code, text in _split_outside_fences(markdown):
+        if not is_code:
+            text = _MD_IMAGE_RE.sub(_md_sub, text)
+            text = _HTML_IMG_SRC_RE.sub(_img_sub, text)
+        out.append(text)
+    return "".join(out)
+
+
+def prefetch_markdown_images(markdown: str, request_headers: Iterable[str], settings: dict) -> str:
+    """Markdown 预处理入口：下载远程图片并改写引用"""
+    urls = collect_markdown_image_urls(markdown)
+    if not urls:
+        return markdown
+    return rewrite_markdown_image_urls(markdown, prefetch_images(urls, request_headers, settings))
+
+
+def is_remote_image_src(src) -> bool:
+    return isinstance(src, str) and src.strip().lower().startswith(("http://", "https://"))
+
+
+def prefetch_soup_images(soup, request_headers: Iterable[str], settings: dict) -> None:
+    """HTML 预处理入口：下载 <img> 远程图片并就地改写 src"""
+    images = [img for img in soup.find_all("img") if is_remote_image_src(img.get("src"))]
+    if not images:
+        return
+    mapping = prefetch_images((img["src"].strip() for img in images), request_headers, settings)
+    for img in images:
+        path = mapping.get(img["src"].strip())
+        if path:
+            img["src"] = _local_ref(path)
+
+
+def prefetch_element_images(images: List, request_headers: Iterable[str], settings: dict) -> None:
+    """同 prefetch_soup_images，作用于已收集好的 lxml <img> 元素"""
+    if not images:
+        return
+    mapping = prefetch_images((img.get("src").strip() for img in images), request_headers, settings)
+    for img in images:
+        path = mapping.get(img.get("src").strip())
+        if path:
+            img.set("src", _local_ref(path))
@@ -0,0 +1,241 @@
+"""Extract inline ``data:`` URI images out of clipboard HTML.
+
+浏览器和 Office 复制的 HTML 常把截图内嵌为数 MB 的 base64 ``data:`` URI，
+这些内容会被 BeautifulSoup、protect_brackets、is_plain_html_fragment 反复扫描复制，
+最后再作为文本写入 Pandoc stdin。
+
+这里在任何 soup 解析之前，单遍扫描 HTML，把 base64 负载分块解码并直接写入
+按内容哈希命名的临时文件（相同图片只写一份），原位置替换为短的文件路径。
+临时文件按引用计数管理，工作流落地后释放。
+"""
+
+from __future__ import annotations
+
+import base64
+import binascii
+import hashlib
+import os
+import re
+import tempfile
+import threading
+import time
+from typing import Dict, List, Optional, Set
+
+from .logging import log
+
+# data:image/png;base64, / data:image/svg+xml;charset=utf-8;base64,
+# （区分大小写，才能走字面前缀的快速查找）
+_DATA_URI_RE = re.compile(r"data:image/([a-zA-Z0-9.+-]+)(?:;[^,;\"'\s>]*)*;base64,")
+# base64 负载：先按严格字母表匹配，遇到空白再放宽
+_B64_STRICT_RE = re.compile(r"[A-Za-z0-9+/=]*")
+_B64_RUN_RE = re.compile(r"[A-Za-z0-9+/=\s]*")
+_WS_RE = re.compile(r"\s+")
+# 负载之后必须是这些分隔符之一，否则（如遇到 &#10; 等实体）说明负载不完整，保持原样
+_PAYLOAD_TERMINATORS = "\"')"
+
+# 小于该长度（base64 字符数）的图标不值得落盘
+_MIN_PAYLOAD_CHARS = 4096
+# 分块解码的块大小（base64 字符数，4 的倍数）
+_DECODE_CHUNK_CHARS = 1024 * 1024
+
+_EXTENSIONS = {
+    "jpeg": ".jpg",
+    "jpg": ".jpg",
+    "png": ".png",
+    "gif": ".gif",
+    "webp": ".webp",
+    "bmp": ".bmp",
+    "svg+xml": ".svg",
+    "x-icon": ".ico",
+    "tiff": ".tiff",
+}
+
+# 超过该时长的残留文件（进程异常退出未释放）在首次使用时清理
+_STALE_AFTER_S = 3600
+
+_refcounts: Dict[str, int] = {}
+_ref_lock = threading.Lock()
+_swept = False
+
+
+def get_inline_image_dir() -> str:
+    return os.path.join(tempfile.gettempdir(), "pastemd_inline_images")
+
+
+def _sweep_stale(out_dir: str) -> None:
+    """清理上次进程遗留的临时文件（每个进程只执行一次）"""
+    global _swept
+    with _ref_lock:
+        if _swept:
+            return
+        _swept = True
+    cutoff = time.time() - _STALE_AFTER_S
+    try:
+        with os.scandir(out_dir) as it:
+            for entry in it:
+                try:
+                    if entry.stat().st_mtime < cutoff:
+                        os.remove(entry.path)
+                except OSError:
+                    pass
+    except OSError:
+        pass
+
+
+def _commit(tmp_path: str, path: str, acquire: bool) -> bool:
+    """把解码好的临时文件落到最终路径，并（可选）增加引用计数"""
+    with _ref_lock:
+        try:
+            if os.path.exists(path):
+                os.remove(tmp_path)
+            else:
+                os.replace(tmp_path, path)
+        except OSError as e:
+            log(f"Inline image write failed: {e}")
+            return False
+        if acquire:
+            _refcounts[path] = _refcounts.get(path, 0) + 1
+        return True
+
+
+def _release(path: str) -> None:
+    with _ref_lock:
+        count = _refcounts.get(path, 0) - 1
+        if count > 0:
+            _refcounts[path] = count
+            return
+        _refcounts.pop(path, None)
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def _decode_to_file(
+    html: str, start: int, end: int, ext: str, out_dir: str, has_whitespace: bool
+) -> Optional[tuple]:
+    """把 html[start:end] 的 base64 负载分块解码到临时文件，返回 (临时路径, 按内容哈希命名的最终路径)"""
+    os.makedirs(out_dir, exist_ok=True)
+    hasher = hashlib.sha256()
+    fd, tmp_path = tempfile.mkstemp(dir=out_dir, suffix=".part")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            pending = ""
+            for offset in range(start, end, _DECODE_CHUNK_CHARS):
+                chunk = html[offset:min(offset + _DECODE_CHUNK_CHARS, end)]
+                if pending:
+                    chunk = pending + chunk
+                if has_whitespace:
+                    chunk = _WS_RE.sub("", chunk)
+                usable = len(chunk) - len(chunk) % 4
+                pending = chunk[usable:]
+                if usable:
+                    data = base64.b64decode(chunk[:usable], validate=True)
+                    hasher.update(data)
+                    f.write(data)
+            if pending:
+                # 缺少 padding 时补齐
+                data = base64.b64decode(pending + "=" * (-len(pending) % 4), validate=True)
+                hasher.update(data)
+                f.write(data)
+    except (binascii.Error, ValueError, OSError) as e:
+        log(f"Inline image decode failed: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return None
+
+    return tmp_path, os.path.join(out_dir, hasher.hexdigest() + ext)
+
+
+class InlineImageSet:
+    """一次工作流内抽出的内联图片（落地后调用 release 清理）"""
+
+    def __init__(self, out_dir: Optional[str] = None) -> None:
+        self.out_dir = out_dir or get_inline_image_dir()
+        _sweep_stale(self.out_dir)
+        self._paths: Set[str] = set()
+        self._lock = threading.Lock()
+        # 同一工作流里 HTML 常被读取多次（类型检测 + 转换），记住上次结果
+        self._last_raw: Optional[str] = None
+        self._last_result: Optional[str] = None
+
+    @property
+    def paths(self) -> List[str]:
+        with self._lock:
+            return sorted(self._paths)
+
+    def extract(self, html: str) -> str:
+        """
+        抽出 HTML 中的内联 data: 图片，返回替换为本地路径后的 HTML
+
+        解码失败或负载过小的 data URI 保持原样。
+        """
+        if not html or "base64," not in html:
+            return html
+        if self._last_raw is not None and html == self._last_raw:
+            return self._last_result
+
+        parts: List[str] = []
+        pos = 0
+        extracted = 0
+        saved_chars = 0
+        search_pos = 0
+        while True:
+            match = _DATA_URI_RE.search(html, search_pos)
+            if match is None:
+                break
+            payload_start = match.end()
+            run_end = _B64_STRICT_RE.match(html, payload_start).end()
+            has_whitespace = run_end < len(html) and html[run_end].isspace()
+            if has_whitespace:
+                run_end = _B64_RUN_RE.match(html, run_end).end()
+            # 下一次查找从负载之后开始，不再扫描负载本身
+            search_pos = max(run_end, payload_start)
+            if run_end < len(html) and html[run_end] not in _PAYLOAD_TERMINATORS:
+                continue
+            # 去掉负载尾部的空白，保留原始分隔符
+            payload_end = run_end
+            while payload_end > payload_start and html[payload_end - 1].isspace():
+                payload_end -= 1
+            if payload_end - payload_start < _MIN_PAYLOAD_CHARS:
+                continue
+
+            ext = _EXTENSIONS.get(match.group(1).lower(), ".img")
+            decoded = _decode_to_file(html, payload_start, payload_end, ext, self.out_dir, has_whitespace)
+            if decoded is None:
+                continue
+            tmp_path, path = decoded
+            with self._lock:
+                is_new = path not in self._paths
+                if not _commit(tmp_path, path, acquire=is_new):
+                    continue
+                self._paths.add(path)
+
+            parts.append(html[pos:match.start()])
+            parts.append(path.replace("\\", "/"))
+            pos = payload_end
+            extracted += 1
+            saved_chars += payload_end - match.start()
+
+        if not extracted:
+            result = html
+        else:
+            parts.append(html[pos:])
+            result = "".join(parts)
+            log(f"Extracted {extracted} inline images ({saved_chars / 1024 / 1024:.1f} MB of data URIs)")
+
+        self._last_raw = html
+        self._last_result = result
+        return result
+
+    def release(self) -> None:
+        """删除本次抽出的临时文件（其它任务仍在引用的文件会保留）"""
+        with self._lock:
+            paths = list(self._paths)
+            self._paths.clear()
+            self._last_raw = None
+            self._last_result = None
+        for path in paths:
+            _release(path)
@@ -1,6 +1,55 @@
 """LaTeX formula conversion utilities."""
 
 import re
+from dataclasses import dataclass, field
+from typing import List, Optional
+
+# 扫描记号：
+# - 行首：代码块围栏（与旧实现一致：去除首尾空白后以 ``` 或 ~~~ 开头）、只有一个 $ 的行
+# - 行内：反斜杠转义（含 \( \[ 等分隔符）、反引号串、$$ 或 $
+_TOKEN_RE = re.compile(
+    r'^[^\S\n]*(?:(?P<fence>```|~~~)|(?P<lone>\$)[^\S\n]*$)'
+    r'|\\[\\`$()\[\]]|`+|\$\$?',
+    re.MULTILINE,
+)
+# 块级公式的结束分隔符；公式不会跨过代码块围栏，先遇到围栏时视为没有结束
+_LONE_DOLLAR_CLOSE_RE = re.compile(r'^[^\S\n]*(?:\$[^\S\n]*$|```|~~~)', re.MULTILINE)
+_DOUBLE_DOLLAR_CLOSE_RE = re.compile(r'\$\$|^[^\S\n]*(?:```|~~~)', re.MULTILINE)
+_BRACKET_CLOSE_RE = re.compile(r'\\\]|^[^\S\n]*(?:```|~~~)', re.MULTILINE)
+# 行内公式的结束 $（跳过转义）
+_INLINE_CLOSE_RE = re.compile(r'\\.|\$')
+
+
+@dataclass
+class MathSpan:
+    """一个公式在（规范化后）文本中的位置"""
+    start: int
+    end: int
+    display: bool
+    delimiter: str  # "$" / "$$" / "\\(" / "\\["
+
+
+@dataclass
+class MathScan:
+    """scan_latex_math 的结果：规范化后的文本 + 公式清单"""
+    text: str
+    spans: List[MathSpan] = field(default_factory=list)
+
+    @property
+    def count(self) -> int:
+        return len(self.spans)
+
+    @property
+    def display_count(self) -> int:
+        return sum(1 for span in self.spans if span.display)
+
+    @property
+    def inline_count(self) -> int:
+        return self.count - self.display_count
+
+    @property
+    def has_math(self) -> bool:
+        return bool(self.spans)
 
 
 def convert_latex_delimiters(text: str, fix_single_dollar_block: bool = True) -> str:
@@ -14,18 +63,198 @@ def convert_latex_delimiters(text: str, fix_single_dollar_block: bool = True) ->
     Returns:
         转换后的文本
     """
-    # 1. (弃用) 标准 LaTeX 分隔符转换（\[...\] -> $$...$$）
+    return scan_latex_math(text, fix_single_dollar_block).text
+
+
+def scan_latex_math(text: str, fix_single_dollar_block: bool = True, *, limit: int = 0) -> MathScan:
+    """
+    单遍扫描 Markdown 中的 LaTeX 公式，同时完成分隔符修复
+
+    识别代码块围栏（``` / ~~~）、行内代码、反斜杠转义，以及 $...$、$$...$$、
+    \\(...\\)、\\[...\\] 四种分隔符；代码中的 $ 不会被当作公式，也不会被改写。
+
+    fix_single_dollar_block=True 时顺带修复 Pandoc 无法识别的写法：
+    - 行内公式两侧的空格：$  L  $ -> $L$
+    - 单独一行的 $ 作为块级公式分隔符：$ ... $ -> $$ ... $$
+
+    Args:
+        text: Markdown 文本
+        fix_single_dollar_block: 是否启用非标准块级公式修复
+        limit: 找到这么多个公式后立即停止（0 表示不限制）；停止后剩余部分不再修复，只适合检测
+
+    Returns:
+        MathScan：修复后的文本，以及各公式在该文本中的位置（行内/块级）
+    """
+    # (弃用) 标准 LaTeX 分隔符转换（\[...\] -> $$...$$）
     # 目前此功能被注释掉，若启用需解开 _convert_standard_latex_delimiters 内部注释
     text = _convert_standard_latex_delimiters(text)
-    
-    if fix_single_dollar_block:
-        # 2. 修复行内公式中 $ 两侧的多余空格 ($  L  $ -> $L$)
-        text = _fix_inline_math_spaces(text)
-        
-        # 3. 将单独一行的 $ ... $ 块级公式转换为 $$ ... $$
-        text = _fix_single_dollar_blocks(text)
-        
-    return text
+
+    return _MathScanner(text, fix_single_dollar_block, limit).run()
+
+
+class _MathScanner:
+    """scan_latex_math 的实现：按记号推进，块级公式/代码块整段跳过"""
+
+    def __init__(self, text: str, fix: bool, limit: int = 0) -> None:
+        self.text = text
+        self.fix = fix
+        self.limit = limit
+        self.pieces: List[str] = []
+        self.copied = 0  # 原文中已复制到 pieces 的位置
+        self.shift = 0   # 输出位置 - 原文位置
+        self.spans: List[MathSpan] = []
+        # 已知后面再也没有某种结束分隔符时，避免重复查找（保证线性时间）
+        self.no_double_dollar = False
+        self.no_bracket_close = False
+        self.no_paren_close_before = -1
+
+    def run(self) -> MathScan:
+        text = self.text
+        if '$' not in text and '\\' not in text:
+            return MathScan(text, self.spans)
+
+        limit = self.limit
+        pos: Optional[int] = 0
+        while pos is not None and not (limit and len(self.spans) >= limit):
+            m = _TOKEN_RE.search(text, pos)
+            if m is None:
+                break
+            kind = m.lastgroup
+            if kind == 'fence':
+                pos = self._fence(m)
+                continue
+            if kind == 'lone':
+                pos = self._lone_dollar(m)
+                continue
+            token = m.group()
+            start = m.start()
+            if token[0] == '\\':
+                pos = self._backslash(token, start, m.end())
+            elif token[0] == '`':
+                pos = self._code_span(start, m.end())
+            elif token == '$$':
+                pos = self._double_dollar(start)
+            else:
+                pos = self._single_dollar(start)
+
+        if not self.pieces:
+            return MathScan(text, self.spans)
+        self.pieces.append(text[self.copied:])
+        return MathScan(''.join(self.pieces), self.spans)
+
+    # ---- 输出 ----
+
+    def _out(self, index: int) -> int:
+        return index + self.shift
+
+    def _replace(self, start: int, end: int, replacement: str) -> None:
+        self.pieces.append(self.text[self.copied:start])
+        self.pieces.append(replacement)
+        self.copied = end
+        self.shift += len(replacement) - (end - start)
+
+    def _add_span(self, start: int, end: int, display: bool, delimiter: str) -> None:
+        self.spans.append(MathSpan(self._out(start), self._out(end), display, delimiter))
+
+    def _line_end(self, index: int) -> int:
+        end = self.text.find('\n', index)
+        return len(self.text) if end < 0 else end
+
+    # ---- 记号处理（返回下一次扫描的位置，None 表示扫描结束） ----
+
+    def _fence(self, m: re.Match) -> Optional[int]:
+        """代码块：整段跳过；旧实现的规则，去除首尾空白后以相同的三个字符开头即为结束围栏"""
+        text = self.text
+        close_re = re.compile(r'^[^\S\n]*' + re.escape(m.group('fence')), re.MULTILINE)
+        close = close_re.search(text, self._line_end(m.end()))
+        return None if close is None else self._line_end(close.end())
+
+    def _lone_dollar(self, m: re.Match) -> int:
+        """单独一行的 $：与下一个单行 $ 配对，改写为 $$ 块级公式；不成对时保持原样"""
+        if not self.fix:
+            return m.end()
+        close = _LONE_DOLLAR_CLOSE_RE.search(self.text, m.end())
+        if close is None or not close.group().rstrip().endswith('$'):
+            return m.end()
+
+        open_at = m.start('lone')
+        close_at = self.text.index('$', close.start())
+        span_start = self._out(open_at)
+        self._replace_lone_dollar(open_at, m.end())
+        span_end = self._out(close_at) + 2
+        self._replace_lone_dollar(close_at, close.end())
+        self.spans.append(MathSpan(span_start, span_end, True, '$$'))
+        return close.end()
+
+    def _replace_lone_dollar(self, dollar_at: int, line_end: int) -> None:
+        """$ 及其后的空白替换为 $$（保留缩进和 CRLF 的 \\r）"""
+        tail = '\r' if self.text[line_end - 1:line_end] == '\r' and line_end - 1 > dollar_at else ''
+        self._replace(dollar_at, line_end, '$$' + tail)
+
+    def _backslash(self, token: str, start: int, pos: int) -> int:
+        text = self.text
+        if token == '\\(':
+            if pos > self.no_paren_close_before:
+                line_end = self._line_end(pos)
+                close = text.find('\\)', pos, line_end)
+                if close >= 0:
+                    self._add_span(start, close + 2, False, token)
+                    return close + 2
+                self.no_paren_close_before = line_end
+        elif token == '\\[' and not self.no_bracket_close:
+            close = _BRACKET_CLOSE_RE.search(text, pos)
+            if close is None:
+                self.no_bracket_close = True
+            elif close.group() == '\\]':
+                self._add_span(start, close.end(), True, token)
+                return close.end()
+        # 其余为转义字符（\\$、\\` 等）或落单的分隔符
+        return pos
+
+    def _code_span(self, start: int, pos: int) -> int:
+        """行内代码：找同一行内等长的反引号串，找不到时反引号按普通字符处理"""
+        ticks = pos - start
+        close_re = re.compile(r'(?<!`)`{%d}(?!`)' % ticks)
+        close = close_re.search(self.text, pos, self._line_end(pos))
+        return pos if close is None else close.end()
+
+    def _double_dollar(self, start: int) -> int:
+        pos = start + 2
+        if self.no_double_dollar:
+            return pos
+        close = _DOUBLE_DOLLAR_CLOSE_RE.search(self.text, pos)
+        if close is None:
+            self.no_double_dollar = True
+            return pos
+        if close.group() != '$$':
+            return pos
+        self._add_span(start, close.end(), True, '$$')
+        return close.end()
+
+    def _single_dollar(self, start: int) -> int:
+        text = self.text
+        pos = start + 1
+        line_end = self._line_end(pos)
+        close = _INLINE_CLOSE_RE.search(text, pos, line_end)
+        while close is not None and close.group() != '$':
+            close = _INLINE_CLOSE_RE.search(text, close.end(), line_end)
+        if close is None or text[close.end():close.end() + 1] == '$':
+            return pos
+
+        content = text[pos:close.start()]
+        if not content.strip():
+            return pos
+
+        end = close.end()
+        if self.fix and content[0] in ' \t' and content[-1] in ' \t':
+            # Pandoc tex_math_dollars 要求 $ 后、$ 前不能有空格：$  L  $ -> $L$
+            replacement = f"${content.strip()}$"
+            span_start = self._out(start)
+            self._replace(start, end, replacement)
+            self.spans.append(MathSpan(span_start, span_start + len(replacement), False, '$'))
+        else:
+            self._add_span(start, end, False, '$')
+        return end
 
 
 def _convert_standard_latex_delimiters(text: str) -> str:
@@ -49,74 +278,3 @@ def _convert_standard_latex_delimiters(text: str) -> str:
     # text = re.sub(pattern, replace_match, text, flags=re.DOTALL)
     # text = re.sub(inline_pattern, replace_inline_match, text, flags=re.DOTALL)
     return text
-
-
-def _fix_inline_math_spaces(text: str) -> str:
-    """
-    修复行内公式中 $ 后面的空格和 $ 前面的空格
-    
-    Pandoc tex_math_dollars 要求 $ 后不能有空格，$ 前不能有空格
-    例如：$  L  $ -> $L$
-    """
-    def fix_inline_spaces(match):
-        content = match.group(1)
-        return f"${content.strip()}$"
-
-    # 匹配 $ + 空格 + 内容 + 空格 + $
-    # 排除 $$ 的情况
-    # 使用 [ \t]+ 仅匹配水平空白，避免误伤多行块级公式
-    return re.sub(r'(?<!\$)\$(?!\$)[ \t]+([^\n$]+?)[ \t]+(?<!\$)\$(?!\$)', fix_inline_spaces, text)
-
-
-def _fix_single_dollar_blocks(text: str) -> str:
-    """
-    将单独一行的 $ ... $ 块级公式转换为 $$ ... $$
-    规则：如果某一行去除首尾空白后只有 $，则视为块公式的分隔符
-    注意要跳过代码块
-    """
-    lines = text.split('\n')
-    new_lines = []
-    in_code_block = False
-    code_fence_char = ""
-    in_dollar_block = False
-    
-    for line in lines:
-        stripped = line.strip()
-        
-        # 1. 代码块检测
-        if stripped.startswith('```') or stripped.startswith('~~~'):
-            fence = stripped[:3]
-            if not in_code_block:
-                in_code_block = True
-                code_fence_char = fence
-                new_lines.append(line)
-                continue
-            elif stripped.startswith(code_fence_char):
-                in_code_block = False
-                code_fence_char = ""
-                new_lines.append(line)
-                continue
-            
-        if in_code_block:
-            new_lines.append(line)
-            continue
-            
-        # 2. 单行 $ 检测
-        # 匹配仅包含 $ 的行（允许缩进）
-        if re.match(r'^\s*\$\s*$', line):
-            # 这是一个潜在的块公式分隔符
-            if not in_dollar_block:
-                # 块开始：替换为 $$
-                # 尽量保留原有的缩进
-                prefix = line[:line.find('$')]
-                new_lines.append(f"{prefix}$$")
-                in_dollar_block = True
-            else:
-                # 块结束：替换为 $$
-                prefix = line[:line.find('$')]
-                new_lines.append(f"{prefix}$$")
-                in_dollar_block = False
-        else:
-            new_lines.append(line)
-            
-    return '\n'.join(new_lines)
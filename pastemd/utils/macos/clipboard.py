@@ -117,6 +117,18 @@ def preserve_clipboard(*, restore_delay_s: float = 0.25):
                 log(f"Failed to restore clipboard: {exc}")
 
 
+def get_clipboard_sequence_number() -> int:
+    """
+    获取剪贴板变化计数（NSPasteboard.changeCount，内容每次变化都会递增）
+
+    只读取一个计数器，不读取剪贴板内容，适合高频轮询检测变化。
+    """
+    try:
+        return int(NSPasteboard.generalPasteboard().changeCount())
+    except Exception:
+        return 0
+
+
 def get_clipboard_text() -> str:
     """
     获取剪贴板文本内容
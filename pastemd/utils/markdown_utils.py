@@ -1,8 +1,11 @@
 """Markdown processing utilities - pure functions without workflow dependencies."""
 
+from __future__ import annotations
 
 import re
 
+from .latex import MathScan, scan_latex_math
+
 
 def merge_markdown_contents(files_data: list[tuple[str, str]]) -> str:
     """
@@ -31,6 +34,91 @@ def merge_markdown_contents(files_data: list[tuple[str, str]]) -> str:
     
     return "\n".join(merged_parts)
 
+_FENCE_OPEN_RE = re.compile(r"^ {0,3}(`{3,}|~{3,})")
+_SOURCE_MARKER_RE = re.compile(r"^<!-- Source: .* -->$")
+_TOP_HEADING_RE = re.compile(r"^# ")
+_LINK_DEFINITION_RE = re.compile(r"^ {0,3}\[[^\]^][^\]]*\]:\s")
+_FOOTNOTE_DEFINITION_RE = re.compile(r"^ {0,3}\[\^[^\]]+\]:")
+
+
+def split_markdown_chunks(md_text: str, max_chunks: int, min_chunk_chars: int = 0) -> list[str]:
+    """
+    把大型 Markdown 拆分为可独立转换的若干块（用于并行转换）
+
+    只在一级标题或 merge_markdown_contents 的文件分隔注释处切分，不会切开代码块和
+    $$ 公式块。引用式链接定义会附加到每一块；含脚注的文档不拆分（脚注编号是全局的）。
+
+    Args:
+        md_text: Markdown 文本
+        max_chunks: 最多拆成几块
+        min_chunk_chars: 每块的最小字符数
+
+    Returns:
+        各块文本；无法拆分时返回只含原文的列表
+    """
+    if max_chunks < 2:
+        return [md_text]
+
+    lines = md_text.split("\n")
+    sections: list[list[str]] = [[]]
+    definitions: list[str] = []
+    fence: str | None = None
+    in_math = False
+
+    for line in lines:
+        if fence is not None:
+            stripped = line.strip()
+            if stripped.startswith(fence) and stripped.strip(fence[0]) == "":
+                fence = None
+            sections[-1].append(line)
+            continue
+
+        match = _FENCE_OPEN_RE.match(line)
+        if match and not in_math:
+            fence = match.group(1)
+            sections[-1].append(line)
+            continue
+
+        if line.count("$$") % 2 == 1:
+            in_math = not in_math
+        elif not in_math:
+            if _FOOTNOTE_DEFINITION_RE.match(line):
+                return [md_text]
+            if _LINK_DEFINITION_RE.match(line):
+                definitions.append(line)
+                continue
+            if (_TOP_HEADING_RE.match(line) or _SOURCE_MARKER_RE.match(line)) and sections[-1]:
+                sections.append([])
+
+        sections[-1].append(line)
+
+    if len(sections) < 2:
+        return [md_text]
+
+    # 按字符数贪心合并相邻小节，使各块大小接近
+    # 目标大小按拆出的正文计算（引用式链接定义会复制到每一块，不计入）
+    texts = ["\n".join(section) for section in sections]
+    target = max(min_chunk_chars, sum(len(text) + 1 for text in texts) // max_chunks)
+    chunks: list[str] = []
+    current: list[str] = []
+    size = 0
+    for text in texts:
+        if current and size >= target and len(chunks) < max_chunks - 1:
+            chunks.append("\n".join(current))
+            current, size = [], 0
+        current.append(text)
+        size += len(text) + 1
+    if current:
+        chunks.append("\n".join(current))
+
+    if len(chunks) < 2:
+        return [md_text]
+    if definitions:
+        tail = "\n\n" + "\n".join(definitions) + "\n"
+        chunks = [chunk + tail for chunk in chunks]
+    return chunks
+
+
 def has_backtick_fenced_code_block(text: str) -> bool:
     """
     检测 ``` 这种 fenced code block，并要求起始/结束围栏成对出现。
@@ -47,42 +135,32 @@ def has_backtick_fenced_code_block(text: str) -> bool:
     return bool(pattern.search(text))
 
 
-def has_latex_math(text: str) -> bool:
+def has_latex_math(text: str, scan: MathScan | None = None) -> bool:
     """
     检测常见 LaTeX 数学公式：
     行内：$...$ 或 \\( ... \\)
     块级：$$...$$ 或 \\[ ... \\]
     这里对 $...$ 不做内容限制（更宽松，误判风险也更高，比如 $100）。
+    代码块和行内代码中的 $ 不计入。
+
+    Args:
+        text: Markdown 文本
+        scan: 已有的 scan_latex_math(text, False) 结果（可选，传入时不再重复扫描）
     """
     if not text:
         return False
+    if scan is None:
+        scan = scan_latex_math(text, fix_single_dollar_block=False, limit=1)
+    return scan.has_math
 
-    # 块级：$$...$$（允许跨行）
-    if re.search(r'\$\$[\s\S]*?\$\$', text):
-        return True
-
-    # 块级：\[...\]（允许跨行）
-    if re.search(r'\\\[[\s\S]*?\\\]', text):
-        return True
-
-    # 行内：\(...\)（不跨行）
-    if re.search(r'\\\([^\n]*?\\\)', text):
-        return True
-
-    # 行内：$...$（不跨行；排除 $$...$$）
-    if re.search(r'(?<!\$)\$(?!\$)[^\n$]+(?<!\$)\$(?!\$)', text):
-        return True
-
-    return False
-
-def is_markdown(text: str) -> bool:
+def is_markdown(text: str, math: MathScan | None = None) -> bool:
     if not text or not isinstance(text, str):
         return False
 
     if has_backtick_fenced_code_block(text):
         return True
 
-    if has_latex_math(text):
+    if has_latex_math(text, math):
         return True
 
     md_patterns = [
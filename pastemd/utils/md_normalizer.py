@@ -1,113 +1,167 @@
 """Markdown 格式规范化工具 - 处理不同来源的 Markdown 格式差异"""
 
+import io
 import re
+from typing import Iterable, Iterator, Optional
+
+_HEADING_RE = re.compile(r'#{1,6}\s+')
+_HR_RE = re.compile(r'[-*_]{3,}')
+_UNORDERED_LIST_RE = re.compile(r'[-*+]\s')
+_ORDERED_LIST_RE = re.compile(r'\d+\.\s')
 
 
 def normalize_markdown(md_text: str) -> str:
     """
     规范化 Markdown 文本格式，确保元素之间有适当的空行
-    
+
     主要处理以下问题：
     1. 标题前后缺少空行（如智谱清言）
     2. 代码块前后缺少空行
     3. 列表、引用等块级元素前后缺少空行
     4. 表格前后缺少空行
-    
+
     Args:
         md_text: 原始 Markdown 文本
-        
+
     Returns:
         规范化后的 Markdown 文本
     """
-    # 统一换行符为 \n
-    text = md_text.replace('\r\n', '\n').replace('\r', '\n')
-    lines = text.split('\n')
-    
-    result = []
+    # 恢复原始换行符风格
+    newline = '\r\n' if '\r\n' in md_text else '\n'
+    return newline.join(_normalize_lines(_iter_lines(md_text)))
+
+
+def _iter_lines(text: str) -> Iterator[str]:
+    """
+    逐行迭代文本（\\r\\n、\\r、\\n 均视为换行，行尾不含换行符）
+
+    与 text.replace('\\r\\n', '\\n').replace('\\r', '\\n').split('\\n') 结果一致，但不生成整份副本。
+    """
+    line = ''
+    for line in io.StringIO(text, newline=None):
+        yield line[:-1] if line.endswith('\n') else line
+    if not text or line.endswith('\n'):
+        yield ''
+
+
+def _normalize_lines(lines: Iterable[str]) -> Iterator[str]:
+    """
+    单遍规范化：逐行读取（行尾不含换行符），逐行输出规范化后的行
+
+    只向前看一行，代码块状态随扫描维护，整体为线性时间；
+    连续两个以上的空行会压缩为一个（与按 \\n{3,} → \\n\\n 压缩整段文本的结果一致）。
+    """
+    return _collapse_blank_runs(_insert_blank_lines(lines))
+
+
+def _insert_blank_lines(lines: Iterable[str]) -> Iterator[str]:
+    """按相邻行的类型在块级元素之间补充空行"""
+    it = iter(lines)
+    line: Optional[str] = next(it, None)
     in_code_block = False
-    in_table = False
     prev_line_type = 'start'  # start, empty, text, heading, code, table, list, quote, hr
-    
-    for i, line in enumerate(lines):
-        current_type = _get_line_type(line, in_code_block, in_table)
-        
+    last_has_content = False
+
+    while line is not None:
+        next_line = next(it, None)
+        current_type = _get_line_type(line, in_code_block)
+
         # 代码块状态切换
+        is_fence_end = False
         if line.startswith('```'):
+            is_fence_end = in_code_block
             in_code_block = not in_code_block
-        
-        # 表格状态检测
-        if current_type == 'table':
-            in_table = True
-        elif in_table and current_type not in ('table', 'empty'):
-            in_table = False
-        
+
         # 决定是否需要在当前行前添加空行
-        need_blank_before = _should_add_blank_line(prev_line_type, current_type)
-        
-        if need_blank_before and result and result[-1].strip():
-            result.append('')
-        
-        result.append(line)
-        
+        if last_has_content and _should_add_blank_line(prev_line_type, current_type):
+            yield ''
+
+        yield line
+        has_content = bool(line.strip())
+        last_has_content = has_content
+
         # 决定是否需要在当前行后添加空行
-        need_blank_after = _should_add_blank_after(current_type, i, lines)
-        
-        if need_blank_after and i + 1 < len(lines) and lines[i + 1].strip():
-            result.append('')
-        
+        if (
+            next_line is not None
+            and next_line.strip()
+            and _should_add_blank_after(current_type, is_fence_end)
+        ):
+            yield ''
+            last_has_content = False
+
         # 更新前一行类型
-        prev_line_type = current_type if line.strip() else 'empty'
-    
-    text = '\n'.join(result)
-    
-    # 清理多余的连续空行（超过2个连续换行符压缩为2个）
-    text = re.sub(r'\n{3,}', '\n\n', text)
-    
-    # 恢复原始换行符风格
-    if '\r\n' in md_text:
-        text = text.replace('\n', '\r\n')
-    
-    return text
+        prev_line_type = current_type if has_content else 'empty'
+        line = next_line
+
+
+def _collapse_blank_runs(lines: Iterable[str]) -> Iterator[str]:
+    """
+    压缩连续空行，结果与 re.sub(r'\\n{3,}', '\\n\\n', '\\n'.join(lines)) 一致：
+    文本中间的多个空行保留一个；开头/结尾的空行最多保留两个。
+    """
+    pending = 0
+    seen_content = False
+    for line in lines:
+        if line == '':
+            pending += 1
+            continue
+        if pending:
+            if seen_content:
+                yield ''
+            else:
+                yield from [''] * (pending if pending < 3 else 2)
+            pending = 0
+        seen_content = True
+        yield line
 
+    if pending:
+        if seen_content:
+            yield from [''] * (pending if pending < 3 else 2)
+        else:
+            # 全部为空行：n 行之间有 n-1 个换行符
+            yield from [''] * (pending if pending < 4 else 3)
 
-def _get_line_type(line: str, in_code_block: bool, in_table: bool) -> str:
-    """判断行的类型"""
+
+def _get_line_type(line: str, in_code_block: bool) -> str:
+    """判断行的类型（按首字符分派，只对可能匹配的行执行正则）"""
     stripped = line.strip()
-    
+
     if not stripped:
         return 'empty'
-    
+
     if in_code_block:
         return 'code'
-    
+
+    first = line[0]
+
     # 代码块边界
-    if line.startswith('```'):
+    if first == '`' and line.startswith('```'):
         return 'code'
-    
+
     # 标题
-    if re.match(r'^#{1,6}\s+', line):
-        return 'heading'
-    
+    if first == '#':
+        return 'heading' if _HEADING_RE.match(line) else 'text'
+
     # 表格
-    if line.startswith('|') and line.endswith('|'):
-        return 'table'
-    
-    # 分隔线
-    if re.match(r'^[-*_]{3,}$', stripped):
+    if first == '|':
+        return 'table' if line.endswith('|') else 'text'
+
+    # 分隔线（允许前导空白）
+    if stripped[0] in '-*_' and _HR_RE.fullmatch(stripped):
         return 'hr'
-    
+
     # 列表（无序）
-    if re.match(r'^[-*+]\s', line):
-        return 'list'
-    
+    if first in '-*+':
+        return 'list' if _UNORDERED_LIST_RE.match(line) else 'text'
+
     # 列表（有序）
-    if re.match(r'^\d+\.\s', line):
-        return 'list'
-    
+    if first.isdigit():
+        return 'list' if _ORDERED_LIST_RE.match(line) else 'text'
+
     # 引用
-    if line.startswith('>'):
+    if first == '>':
         return 'quote'
-    
+
     return 'text'
 
 
@@ -116,67 +170,50 @@ def _should_add_blank_line(prev_type: str, current_type: str) -> bool:
     # 文档开头或前一行是空行，不需要
     if prev_type in ('start', 'empty'):
         return False
-    
+
     # 当前行是空行，不需要
     if current_type == 'empty':
         return False
-    
+
     # 标题前需要空行（除非前面是标题）
     if current_type == 'heading':
         return prev_type not in ('heading',)
-    
+
     # 代码块前需要空行
     if current_type == 'code' and prev_type != 'code':
         return True
-    
+
     # 表格前需要空行
     if current_type == 'table' and prev_type not in ('table',):
         return True
-    
+
     # 列表前需要空行（除非前面是列表）
     if current_type == 'list' and prev_type not in ('list',):
         return True
-    
+
     # 引用前需要空行
     if current_type == 'quote' and prev_type not in ('quote',):
         return True
-    
+
     # 分隔线前需要空行
     if current_type == 'hr':
         return True
-    
+
     return False
 
 
-def _should_add_blank_after(current_type: str, index: int, lines: list) -> bool:
-    """判断当前行后是否需要空行"""
-    # 最后一行不需要
-    if index >= len(lines) - 1:
-        return False
-    
-    next_line = lines[index + 1].strip()
-    
-    # 下一行已经是空行，不需要
-    if not next_line:
-        return False
-    
+def _should_add_blank_after(current_type: str, is_fence_end: bool) -> bool:
+    """判断当前行后是否需要空行（调用方已确认下一行不是空行）"""
     # 标题后需要空行
     if current_type == 'heading':
         return True
-    
+
     # 代码块结束后需要空行
-    if current_type == 'code' and lines[index].startswith('```'):
-        # 检查是结束标记
-        in_code = False
-        for i in range(index):
-            if lines[i].startswith('```'):
-                in_code = not in_code
-        if not in_code:  # 结束标记
-            return True
-    
+    if current_type == 'code' and is_fence_end:
+        return True
+
     # 分隔线后需要空行
     if current_type == 'hr':
         return True
-    
-    return False
 
+    return False
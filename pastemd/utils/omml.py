@@ -7,7 +7,12 @@ Office-compatible HTML with formula support.
 
 from __future__ import annotations
 
+import os
 import re
+import threading
+from bisect import bisect_right
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
 from html.entities import name2codepoint
 from typing import Callable
 
@@ -42,6 +47,16 @@ def convert_mathml_to_omml(mathml: str, entity_map: dict | None = None) -> str:
         raise ValueError(f"Failed to convert MathML to OMML: {e}")
 
 
+_MATH_RE = re.compile(r'<math[^>]*>.*?</math>', re.DOTALL | re.IGNORECASE)
+_TABLE_RE = re.compile(r'<table[^>]*>.*?</table>', re.DOTALL | re.IGNORECASE)
+_TAG_RE = re.compile(r'<[^>]+>')
+
+# 已转换公式的缓存上限（按 MathML 原文去重，文档中重复的公式只转换一次）
+_OMML_CACHE_MAX_ENTRIES = 2048
+# 每个工作进程一次处理的公式数下限，避免进程间通信开销超过转换本身
+_PARALLEL_MIN_BATCH = 16
+
+
 def extract_mathml_elements(html: str) -> list[tuple[str, int, int]]:
     """Extract MathML elements from HTML.
     
@@ -51,11 +66,7 @@ def extract_mathml_elements(html: str) -> list[tuple[str, int, int]]:
     Returns:
         List of (mathml_string, start_pos, end_pos) tuples
     """
-    pattern = r'<math[^>]*>.*?</math>'
-    matches = []
-    for match in re.finditer(pattern, html, re.DOTALL | re.IGNORECASE):
-        matches.append((match.group(0), match.start(), match.end()))
-    return matches
+    return [(match.group(0), match.start(), match.end()) for match in _MATH_RE.finditer(html)]
 
 
 def wrap_omml_conditional(omml: str, fallback_text: str = "") -> str:
@@ -74,64 +85,207 @@ def wrap_omml_conditional(omml: str, fallback_text: str = "") -> str:
     return result
 
 
-def _extract_table_ranges(html: str) -> list[tuple[int, int]]:
-    """Extract table ranges from HTML.
+class RangeIndex:
+    """正则匹配出的区间（互不重叠）的有序索引，二分判断某段位置是否落在区间内（如 <table>）"""
 
-    Args:
-        html: HTML string containing table elements
+    def __init__(self, html: str, pattern: re.Pattern = _TABLE_RE) -> None:
+        self._starts: list[int] = []
+        self._ends: list[int] = []
+        for match in pattern.finditer(html):
+            self._starts.append(match.start())
+            self._ends.append(match.end())
+
+    def __bool__(self) -> bool:
+        return bool(self._starts)
+
+    def contains(self, start: int, end: int) -> bool:
+        index = bisect_right(self._starts, start) - 1
+        return index >= 0 and end <= self._ends[index]
+
+
+class _ReplacementCache:
+    """MathML 原文 -> 替换后的 HTML 片段（OMML 条件注释），按 LRU 淘汰"""
+
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max_entries
+        self._data: OrderedDict[str, str] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, mathml: str) -> str | None:
+        with self._lock:
+            value = self._data.get(mathml)
+            if value is not None:
+                self._data.move_to_end(mathml)
+            return value
+
+    def put(self, mathml: str, value: str) -> None:
+        with self._lock:
+            self._data[mathml] = value
+            self._data.move_to_end(mathml)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+
+_replacement_cache = _ReplacementCache(_OMML_CACHE_MAX_ENTRIES)
+
+_pool: ProcessPoolExecutor | None = None
+_pool_workers = 0
+_pool_lock = threading.Lock()
+
+
+def _build_replacement(mathml: str) -> str:
+    """转换一个公式并包装为条件注释（原文的纯文本作为非 Office 应用的回退）"""
+    omml = convert_mathml_to_omml(mathml)
+    return wrap_omml_conditional(omml, _TAG_RE.sub('', mathml))
+
+
+def _convert_batch(mathml_list: list[str]) -> list[tuple[str | None, str | None]]:
+    """工作进程入口：返回 [(替换片段, None) 或 (None, 错误信息)]"""
+    results: list[tuple[str | None, str | None]] = []
+    for mathml in mathml_list:
+        try:
+            results.append((_build_replacement(mathml), None))
+        except Exception as e:
+            results.append((None, str(e)))
+    return results
+
+
+def _get_pool(workers: int) -> ProcessPoolExecutor:
+    """常驻进程池（首次使用时创建，工作进程数变化时重建）"""
+    global _pool, _pool_workers
+    with _pool_lock:
+        if _pool is None or _pool_workers != workers:
+            if _pool is not None:
+                _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = ProcessPoolExecutor(max_workers=workers)
+            _pool_workers = workers
+        return _pool
 
-    Returns:
-        List of (start_pos, end_pos) tuples for table blocks
-    """
-    pattern = r'<table[^>]*>.*?</table>'
-    ranges = []
-    for match in re.finditer(pattern, html, re.DOTALL | re.IGNORECASE):
-        ranges.append((match.start(), match.end()))
-    return ranges
 
+def shutdown_omml_pool() -> None:
+    """关闭公式转换进程池（程序退出时调用）"""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
 
-def _is_within_ranges(start: int, end: int, ranges: list[tuple[int, int]]) -> bool:
-    for range_start, range_end in ranges:
-        if start >= range_start and end <= range_end:
-            return True
-    return False
 
+def _parallel_workers(parallel: dict | None, count: int) -> int:
+    """按配置与待转换公式数决定工作进程数；不并行时返回 0"""
+    if not isinstance(parallel, dict) or not parallel.get("enabled", False):
+        return 0
+    try:
+        min_formulas = int(parallel.get("min_formulas", 200))
+        workers = int(parallel.get("max_workers", 0)) or os.cpu_count() or 1
+    except (TypeError, ValueError):
+        return 0
+    if count < max(min_formulas, 2 * _PARALLEL_MIN_BATCH):
+        return 0
+    workers = min(workers, count // _PARALLEL_MIN_BATCH)
+    return workers if workers >= 2 else 0
+
+
+def _convert_unique(pending: list[str], parallel: dict | None) -> dict[str, str]:
+    """转换去重后的公式，返回成功的 MathML -> 替换片段；失败的公式记录日志后跳过"""
+    results: list[tuple[str | None, str | None]] | None = None
+    workers = _parallel_workers(parallel, len(pending))
+    if workers:
+        # 按工作进程数的 4 倍分批，兼顾负载均衡与通信开销
+        size = max(_PARALLEL_MIN_BATCH, -(-len(pending) // (workers * 4)))
+        batches = [pending[i:i + size] for i in range(0, len(pending), size)]
+        try:
+            results = [item for batch in _get_pool(workers).map(_convert_batch, batches) for item in batch]
+            log(f"Converted {len(pending)} MathML formulas with {workers} worker processes")
+        except Exception as e:
+            # 进程池不可用（如被安全软件拦截）时回退为当前进程串行转换
+            log(f"Parallel MathML conversion failed, falling back to serial: {e}")
+            shutdown_omml_pool()
+    if results is None:
+        results = _convert_batch(pending)
+
+    converted: dict[str, str] = {}
+    for mathml, (replacement, error) in zip(pending, results):
+        if replacement is None:
+            log(f"Failed to convert MathML element: {error}")
+            continue
+        converted[mathml] = replacement
+        _replacement_cache.put(mathml, replacement)
+    return converted
 
-def convert_html_mathml_to_omml(html: str, *, skip_table_mathml: bool = False) -> str:
+
+def convert_mathml_replacements(mathml_list: list[str], *, parallel: dict | None = None) -> dict[str, str]:
+    """Convert MathML formulas to OMML conditional-comment replacements.
+
+    重复的公式只转换一次（并缓存供后续调用复用）；parallel 见 convert_html_mathml_to_omml。
+
+    Returns:
+        MathML -> 替换片段；转换失败的公式不在结果中
+    """
+    replacements: dict[str, str] = {}
+    pending: list[str] = []
+    for mathml in mathml_list:
+        if mathml in replacements:
+            continue
+        cached = _replacement_cache.get(mathml)
+        if cached is not None:
+            replacements[mathml] = cached
+        else:
+            replacements[mathml] = ""
+            pending.append(mathml)
+    if pending:
+        replacements.update(_convert_unique(pending, parallel))
+    return {mathml: value for mathml, value in replacements.items() if value}
+
+
+def convert_html_mathml_to_omml(
+    html: str,
+    *,
+    skip_table_mathml: bool = False,
+    parallel: dict | None = None,
+) -> str:
     """Replace MathML elements in HTML with OMML conditional comments.
 
+    重复的公式只转换一次（并缓存供后续调用复用）；不重复的公式较多且 parallel
+    启用时在进程池中并行转换。转换失败的公式保留原 MathML。
+
     Args:
         html: HTML string with MathML formulas
         skip_table_mathml: When True, keep MathML inside <table> blocks unchanged
+        parallel: 并行转换配置（config["omml_parallel"]：enabled / min_formulas / max_workers）
 
     Returns:
         HTML with MathML replaced by OMML conditional comments
     """
-    mathml_elements = extract_mathml_elements(html)
-    if not mathml_elements:
+    matches = list(_MATH_RE.finditer(html))
+    if not matches:
         return html
 
-    table_ranges: list[tuple[int, int]] = []
-    if skip_table_mathml:
-        table_ranges = _extract_table_ranges(html)
+    tables = RangeIndex(html) if skip_table_mathml else None
+    if tables:
+        matches = [m for m in matches if not tables.contains(m.start(), m.end())]
 
-    # Process in reverse order to preserve positions
-    result = html
-    for mathml, start, end in reversed(mathml_elements):
-        if table_ranges and _is_within_ranges(start, end, table_ranges):
-            continue
-        try:
-            omml = convert_mathml_to_omml(mathml)
-            # Extract original text content as fallback
-            fallback = re.sub(r'<[^>]+>', '', mathml)
-            replacement = wrap_omml_conditional(omml, fallback)
-            result = result[:start] + replacement + result[end:]
-        except Exception as e:
-            log(f"Failed to convert MathML element: {e}")
-            # Keep original MathML if conversion fails
-            continue
+    # 1. 去重并查缓存，只转换未见过的公式
+    replacements = convert_mathml_replacements([m.group(0) for m in matches], parallel=parallel)
 
-    return result
+    # 2. 单遍拼接结果
+    parts: list[str] = []
+    pos = 0
+    for match in matches:
+        replacement = replacements.get(match.group(0))
+        if replacement is None:
+            continue
+        parts.append(html[pos:match.start()])
+        parts.append(replacement)
+        pos = match.end()
+    if not parts:
+        return html
+    parts.append(html[pos:])
+    return "".join(parts)
 
 
 def generate_office_html(
@@ -173,6 +327,9 @@ __all__ = [
     "convert_mathml_to_omml",
     "extract_mathml_elements",
     "wrap_omml_conditional",
+    "RangeIndex",
+    "convert_mathml_replacements",
     "convert_html_mathml_to_omml",
+    "shutdown_omml_pool",
     "generate_office_html",
 ]
@@ -0,0 +1,29 @@
+"""HTTP request headers shared by Pandoc and the image prefetcher."""
+
+from typing import List
+
+DEFAULT_REQUEST_HEADERS: List[str] = [
+    "User-Agent: Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+]
+
+
+def get_request_headers(config: dict) -> List[str]:
+    """
+    读取 pandoc_request_headers 配置
+
+    未配置时使用默认 User-Agent；显式设为 null/空列表时不附加任何请求头。
+
+    Returns:
+        ["Name: Value", ...]
+    """
+    if "pandoc_request_headers" not in config:
+        return DEFAULT_REQUEST_HEADERS
+
+    headers = config.get("pandoc_request_headers")
+    if headers is None:
+        return []
+    if isinstance(headers, str):
+        return [headers]
+    if isinstance(headers, list):
+        return [h.strip() for h in headers if isinstance(h, str) and h.strip()]
+    return []
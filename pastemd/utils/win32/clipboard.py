@@ -273,6 +273,18 @@ def _try_read_cf_html(wait_ms: int, interval_ms: int) -> bytes | str | None:
     return None
 
 
+def get_clipboard_sequence_number() -> int:
+    """
+    获取剪贴板序列号（剪贴板内容每次变化都会递增）
+
+    只读取一个计数器，不打开剪贴板，适合高频轮询检测变化。
+    """
+    try:
+        return int(ctypes.windll.user32.GetClipboardSequenceNumber())
+    except Exception:
+        return 0
+
+
 def get_clipboard_text() -> str:
     """
     获取剪贴板文本内容
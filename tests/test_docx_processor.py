@@ -0,0 +1,182 @@
+"""DOCX zip 层面后处理（rewrite_docx_parts / ParagraphStyleTransform）测试，与原 python-docx 实现对比"""
+
+import io
+import random
+import zipfile
+
+import pytest
+from lxml import etree
+
+from pastemd.utils.docx_processor import DocxProcessor, ParagraphStyleTransform
+from pastemd.utils.docx_zip import rewrite_docx_parts
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS = {"w": W}
+
+_CONTENT_TYPES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+    '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+    '<Default Extension="xml" ContentType="application/xml"/>'
+    '<Default Extension="png" ContentType="image/png"/>'
+    '<Override PartName="/word/document.xml"'
+    ' ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.document.main+xml"/>'
+    '<Override PartName="/word/styles.xml"'
+    ' ContentType="application/vnd.openxmlformats-officedocument.wordprocessingml.styles+xml"/>'
+    '</Types>'
+)
+_PACKAGE_RELS = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+    '<Relationship Id="rId1" Target="word/document.xml"'
+    ' Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument"/>'
+    '</Relationships>'
+)
+_STYLES = (
+    '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+    f'<w:styles xmlns:w="{W}">'
+    '<w:style w:type="paragraph" w:default="1" w:styleId="Normal"><w:name w:val="Normal"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="BodyText"><w:name w:val="Body Text"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="FirstParagraph"><w:name w:val="First Paragraph"/></w:style>'
+    '<w:style w:type="paragraph" w:styleId="Heading1"><w:name w:val="heading 1"/></w:style>'
+    '</w:styles>'
+)
+
+
+def _paragraph(style, text):
+    ppr = f'<w:pPr><w:pStyle w:val="{style}"/></w:pPr>' if style else ""
+    return f"<w:p>{ppr}<w:r><w:t>{text}</w:t></w:r></w:p>"
+
+
+def build_docx(paragraphs: int, images: int = 0, image_size: int = 20_000, styles: str = _STYLES) -> bytes:
+    """pandoc 风格的 DOCX：标题后跟 First Paragraph，其余 Body Text，末尾一个含 First Paragraph 的表格"""
+    body = []
+    for i in range(paragraphs):
+        if i % 10 == 0:
+            body.append(_paragraph("Heading1", f"Section {i}"))
+        body.append(_paragraph("FirstParagraph" if i % 10 == 0 else "BodyText", f"paragraph {i} " * 5))
+    body.append(f"<w:tbl><w:tr><w:tc>{_paragraph('FirstParagraph', 'cell')}</w:tc></w:tr></w:tbl>")
+    rels = '<Relationship Id="rIdStyles" Target="styles.xml" Type="%s/styles"/>' % R + "".join(
+        f'<Relationship Id="rIdImg{i}" Target="media/image{i}.png" Type="{R}/image"/>' for i in range(images)
+    )
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w", zipfile.ZIP_DEFLATED) as zf:
+        zf.writestr("[Content_Types].xml", _CONTENT_TYPES)
+        zf.writestr("_rels/.rels", _PACKAGE_RELS)
+        zf.writestr(
+            "word/document.xml",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<w:document xmlns:w="{W}" xmlns:r="{R}"><w:body>{"".join(body)}<w:sectPr/></w:body></w:document>',
+        )
+        zf.writestr(
+            "word/_rels/document.xml.rels",
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>',
+        )
+        zf.writestr("word/styles.xml", styles)
+        for i in range(images):
+            # 随机内容，与真实图片一样几乎不可压缩
+            zf.writestr(f"word/media/image{i}.png", random.Random(i).randbytes(image_size))
+    return out.getvalue()
+
+
+def reference_normalize(docx_bytes: bytes, target_style: str = "Body Text") -> bytes:
+    """原实现：python-docx 载入整个包，逐段落改样式后整包重新保存"""
+    from docx import Document
+
+    doc = Document(io.BytesIO(docx_bytes))
+    for paragraph in doc.paragraphs:
+        if paragraph.style and paragraph.style.name == "First Paragraph":
+            paragraph.style = target_style
+    out = io.BytesIO()
+    doc.save(out)
+    return out.getvalue()
+
+
+def _body_styles(docx_bytes):
+    """body 中所有段落（含表格内）的 pStyle，None 表示未设置"""
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+        root = etree.fromstring(zf.read("word/document.xml"))
+    styles = []
+    for paragraph in root.iter(f"{{{W}}}p"):
+        p_style = paragraph.find("w:pPr/w:pStyle", NS)
+        styles.append(p_style.get(f"{{{W}}}val") if p_style is not None else None)
+    return styles
+
+
+def _members(docx_bytes):
+    with zipfile.ZipFile(io.BytesIO(docx_bytes)) as zf:
+        assert zf.testzip() is None
+        return {info.filename: zf.read(info) for info in zf.infolist()}
+
+
+def test_matches_python_docx():
+    pytest.importorskip("docx")
+    source = build_docx(50, images=3)
+    result = DocxProcessor.normalize_first_paragraph_style(source)
+    expected = reference_normalize(source)
+    assert _body_styles(result) == _body_styles(expected)
+    # 表格中的段落不处理（与 doc.paragraphs 语义一致）
+    assert _body_styles(result)[-1] == "FirstParagraph"
+    assert "FirstParagraph" not in _body_styles(result)[:-1]
+
+    # 其余部件内容不变
+    members = _members(result)
+    for name, content in _members(source).items():
+        if name != "word/document.xml":
+            assert members[name] == content
+
+
+def test_untouched_members_are_copied_raw():
+    source = build_docx(20, images=2)
+    result = DocxProcessor.normalize_first_paragraph_style(source)
+    with zipfile.ZipFile(io.BytesIO(source)) as zin, zipfile.ZipFile(io.BytesIO(result)) as zout:
+        for info in zin.infolist():
+            out_info = zout.getinfo(info.filename)
+            if info.filename == "word/document.xml":
+                assert out_info.CRC != info.CRC
+                continue
+            # 压缩数据原样拷贝：CRC、压缩大小与原包相同
+            assert (out_info.CRC, out_info.compress_size, out_info.compress_type) == \
+                (info.CRC, info.compress_size, info.compress_type)
+
+
+def test_target_is_default_style():
+    styles = _STYLES.replace('w:default="1" w:styleId="Normal"', 'w:styleId="Normal"').replace(
+        'w:styleId="BodyText"', 'w:default="1" w:styleId="BodyText"'
+    )
+    result = DocxProcessor.normalize_first_paragraph_style(build_docx(10, styles=styles))
+    # 目标为默认段落样式时去掉 pStyle（与 python-docx 一致）
+    assert _body_styles(result)[:3] == ["Heading1", None, "BodyText"]
+
+
+def test_unchanged_documents_return_input():
+    source = build_docx(5)
+    assert DocxProcessor.normalize_first_paragraph_style(source, "Missing Style") is source
+    no_first = build_docx(5, styles=_STYLES.replace("First Paragraph", "Other"))
+    assert DocxProcessor.normalize_first_paragraph_style(no_first) is no_first
+    assert rewrite_docx_parts(source, []) is source
+    assert DocxProcessor.normalize_first_paragraph_style(b"not a zip") == b"not a zip"
+
+
+def test_transient_output_stores_xml():
+    source = build_docx(10, images=1)
+    result = DocxProcessor.apply_custom_processing(source, disable_first_para_indent=True, transient=True)
+    with zipfile.ZipFile(io.BytesIO(result)) as zf:
+        types = {info.filename: info.compress_type for info in zf.infolist()}
+    assert types["word/document.xml"] == zipfile.ZIP_STORED
+    assert types["word/styles.xml"] == zipfile.ZIP_STORED
+    assert types["word/media/image0.png"] == zipfile.ZIP_DEFLATED
+    assert _members(result)["word/styles.xml"] == _members(source)["word/styles.xml"]
+
+
+def test_zip64_falls_back_to_zipfile():
+    source = io.BytesIO()
+    with zipfile.ZipFile(io.BytesIO(build_docx(10))) as zin, \
+            zipfile.ZipFile(source, "w", zipfile.ZIP_DEFLATED) as zout:
+        for info in zin.infolist():
+            with zout.open(info.filename, "w", force_zip64=True) as member:
+                member.write(zin.read(info))
+    result = rewrite_docx_parts(source.getvalue(), [ParagraphStyleTransform("First Paragraph", "Body Text")])
+    assert _body_styles(result)[:3] == ["Heading1", "BodyText", "BodyText"]
@@ -0,0 +1,117 @@
+"""is_plain_html_fragment 与原 BeautifulSoup(html, "lxml") 实现的等价性测试"""
+
+import random
+
+import pytest
+from bs4 import BeautifulSoup
+
+from pastemd.utils import html_analyzer
+from pastemd.utils.html_analyzer import (
+    INLINE_WRAPPER_TAGS,
+    SEMANTIC_TAGS,
+    YUANBAO_CLASSES,
+    _markdown_hint_score,
+    is_plain_html_fragment,
+)
+from pastemd.utils.markdown_utils import is_markdown
+
+
+def _reference(html, get_text):
+    """原实现：解析成 BeautifulSoup 树后判断"""
+    if not html or not html.strip():
+        return True
+    soup = BeautifulSoup(html, "lxml")
+    if "ybc" in html and any(soup.find_all(class_=c) for c in YUANBAO_CLASSES):
+        text = get_text()
+        if text and is_markdown(text):
+            return True
+    body = soup.body or soup
+    names = [tag.name.lower() for tag in body.find_all(True)]
+    if any(name in SEMANTIC_TAGS for name in names):
+        return False
+    if all(name in INLINE_WRAPPER_TAGS or name in ("html", "head", "body", "meta", "style") for name in names):
+        return True
+    text = body.get_text(separator="\n").strip()
+    if not text:
+        return True
+    return _markdown_hint_score(text) >= 2
+
+
+# 剪贴板 HTML 中常见的片段，以及 libxml2 有特殊容错规则的标记
+_TOKENS = [
+    "<p>", "</p>", "<span>", "</span>", "<b>", "</b>", "<div>", "</div>", "<h1>", "</h1>",
+    "<ul><li>", "</li></ul>", "<table>", "<td>", "<li>", "<hr>", "<br>", "</br>", "<P>",
+    "<html>", "</html>", "<head>", "</head>", "<Head>", "<body>", "</body>", "<BODY>",
+    "</body></html>", "</body>\n<!--e-->", "</html> ",
+    "<title>", "</title>", "<meta charset=x>", "<link rel=a>", "<base href=x>",
+    "<style>a{}</style>", "<script>x<p></script>", "<textarea>t<p></textarea>",
+    "<!--c-->", "<!-- x", "<!DOCTYPE html>", "<?xml version='1.0'?>", "<![CDATA[x]]>",
+    "<input>", "<section>", "<img src=x>", "<a href=x>", "</a>", "<code>", "</code>",
+    "<pre>", "</pre>", "<font>", "<i>", "<em>", "<wbr>", "<col>", "<dl>", "<center>", "<q>",
+    "<noscript>", "<frameset>", "<svg><p>", "</svg>", "<math>", "<select><option>",
+    "<template><p></template>", "<plaintext>", "<xmp>", "<iframe>x</iframe>", "<noembed>",
+    "<ybc class='ybc-p'>", '<span class="ybc-markdown-katex">', "<div class='x ybc-pre-component'>",
+    '<span title="a>b">', "<p/>", "<b", "< b>", "</x>", "<unknown>",
+    "# h\n", "- item\n", "**b**", "`c`", "$$x$$", "text", " ", "\n", "\r\n", "| a |", "> q", "\0",
+    "&amp;", "&lt;p&gt;", "&nbsp;", "&#42;", "&#x2A;", "&#0;", "&#x80;", "&amp", "&apos;",
+    "&copy;", "&#55296;", "&#65535;", "&#x1F600;", "&ampx;", "& ", "&#xFFFE;", "&#127;",
+]
+
+
+def _corpus(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(_TOKENS) for _ in range(rng.randint(1, 12)))
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_beautifulsoup_on_random_corpus(seed):
+    get_text = lambda: "$$x$$"
+    mismatches = [
+        html for html in _corpus(seed, 5000)
+        if is_plain_html_fragment(html, get_text=get_text) != _reference(html, get_text)
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("html, expected", [
+    ("", True),
+    ('<html><head><meta charset="utf-8"></head><body><!--StartFragment-->'
+     "<span>**bold** &nbsp;# x</span><!--EndFragment--></body></html>\r\n", True),
+    ('<meta charset="utf-8"><p>hi</p>', False),
+    ("<div><span>plain text</span></div>", False),
+    ("<div><span>**a** `b` # c</span></div>", True),
+    # lxml 把 <section> 留在 head 中，body 里只有文本
+    ("<head><section>x</section></head><body>**a** `b`</body>", True),
+])
+def test_common_fragments(html, expected):
+    assert is_plain_html_fragment(html, get_text=lambda: "") is expected
+    assert _reference(html, lambda: "") is expected
+
+
+def test_fast_path_handles_clipboard_fragments():
+    scan = html_analyzer._FragmentScan(False)
+    scan.scan_markup(
+        '<html><head><meta charset="utf-8"></head><body><!--StartFragment-->'
+        "<span>**a** &amp; b</span><!--EndFragment--></body></html>"
+    )
+    assert not scan.has_semantic and scan.only_inline
+    assert scan.text() == "**a** & b"
+
+
+@pytest.mark.parametrize("html", [
+    "<span>a</span></body><span>b</span>",
+    "<head><b>a</b></head>",
+    "<?xml version='1.0'?><p>a</p>",
+    "<span><![CDATA[x]]></span>",
+    "<head><section>x</section></head>",
+])
+def test_fast_path_defers_to_tree(html):
+    with pytest.raises(html_analyzer._NeedsTree):
+        html_analyzer._FragmentScan(False).scan_markup(html)
+
+
+def test_yuanbao_class_prefers_clipboard_text():
+    html = '<div class="ybc-markdown-katex"><p>x</p></div>'
+    assert is_plain_html_fragment(html, get_text=lambda: "$$x^2$$") is True
+    assert is_plain_html_fragment(html, get_text=lambda: "") is False
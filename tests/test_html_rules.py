@@ -0,0 +1,139 @@
+"""HtmlPreprocessor 单次遍历规则引擎（lxml）与原 BeautifulSoup 实现的输出等价性测试"""
+
+import random
+
+import pytest
+from lxml import etree
+
+from pastemd.service.preprocessor.html import HtmlPreprocessor
+
+_STYLE = "<style>.xl65{font-weight:700}.xl66{font-style:italic}</style>"
+_TEXT = ["text", "~~s~~", " ~~a b~~ ", "~~", "$$", "\\(", "\\)", "&amp;", " ", "\n", "x~y", "~~~~"]
+_INLINE = [
+    "span", "b", "i", "strong", "em", "del", "s", "span class=katex", "span class=katex-display",
+    "span class=xl65", "span class=xl66", "span class='xl65 xl66'",
+]
+_EMBEDDED = [
+    "<br>", "<img src='a.svg'>", "<img src='b.png'>", "<svg><g/></svg>", "<svg><text>$$</text></svg>", "<!-- $$ -->",
+]
+
+
+def _inline(rng, depth):
+    out = []
+    for _ in range(rng.randint(0, 4)):
+        roll = rng.random()
+        if roll < 0.5 or depth > 3:
+            out.append(rng.choice(_TEXT))
+        elif roll < 0.65:
+            out.append(rng.choice(_EMBEDDED))
+        else:
+            tag = rng.choice(_INLINE)
+            out.append(f"<{tag}>{_inline(rng, depth + 1)}</{tag.split()[0]}>")
+    return "".join(out)
+
+
+def _cell(rng):
+    tag = rng.choice(["td", "td class=xl65", "td class=xl66"])
+    inner = _inline(rng, 2) if rng.random() < 0.5 else f"<b>{_inline(rng, 3)}</b>"
+    return f"<{tag}>{inner}</td>"
+
+
+def _block(rng, depth):
+    out = []
+    for _ in range(rng.randint(1, 4)):
+        roll = rng.random()
+        if roll < 0.35 or depth > 2:
+            out.append(f"<p>{_inline(rng, 0)}</p>")
+        elif roll < 0.55:
+            out.append(f"<div>{_block(rng, depth + 1)}</div>")
+        elif roll < 0.7:
+            items = (_inline(rng, 0) if rng.random() < 0.5 else _block(rng, depth + 1) for _ in range(rng.randint(1, 3)))
+            out.append("<ul>" + "".join(f"<li>{item}</li>" for item in items) + "</ul>")
+        elif roll < 0.85:
+            cols = rng.randint(1, 3)
+            rows = ("<tr>" + "".join(_cell(rng) for _ in range(cols)) + "</tr>" for _ in range(rng.randint(1, 3)))
+            out.append("<table>" + "".join(rows) + "</table>")
+        else:
+            out.append(_inline(rng, 0))
+    return "".join(out)
+
+
+def _corpus(seed, count):
+    """结构合法的随机 HTML（html.parser 与 libxml2 解析出相同的树），覆盖各条规则的交互"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield (_STYLE if rng.random() < 0.5 else "") + _block(rng, 0)
+
+
+_PARSER = etree.HTMLParser()
+
+
+def _canonical(html):
+    """
+    与序列化方式无关的比较形式：标签/属性/文本事件序列
+
+    两种实现序列化方式不同（html/head/body 外壳、<br/> 与 <br>、空白），比较前统一重新解析。
+    """
+    events = []
+
+    def add_text(text):
+        text = " ".join((text or "").split())
+        if not text:
+            return
+        if events and events[-1][0] == "text":
+            events[-1] = ("text", events[-1][1] + " " + text)
+        else:
+            events.append(("text", text))
+
+    def walk(el):
+        if isinstance(el.tag, str):
+            keep = el.tag not in ("html", "head", "body", "meta")
+            if keep:
+                events.append(("start", el.tag, tuple(sorted(el.attrib.items()))))
+            add_text(el.text)
+            for child in el:
+                walk(child)
+            if keep:
+                events.append(("end", el.tag))
+        add_text(el.tail)
+
+    walk(etree.fromstring(html, _PARSER))
+    return events
+
+
+def _process(html, engine, bold_header):
+    config = {"html_preprocess_engine": engine, "html_formatting": {"bold_first_row_to_header": bold_header}}
+    return HtmlPreprocessor().process(html, config)
+
+
+@pytest.mark.parametrize("seed", range(3))
+@pytest.mark.parametrize("bold_header", [True, False])
+def test_rule_engine_matches_beautifulsoup(seed, bold_header):
+    mismatches = [
+        html for html in _corpus(seed, 400)
+        if _canonical(_process(html, "lxml", bold_header)) != _canonical(_process(html, "bs4", bold_header))
+    ]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("html", [
+    # Excel 复制：样式写在 <style> 的 class 中，首行加粗
+    "<html><head>" + _STYLE + "</head><body><table><tr><td class=xl65>Name</td><td class=xl65>Qty</td></tr>"
+    "<tr><td class=xl66>apple</td><td>~~3~~ 4</td></tr></table></body></html>",
+    # 只含 SVG 的单元格按空单元格处理
+    _STYLE + "<table><tr><td class=xl65><svg><g/></svg></td><td class=xl65><img src='x.svg'>a</td></tr></table>",
+    # 删除 $$ 之间的 <br> 后，两侧文本中的 ~~ 不会跨 <br> 配对
+    "<p>$$a~~<br>b~~c$$ ~~d~~</p><span class=katex>x~~<br>~~y</span>",
+])
+def test_known_documents(html):
+    for bold_header in (True, False):
+        assert _canonical(_process(html, "lxml", bold_header)) == _canonical(_process(html, "bs4", bold_header))
+
+
+def test_script_and_comments_are_left_alone():
+    # 有意与原实现不同：原实现会把 <script> 与注释中的 ~~ 也替换成 <del>
+    html = "<script>var a = '~~x~~';</script><p>~~y~~</p><!-- ~~c~~ -->"
+    output = _process(html, "lxml", False)
+    assert "var a = '~~x~~';" in output
+    assert "<!-- ~~c~~ -->" in output
+    assert "<del>y</del>" in output
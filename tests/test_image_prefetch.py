@@ -0,0 +1,207 @@
+"""image_prefetch 测试：用本地 HTTP 服务代替远程图床"""
+
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+from bs4 import BeautifulSoup
+
+from pastemd.integrations.pandoc_runner import CancelToken, PandocCancelledError, cancel_scope
+from pastemd.utils import image_prefetch
+from pastemd.utils.image_prefetch import (
+    ImageCache,
+    prefetch_images,
+    prefetch_markdown_images,
+    prefetch_soup_images,
+    rewrite_markdown_image_urls,
+)
+
+_PNG = b"\x89PNG\r\n\x1a\n"
+
+
+class _ImageServer:
+    """
+    /img/<name>  返回以 PNG 文件头开头、内容随 name 变化的图片
+    /slow/<name> 在 release 之前不响应
+    /text        返回 HTML 页面
+    /big         返回超过 max_image_mb 的图片
+    """
+
+    def __init__(self) -> None:
+        self.hits = []
+        self.headers = []
+        self.release = threading.Event()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                server.hits.append(self.path)
+                server.headers.append(dict(self.headers))
+                if self.path.startswith("/slow/"):
+                    server.release.wait(10)
+                if self.path == "/text":
+                    body, content_type = b"<html>not an image</html>", "text/html"
+                elif self.path == "/big":
+                    body, content_type = _PNG + b"\0" * (2 * 1024 * 1024), "image/png"
+                else:
+                    body, content_type = _PNG + self.path.encode(), "image/png"
+                try:
+                    self.send_response(200)
+                    self.send_header("Content-Type", content_type)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+                except OSError:
+                    pass
+
+            def log_message(self, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.httpd.daemon_threads = True
+        self.base = "http://127.0.0.1:%d" % self.httpd.server_address[1]
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self.thread.start()
+
+    def url(self, path: str) -> str:
+        return self.base + path
+
+    def close(self) -> None:
+        self.release.set()
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+@pytest.fixture
+def server():
+    srv = _ImageServer()
+    yield srv
+    srv.close()
+
+
+@pytest.fixture
+def cache(tmp_path, monkeypatch):
+    cache = ImageCache(str(tmp_path / "images"))
+    monkeypatch.setattr(image_prefetch, "_cache", cache)
+    return cache
+
+
+def test_cache_miss_then_hit(server, cache):
+    url = server.url("/img/a")
+    first = prefetch_images([url, url], ["User-Agent: PasteMD-Test"], {})
+    assert list(first) == [url]
+    assert first[url].endswith(".png")
+    with open(first[url], "rb") as f:
+        assert f.read() == _PNG + b"/img/a"
+    # 重复的 URL 只下载一次，并带上配置的请求头
+    assert server.hits == ["/img/a"]
+    assert server.headers[0]["User-Agent"] == "PasteMD-Test"
+
+    second = prefetch_images([url], [], {})
+    assert second == first
+    assert server.hits == ["/img/a"]
+
+    # 新建缓存对象时从 index.json 恢复
+    assert ImageCache(cache.cache_dir).lookup(url, 3600) == first[url]
+
+
+def test_expired_entry_is_fetched_again(server, cache):
+    url = server.url("/img/a")
+    prefetch_images([url], [], {"ttl_hours": 1})
+    cache._index[url][1] -= 2 * 3600
+    assert cache.lookup(url, 3600) is None
+
+    assert url in prefetch_images([url], [], {"ttl_hours": 1})
+    assert server.hits == ["/img/a", "/img/a"]
+
+
+def test_non_images_and_oversized_images_are_left_to_pandoc(server, cache):
+    urls = [server.url("/text"), server.url("/big"), "http://127.0.0.1:1/unreachable.png"]
+    assert prefetch_images(urls, [], {"max_image_mb": 1, "timeout_s": 2}) == {}
+
+
+def test_evicts_least_recently_used_files(cache):
+    paths = {}
+    for i, name in enumerate("abc"):
+        paths[name] = cache.store("http://x/" + name, _PNG + name.encode() * 100, ".png")
+        os.utime(paths[name], (1000 + i, 1000 + i))
+    size = os.path.getsize(paths["a"])
+
+    # 访问 a 后它成为最近使用的文件，淘汰从 b 开始
+    assert cache.lookup("http://x/a", 0) == paths["a"]
+    cache.flush_and_evict(0, 2 * size)
+
+    assert not os.path.exists(paths["b"])
+    assert os.path.exists(paths["a"]) and os.path.exists(paths["c"])
+    assert cache.lookup("http://x/b", 0) is None
+    assert ImageCache(cache.cache_dir).lookup("http://x/c", 0) == paths["c"]
+
+
+def test_flush_drops_expired_entries_and_unreferenced_files(cache):
+    old = cache.store("http://x/old", _PNG + b"old", ".png")
+    new = cache.store("http://x/new", _PNG + b"new", ".png")
+    cache._index["http://x/old"][1] -= 7200
+    cache.flush_and_evict(3600, 1024 * 1024)
+
+    assert not os.path.exists(old)
+    assert os.path.exists(new)
+    assert cache.lookup("http://x/old", 0) is None
+
+
+def test_deadline_leaves_slow_images_to_pandoc(server, cache):
+    fast, slow = server.url("/img/fast"), server.url("/slow/x")
+    started = time.monotonic()
+    result = prefetch_images([fast, slow], [], {"deadline_s": 0.5, "timeout_s": 10})
+    assert time.monotonic() - started < 3
+    assert list(result) == [fast]
+
+
+def test_cancel_token_stops_waiting(server, cache):
+    token = CancelToken()
+    timer = threading.Timer(0.3, token.cancel)
+    timer.start()
+    started = time.monotonic()
+    try:
+        with cancel_scope(token), pytest.raises(PandocCancelledError):
+            prefetch_images([server.url("/slow/x")], [], {"deadline_s": 0, "timeout_s": 10})
+    finally:
+        timer.cancel()
+    assert time.monotonic() - started < 3
+
+
+def test_rewrite_markdown_image_urls():
+    markdown = (
+        '![a](http://h/a.png "title") ![b](<http://h/b.png>) ![c](http://h/c.png)\n'
+        '<img alt="x" src="http://h/a.png">\n'
+        "```\n![a](http://h/a.png)\n```\n"
+    )
+    mapping = {"http://h/a.png": "C:\\cache dir\\a.png", "http://h/b.png": "/cache/b.png"}
+    assert rewrite_markdown_image_urls(markdown, mapping) == (
+        '![a](<C:/cache dir/a.png> "title") ![b](</cache/b.png>) ![c](http://h/c.png)\n'
+        '<img alt="x" src="C:/cache dir/a.png">\n'
+        "```\n![a](http://h/a.png)\n```\n"
+    )
+    assert rewrite_markdown_image_urls(markdown, {}) is markdown
+
+
+def test_prefetch_markdown_images(server, cache):
+    url = server.url("/img/md")
+    result = prefetch_markdown_images(f"text ![x]({url}) `![y]({url})`", [], {})
+    path = cache.lookup(url, 0)
+    assert path is not None
+    assert result.startswith(f"text ![x](<{path}>)")
+    assert prefetch_markdown_images("no images", [], {}) == "no images"
+
+
+def test_prefetch_soup_images(server, cache):
+    url = server.url("/img/soup")
+    soup = BeautifulSoup(
+        f'<p><img src=" {url} "><img src="data:image/png;base64,AA=="><img src="/relative.png"></p>',
+        "html.parser",
+    )
+    prefetch_soup_images(soup, [], {})
+    srcs = [img["src"] for img in soup.find_all("img")]
+    assert srcs == [cache.lookup(url, 0), "data:image/png;base64,AA==", "/relative.png"]
+    assert server.hits == ["/img/soup"]
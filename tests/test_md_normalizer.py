@@ -0,0 +1,111 @@
+"""normalize_markdown 与原整段实现的等价性测试"""
+
+import random
+import re
+
+import pytest
+
+from pastemd.utils.md_normalizer import normalize_markdown
+
+
+def _reference_line_type(line, in_code_block):
+    stripped = line.strip()
+    if not stripped:
+        return "empty"
+    if in_code_block or line.startswith("```"):
+        return "code"
+    if re.match(r"^#{1,6}\s+", line):
+        return "heading"
+    if line.startswith("|") and line.endswith("|"):
+        return "table"
+    if re.match(r"^[-*_]{3,}$", stripped):
+        return "hr"
+    if re.match(r"^[-*+]\s", line) or re.match(r"^\d+\.\s", line):
+        return "list"
+    if line.startswith(">"):
+        return "quote"
+    return "text"
+
+
+def _reference_blank_before(prev_type, current_type):
+    if prev_type in ("start", "empty") or current_type == "empty":
+        return False
+    if current_type in ("code", "table", "list", "quote"):
+        return prev_type != current_type
+    return current_type in ("heading", "hr") and not (current_type == prev_type == "heading")
+
+
+def _reference(md_text):
+    """
+    原实现（整段文本、每个 ``` 行回扫之前所有行），按原注释的意图修正了代码块结束判断：
+    空行加在结束的 ``` 之后，而不是开始的 ``` 之后
+    """
+    lines = md_text.replace("\r\n", "\n").replace("\r", "\n").split("\n")
+    result = []
+    in_code_block = False
+    prev_type = "start"
+    for i, line in enumerate(lines):
+        current_type = _reference_line_type(line, in_code_block)
+        if line.startswith("```"):
+            in_code_block = not in_code_block
+        if _reference_blank_before(prev_type, current_type) and result and result[-1].strip():
+            result.append("")
+        result.append(line)
+
+        blank_after = current_type in ("heading", "hr")
+        if current_type == "code" and line.startswith("```"):
+            in_code = False
+            for previous in lines[:i]:
+                if previous.startswith("```"):
+                    in_code = not in_code
+            blank_after = in_code
+        if blank_after and i + 1 < len(lines) and lines[i + 1].strip():
+            result.append("")
+        prev_type = current_type if line.strip() else "empty"
+
+    text = re.sub(r"\n{3,}", "\n\n", "\n".join(result))
+    if "\r\n" in md_text:
+        text = text.replace("\n", "\r\n")
+    return text
+
+
+_LINES = [
+    "# h", "## h2", "####### seven", "#nohash", "text", "", "  ", "\t", "```", "```py", "~~~", "| a |", "|a",
+    "- a", "* b", "+ c", "-x", "1. x", "2.y", "1)", "> q", ">q", "---", "***", "___", " ---", "-- -", "  indented",
+]
+
+
+def _corpus(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        newline = rng.choice(["\n", "\r\n", "\r"])
+        text = newline.join(rng.choice(_LINES) for _ in range(rng.randint(0, 15)))
+        if rng.random() < 0.3:
+            text += newline * rng.randint(1, 4)
+        if rng.random() < 0.2:
+            text = newline * rng.randint(1, 4) + text
+        yield text
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_reference_on_random_corpus(seed):
+    mismatches = [text for text in _corpus(seed, 5000) if normalize_markdown(text) != _reference(text)]
+    assert mismatches == []
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("# Title\nbody\n## Sub\n- a\n- b\ntext", "# Title\n\nbody\n\n## Sub\n\n- a\n- b\ntext"),
+    ("text\n```py\n# not a heading\n```\nafter", "text\n\n```py\n# not a heading\n```\n\nafter"),
+    ("a\r\n| x |\r\n| y |\r\nb", "a\r\n\r\n| x |\r\n| y |\r\nb"),
+    ("a\n\n\n\nb", "a\n\nb"),
+    ("", ""),
+])
+def test_common_documents(text, expected):
+    assert normalize_markdown(text) == expected
+    assert _reference(text) == expected
+
+
+def test_many_code_blocks():
+    # 原实现每个 ``` 行回扫之前所有行，2 万行、5000 个代码块需要数秒（扩展性见 benchmarks/bench_md_normalizer.py）
+    text = "text\n```\ncode\n```\n" * 5000
+    assert normalize_markdown(text).count("```\n\ntext") == 4999
@@ -0,0 +1,104 @@
+"""convert_html_mathml_to_omml（去重、缓存、进程池并行）与原逐个转换实现的输出等价性测试"""
+
+import random
+import re
+
+import pytest
+
+from pastemd.utils import omml
+from pastemd.utils.omml import convert_html_mathml_to_omml, convert_mathml_to_omml, wrap_omml_conditional
+
+pytest.importorskip("mathml2omml")
+
+_PARALLEL = {"enabled": True, "min_formulas": 0, "max_workers": 2}
+
+
+def _reference(html, skip_table_mathml=False):
+    """原实现：每个公式单独转换，倒序逐个拼接整份 HTML"""
+    elements = [(m.group(0), m.start(), m.end()) for m in re.finditer(r"<math[^>]*>.*?</math>", html, re.DOTALL | re.I)]
+    tables = [(m.start(), m.end()) for m in re.finditer(r"<table[^>]*>.*?</table>", html, re.DOTALL | re.I)]
+    result = html
+    for mathml, start, end in reversed(elements):
+        if skip_table_mathml and any(start >= s and end <= e for s, e in tables):
+            continue
+        try:
+            replacement = wrap_omml_conditional(convert_mathml_to_omml(mathml), re.sub(r"<[^>]+>", "", mathml))
+        except Exception:
+            continue
+        result = result[:start] + replacement + result[end:]
+    return result
+
+
+def _expression(rng, depth=0):
+    roll = rng.random()
+    if depth > 2 or roll < 0.4:
+        return rng.choice(["<mi>x</mi>", "<mi>y</mi>", "<mn>2</mn>", "<mo>+</mo>", "<mi>&alpha;</mi>"])
+    if roll < 0.55:
+        return f"<mfrac>{_expression(rng, depth + 1)}{_expression(rng, depth + 1)}</mfrac>"
+    if roll < 0.7:
+        return f"<msup>{_expression(rng, depth + 1)}{_expression(rng, depth + 1)}</msup>"
+    if roll < 0.8:
+        return f"<msqrt>{_expression(rng, depth + 1)}</msqrt>"
+    return "<mrow>" + "".join(_expression(rng, depth + 1) for _ in range(rng.randint(1, 3))) + "</mrow>"
+
+
+def formula(rng):
+    roll = rng.random()
+    if roll < 0.05:
+        # 转换失败的公式保留原 MathML
+        return rng.choice(["<math><mfrac><mi>a</mi></mfrac></math>", "<math><foo/></math>"])
+    display = ' display="block"' if roll < 0.2 else ""
+    return f"<math{display}><mrow>{_expression(rng)}{_expression(rng)}</mrow></math>"
+
+
+def document(rng, formulas, distinct):
+    """含 formulas 个公式（从 distinct 个不同公式中抽取）的 HTML，部分位于表格中"""
+    pool = [formula(rng) for _ in range(distinct)]
+    parts = []
+    for i in range(formulas):
+        math = rng.choice(pool)
+        if rng.random() < 0.1:
+            parts.append(f"<table><tr><td>cell {math}</td></tr></table>")
+        else:
+            parts.append(f"<p>formula {i}: {math} text</p>")
+    return "".join(parts)
+
+
+@pytest.fixture(autouse=True)
+def _fresh_cache():
+    omml._replacement_cache.clear()
+    yield
+    omml._replacement_cache.clear()
+    omml.shutdown_omml_pool()
+
+
+@pytest.mark.parametrize("skip_table_mathml", [False, True])
+@pytest.mark.parametrize("seed", range(3))
+def test_serial_matches_reference(seed, skip_table_mathml):
+    rng = random.Random(seed)
+    html = document(rng, 120, rng.choice([5, 40, 120]))
+    expected = _reference(html, skip_table_mathml)
+    assert convert_html_mathml_to_omml(html, skip_table_mathml=skip_table_mathml) == expected
+    # 第二次全部命中缓存
+    assert convert_html_mathml_to_omml(html, skip_table_mathml=skip_table_mathml) == expected
+
+
+def test_parallel_matches_reference():
+    rng = random.Random(10)
+    html = document(rng, 200, 150)
+    assert convert_html_mathml_to_omml(html, parallel=_PARALLEL) == _reference(html)
+    assert omml._pool is not None and omml._pool_workers == 2
+
+
+def test_parallel_thresholds():
+    assert omml._parallel_workers(None, 1000) == 0
+    assert omml._parallel_workers({"enabled": False}, 1000) == 0
+    assert omml._parallel_workers(_PARALLEL, 10) == 0
+    assert omml._parallel_workers(_PARALLEL, 1000) == 2
+    assert omml._parallel_workers({"enabled": True, "max_workers": 8}, 100) == 0
+    assert omml._parallel_workers({"enabled": True, "min_formulas": 0, "max_workers": 8}, 40) == 2
+
+
+def test_no_math():
+    html = "<p>no formulas</p>"
+    assert convert_html_mathml_to_omml(html) is html
@@ -0,0 +1,168 @@
+"""rewrite_pandoc_output 与原逐条正则改写的回归语料测试"""
+
+import random
+import re
+
+import pytest
+
+from pastemd.integrations.pandoc_output import rewrite_pandoc_output
+
+
+def _reference_gfm(md):
+    """
+    原 _convert_to_gfm 中的正则改写，修正了两处跨行匹配：
+
+    - 信息串正则 (```\\s*\\w+)\\s+[^\\n]+ 会跨过换行，删除带语言代码块的第一行代码；
+    - $\\s*`..`\\s*$ 会跨过 ```math 改写出的 $$，改写下一段的行内代码。
+    """
+    md = re.sub(r"```\s*math\s*\n(.*?)\n\s*```", r"$$\n\1\n$$", md, flags=re.DOTALL)
+    md = re.sub(r"\$[ \t]*`([^`\n]+)`[ \t]*\$", r"$\1$", md)
+    md = re.sub(r"(```[ \t]*\w+)[ \t]+[^\n]+", r"\1", md)
+    md = re.sub(r"\\~~(.*?)\\~~", r"~~\1~~", md)
+    return md.replace("{{TASK_CHECKED}}", "[x]").replace("{{TASK_UNCHECKED}}", "[ ]")
+
+
+_LATEX_SKIP = [
+    r"^\s*\\documentclass", r"^\s*\\usepackage", r"^\s*\\begin\{document\}", r"^\s*\\end\{document\}",
+    r"^\s*\\maketitle", r"^\s*\\date\{", r"^\s*\\author\{", r"^\s*\\providecommand", r"^\s*\\setlength",
+    r"^\s*\\def\\tightlist", r"^\s*\\tightlist", r"^\s*\\newcommand",
+]
+
+
+def _reference_latex(latex):
+    """原 _strip_latex_preamble：逐行逐条匹配，每行重新检查前 20 行中的 \\documentclass"""
+    lines = latex.split("\n")
+    result_lines = []
+    in_document = False
+    for line in lines:
+        if any(re.match(pattern, line) for pattern in _LATEX_SKIP):
+            if "\\begin{document}" in line:
+                in_document = True
+            continue
+        if in_document or not any(re.match(r"^\s*\\documentclass", l) for l in lines[:20]):
+            result_lines.append(line)
+    return "\n".join(result_lines).strip()
+
+
+_WORDS = "alpha beta gamma delta 中文 文本 price $5 a_b x*y".split()
+_CODE = {
+    "python": ["import os", "def f(x):", "    return x * 2", "print(f(3))"],
+    "bash": ["ls -la", "echo hello", "cd /tmp"],
+    "": ["plain code", "more code"],
+}
+
+
+def _words(rng, n):
+    return " ".join(rng.choice(_WORDS) for _ in range(n))
+
+
+def _inline(rng):
+    roll = rng.random()
+    if roll < 0.15:
+        return "$`" + rng.choice(["x^2", "a+b", "\\\\frac{1}{2}", "E=mc^2"]) + "`$"
+    if roll < 0.25:
+        return f"`{rng.choice(['code', 'x = 1', 'a|b', '$HOME'])}`"
+    if roll < 0.32:
+        return "\\~~" + _words(rng, 2) + "\\~~"
+    if roll < 0.38:
+        return f"**{_words(rng, 2)}**"
+    if roll < 0.42:
+        return "[link](http://e.com/x)"
+    return _words(rng, rng.randint(1, 4))
+
+
+def _para(rng):
+    return " ".join(_inline(rng) for _ in range(rng.randint(1, 8)))
+
+
+def _gfm_block(rng):
+    """pandoc 风格的 GFM 块（代码块中不含 $`..`$ / \\~~，见 test_code_is_left_alone）"""
+    roll = rng.random()
+    if roll < 0.35:
+        return _para(rng)
+    if roll < 0.45:
+        lang = rng.choice(list(_CODE))
+        lines = rng.sample(_CODE[lang], rng.randint(1, len(_CODE[lang])))
+        return (f"``` {lang}" if lang else "```") + "\n" + "\n".join(lines) + "\n```"
+    if roll < 0.52:
+        return "``` math\n" + rng.choice(["x^2 + y^2 = z^2", "\\int_0^1 f(x)\\,dx", "a = b\\\\\nc = d"]) + "\n```"
+    if roll < 0.62:
+        items = (f"- {rng.choice(['{{TASK_CHECKED}}', '{{TASK_UNCHECKED}}', ''])} {_para(rng)}" for _ in range(rng.randint(1, 4)))
+        return "\n".join(item.replace("  ", " ") for item in items)
+    if roll < 0.7:
+        rows = (f"| {_inline(rng)} | {_inline(rng)} |" for _ in range(rng.randint(1, 3)))
+        return "| a | b |\n|---|---|\n" + "\n".join(rows)
+    if roll < 0.75:
+        return "> " + _para(rng)
+    if roll < 0.8:
+        return "1.  item " + _para(rng) + "\n\n    ``` python\n    x = 1\n    ```"
+    return "# " + _words(rng, 3)
+
+
+def gfm_document(rng, blocks):
+    return "\n\n".join(_gfm_block(rng) for _ in range(blocks)) + "\n"
+
+
+def latex_document(rng, blocks, preamble=False):
+    out = []
+    if preamble:
+        out += [
+            "\\documentclass{article}", "\\usepackage{amsmath}", "\\providecommand{\\tightlist}{%",
+            "  \\setlength{\\itemsep}{0pt}\\setlength{\\parskip}{0pt}}", "\\begin{document}",
+        ]
+    for _ in range(blocks):
+        roll = rng.random()
+        if roll < 0.4:
+            out.append(_words(rng, 8) + " $x^2$ \\textbf{" + _words(rng, 2) + "}")
+        elif roll < 0.55:
+            out += ["\\begin{itemize}", "\\tightlist", "\\item " + _words(rng, 3), "\\item " + _words(rng, 3), "\\end{itemize}"]
+        elif roll < 0.7:
+            out += ["\\begin{verbatim}", "x = 1", "\\end{verbatim}"]
+        elif roll < 0.8:
+            out += [
+                "\\begin{Shaded}", "\\begin{Highlighting}[]", "\\NormalTok{x }\\OperatorTok{=} \\DecValTok{1}",
+                "\\end{Highlighting}", "\\end{Shaded}",
+            ]
+        else:
+            out += ["", "\\section{" + _words(rng, 2) + "}\\label{sec}", ""]
+    if preamble:
+        out.append("\\end{document}")
+    return "\n".join(out) + "\n"
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_gfm_matches_reference(seed):
+    rng = random.Random(seed)
+    documents = [gfm_document(rng, rng.randint(1, 12)) for _ in range(1000)]
+    assert [d for d in documents if rewrite_pandoc_output(d, "gfm") != _reference_gfm(d)] == []
+
+
+@pytest.mark.parametrize("seed", range(3))
+def test_latex_matches_reference(seed):
+    rng = random.Random(seed)
+    documents = [latex_document(rng, rng.randint(1, 15), rng.random() < 0.3) for _ in range(1000)]
+    assert [d for d in documents if rewrite_pandoc_output(d, "latex") != _reference_latex(d)] == []
+
+
+def test_fence_info_string_keeps_first_code_line():
+    # 原信息串正则跨行，删除了 print(1)
+    assert rewrite_pandoc_output("``` python\nprint(1)\n```\n", "gfm") == "``` python\nprint(1)\n```\n"
+    assert rewrite_pandoc_output("```python {.x}\nprint(1)\n```\n", "gfm") == "```python\nprint(1)\n```\n"
+
+
+def test_code_is_left_alone():
+    md = "```\necho $`date`$ \\~~x\\~~ {{TASK_CHECKED}}\n```\n`$`x`$` $`y`$\n"
+    assert rewrite_pandoc_output(md, "gfm") == "```\necho $`date`$ \\~~x\\~~ [x]\n```\n`$`x`$` $y$\n"
+
+    latex = "\\begin{verbatim}\n\\usepackage{x}\n\\end{verbatim}\n\\tightlist\ntext"
+    assert rewrite_pandoc_output(latex, "latex") == "\\begin{verbatim}\n\\usepackage{x}\n\\end{verbatim}\ntext"
+
+
+def test_math_block_in_list_keeps_indent():
+    md = "- item\n\n  ``` math\n  x^2\n  ```\n\n> ``` math\n> y\n> ```\n"
+    assert rewrite_pandoc_output(md, "gfm") == "- item\n\n  $$\n  x^2\n  $$\n\n> $$\n> y\n> $$\n"
+
+
+def test_unknown_target():
+    with pytest.raises(KeyError):
+        rewrite_pandoc_output("x", "rst")
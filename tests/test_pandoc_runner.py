@@ -0,0 +1,54 @@
+"""run_pandoc 进程运行器测试（用 Python 子进程代替 pandoc）"""
+
+import sys
+import threading
+import time
+
+import pytest
+
+from pastemd.core.errors import PandocError
+from pastemd.integrations import pandoc_runner
+from pastemd.integrations.pandoc_runner import CancelToken, PandocCancelledError, run_pandoc
+
+
+def _python(code):
+    return [sys.executable, "-c", code]
+
+
+def test_large_output_is_complete():
+    # 输出远大于管道缓冲区，进程退出时读线程仍有数据要读
+    code = "import sys; sys.stdout.buffer.write(sys.stdin.buffer.read() * 8); sys.stderr.write('warn')"
+    data = bytes(range(256)) * 4096
+    result = run_pandoc(_python(code), data)
+    assert result.returncode == 0
+    assert result.stdout == data * 8
+    assert result.stderr == b"warn"
+
+
+def test_timeout_and_cancel():
+    sleeper = _python("import sys, time; sys.stderr.write('started'); sys.stderr.flush(); time.sleep(30)")
+    started = time.monotonic()
+    with pytest.raises(PandocCancelledError, match="timed out"):
+        run_pandoc(sleeper, b"", timeout_s=0.5)
+
+    token = CancelToken()
+    threading.Timer(0.3, token.cancel, args=("superseded",)).start()
+    with pytest.raises(PandocCancelledError, match="superseded"):
+        run_pandoc(sleeper, b"", token=token)
+    assert time.monotonic() - started < 10
+
+
+def test_output_pipe_held_open_after_exit(monkeypatch):
+    # 进程退出后，后台子进程仍持有 stdout：不能把读到一半的输出当作成功结果
+    monkeypatch.setattr(pandoc_runner, "_READER_JOIN_TIMEOUT_S", 0.5)
+    code = (
+        "import subprocess, sys; print('partial', flush=True); "
+        "subprocess.Popen([sys.executable, '-c', 'import time; time.sleep(3)'])"
+    )
+    with pytest.raises(PandocError, match="output may be incomplete"):
+        run_pandoc(_python(code), b"")
+
+
+def test_launch_failure():
+    with pytest.raises(PandocError, match="Failed to launch"):
+        run_pandoc(["/nonexistent/pandoc"], b"")
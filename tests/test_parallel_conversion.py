@@ -0,0 +1,167 @@
+"""超大 Markdown 分块（split_markdown_chunks）与 DOCX 合并（merge_docx_packages）测试"""
+
+import io
+import zipfile
+
+from lxml import etree
+
+from pastemd.utils.docx_merge import merge_docx_packages
+from pastemd.utils.markdown_utils import merge_markdown_contents, split_markdown_chunks
+
+W = "http://schemas.openxmlformats.org/wordprocessingml/2006/main"
+R = "http://schemas.openxmlformats.org/officeDocument/2006/relationships"
+NS = {"w": W}
+
+
+def _section(i: int, body: str = "text") -> str:
+    return f"# Title {i}\n\n{body} {i}\n"
+
+
+def test_split_rejoins_to_original_text():
+    md = "\n".join(_section(i) for i in range(10))
+    chunks = split_markdown_chunks(md, 4)
+    assert 2 <= len(chunks) <= 4
+    assert all(chunk.lstrip().startswith("# ") for chunk in chunks)
+    assert "\n".join(chunks) == md
+
+
+def test_split_keeps_code_fences_and_math_blocks_intact():
+    fenced = "```\n# not a heading\n```\n"
+    math = "$$\n# also not a heading\n$$\n"
+    md = "\n".join([_section(0), fenced, _section(1), math, _section(2), "~~~~\n# x\n~~~\n~~~~\n"])
+    chunks = split_markdown_chunks(md, 8)
+    assert "\n".join(chunks) == md
+    for chunk in chunks:
+        assert chunk.count("```") % 2 == 0
+        assert chunk.count("$$") % 2 == 0
+    assert [c.lstrip().splitlines()[0] for c in chunks] == ["# Title 0", "# Title 1", "# Title 2"]
+
+
+def test_split_at_file_boundaries():
+    md = merge_markdown_contents([("a.md", "alpha\n"), ("b.md", "beta\n"), ("c.md", "gamma\n")])
+    chunks = split_markdown_chunks(md, 3)
+    assert len(chunks) == 3
+    assert ["alpha" in chunks[0], "beta" in chunks[1], "gamma" in chunks[2]] == [True] * 3
+
+
+def test_split_copies_link_definitions_and_skips_footnotes():
+    md = "\n".join([_section(0, "[a][ref]" * 20), _section(1, "[b][ref]" * 20), "[ref]: http://example.com"])
+    chunks = split_markdown_chunks(md, 2)
+    assert len(chunks) == 2
+    assert all("[ref]: http://example.com" in chunk for chunk in chunks)
+
+    with_footnote = "\n".join([_section(0, "x[^1]"), _section(1), "[^1]: note"])
+    assert split_markdown_chunks(with_footnote, 2) == [with_footnote]
+
+
+def test_split_respects_minimum_chunk_size():
+    md = "\n".join(_section(i) for i in range(10))
+    assert split_markdown_chunks(md, 4, min_chunk_chars=len(md)) == [md]
+    assert split_markdown_chunks(md, 1) == [md]
+
+
+def _docx(body: str, *, rels: str = "", numbering: str = "", styles: str = "", media: dict = None) -> bytes:
+    """生成只含合并所需部件的最小 DOCX 包"""
+    out = io.BytesIO()
+    with zipfile.ZipFile(out, "w") as zf:
+        zf.writestr(
+            "[Content_Types].xml",
+            '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+            '<Default Extension="png" ContentType="image/png"/></Types>',
+        )
+        zf.writestr(
+            "word/document.xml",
+            f'<w:document xmlns:w="{W}" xmlns:r="{R}"><w:body>{body}<w:sectPr/></w:body></w:document>',
+        )
+        zf.writestr(
+            "word/_rels/document.xml.rels",
+            f'<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">{rels}</Relationships>',
+        )
+        zf.writestr("word/numbering.xml", f'<w:numbering xmlns:w="{W}">{numbering}</w:numbering>')
+        zf.writestr("word/styles.xml", f'<w:styles xmlns:w="{W}">{styles}</w:styles>')
+        for name, data in (media or {}).items():
+            zf.writestr(name, data)
+    return out.getvalue()
+
+
+def _part(data: bytes, name: str):
+    with zipfile.ZipFile(io.BytesIO(data)) as zf:
+        return etree.fromstring(zf.read(name))
+
+
+def _heading(name: str, text: str, bookmark_id: str = "0") -> str:
+    return (
+        f'<w:p><w:bookmarkStart w:id="{bookmark_id}" w:name="{name}"/><w:r><w:t>{text}</w:t></w:r>'
+        f'<w:bookmarkEnd w:id="{bookmark_id}"/></w:p>'
+    )
+
+
+_LIST = '<w:p><w:pPr><w:numPr><w:numId w:val="1"/></w:numPr></w:pPr><w:r><w:t>item</w:t></w:r></w:p>'
+_NUMBERING = (
+    '<w:abstractNum w:abstractNumId="0"><w:nsid w:val="AAAA"/></w:abstractNum>'
+    '<w:num w:numId="1"><w:abstractNumId w:val="0"/></w:num>'
+)
+_IMAGE_REL = (
+    '<Relationship Id="rId5" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/image"'
+    ' Target="media/image1.png"/>'
+)
+
+
+def test_merge_appends_bodies_in_order():
+    parts = [_docx(_heading("intro", "one")), _docx(_heading("intro", "two")), _docx("<w:p><w:r><w:t>three</w:t></w:r></w:p>")]
+    document = _part(merge_docx_packages(parts), "word/document.xml")
+    body = document.find("w:body", NS)
+    assert [t.text for t in body.iterfind(".//w:t", NS)] == ["one", "two", "three"]
+    assert body[-1].tag == f"{{{W}}}sectPr"
+
+    # 重名书签改名，书签 id 在整个文档内唯一
+    starts = body.findall(".//w:bookmarkStart", NS)
+    assert [el.get(f"{{{W}}}name") for el in starts] == ["intro", "intro-1"]
+    assert len({el.get(f"{{{W}}}id") for el in starts}) == 2
+
+
+def test_merge_renames_internal_links_with_their_bookmarks():
+    link = '<w:p><w:hyperlink w:anchor="intro"><w:r><w:t>see</w:t></w:r></w:hyperlink></w:p>'
+    parts = [_docx(_heading("intro", "one")), _docx(_heading("intro", "two") + link)]
+    body = _part(merge_docx_packages(parts), "word/document.xml").find("w:body", NS)
+    assert body.find(".//w:hyperlink", NS).get(f"{{{W}}}anchor") == "intro-1"
+
+
+def test_merge_copies_images_and_relationships():
+    drawing = f'<w:p><w:r><w:drawing><a:blip xmlns:a="urn:a" r:embed="rId5" xmlns:r="{R}"/></w:drawing></w:r></w:p>'
+    first = _docx(drawing, rels=_IMAGE_REL, media={"word/media/image1.png": b"first"})
+    second = _docx(drawing, rels=_IMAGE_REL, media={"word/media/image1.png": b"second"})
+    merged = merge_docx_packages([first, second])
+
+    rels = _part(merged, "word/_rels/document.xml.rels")
+    targets = {rel.get("Id"): rel.get("Target") for rel in rels}
+    body = _part(merged, "word/document.xml").find("w:body", NS)
+    embeds = [el.get(f"{{{R}}}embed") for el in body.iter("{urn:a}blip")]
+    assert embeds[0] == "rId5" and embeds[1] != "rId5"
+    with zipfile.ZipFile(io.BytesIO(merged)) as zf:
+        assert zf.read("word/" + targets[embeds[0]]) == b"first"
+        assert zf.read("word/" + targets[embeds[1]]) == b"second"
+
+
+def test_merge_offsets_list_numbering_and_adds_missing_styles():
+    first = _docx(_LIST, numbering=_NUMBERING, styles='<w:style w:styleId="Body"/>')
+    second = _docx(_LIST, numbering=_NUMBERING, styles='<w:style w:styleId="Body"/><w:style w:styleId="Code"/>')
+    merged = merge_docx_packages([first, second])
+
+    body = _part(merged, "word/document.xml").find("w:body", NS)
+    # 后续分块的编号整体偏移到基础包已有编号之后，引用随之更新
+    assert [el.get(f"{{{W}}}val") for el in body.iterfind(".//w:numId", NS)] == ["1", "3"]
+    numbering = _part(merged, "word/numbering.xml")
+    assert [el.get(f"{{{W}}}abstractNumId") for el in numbering.findall("w:abstractNum", NS)] == ["0", "1"]
+    assert numbering.find("w:num[@w:numId='3']/w:abstractNumId", NS).get(f"{{{W}}}val") == "1"
+    # nsid 相同时 Word 会把两个列表连续编号
+    assert len(numbering.findall(".//w:nsid", NS)) == 1
+    styles = _part(merged, "word/styles.xml")
+    assert [el.get(f"{{{W}}}styleId") for el in styles] == ["Body", "Code"]
+
+
+def test_merge_failure_returns_none():
+    assert merge_docx_packages([]) is None
+    assert merge_docx_packages([b"not a zip", b"x"]) is None
+    single = _docx("<w:p/>")
+    assert merge_docx_packages([single]) is single
@@ -0,0 +1,36 @@
+"""CellFormat 解析缓存测试"""
+
+import dataclasses
+
+import pytest
+
+from pastemd.service.spreadsheet.formatting import CellFormat, ParsedCell
+
+
+def _parse(text):
+    cell_format = CellFormat(text)
+    cell_format.parse()
+    return cell_format
+
+
+@pytest.mark.parametrize("text", ["plain", "a **b** *c* ~~d~~ `e`", "[**x**](http://e.com) y", "<pre>a<br>b</pre>", "x" * 300])
+def test_cached_matches_parse(text):
+    parsed = _parse(text)
+    cached = CellFormat.cached(text)
+    assert isinstance(cached, ParsedCell)
+    assert cached == parsed.freeze()
+    assert (cached.clean_text, cached.is_code_block, cached.has_newline) == \
+        (parsed.clean_text, parsed.is_code_block, parsed.has_newline)
+    assert [(s.text, s.bold, s.italic, s.strikethrough, s.is_code, s.hyperlink_url) for s in cached.segments] == \
+        [(s.text, s.bold, s.italic, s.strikethrough, s.is_code, s.hyperlink_url) for s in parsed.segments]
+
+
+def test_cached_result_is_shared_and_read_only():
+    cached = CellFormat.cached("**bold** text")
+    assert CellFormat.cached("**bold** text") is cached
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cached.clean_text = "changed"
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        cached.segments[0].bold = False
+    with pytest.raises(AttributeError):
+        cached.segments.append(None)
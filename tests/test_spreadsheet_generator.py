@@ -0,0 +1,87 @@
+"""SpreadsheetGenerator 流式（write-only）生成与标准生成的输出等价性测试"""
+
+import random
+from io import BytesIO
+
+import pytest
+from openpyxl import load_workbook
+from openpyxl.cell.rich_text import CellRichText
+
+from pastemd.service.spreadsheet.generator import SpreadsheetGenerator
+
+_CELLS = [
+    "", "plain", "123", "2024-01-01", "**bold**", "*italic*", "~~del~~", "***both***", "`code`",
+    "a **b** c", "x `y` z", "[link](http://example.com)", "[**bold link**](http://e.com)", "a<br>b",
+    "<code>x = 1</code>", "<pre>line1<br>line2</pre>", "__u__ and _i_", "\\*not italic\\*", "中文 **粗体**",
+    "a very long cell value that is wider than the fifty character column width limit",
+]
+
+
+def _font(font):
+    if font is None:
+        return None
+    # 默认字体的颜色是主题色，rgb 不是字符串
+    color = font.color.rgb if font.color is not None and isinstance(font.color.rgb, str) else None
+    return (bool(font.b), bool(font.i), bool(font.strike), font.name, color, font.u)
+
+
+def _value(value):
+    if isinstance(value, CellRichText):
+        return tuple(
+            (part.text, bool(part.font.b), bool(part.font.i), bool(part.font.strike), part.font.rFont)
+            if hasattr(part, "font") else part
+            for part in value
+        )
+    return value
+
+
+def _snapshot(xlsx):
+    """与生成方式无关的比较形式：值（含富文本）、超链接、字体、填充、对齐、列宽"""
+    ws = load_workbook(BytesIO(xlsx), rich_text=True).active
+    cells = []
+    for row in ws.iter_rows():
+        for cell in row:
+            fill = cell.fill.fgColor.rgb if cell.fill.fill_type else None
+            cells.append((
+                cell.coordinate,
+                _value(cell.value),
+                cell.hyperlink.target if cell.hyperlink else None,
+                _font(cell.font),
+                fill,
+                (bool(cell.alignment.wrap_text), cell.alignment.horizontal, cell.alignment.vertical),
+            ))
+    widths = {key: dim.width for key, dim in ws.column_dimensions.items() if dim.customWidth}
+    return ws.title, cells, widths
+
+
+def _tables(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        cols = rng.randint(1, 4)
+        # 除首行外允许行长度与首行不同（列宽只按首行的列统计）
+        rows = [[rng.choice(_CELLS) for _ in range(cols)]]
+        for _ in range(rng.randint(0, 6)):
+            rows.append([rng.choice(_CELLS) for _ in range(max(1, cols + rng.randint(-1, 1)))])
+        yield rows
+
+
+@pytest.mark.parametrize("keep_format", [True, False])
+@pytest.mark.parametrize("seed", range(2))
+def test_streaming_matches_standard(seed, keep_format):
+    for table in _tables(seed, 60):
+        standard = SpreadsheetGenerator.generate_xlsx_bytes(table, keep_format, streaming=False)
+        streaming = SpreadsheetGenerator.generate_xlsx_bytes(table, keep_format, streaming=True)
+        assert _snapshot(streaming) == _snapshot(standard), table
+
+
+def test_every_cell_kind_matches():
+    table = [_CELLS[:10], _CELLS[10:]]
+    for keep_format in (True, False):
+        standard = SpreadsheetGenerator.generate_xlsx_bytes(table, keep_format, streaming=False)
+        streaming = SpreadsheetGenerator.generate_xlsx_bytes(table, keep_format, streaming=True)
+        assert _snapshot(streaming) == _snapshot(standard)
+
+
+def test_empty_table():
+    assert _snapshot(SpreadsheetGenerator.generate_xlsx_bytes([], streaming=True)) == \
+        _snapshot(SpreadsheetGenerator.generate_xlsx_bytes([], streaming=False))
@@ -0,0 +1,105 @@
+"""parse_markdown_table 与原逐字符实现的等价性测试"""
+
+import random
+import re
+
+import pytest
+
+from pastemd.service.spreadsheet.parser import parse_markdown_table
+
+
+def _reference_split(line):
+    cells = []
+    current = []
+    for i, ch in enumerate(line):
+        if i > 0 and ch == "|" and line[i - 1] == "\\":
+            current[-1] = "|"
+        elif ch == "|":
+            cells.append("".join(current).strip())
+            current = []
+        else:
+            current.append(ch)
+    if current or cells:
+        cells.append("".join(current).strip())
+    return cells
+
+
+def _reference(md_text):
+    """原实现：整段切分后逐行、逐字符解析"""
+    lines = md_text.strip().split("\n")
+    if len(lines) < 2:
+        return None
+    rows = []
+    separator_found = False
+    for line in lines:
+        line = line.strip()
+        if not line:
+            continue
+        if "|" not in line:
+            if separator_found:
+                break
+            return None
+        if re.match(r"^\s*\|?\s*[-:]+\s*(\|\s*[-:]+\s*)+\|?\s*$", line):
+            separator_found = True
+            continue
+        cells = _reference_split(line)
+        if cells and cells[0] == "":
+            cells = cells[1:]
+        if cells and cells[-1] == "":
+            cells = cells[:-1]
+        if cells:
+            rows.append(cells)
+    if not separator_found or not rows:
+        return None
+    return rows
+
+
+_CELLS = ["a", "", " b ", "x\\|y", "\\", "1.5", "-", ":--", "**c**", "中文", "a\\\\|b"]
+_SEPARATORS = ["|---|---|", "---|:---:", "| :-- | --: |", "|-|", "--", "|---|"]
+_OTHER = ["", "  ", "text", "# heading", "|", "||", "\r"]
+
+
+def _corpus(seed, count):
+    rng = random.Random(seed)
+    for _ in range(count):
+        lines = []
+        for _ in range(rng.randint(0, 8)):
+            roll = rng.random()
+            if roll < 0.6:
+                cells = [rng.choice(_CELLS) for _ in range(rng.randint(1, 4))]
+                line = "|".join(cells)
+                if rng.random() < 0.7:
+                    line = "| " + line + " |"
+                lines.append(line)
+            elif roll < 0.8:
+                lines.append(rng.choice(_SEPARATORS))
+            else:
+                lines.append(rng.choice(_OTHER))
+        yield rng.choice(["\n", "\r\n"]).join(lines)
+
+
+@pytest.mark.parametrize("seed", range(4))
+def test_matches_reference_on_random_corpus(seed):
+    # 不含反引号：行内代码中的竖线不再分割单元格，是有意的行为变化
+    mismatches = [text for text in _corpus(seed, 5000) if parse_markdown_table(text) != _reference(text)]
+    assert mismatches == []
+
+
+def test_inline_code_keeps_pipes():
+    text = "| cmd | note |\n|---|---|\n| `a | b` | x\\|y |\n| ``c`|`d`` | `open |"
+    assert parse_markdown_table(text) == [
+        ["cmd", "note"],
+        ["`a | b`", "x|y"],
+        ["``c`|`d``", "`open"],
+    ]
+
+
+def test_stops_at_first_line_after_table():
+    text = "| a | b |\n|---|---|\n| 1 | 2 |\n\nSome text | with a pipe\nmore text\n| 3 | 4 |"
+    assert parse_markdown_table(text) == [["a", "b"], ["1", "2"], ["Some text", "with a pipe"]]
+    assert parse_markdown_table("| a | b |\n|---|---|\n| 1 | 2 |\nplain\n| 3 | 4 |") == [["a", "b"], ["1", "2"]]
+
+
+@pytest.mark.parametrize("text", ["", "| a | b |", "plain\n|---|---|", "| a |\n| b |"])
+def test_not_a_table(text):
+    assert parse_markdown_table(text) is None